@@ -14,6 +14,9 @@ from typing import Tuple, Optional, Dict, Any
 from database import ALLOW_CSV_FALLBACK, get_data_source, engine as db_engine, DATA_DIR
 from repositories.market_data_repository import MarketDataRepository
 from services.data_loader import get_loader
+import pandas_compat
+
+pandas_compat.install()
 
 logger = logging.getLogger(__name__)
 
@@ -660,6 +663,22 @@ def build_intervals(filtered_data: pd.DataFrame, spot_adjustment_type: int, spot
         intervals.append((start, filtered_data.iloc[-1]['Date']))
     return intervals
 
+# ── Columnar analytics kernels ────────────────────────────────────────────────
+def _max_run_length(mask: np.ndarray) -> int:
+    """Longest run of consecutive True values (run-length encoding via diff)."""
+    if mask.size == 0 or not mask.any():
+        return 0
+    padded = np.concatenate(([0], mask.astype(np.int8), [0]))
+    edges = np.flatnonzero(np.diff(padded))
+    return int((edges[1::2] - edges[0::2]).max())
+
+
+def _last_high_index(cumulative: np.ndarray, running_peak: np.ndarray) -> np.ndarray:
+    """For every row, position of the last row at or before it that set the running peak."""
+    at_high = np.where(cumulative >= running_peak, np.arange(cumulative.size), -1)
+    return np.maximum.accumulate(at_high) if cumulative.size else at_high
+
+
 def compute_analytics(df: pd.DataFrame) -> Tuple[pd.DataFrame, Dict[str, Any]]:
     """
     AlgoTest-exact analytics engine.
@@ -775,18 +794,17 @@ def compute_analytics(df: pd.DataFrame) -> Tuple[pd.DataFrame, Dict[str, Any]]:
         dd_series = _adf['DD'].astype(float).fillna(0.0).tolist() if 'DD' in _adf.columns else [0.0] * len(_adf)
         pct_dd_series = _adf['%DD'].astype(float).fillna(0.0).tolist() if '%DD' in _adf.columns else [0.0] * len(_adf)
     else:
-        cumulative_index = 100.0
-        peak_index = 100.0
-        for i in range(len(_adf)):
-            pnl_pct = net_pnl_pct.iloc[i] if pd.notna(net_pnl_pct.iloc[i]) else 0
-            cumulative_index = cumulative_index * (1 + pnl_pct / 100)
-            peak_index = max(peak_index, cumulative_index)
-            dd_index = cumulative_index - peak_index
-            pct_dd = (dd_index / peak_index * 100) if peak_index != 0 else 0
-            cumulative_series.append(round(cumulative_index, 6))
-            peak_series.append(round(peak_index, 6))
-            dd_series.append(round(dd_index, 6))
-            pct_dd_series.append(round(pct_dd, 6))
+        # Compounded index from 100: cumprod multiplies in the same order as
+        # the running product, running peak starts at the 100 base.
+        growth = 1 + np.nan_to_num(net_pnl_pct.to_numpy(dtype=float), nan=0.0) / 100
+        cumulative_index = np.cumprod(np.concatenate(([100.0], growth)))[1:]
+        peak_index = np.maximum.accumulate(np.maximum(cumulative_index, 100.0))
+        dd_index = cumulative_index - peak_index
+        pct_dd = np.divide(dd_index, peak_index, out=np.zeros_like(dd_index), where=peak_index != 0) * 100
+        cumulative_series = np.round(cumulative_index, 6)
+        peak_series = np.round(peak_index, 6)
+        dd_series = np.round(dd_index, 6)
+        pct_dd_series = np.round(pct_dd, 6)
 
     _adf = _adf.copy()
     _adf['Cumulative'] = cumulative_series
@@ -834,21 +852,9 @@ def compute_analytics(df: pd.DataFrame) -> Tuple[pd.DataFrame, Dict[str, Any]]:
     else:
         expectancy = 0
 
-    max_win_streak  = 0
-    max_loss_streak = 0
-    cur_win  = 0
-    cur_loss = 0
-    for pnl in _adf[trade_pnl_col]:
-        if pnl > 0:
-            cur_win  += 1
-            cur_loss  = 0
-            max_win_streak = max(max_win_streak, cur_win)
-        elif pnl < 0:
-            cur_loss += 1
-            cur_win   = 0
-            max_loss_streak = max(max_loss_streak, cur_loss)
-        else:
-            cur_win = cur_loss = 0
+    trade_pnl_arr   = _adf[trade_pnl_col].to_numpy(dtype=float)
+    max_win_streak  = _max_run_length(trade_pnl_arr > 0)
+    max_loss_streak = _max_run_length(trade_pnl_arr < 0)
 
     start_date = pd.to_datetime(_adf[entry_date_col].min(), dayfirst=True)
     end_date   = pd.to_datetime(_adf[exit_date_col].max(), dayfirst=True)
@@ -996,59 +1002,53 @@ def build_pivot(df: pd.DataFrame, expiry_col: str) -> Dict[str, Any]:
 
     exit_date_col = 'Exit Date' if 'Exit Date' in df.columns else 'exit_date'
 
+    if not pd.api.types.is_datetime64_any_dtype(df[exit_date_col]):
+        df[exit_date_col] = pd.to_datetime(df[exit_date_col], dayfirst=True)
     df = df.sort_values(exit_date_col).reset_index(drop=True)
-    df[exit_date_col] = pd.to_datetime(df[exit_date_col], dayfirst=True)
-
-    # ── Build GLOBAL cumulative curve (same as compute_analytics) ────────────
-    df['_Global_Cumulative'] = df['Net P&L'].cumsum()
-    df['_Global_Peak']       = df['_Global_Cumulative'].cummax().clip(lower=0)
-    df['_Global_DD']         = df['_Global_Cumulative'] - df['_Global_Peak']
 
-    df['_Year']  = df[exit_date_col].dt.year
-    df['_Month'] = df[exit_date_col].dt.strftime('%b')
+    # ── GLOBAL cumulative curve (same as compute_analytics) ──────────────────
+    pnl        = pd.to_numeric(df['Net P&L'], errors='coerce')
+    cumulative = pnl.cumsum().to_numpy(dtype=float)
+    running    = np.fmax.accumulate(cumulative) if len(cumulative) else cumulative
+    peak       = np.clip(running, 0, None)
+    global_dd  = cumulative - peak
+    # Peak row of a trough: last row that set the running high; a peak clipped
+    # to 0 (curve never above 0) has no such row and falls back to row 0.
+    peak_row   = np.where(running >= 0, _last_high_index(cumulative, running), 0)
+    peak_row   = np.maximum(peak_row, 0)
+
+    exit_dates = df[exit_date_col]
+    years      = exit_dates.dt.year.to_numpy()
+    months     = exit_dates.dt.month.to_numpy()
 
     month_order = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
                    'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
 
-    yearly_data = []
-
-    for year in sorted(df['_Year'].unique()):
-        year_df = df[df['_Year'] == year].copy()
-
-        # ── Monthly P&L sums ─────────────────────────────────────────────────
-        monthly_pnl = year_df.groupby('_Month')['Net P&L'].sum()
-
-        # ── Yearly totals ────────────────────────────────────────────────────
-        total_pnl = year_df['Net P&L'].sum()
+    # ── Per-year aggregates in one groupby each ─────────────────────────────
+    frame = pd.DataFrame({'year': years, 'month': months, 'pnl': pnl.to_numpy(), 'dd': global_dd})
+    by_year       = frame.groupby('year', sort=True)
+    year_totals   = by_year['pnl'].sum()
+    year_max_dd   = by_year['dd'].min()
+    year_trough   = frame.assign(dd=frame['dd'].fillna(np.inf)).groupby('year', sort=True)['dd'].idxmin()
+    monthly_grid  = (
+        frame.groupby(['year', 'month'])['pnl'].sum()
+             .unstack(fill_value=0)
+             .reindex(index=year_totals.index, columns=range(1, 13), fill_value=0)
+    )
 
-        # ── Max Drawdown for this year (on the GLOBAL curve) ─────────────────
-        # We want the deepest trough whose EXIT DATE falls in this year
-        year_dd = year_df['_Global_DD']
-        max_dd  = year_dd.min()           # most negative value (≤ 0)
+    exit_values = exit_dates.to_numpy()
+    yearly_data = []
+    for year in year_totals.index:
+        total_pnl = year_totals.loc[year]
+        max_dd    = year_max_dd.loc[year]
 
         days_for_mdd = 0
         mdd_date_range = ""
 
         if max_dd < 0:
-            # Trough = row with the worst DD in this year
-            trough_local_idx = year_dd.idxmin()
-            trough_date = year_df.loc[trough_local_idx, exit_date_col]
-
-            # Peak = last row (anywhere in full dataset before trough)
-            # where Global_Cumulative == Global_Peak at the trough
-            pre_trough_global = df.loc[:trough_local_idx]
-            peak_val = year_df.loc[trough_local_idx, '_Global_Peak']
-
-            peak_candidates = pre_trough_global[
-                pre_trough_global['_Global_Cumulative'] >= peak_val
-            ]
-            if not peak_candidates.empty:
-                peak_date = peak_candidates.iloc[-1][exit_date_col]
-            else:
-                peak_date = df.iloc[0][exit_date_col]
-
-            peak_date   = pd.Timestamp(peak_date)
-            trough_date = pd.Timestamp(trough_date)
+            trough_idx  = int(year_trough.loc[year])
+            trough_date = pd.Timestamp(exit_values[trough_idx])
+            peak_date   = pd.Timestamp(exit_values[peak_row[trough_idx]])
             days_for_mdd = (trough_date - peak_date).days
 
             # Format: "M/D/YYYY to M/D/YYYY"  (matches AlgoTest display)
@@ -1063,7 +1063,7 @@ def build_pivot(df: pd.DataFrame, expiry_col: str) -> Dict[str, Any]:
 
         yearly_data.append({
             'year':          year,
-            'monthly_pnl':   monthly_pnl.to_dict() if hasattr(monthly_pnl, 'to_dict') else dict(monthly_pnl),
+            'monthly_pnl':   dict(zip(month_order, monthly_grid.loc[year].tolist())),
             'total_pnl':     round(total_pnl, 2),
             'max_dd':        round(max_dd, 2),
             'days_for_mdd':  days_for_mdd,
@@ -1071,10 +1071,6 @@ def build_pivot(df: pd.DataFrame, expiry_col: str) -> Dict[str, Any]:
             'r_mdd':         r_mdd,
         })
 
-    # ── Clean up temp columns ─────────────────────────────────────────────────
-    df.drop(columns=['_Global_Cumulative', '_Global_Peak', '_Global_DD',
-                     '_Year', '_Month'], inplace=True, errors='ignore')
-
     # ── Build output ─────────────────────────────────────────────────────────
     headers = [
         'Year', 'Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
@@ -1366,6 +1362,7 @@ _bulk_bhav_df: pd.DataFrame = None
 _bulk_spot_df: pd.DataFrame = None
 _bulk_loaded = False
 _bulk_date_range = None
+_bulk_data_key = None  # (symbol, data version) the lookups were built from
 
 # HIGH-PERFORMANCE CACHE: Pre-indexed lookup tables
 _option_lookup_table = {}  # (date, symbol, strike, opt_type, expiry) -> premium
@@ -3002,16 +2999,33 @@ def calculate_strike_advanced(date, index, spot_price, strike_interval, option_t
 # These thin wrappers delegate to services/data_loader.py bulk functions.
 # Engines should call these instead of the original functions for fast lookups.
 
+def _partition_bhav_by_date(options_df, date_index) -> None:
+    """
+    Fill _bulk_bhav_by_date. With the loader's date index (Date-sorted frame,
+    e.g. a memory-mapped snapshot) each day is a zero-copy slice; otherwise
+    partition_by copies the rows out.
+    """
+    _bulk_bhav_by_date.clear()
+    if date_index:
+        for date_str, (offset, length) in date_index.items():
+            _bulk_bhav_by_date[date_str] = options_df.slice(offset, length)
+        return
+    for date_val, sub_df in options_df.partition_by("Date", as_dict=True).items():
+        _bulk_bhav_by_date[str(date_val)[:10]] = sub_df
+
+
 def bulk_load_options(symbol: str, from_date: str, to_date: str) -> dict:
     """
     Load all option data for symbol/date-range into memory ONCE.
     Builds a pre-indexed O(1) lookup dict — NOT a raw DataFrame scan.
     """
-    global _bulk_bhav_df, _bulk_spot_df, _bulk_loaded, _bulk_date_range
+    global _bulk_bhav_df, _bulk_spot_df, _bulk_loaded, _bulk_date_range, _bulk_data_key
     global _option_lookup_table, _future_lookup_table, _spot_lookup_table
 
+    from services.data_version import data_version_key
     from services.data_loader import (
         bulk_load as _bulk_load,
+        get_bulk_date_index,
         get_bulk_options_df,
         get_bulk_spot_df,
         load_lookup_cache_from_redis,
@@ -3022,8 +3036,9 @@ def bulk_load_options(symbol: str, from_date: str, to_date: str) -> dict:
 
     requested_from = pd.to_datetime(from_date)
     requested_to   = pd.to_datetime(to_date)
+    data_key = (symbol.upper(), data_version_key(symbol))
 
-    if (_bulk_loaded and _bulk_date_range is not None
+    if (_bulk_loaded and _bulk_date_range is not None and _bulk_data_key == data_key
             and _option_lookup_table and len(_option_lookup_table) > 0):
         loaded_from, loaded_to = _bulk_date_range
         loaded_from = pd.to_datetime(loaded_from)
@@ -3052,11 +3067,10 @@ def bulk_load_options(symbol: str, from_date: str, to_date: str) -> dict:
             # Keep Polars DataFrame in _bulk_bhav_df for per-date slicing
             _bulk_bhav_df = options_df  # Keep as Polars — faster filtering
             # Pre-partition by date string for O(1) lookup in _build_option_lookup
-            _bulk_bhav_by_date.clear()
-            for date_val, sub_df in options_df.partition_by("Date", as_dict=True).items():
-                _bulk_bhav_by_date[str(date_val)[:10]] = sub_df
+            _partition_bhav_by_date(options_df, get_bulk_date_index())
             _bulk_loaded = True
             _bulk_date_range = (from_date, to_date)
+            _bulk_data_key = data_key
             lookup_loaded_from_redis = True
     # FIX #1B: Build O(1) lookup dict using vectorized Polars ops + zip()
     if not lookup_loaded_from_redis:
@@ -3069,11 +3083,10 @@ def bulk_load_options(symbol: str, from_date: str, to_date: str) -> dict:
             # Keep Polars DataFrame in _bulk_bhav_df for per-date slicing
             _bulk_bhav_df = options_df  # Keep as Polars — faster filtering
             # Pre-partition by date string for O(1) lookup in _build_option_lookup
-            _bulk_bhav_by_date.clear()
-            for date_val, sub_df in options_df.partition_by("Date", as_dict=True).items():
-                _bulk_bhav_by_date[str(date_val)[:10]] = sub_df
+            _partition_bhav_by_date(options_df, get_bulk_date_index())
             _bulk_loaded = True
             _bulk_date_range = (from_date, to_date)
+            _bulk_data_key = data_key
 
     spot_df = get_bulk_spot_df()
     if spot_df is not None and not spot_df.is_empty():
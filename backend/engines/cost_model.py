@@ -0,0 +1,100 @@
+"""
+Vectorized slippage and Zerodha F&O charge kernels
+
+Array versions of generic_algotest_engine._apply_slippage and
+_calculate_fo_charges over whole price / qty / position columns. Inputs
+broadcast, so a (S, 1) slippage column against (n,) legs prices every leg
+for S slippage values in one call.
+
+Rounding matches the scalar functions exactly: np.round everywhere, with
+the few values sitting on a rounding tie re-rounded by Python's round().
+"""
+
+from typing import Dict
+
+import numpy as np
+
+from engines.strategy_plan import normalize_slippage_pct
+
+
+def py_round(values, ndigits: int) -> np.ndarray:
+    """np.round with Python round() results on (near-)ties."""
+    values = np.asarray(values, dtype=float)
+    out = np.round(values, ndigits)
+    scaled = values * (10.0 ** ndigits)
+    near_tie = np.isfinite(scaled) & (np.abs(np.abs(scaled - np.floor(scaled)) - 0.5) < 1e-6)
+    if near_tie.any():
+        out = np.array(out, dtype=float, copy=True)
+        out[near_tie] = [round(float(v), ndigits) for v in values[near_tie]]
+    return out
+
+
+def normalize_slippage_array(slippage_pct) -> np.ndarray:
+    return np.vectorize(normalize_slippage_pct, otypes=[float])(np.asarray(slippage_pct, dtype=object))
+
+
+def apply_slippage(prices, is_sell, side: str, slippage_pct) -> np.ndarray:
+    """
+    _apply_slippage over arrays. ``side`` is 'entry' or 'exit'; NaN prices stay NaN.
+    Sellers get less on entry / pay more on exit, buyers the reverse.
+    """
+    prices = np.asarray(prices, dtype=float)
+    pct = normalize_slippage_array(slippage_pct) / 100.0
+    is_sell = np.asarray(is_sell, dtype=bool)
+    if side == 'entry':
+        factor = np.where(is_sell, 1 - pct, 1 + pct)
+    else:
+        factor = np.where(is_sell, 1 + pct, 1 - pct)
+    slipped = np.maximum(prices * factor, 0.0)
+    # pct <= 0 → plain rounding of the raw price (no max(…, 0) clamp)
+    return py_round(np.where(pct > 0, slipped, prices), 2)
+
+
+def fo_charges(entry_price, exit_price, qty, is_sell, is_options) -> Dict[str, np.ndarray]:
+    """
+    _calculate_fo_charges over arrays (one leg = entry + exit order).
+
+    Returns total_charges_inr, entry_charge_per_unit, exit_charge_per_unit;
+    legs with missing prices or qty <= 0 are charged 0.
+    """
+    ep = np.asarray(entry_price, dtype=float)
+    xp = np.asarray(exit_price, dtype=float)
+    q = np.asarray(qty, dtype=float)
+    is_sell = np.asarray(is_sell, dtype=bool)
+    is_options = np.asarray(is_options, dtype=bool)
+
+    valid = np.isfinite(ep) & np.isfinite(xp) & np.isfinite(q) & (q > 0)
+    q_safe = np.where(valid, q, 1.0)
+    to_entry = np.where(valid, ep, 0.0) * q_safe
+    to_exit = np.where(valid, xp, 0.0) * q_safe
+
+    # Options: ₹20 flat; futures: min(₹20, 0.03%)
+    brk_e = np.where(is_options, 20.0, np.minimum(20.0, 0.0003 * to_entry))
+    brk_x = np.where(is_options, 20.0, np.minimum(20.0, 0.0003 * to_exit))
+    # STT on the sell side: 0.15% options / 0.05% futures
+    stt_rate = np.where(is_options, 0.0015, 0.0005)
+    stt_e = np.where(is_sell, stt_rate * to_entry, 0.0)
+    stt_x = np.where(is_sell, 0.0, stt_rate * to_exit)
+    # Stamp on the buy side: 0.003% options / 0.002% futures
+    stamp_rate = np.where(is_options, 0.00003, 0.00002)
+    stmp_e = np.where(is_sell, 0.0, stamp_rate * to_entry)
+    stmp_x = np.where(is_sell, stamp_rate * to_exit, 0.0)
+    # NSE txn: 0.03553% options / 0.00183% futures
+    txn_rate = np.where(is_options, 0.0003553, 0.0000183)
+    txn_e = txn_rate * to_entry
+    txn_x = txn_rate * to_exit
+    # SEBI ₹10 / crore
+    sebi_e = 1e-6 * to_entry
+    sebi_x = 1e-6 * to_exit
+    # GST 18% on brokerage + txn + SEBI
+    gst_e = 0.18 * (brk_e + txn_e + sebi_e)
+    gst_x = 0.18 * (brk_x + txn_x + sebi_x)
+
+    total_entry = stt_e + brk_e + txn_e + sebi_e + stmp_e + gst_e
+    total_exit = stt_x + brk_x + txn_x + sebi_x + stmp_x + gst_x
+
+    return {
+        'total_charges_inr': np.where(valid, py_round(total_entry + total_exit, 4), 0.0),
+        'entry_charge_per_unit': np.where(valid, py_round(total_entry / q_safe, 6), 0.0),
+        'exit_charge_per_unit': np.where(valid, py_round(total_exit / q_safe, 6), 0.0),
+    }
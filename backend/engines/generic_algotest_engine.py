@@ -17,18 +17,6 @@ _EARLY_EXIT_REASONS = {
 }
 
 
-def _normalize_slippage_pct(value):
-    try:
-        pct = float(value)
-    except (TypeError, ValueError):
-        return 0.0
-    if pct < 0:
-        return 0.0
-    if pct > 100:
-        return 100.0
-    return pct
-
-
 def _apply_slippage(price, position, side, slippage_pct):
     if price is None:
         return None
@@ -211,26 +199,9 @@ def get_lot_size(index, entry_date):
       Oct 2015 – Oct 2019 : 20
       Nov 2019 – present  : 15
     """
-    d = pd.Timestamp(entry_date)
-    if index.upper() == 'NIFTY':
-        if d < pd.Timestamp("2010-10-01"):
-            return 200
-        elif d < pd.Timestamp("2015-10-29"):
-            return 50
-        elif d < pd.Timestamp("2019-11-01"):
-            return 75
-        else:
-            return 65  # Changed from 50 to 65 to match AlgoTest
-    elif index.upper() == 'BANKNIFTY':
-        if d < pd.Timestamp("2010-10-01"):
-            return 50
-        elif d < pd.Timestamp("2015-10-29"):
-            return 25
-        elif d < pd.Timestamp("2019-11-01"):
-            return 20
-        else:
-            return 15
-    return 1  # fallback for other indexes
+    # Schedules live in engines.strategy_plan; lookup is a bisect over date
+    # ordinals, so no pd.Timestamp is built per call. Other indexes → 1.
+    return lot_size_schedule(index).size_on(entry_date)
 
 
 # Import from base.py
@@ -274,6 +245,16 @@ from base import (
 )
 
 from services.data_loader import get_loader
+from services.job_control import current_job
+from services.trade_table import TradeTable
+from engines.strategy_plan import (
+    compile_strategy,
+    lot_size_schedule,
+    normalize_sl_tgt_type,
+    normalize_slippage_pct as _normalize_slippage_pct,
+    normalize_strike_selection_type,
+    unfingerprinted_strike_fields,
+)
 
 
 def _last_trading_day_on_or_before(trading_calendar_df, target_date):
@@ -431,24 +412,7 @@ def _normalize_sl_tgt_type(mode_str):
         'underlying_pts' – Underlying index moved adversely by X absolute points from entry spot
         'underlying_pct' – Underlying index moved adversely by X% from entry spot
     """
-    if mode_str is None:
-        return 'pct'
-    m = str(mode_str).upper().replace(' ', '_').replace('-', '_').strip()
-    if m in ('PERCENT', 'PCT', '%', 'PER', 'PERCENTAGE', 'PREMIUM_PCT',
-             'PREMIUM_PERCENT', 'PREMIUM_%'):
-        return 'pct'
-    if m in ('POINTS', 'PTS', 'POINT', 'PT', 'POINTS_PTS', 'PREMIUM_POINTS',
-             'PREMIUM_PTS', 'PREMIUM_PT', 'ABS', 'ABSOLUTE'):
-        return 'points'
-    if m in ('UNDERLYING_POINTS', 'UNDERLYING_PTS', 'UNDERLYING_PT',
-             'UNDERLYINGPOINTS', 'UNDERLYINGPTS', 'UNDERLYING_POINT',
-             'INDEX_POINTS', 'INDEX_PTS', 'SPOT_POINTS', 'SPOT_PTS'):
-        return 'underlying_pts'
-    if m in ('UNDERLYING_PERCENT', 'UNDERLYING_PCT', 'UNDERLYING_%',
-             'UNDERLYINGPERCENT', 'UNDERLYINGPCT', 'UNDERLYING_PERCENTAGE',
-             'INDEX_PCT', 'INDEX_PERCENT', 'SPOT_PCT', 'SPOT_PERCENT'):
-        return 'underlying_pct'
-    return 'pct'  # safe fallback
+    return normalize_sl_tgt_type(mode_str)
 
 
 def _resolve_strike(leg_config, entry_date, entry_spot, expiry_date, strike_interval, index):
@@ -473,65 +437,40 @@ def _resolve_strike(leg_config, entry_date, entry_spot, expiry_date, strike_inte
     """
     option_type     = leg_config.get('option_type', 'CE')
     strike_sel      = leg_config.get('strike_selection', 'ATM')
-    strike_sel_type = str(leg_config.get('strike_selection_type', '')).upper().strip()
 
-    # Accept dict form of strike_selection
-    if not strike_sel_type and isinstance(strike_sel, dict):
-        strike_sel_type = str(strike_sel.get('type', '')).upper().strip()
-
-    _log(f"      DEBUG: strike_sel_type BEFORE normalization = '{strike_sel_type}'")
-    
-    # Normalise aliases the frontend may send
-    _type_aliases = {
-        'PREMIUMRANGE':    'PREMIUM_RANGE',
-        'PREMIUM_RANGE':   'PREMIUM_RANGE',
-        'CLOSESTPREMIUM':  'CLOSEST_PREMIUM',
-        'CLOSEST_PREMIUM': 'CLOSEST_PREMIUM',
-        'PREMIUM>=':       'PREMIUM_GTE',
-        'PREMIUM_GTE':     'PREMIUM_GTE',
-        'PREMIUMGTE':      'PREMIUM_GTE',
-        'PREMIUM >=':      'PREMIUM_GTE',
-        'PREMIUM<=':       'PREMIUM_LTE',
-        'PREMIUM_LTE':     'PREMIUM_LTE',
-        'PREMIUMLTE':      'PREMIUM_LTE',
-        'PREMIUM <=':      'PREMIUM_LTE',
-        'STRADDLEWIDTH':   'STRADDLE_WIDTH',
-        'STRADDLE_WIDTH':  'STRADDLE_WIDTH',
-        'STRADDLE':       'STRADDLE_WIDTH',
-        'SYNTHETICFUTURE': 'SYNTHETIC_FUTURE',
-        'SYNTHETIC_FUTURE': 'SYNTHETIC_FUTURE',
-        'SYNTHETIC':      'SYNTHETIC_FUTURE',
-        'SYNTHETIC_LONG': 'SYNTHETIC_FUTURE',
-        'PCT_OF_ATM':     'PCT_OF_ATM',
-        'PCTOFATM':       'PCT_OF_ATM',
-        '%OFATM':         'PCT_OF_ATM',
-        'PERCENTOFATM':   'PCT_OF_ATM',
-        'PERCENT_OF_ATM': 'PCT_OF_ATM',
-        'ATM_STRADDLE_PREM_PCT': 'ATM_STRADDLE_PREM_PCT',
-        'ATM_STRADDLE_PREMIUM_PCT': 'ATM_STRADDLE_PREM_PCT',
-        'ATMSTRADDLEPREMIUMPCT': 'ATM_STRADDLE_PREM_PCT',
-        'ATMSTRADDLEPREMPCT': 'ATM_STRADDLE_PREM_PCT',
-    }
-    strike_sel_type = _type_aliases.get(strike_sel_type, strike_sel_type)
+    # Compiled legs (engines.strategy_plan) carry the resolved type; raw
+    # legs go through the same alias table.
+    strike_sel_type = leg_config.get('_strike_selection_type')
+    if strike_sel_type is None:
+        strike_sel_type = normalize_strike_selection_type(leg_config)
     
     _log(f"      DEBUG: strike_sel_type AFTER normalization = '{strike_sel_type}'")
 
     date_str  = entry_date.strftime('%Y-%m-%d')
     spot_atm_strike = round(entry_spot / strike_interval) * strike_interval
 
-    _buf_enabled = bool(leg_config.get('_buffer_strike_enabled', False))
-    try:
-        _buf_value = float(leg_config.get('_buffer_strike_value', 0.5))
-    except (TypeError, ValueError):
-        _buf_value = 0.5
-    _buf_unit = str(leg_config.get('_buffer_strike_unit', 'percent') or 'percent').lower().strip()
-    if _buf_unit not in ('percent', 'points'):
-        _buf_unit = 'percent'
-    _buf_apply_to = str(leg_config.get('_buffer_strike_apply_to', 'both') or 'both').lower().strip()
-    if _buf_apply_to not in ('call', 'put', 'both'):
-        _buf_apply_to = 'both'
-    _buf_above = bool(leg_config.get('_buffer_position_above', True))
-    _buf_below = bool(leg_config.get('_buffer_position_below', True))
+    _buf_plan = leg_config.get('_buffer_plan')
+    if _buf_plan is not None:
+        _buf_enabled = _buf_plan.enabled
+        _buf_value = _buf_plan.value
+        _buf_unit = _buf_plan.unit
+        _buf_apply_to = _buf_plan.apply_to
+        _buf_above = _buf_plan.above
+        _buf_below = _buf_plan.below
+    else:
+        _buf_enabled = bool(leg_config.get('_buffer_strike_enabled', False))
+        try:
+            _buf_value = float(leg_config.get('_buffer_strike_value', 0.5))
+        except (TypeError, ValueError):
+            _buf_value = 0.5
+        _buf_unit = str(leg_config.get('_buffer_strike_unit', 'percent') or 'percent').lower().strip()
+        if _buf_unit not in ('percent', 'points'):
+            _buf_unit = 'percent'
+        _buf_apply_to = str(leg_config.get('_buffer_strike_apply_to', 'both') or 'both').lower().strip()
+        if _buf_apply_to not in ('call', 'put', 'both'):
+            _buf_apply_to = 'both'
+        _buf_above = bool(leg_config.get('_buffer_position_above', True))
+        _buf_below = bool(leg_config.get('_buffer_position_below', True))
 
     option_type_for_buf = str(leg_config.get('option_type', option_type) or '').upper().strip()
     _is_ce = option_type_for_buf in ('CE', 'CALL', 'C')
@@ -882,6 +821,16 @@ def _resolve_strike(leg_config, entry_date, entry_spot, expiry_date, strike_inte
     return final_strike, offset, ref_price
 
 
+# Every strike_selection field read above must be part of the cache / store /
+# single-flight fingerprint, or different strikes would share one result.
+_unfingerprinted = unfingerprinted_strike_fields(_resolve_strike)
+if _unfingerprinted:
+    raise RuntimeError(
+        "strike_selection fields read by _resolve_strike but dropped from "
+        f"canonical_request: {_unfingerprinted} — update _PREMIUM_FIELDS_USED"
+    )
+
+
 def _recalc_leg_pnl(tleg, leg_exit_date, index, expiry_date, lot_size, fallback_spot, slippage_pct=0.0):
     """
     Re-fetch market exit price/premium at leg_exit_date and rewrite pnl in-place.
@@ -959,6 +908,11 @@ def _recalc_leg_pnl(tleg, leg_exit_date, index, expiry_date, lot_size, fallback_
 
 def _copy_sl_tgt_to_leg(leg_dict, leg_src):
     """Copy stopLoss / targetProfit config from leg_src (raw legs_config entry) into leg_dict."""
+    if '_sl_tgt' in leg_src:  # pre-resolved by compile_strategy
+        (leg_dict['stop_loss'], leg_dict['stop_loss_type'],
+         leg_dict['target'], leg_dict['target_type']) = leg_src['_sl_tgt']
+        return
+
     if 'stopLoss' in leg_src and isinstance(leg_src['stopLoss'], dict):
         leg_dict['stop_loss']      = leg_src['stopLoss'].get('value')
         leg_dict['stop_loss_type'] = _normalize_sl_tgt_type(leg_src['stopLoss'].get('mode'))
@@ -1395,6 +1349,235 @@ def check_leg_stop_loss_target(entry_date, exit_date, expiry_date, entry_spot, l
     return leg_results
 
 
+# ── Re-entry window (array-based chain simulation) ───────────────────────────
+#
+# A re-entry chain is a sequence of first-crossing searches on successive
+# sub-windows of ONE holding period (first trigger → exit_date).  Everything
+# that only depends on the window — trading days, spot path, lot sizes,
+# spot-only strike candidates and per-strike premium paths — is fetched once
+# and every link of the chain indexes into those arrays.
+
+# Strike criteria that scan the bhavcopy (depend on the re-entry DATE, not just spot)
+_PREMIUM_DEPENDENT_STRIKE_TYPES = frozenset((
+    'PREMIUM_RANGE', 'CLOSEST_PREMIUM', 'PREMIUM_GTE', 'PREMIUM_LTE',
+    'STRADDLE_WIDTH', 'SYNTHETIC_FUTURE', 'ATM_STRADDLE_PREM_PCT',
+))
+
+# Returned by _ReEntryWindow.leg_results when the legs need the scalar checker
+_REENTRY_SCALAR_FALLBACK = object()
+
+
+class _ReEntryWindow:
+    """Pre-fetched arrays for one expiry's re-entry window."""
+
+    def __init__(self, trading_calendar_arr, first_trigger, exit_date, index,
+                 expiry_date, slippage_pct, lot_size_fn):
+        lo = np.searchsorted(trading_calendar_arr, np.datetime64(pd.Timestamp(first_trigger), 'ns'), side='right')
+        hi = np.searchsorted(trading_calendar_arr, np.datetime64(pd.Timestamp(exit_date), 'ns'), side='right')
+        self.days = trading_calendar_arr[lo:hi]
+        self.day_ts = [pd.Timestamp(d) for d in self.days]
+        self.exit_date = pd.Timestamp(exit_date)
+        self.exit_idx = (len(self.days) - 1) if self.day_ts and self.day_ts[-1] == self.exit_date else None
+        self.index = index
+        self.expiry_str = pd.Timestamp(expiry_date).strftime('%Y-%m-%d')
+        self.slippage_pct = slippage_pct
+
+        _day_str = [d.strftime('%Y-%m-%d') for d in self.day_ts]
+        self._day_str = _day_str
+        spots = [get_spot_price_from_db(d, index) for d in self.day_ts]
+        self.spot = np.array([np.nan if s is None else float(s) for s in spots], dtype=float)
+        self.lot_sizes = [lot_size_fn(d) for d in self.day_ts]
+
+        self._strike_memo = {}         # (leg idx, day idx | spot) → (strike, buffer_runtime)
+        self._premium_paths = {}       # (strike, option_type) → raw premium array (NaN = missing)
+        self._exit_paths = {}          # (strike, option_type, position) → slipped exit price array
+
+    # ── Calendar / spot ──────────────────────────────────────────────────────
+    def next_entry(self, trigger_date):
+        """Day index of the first trading day after trigger_date, or None if it is not before exit_date."""
+        i = int(np.searchsorted(self.days, np.datetime64(pd.Timestamp(trigger_date), 'ns'), side='right'))
+        if i >= len(self.days) or self.day_ts[i] >= self.exit_date:
+            return None
+        return i
+
+    def spot_at(self, i):
+        value = self.spot[i]
+        return None if np.isnan(value) else float(value)
+
+    def spot_on(self, date):
+        i = int(np.searchsorted(self.days, np.datetime64(pd.Timestamp(date), 'ns'), side='left'))
+        if i < len(self.days) and self.day_ts[i] == pd.Timestamp(date):
+            return self.spot_at(i)
+        return get_spot_price_from_db(date, self.index)
+
+    # ── Strikes ──────────────────────────────────────────────────────────────
+    def _resolve(self, leg_idx, leg_config, i, strike_interval, expiry_date):
+        cfg = dict(leg_config)
+        spot = self.spot_at(i)
+        if spot is None:
+            return None, {}
+        strike, _offset, _ref = _resolve_strike(
+            leg_config=cfg,
+            entry_date=self.day_ts[i],
+            entry_spot=spot,
+            expiry_date=expiry_date,
+            strike_interval=strike_interval,
+            index=self.index,
+        )
+        return strike, cfg.get('_buffer_runtime', {})
+
+    def strike(self, leg_idx, leg_config, i, strike_interval, expiry_date):
+        """(strike, buffer_runtime) for a re-entry of leg_idx on day i."""
+        sel_type = leg_config.get('_strike_selection_type')
+        if sel_type is None:
+            sel_type = normalize_strike_selection_type(leg_config)
+        # Spot-only criteria resolve identically for equal spots; premium
+        # criteria scan that day's bhavcopy and are keyed by the day.
+        day_key = i if sel_type in _PREMIUM_DEPENDENT_STRIKE_TYPES else ('spot', self.spot[i])
+        memo_key = (leg_idx, day_key)
+        if memo_key not in self._strike_memo:
+            self._strike_memo[memo_key] = self._resolve(leg_idx, leg_config, i, strike_interval, expiry_date)
+        return self._strike_memo[memo_key]
+
+    # ── Premium paths ────────────────────────────────────────────────────────
+    def premium_path(self, strike, option_type):
+        key = (strike, option_type)
+        path = self._premium_paths.get(key)
+        if path is None:
+            values = [
+                get_option_premium_from_db(
+                    date=ds, index=self.index, strike=strike,
+                    option_type=option_type, expiry=self.expiry_str,
+                )
+                for ds in self._day_str
+            ]
+            path = np.array([np.nan if v is None else float(v) for v in values], dtype=float)
+            self._premium_paths[key] = path
+        return path
+
+    def premium(self, strike, option_type, i):
+        value = self.premium_path(strike, option_type)[i]
+        return None if np.isnan(value) else float(value)
+
+    def exit_premium(self, strike, option_type):
+        """Raw premium on exit_date (None when missing or exit_date is outside the window)."""
+        if self.exit_idx is None:
+            return get_option_premium_from_db(
+                date=self.exit_date.strftime('%Y-%m-%d'), index=self.index,
+                strike=strike, option_type=option_type, expiry=self.expiry_str,
+            )
+        return self.premium(strike, option_type, self.exit_idx)
+
+    def _exit_path(self, strike, option_type, position):
+        key = (strike, option_type, position)
+        path = self._exit_paths.get(key)
+        if path is None:
+            raw = self.premium_path(strike, option_type)
+            # _apply_slippage per element keeps Python round() semantics exactly
+            path = np.array([
+                np.nan if np.isnan(v) else _apply_slippage(float(v), position, 'exit', self.slippage_pct)
+                for v in raw
+            ], dtype=float)
+            self._exit_paths[key] = path
+        return path
+
+    # ── Per-leg SL / Target: first crossing over the sub-window ─────────────
+    def leg_results(self, legs, entry_i, entry_spot, square_off_mode='partial'):
+        """
+        Array equivalent of check_leg_stop_loss_target for option legs without
+        trail SL. Returns _REENTRY_SCALAR_FALLBACK for anything else.
+        """
+        if any(lg.get('trail_sl_enabled') or lg.get('segment', 'OPTION') in ('FUTURES', 'FUTURE')
+               for lg in legs):
+            return _REENTRY_SCALAR_FALLBACK
+        if not any(lg.get('stop_loss') is not None or lg.get('target') is not None for lg in legs):
+            return None
+
+        start = entry_i + 1
+        results = [
+            {'triggered': False, 'exit_date': self.exit_date, 'exit_reason': 'EXPIRY'}
+            for _ in legs
+        ]
+        if start >= len(self.days):
+            return results
+
+        spot = self.spot[start:]
+        first_hits = []   # per leg: (offset, reason) or None
+        for leg in legs:
+            sl_val, tgt_val = leg.get('stop_loss'), leg.get('target')
+            option_type, strike = leg.get('option_type'), leg.get('strike')
+            entry_prem = leg.get('entry_premium')
+            if (sl_val is None and tgt_val is None) or not option_type or not strike or entry_prem is None:
+                first_hits.append(None)
+                continue
+            sl_type = _normalize_sl_tgt_type(leg.get('stop_loss_type', 'pct'))
+            tgt_type = _normalize_sl_tgt_type(leg.get('target_type', 'pct'))
+            position = leg['position']
+
+            cp = self._exit_path(strike, option_type, position)[start:]
+            valid = ~np.isnan(cp)
+            move = np.where(valid, cp - entry_prem, 0.0)
+            adverse = move if position == 'SELL' else -move
+            adverse_pct = adverse / entry_prem * 100 if entry_prem else np.zeros_like(adverse)
+            adverse_spot = np.zeros_like(adverse)
+            adverse_spot_pct = np.zeros_like(adverse)
+            if sl_type in ('underlying_pts', 'underlying_pct') or tgt_type in ('underlying_pts', 'underlying_pct'):
+                if entry_spot:
+                    spot_ok = ~np.isnan(spot)
+                    spot_move = np.where(spot_ok, spot - entry_spot, 0.0)
+                    if str(option_type).upper() in ('CE', 'CALL', 'C'):
+                        adverse_spot = spot_move if position == 'SELL' else -spot_move
+                    else:
+                        adverse_spot = -spot_move if position == 'SELL' else spot_move
+                    adverse_spot_pct = adverse_spot / entry_spot * 100
+
+            adverse_by_type = {
+                'pct': adverse_pct, 'points': adverse,
+                'underlying_pts': adverse_spot, 'underlying_pct': adverse_spot_pct,
+            }
+            no_hit = np.zeros(len(cp), dtype=bool)
+            hit_sl = no_hit
+            if sl_val is not None and sl_type in adverse_by_type:
+                hit_sl = adverse_by_type[sl_type] >= abs(sl_val)
+            hit_tgt = no_hit
+            if tgt_val is not None and tgt_type in adverse_by_type:
+                hit_tgt = -adverse_by_type[tgt_type] >= abs(tgt_val)
+
+            hit = valid & (hit_sl | hit_tgt)
+            if hit.any():
+                k = int(np.argmax(hit))
+                first_hits.append((k, 'STOP_LOSS' if hit_sl[k] else 'TARGET'))
+            else:
+                first_hits.append(None)
+
+        if square_off_mode == 'complete':
+            hit_offsets = [h[0] for h in first_hits if h is not None]
+            if not hit_offsets:
+                return results
+            k = min(hit_offsets)
+            trigger_date = self.day_ts[start + k]
+            fired = [li for li, h in enumerate(first_hits) if h is not None and h[0] == k]
+            trigger_reason = first_hits[fired[0]][1]
+            # Same labelling as the scalar checker: legs that fired that day
+            # carry the first leg's reason, the rest are collateral exits.
+            for li in range(len(results)):
+                results[li] = {
+                    'triggered': True,
+                    'exit_date': trigger_date,
+                    'exit_reason': trigger_reason if li in fired else f'COMPLETE_{trigger_reason}',
+                }
+            return results
+
+        for li, h in enumerate(first_hits):
+            if h is not None:
+                results[li] = {
+                    'triggered': True,
+                    'exit_date': self.day_ts[start + h[0]],
+                    'exit_reason': h[1],
+                }
+        return results
+
+
 # ── Overall Stop Loss / Target — supports both AlgoTest modes ────────────────
 #
 # AlgoTest has two Overall SL modes:
@@ -1822,6 +2005,10 @@ def run_algotest_backtest(params):
     """
     
     # ========== STEP 1: EXTRACT PARAMETERS ==========
+    # Leg-level parsing (aliases, SL/TGT modes, buffer, slippage, lot sizes)
+    # happens once in compile_strategy; sweeps may pass a pre-built '_plan'
+    # (compiled from these same params) to skip it.
+    plan = params.get('_plan') or compile_strategy(params)
     index = params['index']
     from_date = params['from_date']
     to_date = params['to_date']
@@ -1836,7 +2023,7 @@ def run_algotest_backtest(params):
 
     entry_dte = _coerce_int(params.get('entry_dte', 2), 2, 'Entry')
     exit_dte = _coerce_int(params.get('exit_dte', 0), 0, 'Exit')
-    legs_config = params.get('legs', [])
+    legs_config = plan.leg_configs()
     # Read super_trend_config ONLY from its dedicated key.
     # Never fall back to filter_config — they are separate concepts.
     _raw_stc = params.get('super_trend_config') or 'None'
@@ -1966,29 +2153,12 @@ def run_algotest_backtest(params):
         spot_adjustment_units = 'percent'
 
     # ── Buffer Strike Selection ───────────────────────────────────────────────
-    buffer_strike_enabled = bool(params.get('buffer_strike_enabled', False))
-
-    buffer_strike_value = 0.5
-    try:
-        buffer_strike_value = float(params.get('buffer_strike_value', 0.5) or 0.5)
-    except (TypeError, ValueError):
-        buffer_strike_value = 0.5
-    if buffer_strike_value <= 0:
-        buffer_strike_enabled = False
-
-    buffer_strike_unit = str(params.get('buffer_strike_unit', 'percent') or 'percent').lower().strip()
-    if buffer_strike_unit not in ('percent', 'points'):
-        buffer_strike_unit = 'percent'
-
-    buffer_strike_apply_to = str(params.get('buffer_strike_apply_to', 'both') or 'both').lower().strip()
-    if buffer_strike_apply_to not in ('call', 'put', 'both'):
-        buffer_strike_apply_to = 'both'
-
-    buffer_position_above = bool(params.get('buffer_position_above', True))
-    buffer_position_below = bool(params.get('buffer_position_below', True))
-
-    if not buffer_position_above and not buffer_position_below:
-        buffer_strike_enabled = False
+    buffer_strike_enabled = plan.buffer.enabled
+    buffer_strike_value = plan.buffer.value
+    buffer_strike_unit = plan.buffer.unit
+    buffer_strike_apply_to = plan.buffer.apply_to
+    buffer_position_above = plan.buffer.above
+    buffer_position_below = plan.buffer.below
 
     _log(
         f"[BUFFER STRIKE] enabled={buffer_strike_enabled}, "
@@ -1997,13 +2167,11 @@ def run_algotest_backtest(params):
         f"above={buffer_position_above}, below={buffer_position_below}"
     )
 
-    slippage_pct = _normalize_slippage_pct(
-        params.get('slippage_pct', params.get('slippage_percent', params.get('slippage', 0.0)))
-    )
+    slippage_pct = plan.slippage_pct
 
     # Re-entry settings (for both Weekly and Monthly strategies)
-    re_entry_enabled = params.get('re_entry_enabled', False)
-    re_entry_max = params.get('re_entry_max', 20)
+    re_entry_enabled = plan.re_entry_enabled
+    re_entry_max = plan.re_entry_max
 
     # ========== STEP 2: LOAD DATA FROM CSV (like generic_multi_leg) ==========
     t_spot = time.perf_counter()
@@ -2027,6 +2195,15 @@ def run_algotest_backtest(params):
         else:  # MONTHLY, NEXT_MONTHLY, MONTHLY_T1
             expiry_df = get_expiry_dates(index, 'monthly', from_date, to_date)
 
+    # Expiry shard: the data range may be padded around the shard so DTE
+    # anchors and exits resolve, but only the shard's own expiries are traded.
+    _expiry_chunk = params.get('_expiry_chunk')
+    if _expiry_chunk:
+        _chunk_set = set(pd.to_datetime(list(_expiry_chunk)).normalize())
+        expiry_df = expiry_df[
+            pd.to_datetime(expiry_df['Current Expiry']).dt.normalize().isin(_chunk_set)
+        ].reset_index(drop=True)
+
     # ========== STEP 4: INITIALIZE RESULTS ==========
     all_trades = []
     trade_id_counter = 0
@@ -2328,6 +2505,7 @@ def run_algotest_backtest(params):
     # ========== STEP 4: LOOP THROUGH SEGMENTED SCHEDULE ==========
     t_loop = time.perf_counter()
     trade_id = 0
+    _job = current_job()   # live progress publisher when running inside a worker task
     
     # ========== Cumulative % P&L Accumulators (additive, base 100) ==========
     cumulative = 100.0   # base 100, matches Excel seed
@@ -2335,7 +2513,13 @@ def run_algotest_backtest(params):
     
     for seg_scope in segment_records:
         segment = seg_scope['segment']
+        if _job is not None and _job.cancelled():
+            break
         for entry_idx, trade_entry in enumerate(seg_scope['entries'], 1):
+            # Cooperative cancel between expiries: trades so far become a partial result
+            if _job is not None and _job.cancelled():
+                _log(f"[CANCEL] Job cancelled after {trade_id}/{total_entries} entries")
+                break
             entry_date = trade_entry['entry_date']
             exit_date = trade_entry['exit_date']
             expiry_date = trade_entry['expiry_date']
@@ -2344,6 +2528,8 @@ def run_algotest_backtest(params):
             _force_next_expiry   = trade_entry.get('_force_next_expiry', False)
             clamped_exit = trade_entry['clamped_exit']
             trade_id += 1
+            if _job is not None:
+                _job.step(trade_id - 1, total_entries)
             _log(f"--- Segment {segment['label']} | Trade {trade_id}/{total_entries} ---")
             _log(f"  [EXPIRY DEBUG] expiry_type={expiry_type} | trade_entry keys={list(trade_entry.keys())}")
             _log(f"  [EXPIRY DEBUG] expiry_date={expiry_date} | current_expiry_raw={trade_entry.get('current_expiry')} | next_expiry_raw={trade_entry.get('next_expiry')}")
@@ -2451,7 +2637,7 @@ def run_algotest_backtest(params):
                     if leg_segment == 'FUTURES':
                         _log(f"      Type: FUTURE")
                         _log(f"      Position: {position}")
-                        lot_size = get_lot_size(index, entry_date)
+                        lot_size = plan.lot_size(entry_date)
                         futures_expiry_pref = str(leg_config.get('expiry', 'monthly') or 'monthly').lower().strip()
                         if futures_expiry_pref in ('next_monthly', 'next_month', 'mid_month'):
                             futures_expiry_pref = 'next_monthly'
@@ -2687,15 +2873,9 @@ def run_algotest_backtest(params):
                         # Routes through _resolve_strike which handles ALL criteria:
                         # ATM/ITM/OTM, Premium Range, Closest Premium, Premium >=, Premium <=
                         # Uses entry_date bhavcopy (= previous-day close) matching AlgoTest.
-                        leg_config_with_buffer = {
-                            **leg_config,
-                            '_buffer_strike_enabled': buffer_strike_enabled,
-                            '_buffer_strike_value': buffer_strike_value,
-                            '_buffer_strike_unit': buffer_strike_unit,
-                            '_buffer_strike_apply_to': buffer_strike_apply_to,
-                            '_buffer_position_above': buffer_position_above,
-                            '_buffer_position_below': buffer_position_below,
-                        }
+                        # Compiled legs already carry the _buffer_* keys; copy because
+                        # _resolve_strike writes '_buffer_runtime' into the dict.
+                        leg_config_with_buffer = dict(leg_config)
                         strike, buffer_offset, buffer_ref_price = _resolve_strike(
                             leg_config=leg_config_with_buffer,
                             entry_date=entry_date,
@@ -2801,7 +2981,7 @@ def run_algotest_backtest(params):
                             pe_pnl = 0
 
                         # Store lot_size for DataFrame (but don't use in P&L calculation)
-                        lot_size = get_lot_size(index, entry_date)
+                        lot_size = plan.lot_size(entry_date)
 
                         _log(f"      Lots: {lots}, CE P&L: {ce_pnl:.2f}, PE P&L: {pe_pnl:.2f}, Net P&L: {leg_pnl:,.2f}")
 
@@ -2977,7 +3157,7 @@ def run_algotest_backtest(params):
                 # ========== STEP 8F: RECALCULATE EXIT PRICES FOR TRIGGERED LEGS ==
                 # For EVERY triggered leg (per-leg SL/TGT or overall SL), re-fetch
                 # the market price at leg_exit_date and recompute P&L.
-                lot_size_for_pnl = get_lot_size(index, entry_date)
+                lot_size_for_pnl = plan.lot_size(entry_date)
                 sl_reason        = None
                 any_early        = False
 
@@ -3083,6 +3263,8 @@ def run_algotest_backtest(params):
                 trade_id_counter += 1
                 trade_record['trade_id'] = f"{trade_id_counter}"
                 all_trades.append(trade_record)
+                if _job is not None:
+                    _job.trade_closed(trade_record)
 
                 # ========== RE-ENTRY LOGIC ==========
                 # When a per-leg SL/TGT triggered early, re-enter next trading day
@@ -3126,22 +3308,26 @@ def run_algotest_backtest(params):
                         re_entry_count  = 0
                         re_trigger_date = earliest_trigger  # None → no re-entry
 
-                        while re_trigger_date is not None and re_entry_count < re_entry_max:
-                            future_days = trading_calendar[
-                                trading_calendar['date'] > re_trigger_date
-                            ]['date'].tolist()
-                            if not future_days:
-                                break
+                        # Every link of the chain lives inside (earliest_trigger, exit_date]:
+                        # fetch calendar, spot, lot sizes and premium paths for it once.
+                        re_window = None
+                        if re_trigger_date is not None and re_entry_max > 0:
+                            re_window = _ReEntryWindow(
+                                trading_calendar_arr, re_trigger_date, exit_date, index,
+                                expiry_date, slippage_pct, plan.lot_size,
+                            )
 
-                            re_entry_date = future_days[0]
-                            if re_entry_date >= exit_date:
+                        while re_trigger_date is not None and re_entry_count < re_entry_max:
+                            re_i = re_window.next_entry(re_trigger_date)
+                            if re_i is None:
                                 break
 
-                            re_entry_spot = get_spot_price_from_db(re_entry_date, index)
+                            re_entry_date = re_window.day_ts[re_i]
+                            re_entry_spot = re_window.spot_at(re_i)
                             if re_entry_spot is None:
                                 break
 
-                            re_lot_size   = get_lot_size(index, re_entry_date)
+                            re_lot_size   = re_window.lot_sizes[re_i]
                             re_trade_legs = []
                             re_ok         = True
 
@@ -3186,43 +3372,20 @@ def run_algotest_backtest(params):
                                     }
                                 else:  # OPTIONS — same strike criteria as initial entry
                                     ropt = rlc.get('option_type', 'CE')
-                                    rlc_with_buffer = {
-                                        **rlc,
-                                        '_buffer_strike_enabled': buffer_strike_enabled,
-                                        '_buffer_strike_value': buffer_strike_value,
-                                        '_buffer_strike_unit': buffer_strike_unit,
-                                        '_buffer_strike_apply_to': buffer_strike_apply_to,
-                                        '_buffer_position_above': buffer_position_above,
-                            '_buffer_position_below': buffer_position_below,
-                                    }
-                                    rstk = _resolve_strike(
-                                        leg_config=rlc_with_buffer,
-                                        entry_date=re_entry_date,
-                                        entry_spot=re_entry_spot,
-                                        expiry_date=expiry_date,
-                                        strike_interval=strike_interval,
-                                        index=index,
+                                    rstk, re_buffer_runtime = re_window.strike(
+                                        rli, rlc, re_i, strike_interval, expiry_date,
                                     )
                                     if rstk is None:
                                         re_ok = False; break
-                                    re_buffer_runtime = rlc_with_buffer.get('_buffer_runtime', {})
-                                    rep2 = get_option_premium_from_db(
-                                        date=re_entry_date.strftime('%Y-%m-%d'),
-                                        index=index, strike=rstk, option_type=ropt,
-                                        expiry=expiry_date.strftime('%Y-%m-%d'),
-                                    )
+                                    rep2 = re_window.premium(rstk, ropt, re_i)
                                     if rep2 is None:
                                         re_ok = False; break
                                     market_rep2 = rep2
                                     raw_rep2 = market_rep2
                                     rep2 = _apply_slippage(raw_rep2, rpos, 'entry', slippage_pct)
-                                    rxp2 = get_option_premium_from_db(
-                                        date=exit_date.strftime('%Y-%m-%d'),
-                                        index=index, strike=rstk, option_type=ropt,
-                                        expiry=expiry_date.strftime('%Y-%m-%d'),
-                                    )
+                                    rxp2 = re_window.exit_premium(rstk, ropt)
                                     if rxp2 is None:
-                                        s2   = get_spot_price_from_db(exit_date, index) or re_entry_spot
+                                        s2   = re_window.spot_on(exit_date) or re_entry_spot
                                         rxp2 = calculate_intrinsic_value(spot=s2, strike=rstk, option_type=ropt)
                                     market_rxp2 = rxp2
                                     raw_rxp2 = market_rxp2
@@ -3252,18 +3415,23 @@ def run_algotest_backtest(params):
                             if not re_ok or not re_trade_legs:
                                 break
 
-                            # Per-leg SL/TGT for this re-entry
-                            re_per_leg = check_leg_stop_loss_target(
-                                entry_date=re_entry_date,
-                                exit_date=exit_date,
-                                expiry_date=expiry_date,
-                                entry_spot=re_entry_spot,
-                                legs_config=re_trade_legs,
-                                index=index,
-                                trading_calendar=trading_calendar,
-                                square_off_mode=square_off_mode,
-                                slippage_pct=slippage_pct,
+                            # Per-leg SL/TGT for this re-entry: first crossing on the
+                            # window's premium paths; futures / trail SL use the day loop.
+                            re_per_leg = re_window.leg_results(
+                                re_trade_legs, re_i, re_entry_spot, square_off_mode,
                             )
+                            if re_per_leg is _REENTRY_SCALAR_FALLBACK:
+                                re_per_leg = check_leg_stop_loss_target(
+                                    entry_date=re_entry_date,
+                                    exit_date=exit_date,
+                                    expiry_date=expiry_date,
+                                    entry_spot=re_entry_spot,
+                                    legs_config=re_trade_legs,
+                                    index=index,
+                                    trading_calendar=trading_calendar,
+                                    square_off_mode=square_off_mode,
+                                    slippage_pct=slippage_pct,
+                                )
 
                             # Overall SL/TGT for this re-entry
                             re_sl_thr  = compute_overall_sl_threshold(
@@ -3294,7 +3462,7 @@ def run_algotest_backtest(params):
                             # Recalculate P&L for triggered re-entry legs
                             re_sl_reason    = None
                             re_next_trigger = None
-                            re_lot_sz_pnl   = get_lot_size(index, re_entry_date)
+                            re_lot_sz_pnl   = re_lot_size
 
                             if re_per_leg is not None:
                                 for rli2, rtleg in enumerate(re_trade_legs):
@@ -3342,7 +3510,7 @@ def run_algotest_backtest(params):
                                 re_actual_exit = max(valid_re_dates) if valid_re_dates else exit_date
                             else:
                                 re_actual_exit = exit_date
-                            re_exit_spot   = get_spot_price_from_db(re_actual_exit, index) or re_entry_spot
+                            re_exit_spot   = re_window.spot_on(re_actual_exit) or re_entry_spot
                             re_suffix      = f'[RE{re_entry_count + 1}]'
                             re_exit_reason = (re_sl_reason or 'EXPIRY') + re_suffix
 
@@ -3373,6 +3541,8 @@ def run_algotest_backtest(params):
                                 'index':           index,
                                 'trade_id':        re_trade_id,
                             })
+                            if _job is not None:
+                                _job.trade_closed(all_trades[-1])
                             re_entry_count += 1
 
                             # Chain: only if re-entry itself hit a per-leg SL/TGT (not OVERALL)
@@ -3419,7 +3589,7 @@ def run_algotest_backtest(params):
 
     # Flatten for DataFrame - Create rows for EACH leg (AlgoTest format)
     # But we'll aggregate them back for analytics
-    trades_flat = []
+    trades_flat = TradeTable()
     flatten_errors = []
     _log(f"[DEBUG] Starting flatten loop for {len(all_trades)} trades")
     for trade_idx, trade in enumerate(all_trades, 1):
@@ -3605,10 +3775,10 @@ def run_algotest_backtest(params):
     t_agg = time.perf_counter()
     
     print(f"[DEBUG] flatten: {len(all_trades)} trades, {len(trades_flat)} rows, errors: {flatten_errors}")
-    if not trades_flat:
+    if not len(trades_flat):
         print(f"[DEBUG] trades_flat is empty! all_trades had {len(all_trades)} items")
 
-    trades_df = pd.DataFrame(trades_flat)
+    trades_df = trades_flat.to_pandas(parse_dates=False)
     print(f"[DEBUG] trades_df created: {len(trades_df)} rows, cols: {list(trades_df.columns)[:10]}")
     
     # ========== AGGREGATE LEGS INTO TRADES FOR ANALYTICS ==========
@@ -0,0 +1,695 @@
+"""
+Compiled Strategy Plan
+
+Normalises a loosely typed AlgoTest request (or a StrategyDefinition from
+strategies/strategy_types.py) ONCE into an immutable, slotted plan that the
+engine's hot loops consume directly.
+
+Features:
+- Strike-selection and SL/Target alias tables resolved at compile time
+- Buffer settings, slippage, overall SL/Target and re-entry limits coerced once
+- Lot-size schedules looked up by date ordinal (no pd.Timestamp per call)
+- Cheap variants for parameter sweeps via StrategyPlan.variant(...)
+- canonical_request / strategy_fingerprint: the minimal semantic form of a
+  request, so cache, result store and coalescing keys ignore spelling
+
+Usage:
+    from engines.strategy_plan import compile_strategy
+
+    plan = compile_strategy(request)
+    plan.lot_size(entry_date)                 # 65
+    plan.legs[0].strike_selection_type        # 'PREMIUM_GTE'
+    plan.variant(slippage_pct=0.5)            # new plan, everything else shared
+    strategy_fingerprint(request)             # 'c41f…' (same for date_from / from_date, …)
+"""
+
+from bisect import bisect_right
+from dataclasses import dataclass, field, replace
+from datetime import date, datetime
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+import pandas as pd
+
+
+# ── Alias tables ──────────────────────────────────────────────────────────────
+
+STRIKE_SELECTION_ALIASES: Mapping[str, str] = MappingProxyType({
+    'PREMIUMRANGE':    'PREMIUM_RANGE',
+    'PREMIUM_RANGE':   'PREMIUM_RANGE',
+    'CLOSESTPREMIUM':  'CLOSEST_PREMIUM',
+    'CLOSEST_PREMIUM': 'CLOSEST_PREMIUM',
+    'PREMIUM>=':       'PREMIUM_GTE',
+    'PREMIUM_GTE':     'PREMIUM_GTE',
+    'PREMIUMGTE':      'PREMIUM_GTE',
+    'PREMIUM >=':      'PREMIUM_GTE',
+    'PREMIUM<=':       'PREMIUM_LTE',
+    'PREMIUM_LTE':     'PREMIUM_LTE',
+    'PREMIUMLTE':      'PREMIUM_LTE',
+    'PREMIUM <=':      'PREMIUM_LTE',
+    'STRADDLEWIDTH':   'STRADDLE_WIDTH',
+    'STRADDLE_WIDTH':  'STRADDLE_WIDTH',
+    'STRADDLE':       'STRADDLE_WIDTH',
+    'SYNTHETICFUTURE': 'SYNTHETIC_FUTURE',
+    'SYNTHETIC_FUTURE': 'SYNTHETIC_FUTURE',
+    'SYNTHETIC':      'SYNTHETIC_FUTURE',
+    'SYNTHETIC_LONG': 'SYNTHETIC_FUTURE',
+    'PCT_OF_ATM':     'PCT_OF_ATM',
+    'PCTOFATM':       'PCT_OF_ATM',
+    '%OFATM':         'PCT_OF_ATM',
+    'PERCENTOFATM':   'PCT_OF_ATM',
+    'PERCENT_OF_ATM': 'PCT_OF_ATM',
+    'ATM_STRADDLE_PREM_PCT': 'ATM_STRADDLE_PREM_PCT',
+    'ATM_STRADDLE_PREMIUM_PCT': 'ATM_STRADDLE_PREM_PCT',
+    'ATMSTRADDLEPREMIUMPCT': 'ATM_STRADDLE_PREM_PCT',
+    'ATMSTRADDLEPREMPCT': 'ATM_STRADDLE_PREM_PCT',
+})
+
+_SL_TGT_ALIASES: Mapping[str, str] = MappingProxyType({
+    **{k: 'pct' for k in (
+        'PERCENT', 'PCT', '%', 'PER', 'PERCENTAGE', 'PREMIUM_PCT',
+        'PREMIUM_PERCENT', 'PREMIUM_%')},
+    **{k: 'points' for k in (
+        'POINTS', 'PTS', 'POINT', 'PT', 'POINTS_PTS', 'PREMIUM_POINTS',
+        'PREMIUM_PTS', 'PREMIUM_PT', 'ABS', 'ABSOLUTE')},
+    **{k: 'underlying_pts' for k in (
+        'UNDERLYING_POINTS', 'UNDERLYING_PTS', 'UNDERLYING_PT',
+        'UNDERLYINGPOINTS', 'UNDERLYINGPTS', 'UNDERLYING_POINT',
+        'INDEX_POINTS', 'INDEX_PTS', 'SPOT_POINTS', 'SPOT_PTS')},
+    **{k: 'underlying_pct' for k in (
+        'UNDERLYING_PERCENT', 'UNDERLYING_PCT', 'UNDERLYING_%',
+        'UNDERLYINGPERCENT', 'UNDERLYINGPCT', 'UNDERLYING_PERCENTAGE',
+        'INDEX_PCT', 'INDEX_PERCENT', 'SPOT_PCT', 'SPOT_PERCENT')},
+})
+
+_NEXT_EXPIRY_TYPES = frozenset(('NEXT_WEEKLY', 'WEEKLY_T1', 'NEXT_MONTHLY', 'MONTHLY_T1'))
+
+
+@lru_cache(maxsize=512)
+def _normalize_sl_tgt_key(mode_str: str) -> str:
+    m = mode_str.upper().replace(' ', '_').replace('-', '_').strip()
+    return _SL_TGT_ALIASES.get(m, 'pct')  # safe fallback
+
+
+def normalize_sl_tgt_type(mode_str: Any) -> str:
+    """Map any frontend SL/Target mode string to 'pct' | 'points' | 'underlying_pts' | 'underlying_pct'."""
+    if mode_str is None:
+        return 'pct'
+    return _normalize_sl_tgt_key(str(mode_str))
+
+
+def normalize_strike_selection_type(leg_config: Mapping[str, Any]) -> str:
+    """Canonical strike-selection type of a leg ('' means ATM/ITM/OTM string mode)."""
+    strike_sel = leg_config.get('strike_selection', 'ATM')
+    sel_type = str(leg_config.get('strike_selection_type', '')).upper().strip()
+    # Accept dict form of strike_selection
+    if not sel_type and isinstance(strike_sel, dict):
+        sel_type = str(strike_sel.get('type', '')).upper().strip()
+    return STRIKE_SELECTION_ALIASES.get(sel_type, sel_type)
+
+
+def normalize_slippage_pct(value: Any) -> float:
+    try:
+        pct = float(value)
+    except (TypeError, ValueError):
+        return 0.0
+    if pct < 0:
+        return 0.0
+    if pct > 100:
+        return 100.0
+    return pct
+
+
+# ── Lot sizes ─────────────────────────────────────────────────────────────────
+
+def _to_ordinal(when: Any) -> int:
+    if isinstance(when, (datetime, date)):  # pd.Timestamp is a datetime subclass
+        return when.toordinal()
+    return pd.Timestamp(when).toordinal()
+
+
+@dataclass(frozen=True, slots=True)
+class LotSizeSchedule:
+    """Piecewise-constant lot size: sizes[i] applies before cutoffs[i]."""
+    cutoffs: Tuple[int, ...]
+    sizes: Tuple[int, ...]
+
+    @classmethod
+    def from_dates(cls, cutoffs: Tuple[str, ...], sizes: Tuple[int, ...]) -> 'LotSizeSchedule':
+        return cls(tuple(date.fromisoformat(c).toordinal() for c in cutoffs), tuple(sizes))
+
+    def size_on(self, when: Any) -> int:
+        return self.sizes[bisect_right(self.cutoffs, _to_ordinal(when))]
+
+
+_LOT_CUTOFFS = ("2010-10-01", "2015-10-29", "2019-11-01")
+
+LOT_SIZE_SCHEDULES: Mapping[str, LotSizeSchedule] = MappingProxyType({
+    'NIFTY':     LotSizeSchedule.from_dates(_LOT_CUTOFFS, (200, 50, 75, 65)),
+    'BANKNIFTY': LotSizeSchedule.from_dates(_LOT_CUTOFFS, (50, 25, 20, 15)),
+})
+_FALLBACK_LOT_SCHEDULE = LotSizeSchedule((), (1,))
+
+
+def lot_size_schedule(index: str) -> LotSizeSchedule:
+    return LOT_SIZE_SCHEDULES.get(str(index).upper(), _FALLBACK_LOT_SCHEDULE)
+
+
+# ── Plan objects ──────────────────────────────────────────────────────────────
+
+@dataclass(frozen=True, slots=True)
+class BufferPlan:
+    enabled: bool = False
+    value: float = 0.5
+    unit: str = 'percent'          # 'percent' | 'points'
+    apply_to: str = 'both'         # 'call' | 'put' | 'both'
+    above: bool = True
+    below: bool = True
+
+    @classmethod
+    def from_params(cls, params: Mapping[str, Any]) -> 'BufferPlan':
+        enabled = bool(params.get('buffer_strike_enabled', False))
+        try:
+            value = float(params.get('buffer_strike_value', 0.5) or 0.5)
+        except (TypeError, ValueError):
+            value = 0.5
+        if value <= 0:
+            enabled = False
+        unit = str(params.get('buffer_strike_unit', 'percent') or 'percent').lower().strip()
+        if unit not in ('percent', 'points'):
+            unit = 'percent'
+        apply_to = str(params.get('buffer_strike_apply_to', 'both') or 'both').lower().strip()
+        if apply_to not in ('call', 'put', 'both'):
+            apply_to = 'both'
+        above = bool(params.get('buffer_position_above', True))
+        below = bool(params.get('buffer_position_below', True))
+        if not above and not below:
+            enabled = False
+        return cls(enabled, value, unit, apply_to, above, below)
+
+    def leg_keys(self) -> Dict[str, Any]:
+        """The `_buffer_*` keys _resolve_strike reads from a leg config."""
+        return {
+            '_buffer_strike_enabled': self.enabled,
+            '_buffer_strike_value': self.value,
+            '_buffer_strike_unit': self.unit,
+            '_buffer_strike_apply_to': self.apply_to,
+            '_buffer_position_above': self.above,
+            '_buffer_position_below': self.below,
+            '_buffer_plan': self,
+        }
+
+
+@dataclass(frozen=True, slots=True)
+class LegPlan:
+    leg_number: int
+    segment: str                        # 'OPTIONS' | 'FUTURES'
+    position: str                       # 'BUY' | 'SELL'
+    lots: int
+    option_type: Optional[str]
+    expiry: str
+    is_next_expiry: bool
+    strike_selection_type: str
+    stop_loss: Optional[float]
+    stop_loss_type: str
+    target: Optional[float]
+    target_type: str
+    # Normalised leg dict as items (a mappingproxy would make the plan unpicklable)
+    config_items: Tuple[Tuple[str, Any], ...] = field(repr=False)
+
+    def leg_config(self) -> Dict[str, Any]:
+        """Mutable copy of the normalised leg dict in the engine's format."""
+        return dict(self.config_items)
+
+
+@dataclass(frozen=True, slots=True)
+class StrategyPlan:
+    index: str
+    from_date: Any
+    to_date: Any
+    expiry_type: str
+    entry_dte: int
+    exit_dte: int
+    legs: Tuple[LegPlan, ...]
+    overall_sl_type: str
+    overall_sl_value: Optional[float]
+    overall_target_type: str
+    overall_target_value: Optional[float]
+    square_off_mode: str
+    slippage_pct: float
+    re_entry_enabled: bool
+    re_entry_max: int
+    buffer: BufferPlan
+    lot_sizes: LotSizeSchedule
+
+    def lot_size(self, when: Any) -> int:
+        return self.lot_sizes.size_on(when)
+
+    def leg_configs(self) -> List[Dict[str, Any]]:
+        return [leg.leg_config() for leg in self.legs]
+
+    def variant(self, **changes) -> 'StrategyPlan':
+        """Clone with some fields replaced (legs/buffer/schedules are shared, not copied)."""
+        if 'buffer' in changes or 'legs' in changes:
+            buffer = changes.get('buffer', self.buffer)
+            legs = changes.get('legs', self.legs)
+            changes['legs'] = tuple(
+                replace(leg, config_items=tuple({**leg.leg_config(), **buffer.leg_keys()}.items()))
+                for leg in legs
+            )
+        if 'slippage_pct' in changes:
+            changes['slippage_pct'] = normalize_slippage_pct(changes['slippage_pct'])
+        return replace(self, **changes)
+
+
+# ── Compilation ───────────────────────────────────────────────────────────────
+
+def _coerce_int(value: Any, default: int) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _coerce_float(value: Any) -> Optional[float]:
+    if value is None or value == '':
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _normalize_leg_format(leg: Mapping[str, Any]) -> Dict[str, Any]:
+    """Simple user format → full router format (same rules as the engine loop)."""
+    leg = dict(leg)
+    if 'segment' not in leg:
+        leg['segment'] = 'OPTIONS'
+        leg['position'] = str(leg.get('action', leg.get('position', 'SELL'))).upper()
+        leg['lots'] = leg.get('lots', 1)
+        leg['option_type'] = leg.get('opt_type', leg.get('option_type', 'CE'))
+        leg['strike_selection'] = leg.get('strike', leg.get('strike_selection', 'ATM'))
+    return leg
+
+
+def _leg_sl_tgt(leg: Mapping[str, Any]) -> Tuple[Any, str, Any, str]:
+    if isinstance(leg.get('stopLoss'), dict):
+        sl, sl_type = leg['stopLoss'].get('value'), normalize_sl_tgt_type(leg['stopLoss'].get('mode'))
+    elif leg.get('stop_loss') is not None:
+        sl, sl_type = leg['stop_loss'], normalize_sl_tgt_type(leg.get('stop_loss_type'))
+    else:
+        sl, sl_type = None, 'pct'
+    if isinstance(leg.get('targetProfit'), dict):
+        tgt, tgt_type = leg['targetProfit'].get('value'), normalize_sl_tgt_type(leg['targetProfit'].get('mode'))
+    elif leg.get('target') is not None:
+        tgt, tgt_type = leg['target'], normalize_sl_tgt_type(leg.get('target_type'))
+    else:
+        tgt, tgt_type = None, 'pct'
+    return sl, sl_type, tgt, tgt_type
+
+
+def _compile_leg(leg_number: int, raw: Mapping[str, Any], buffer: BufferPlan) -> LegPlan:
+    leg = _normalize_leg_format(raw)
+    sel_type = normalize_strike_selection_type(leg)
+    sl, sl_type, tgt, tgt_type = _leg_sl_tgt(leg)
+    expiry = str(leg.get('expiry', 'WEEKLY') or 'WEEKLY').upper()
+    config = {
+        **leg,
+        **buffer.leg_keys(),
+        '_strike_selection_type': sel_type,
+        '_sl_tgt': (sl, sl_type, tgt, tgt_type),
+    }
+    option_type = leg.get('option_type')
+    return LegPlan(
+        leg_number=leg_number,
+        segment=str(leg['segment']),
+        position=str(leg.get('position', 'SELL')),
+        lots=_coerce_int(leg.get('lots', 1), 1),
+        option_type=str(option_type) if option_type is not None else None,
+        expiry=expiry,
+        is_next_expiry=expiry in _NEXT_EXPIRY_TYPES,
+        strike_selection_type=sel_type,
+        stop_loss=sl,
+        stop_loss_type=sl_type,
+        target=tgt,
+        target_type=tgt_type,
+        config_items=tuple(config.items()),
+    )
+
+
+def compile_strategy(source: Any, **overrides) -> StrategyPlan:
+    """
+    Compile an engine params dict (or a StrategyDefinition / BacktestRequest)
+    into a StrategyPlan. Keyword overrides are applied to the params first.
+    """
+    if isinstance(source, StrategyPlan):
+        return source.variant(**overrides) if overrides else source
+    if isinstance(source, Mapping):
+        params = dict(source)
+    else:
+        params = strategy_definition_to_params(source)
+    params.update(overrides)
+
+    buffer = BufferPlan.from_params(params)
+
+    overall_sl_type = params.get('overall_sl_type') or 'max_loss'
+    overall_sl_value = params.get('overall_sl_value')
+    overall_target_type = params.get('overall_target_type') or 'max_profit'
+    overall_target_value = params.get('overall_target_value')
+    # Backward-compat: honour old 'stop_loss_pct' / 'target_pct' keys
+    if overall_sl_value is None and params.get('stop_loss_pct') is not None:
+        overall_sl_type, overall_sl_value = 'total_premium_pct', params['stop_loss_pct']
+    if overall_target_value is None and params.get('target_pct') is not None:
+        overall_target_type, overall_target_value = 'total_premium_pct', params['target_pct']
+
+    index = str(params.get('index', 'NIFTY'))
+    return StrategyPlan(
+        index=index,
+        from_date=params.get('from_date') or params.get('date_from'),
+        to_date=params.get('to_date') or params.get('date_to'),
+        expiry_type=str(params.get('expiry_type', 'WEEKLY') or 'WEEKLY').upper(),
+        entry_dte=_coerce_int(params.get('entry_dte', 2), 2),
+        exit_dte=_coerce_int(params.get('exit_dte', 0), 0),
+        legs=tuple(
+            _compile_leg(i + 1, leg, buffer)
+            for i, leg in enumerate(params.get('legs', []) or [])
+        ),
+        overall_sl_type=overall_sl_type,
+        overall_sl_value=overall_sl_value,
+        overall_target_type=overall_target_type,
+        overall_target_value=overall_target_value,
+        square_off_mode=params.get('square_off_mode', 'partial'),
+        slippage_pct=normalize_slippage_pct(
+            params.get('slippage_pct', params.get('slippage_percent', params.get('slippage', 0.0)))
+        ),
+        re_entry_enabled=bool(params.get('re_entry_enabled', False)),
+        re_entry_max=_coerce_int(params.get('re_entry_max', 20), 20),
+        buffer=buffer,
+        lot_sizes=lot_size_schedule(index),
+    )
+
+
+# ── StrategyDefinition → engine params ────────────────────────────────────────
+
+_DEFINITION_EXPIRY_MAP = {
+    'Weekly': 'WEEKLY',
+    'Monthly': 'MONTHLY',
+    'Weekly_T1': 'NEXT_WEEKLY',
+    'Weekly_T2': 'WEEKLY_T2',
+    'Monthly_T1': 'NEXT_MONTHLY',
+}
+
+_DEFINITION_STRIKE_MAP = {
+    'Closest Premium': 'CLOSEST_PREMIUM',
+    'Premium Range': 'PREMIUM_RANGE',
+    'PREMIUM_GTE': 'PREMIUM_GTE',
+    'PREMIUM_LTE': 'PREMIUM_LTE',
+    'Straddle Width': 'STRADDLE_WIDTH',
+    '% of ATM': 'PCT_OF_ATM',
+    'Synthetic Future': 'SYNTHETIC_FUTURE',
+}
+
+
+def _enum_value(value: Any) -> Any:
+    return getattr(value, 'value', value)
+
+
+def _definition_strike(sel: Any) -> Dict[str, Any]:
+    sel_type = _enum_value(sel.type)
+    out: Dict[str, Any] = {}
+    if sel_type in _DEFINITION_STRIKE_MAP:
+        out['strike_selection_type'] = _DEFINITION_STRIKE_MAP[sel_type]
+        out['strike_selection'] = {
+            'type': out['strike_selection_type'],
+            'value': sel.value,
+            'premium': sel.premium,
+            'lower': sel.lower if sel.lower is not None else sel.premium_min,
+            'upper': sel.upper if sel.upper is not None else sel.premium_max,
+        }
+        if sel.premium is not None:
+            out['premium'] = sel.premium
+        return out
+
+    strike_type = _enum_value(sel.strike_type) or 'ATM'
+    if strike_type == 'OTM' and sel.otm_strikes:
+        out['strike_selection'] = f"OTM{int(sel.otm_strikes)}"
+    elif strike_type == 'ITM' and sel.itm_strikes:
+        out['strike_selection'] = f"ITM{int(sel.itm_strikes)}"
+    else:
+        out['strike_selection'] = 'ATM'
+    return out
+
+
+def strategy_definition_to_params(source: Any) -> Dict[str, Any]:
+    """Flatten a StrategyDefinition (or BacktestRequest wrapping one) into engine params."""
+    params: Dict[str, Any] = {}
+    strategy = source
+    if hasattr(source, 'strategy'):  # BacktestRequest
+        strategy = source.strategy
+        params['from_date'] = pd.Timestamp(source.from_date).strftime('%Y-%m-%d')
+        params['to_date'] = pd.Timestamp(source.to_date).strftime('%Y-%m-%d')
+
+    params['index'] = strategy.index
+    params['super_trend_config'] = _enum_value(strategy.super_trend_config)
+
+    legs = []
+    for leg in strategy.legs:
+        is_future = _enum_value(leg.instrument) == 'Future'
+        leg_params: Dict[str, Any] = {
+            'segment': 'FUTURES' if is_future else 'OPTIONS',
+            'position': str(_enum_value(leg.position)).upper(),
+            'lots': leg.lots,
+            'expiry': _DEFINITION_EXPIRY_MAP.get(_enum_value(leg.expiry_type), 'WEEKLY'),
+        }
+        if not is_future:
+            leg_params['option_type'] = _enum_value(leg.option_type) or 'CE'
+            leg_params.update(_definition_strike(leg.strike_selection))
+        if leg.exit_condition.stop_loss_percent is not None:
+            leg_params['stop_loss'] = leg.exit_condition.stop_loss_percent
+            leg_params['stop_loss_type'] = 'pct'
+        if leg.exit_condition.target_percent is not None:
+            leg_params['target'] = leg.exit_condition.target_percent
+            leg_params['target_type'] = 'pct'
+        legs.append(leg_params)
+    params['legs'] = legs
+
+    first = strategy.legs[0]
+    params['expiry_type'] = 'MONTHLY' if _enum_value(first.expiry_type).startswith('Monthly') else 'WEEKLY'
+    if first.entry_condition.days_before_expiry is not None:
+        params['entry_dte'] = first.entry_condition.days_before_expiry
+    if first.exit_condition.days_before_expiry is not None:
+        params['exit_dte'] = first.exit_condition.days_before_expiry
+    return params
+
+
+# ── Canonical request (cache / store / coalescing fingerprint) ────────────────
+
+_DATE_INPUT_FORMATS = ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%Y/%m/%d')
+
+# Sent by the UI but never read by the engine
+_NON_SEMANTIC_KEYS = frozenset((
+    'no_cache', 'request_id', 'timestamp', 'user_id',
+    'strategy_type', 'expiry_window', 'str_filter', 'filter',
+    'charges_enabled', 'spot_adjustment_use_entry_close',
+))
+_BUFFER_KEYS = (
+    'buffer_strike_enabled', 'buffer_strike_value', 'buffer_strike_unit',
+    'buffer_strike_apply_to', 'buffer_position_above', 'buffer_position_below',
+)
+_SPOT_ADJUSTMENT_KEYS = (
+    'spot_adjustment_enabled', 'spot_adjustment_direction',
+    'spot_adjustment_pct', 'spot_adjustment_units',
+)
+_SLIPPAGE_KEYS = ('slippage_pct', 'slippage_percent', 'slippage')
+# Top-level keys whose engine default is None: an explicit None is the same as absent
+_NONE_DEFAULT_KEYS = frozenset((
+    'filter_config', 'expiry_day_of_week', 'overall_sl_value', 'overall_target_value',
+    'stop_loss_pct', 'target_pct',
+))
+# Strike-selection dict fields only read by the premium-based selectors.
+# Must list every one _resolve_strike reads per type (unfingerprinted_strike_fields).
+_PREMIUM_FIELDS = ('premium', 'lower', 'upper', 'min_premium', 'max_premium')
+_PREMIUM_FIELDS_USED: Mapping[str, Tuple[str, ...]] = MappingProxyType({
+    'PREMIUM_RANGE':   ('lower', 'upper', 'min_premium', 'max_premium'),
+    'CLOSEST_PREMIUM': ('premium',),
+    'PREMIUM_GTE':     ('premium', 'lower'),
+    'PREMIUM_LTE':     ('premium', 'upper'),
+})
+
+
+def _canonical_date(value: Any) -> Optional[str]:
+    if not value:
+        return None
+    if isinstance(value, (datetime, date)):
+        return value.strftime('%Y-%m-%d')
+    text = str(value).strip()[:10]
+    for fmt in _DATE_INPUT_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).strftime('%Y-%m-%d')
+        except ValueError:
+            continue
+    return text
+
+
+def _canonical_number(value: Any) -> Any:
+    """2.0 → 2 so float/int spellings of the same number hash alike."""
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, dict):
+        return {k: _canonical_number(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_canonical_number(v) for v in value]
+    return value
+
+
+def _canonical_leg(raw: Mapping[str, Any]) -> Dict[str, Any]:
+    leg = _normalize_leg_format(raw)
+    sel_type = normalize_strike_selection_type(leg)
+    if 'strike_selection_type' in leg:
+        leg['strike_selection_type'] = sel_type
+    strike_sel = leg.get('strike_selection')
+    if isinstance(strike_sel, dict):
+        strike_sel = dict(strike_sel)
+        if strike_sel.get('type') is not None:
+            raw_type = str(strike_sel['type']).upper().strip()
+            strike_sel['type'] = STRIKE_SELECTION_ALIASES.get(raw_type, raw_type)
+        used = _PREMIUM_FIELDS_USED.get(sel_type, ())
+        for key in _PREMIUM_FIELDS:
+            if key not in used:
+                strike_sel.pop(key, None)
+        leg['strike_selection'] = strike_sel
+    for dict_key in ('stopLoss', 'targetProfit'):
+        block = leg.get(dict_key)
+        if isinstance(block, dict):
+            leg[dict_key] = {**block, 'mode': normalize_sl_tgt_type(block.get('mode'))}
+    for flat_key, type_key in (('stop_loss', 'stop_loss_type'), ('target', 'target_type')):
+        if leg.get(flat_key) is None:
+            leg.pop(flat_key, None)
+            leg.pop(type_key, None)
+        elif type_key in leg or flat_key in leg:
+            leg[type_key] = normalize_sl_tgt_type(leg.get(type_key))
+    leg['lots'] = _coerce_int(leg.get('lots', 1), 1)
+    if leg.get('expiry') is not None:
+        leg['expiry'] = str(leg['expiry']).upper()
+    return {k: v for k, v in leg.items() if not str(k).startswith('_')}
+
+
+def canonical_request(source: Any) -> Dict[str, Any]:
+    """
+    Minimal semantic form of an AlgoTest request: aliases resolved with the
+    same tables the plan uses, defaults filled, and settings of disabled
+    features (buffer, spot adjustment, filters, re-entry limits) dropped.
+    Two requests the engine would run identically canonicalise alike.
+    """
+    params = dict(source) if isinstance(source, Mapping) else strategy_definition_to_params(source)
+    out = {
+        k: v for k, v in params.items()
+        if not str(k).startswith('_') and k not in _NON_SEMANTIC_KEYS
+    }
+
+    out['from_date'] = _canonical_date(params.get('from_date') or params.get('date_from'))
+    out['to_date'] = _canonical_date(params.get('to_date') or params.get('date_to'))
+    out.pop('date_from', None)
+    out.pop('date_to', None)
+    out['index'] = str(params.get('index') or 'NIFTY').upper()
+    out['expiry_type'] = str(params.get('expiry_type', 'WEEKLY') or 'WEEKLY').upper()
+    out['entry_dte'] = _coerce_int(params.get('entry_dte', 2), 2)
+    out['exit_dte'] = _coerce_int(params.get('exit_dte', 0), 0)
+    out['square_off_mode'] = params.get('square_off_mode', 'partial')
+
+    slippage = next((params[k] for k in _SLIPPAGE_KEYS if params.get(k) is not None), 0.0)
+    for key in _SLIPPAGE_KEYS:
+        out.pop(key, None)
+    out['slippage_pct'] = normalize_slippage_pct(slippage)
+
+    buffer = BufferPlan.from_params(params)
+    for key in _BUFFER_KEYS:
+        out.pop(key, None)
+    if buffer.enabled:
+        out.update({
+            'buffer_strike_enabled': True,
+            'buffer_strike_value': buffer.value,
+            'buffer_strike_unit': buffer.unit,
+            'buffer_strike_apply_to': buffer.apply_to,
+            'buffer_position_above': buffer.above,
+            'buffer_position_below': buffer.below,
+        })
+
+    if not bool(params.get('spot_adjustment_enabled', False)):
+        for key in _SPOT_ADJUSTMENT_KEYS:
+            out.pop(key, None)
+
+    stc = str(_enum_value(params.get('super_trend_config')) or 'None').strip()
+    if stc in ('5x1', '5x2'):
+        out['super_trend_config'] = stc
+    else:
+        out.pop('super_trend_config', None)
+    filter_config = str(params.get('filter_config') or '').strip()
+    filter_on = stc not in ('5x1', '5x2') and filter_config in ('custom', 'base2')
+    if not filter_on:
+        out.pop('filter_config', None)
+    if not (filter_on and filter_config == 'custom'):
+        out.pop('filter_segments', None)
+    # Only 'fixed' with an active filter changes entries; anything else is DTE mode
+    entry_mode = str(params.get('filter_entry_mode', 'dte')).lower().strip()
+    out.pop('filter_entry_mode', None)
+    if entry_mode == 'fixed' and (filter_on or stc in ('5x1', '5x2')):
+        out['filter_entry_mode'] = 'fixed'
+
+    for prefix in ('overall_sl', 'overall_target'):
+        if params.get(f'{prefix}_value') is None:
+            out.pop(f'{prefix}_type', None)
+    if not bool(params.get('re_entry_enabled', False)):
+        out.pop('re_entry_enabled', None)
+        out.pop('re_entry_max', None)
+
+    for key in _NONE_DEFAULT_KEYS:
+        if out.get(key, 0) is None:
+            out.pop(key)
+
+    out['legs'] = [_canonical_leg(leg) for leg in params.get('legs', []) or []]
+    return _canonical_number(out)
+
+
+def unfingerprinted_strike_fields(resolver: Any) -> List[Tuple[str, str]]:
+    """
+    (type, field) pairs the strike resolver reads from the strike_selection
+    dict inside its ``if strike_sel_type == '<TYPE>':`` branch but that
+    _canonical_leg drops from the fingerprint. Empty when the two agree; any
+    entry means two requests that select different strikes share a cache key.
+    """
+    import ast
+    import inspect
+    import textwrap
+
+    tree = ast.parse(textwrap.dedent(inspect.getsource(resolver)))
+    missing = set()
+    for node in ast.walk(tree):
+        if not (isinstance(node, ast.If) and isinstance(node.test, ast.Compare)
+                and isinstance(node.test.left, ast.Name) and node.test.left.id == 'strike_sel_type'
+                and len(node.test.comparators) == 1
+                and isinstance(node.test.comparators[0], ast.Constant)):
+            continue
+        sel_type = node.test.comparators[0].value
+        used = _PREMIUM_FIELDS_USED.get(sel_type, ())
+        for stmt in node.body:
+            for call in ast.walk(stmt):
+                if (isinstance(call, ast.Call) and isinstance(call.func, ast.Attribute)
+                        and call.func.attr == 'get'
+                        and isinstance(call.func.value, ast.Name)
+                        and call.func.value.id in ('_ss', 'strike_sel')
+                        and call.args and isinstance(call.args[0], ast.Constant)):
+                    field_name = call.args[0].value
+                    if field_name in _PREMIUM_FIELDS and field_name not in used:
+                        missing.add((sel_type, field_name))
+    return sorted(missing)
+
+
+def strategy_fingerprint(source: Any) -> str:
+    """SHA-256 of canonical_request — the shared key of cache, store and single-flight."""
+    import hashlib
+    import json
+
+    body = json.dumps(canonical_request(source), sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(body.encode()).hexdigest()
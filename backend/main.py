@@ -1,28 +1,7 @@
-# Pandas 2.x compatibility - MUST be first before pandas is imported anywhere
-import pandas as pd
-import uvloop
-uvloop.install()
 import logging
 from contextlib import asynccontextmanager
 
-# Patch DataFrame.sort_values to handle 'by' keyword (removed in pandas 2.x)
-_orig_df_sort = pd.DataFrame.sort_values
-def _patched_df_sort(self, by=None, **kwargs):
-    if by is not None:
-        by_list = [by] if isinstance(by, str) else list(by)
-        # pandas 2.x doesn't accept 'by' keyword - pass positionally
-        return _orig_df_sort(self, by_list, **kwargs)
-    return _orig_df_sort(self, **kwargs)
-pd.DataFrame.sort_values = _patched_df_sort
-
-# Patch Series.sort_values - pandas 2.x removed 'by' param from Series  
-_orig_series_sort = pd.Series.sort_values
-def _patched_series_sort(self, by=None, **kwargs):
-    # For Series, we just ignore 'by' since you can't sort a Series by column name
-    return _orig_series_sort(self, **kwargs)
-pd.Series.sort_values = _patched_series_sort
-
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
 import os
@@ -30,7 +9,8 @@ import sys
 import psutil
 import redis as redis_lib
 
-from database import get_pool_status
+from services.job_cost import BACKTEST_QUEUES
+from services.engine_pool import pool_stats as engine_pool_stats
 
 # Add backend directory to path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
@@ -93,8 +73,29 @@ def health_check():
     return {"status": "ok"}
 
 
+@app.get("/health/live")
+def health_live():
+    """Liveness: the process serves requests (no DB, Redis or warmup checks)."""
+    return {"status": "ok"}
+
+
+@app.get("/health/ready")
+def health_ready(response: Response):
+    """
+    Readiness: 503 until warmup has imported the engine, started the engine
+    pool and made the first planned dataset resident.
+    """
+    from services.warmup_planner import warmup_state
+
+    state = warmup_state().snapshot()
+    if not state["ready"]:
+        response.status_code = 503
+    return state
+
+
 @app.get("/health/db")
 def health_db():
+    from database import get_pool_status
     return {"database": get_pool_status()}
 
 @app.get("/health/stats")
@@ -111,7 +112,7 @@ async def health_stats():
             redis_status = {
                 "used_memory_mb": round(info.get("used_memory", 0) / 1e6, 1),
                 "max_memory_mb": round(info.get("maxmemory", 0) / 1e6, 1),
-                "backtest_queue_depth": client.llen("backtests"),
+                "backtest_queue_depth": sum(client.llen(q) for q in BACKTEST_QUEUES),
                 "upload_queue_depth": client.llen("uploads"),
             }
         except Exception as exc:
@@ -128,6 +129,7 @@ async def health_stats():
             "cpu_percent": psutil.cpu_percent(interval=0.1),
         },
         "redis": redis_status,
+        "engine_pool": engine_pool_stats(),
         "status": "healthy",
     }
 
@@ -140,10 +142,9 @@ def cache_stats():
     
     try:
         from services.backtest_cache import get_backtest_cache
-        redis_cache = get_backtest_cache()
-        stats["redis"] = redis_cache.get_stats()
+        stats["results"] = get_backtest_cache().get_stats()
     except Exception as e:
-        stats["redis"] = {"error": str(e)}
+        stats["results"] = {"error": str(e)}
     
     try:
         from services.data_memory_cache import get_memory_cache
@@ -153,6 +154,7 @@ def cache_stats():
         stats["memory"] = {"error": str(e)}
     
     try:
+        from database import get_pool_status
         stats["database"] = get_pool_status()
     except Exception as e:
         stats["database"] = {"error": str(e)}
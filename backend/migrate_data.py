@@ -55,6 +55,8 @@ RELIABILITY:
   Each file committed independently — one bad file never affects others
   --force flag to re-import already-completed files
   Automatic DB schema migration (ALTER TABLE) on first run
+  Data version bumped per symbol after every file that changed rows,
+  so caches keyed on services.data_version refresh only what changed
 """
 
 import argparse
@@ -79,6 +81,7 @@ from sqlalchemy import create_engine, text
 
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 from database import DATABASE_URL, CLEANED_CSV_DIR, EXPIRY_DATA_DIR, STRIKE_DATA_DIR
+from services.data_version import DATA_CHANGE_DDL, DATA_VERSION_DDL, bump_data_version
 
 logging.basicConfig(
     level=logging.INFO,
@@ -649,6 +652,14 @@ def dedupe_keep_first(df: pd.DataFrame, key: List[str]) -> Tuple[pd.DataFrame, i
     return out, before - len(out)
 
 
+def first_trade_date(df: pd.DataFrame) -> Optional[str]:
+    """Earliest trade_date of an import (logged with its data version bump)."""
+    if "trade_date" not in df.columns:
+        return None
+    dates = pd.to_datetime(df["trade_date"], errors="coerce").dropna()
+    return dates.min().strftime("%Y-%m-%d") if len(dates) else None
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 # CSV reader
 # ─────────────────────────────────────────────────────────────────────────────
@@ -962,6 +973,8 @@ class Migrator:
                 "ALTER TABLE _import_file_tracker "
                 "ADD COLUMN IF NOT EXISTS rows_skipped INTEGER DEFAULT 0"
             ))
+            conn.execute(text(DATA_VERSION_DDL))
+            conn.execute(text(DATA_CHANGE_DDL))
 
     def table_columns(self, table_name: str) -> set:
         with self._cols_lock:
@@ -1044,6 +1057,17 @@ class Migrator:
         except Exception as e:
             logger.warning("Tracker finish failed: %s", e)
 
+    def _bump_data_version(self, r: Dict):
+        if r.get("status") != "completed":
+            return
+        if not (r.get("rows_inserted", 0) or r.get("rows_updated", 0)):
+            return
+        try:
+            with sa_engine().begin() as conn:
+                bump_data_version(conn, r.get("symbols") or [None], r.get("first_date"))
+        except Exception as e:
+            logger.warning("Data version bump failed: %s", e)
+
     def _should_skip(self, path: Path) -> Optional[str]:
         if self.force or self.dry_run:
             return None
@@ -1164,6 +1188,8 @@ class Migrator:
         finally:
             if not self.dry_run:
                 self._tracker_finish(tid, result)
+        if not self.dry_run:
+            self._bump_data_version(result)
         return result
 
     # ── option_data ───────────────────────────────────────────────────────
@@ -1214,6 +1240,8 @@ class Migrator:
         r["rows_skipped"]  = skipped + n_dup
         r["rows_valid"]    = len(df_valid)
         r["rows_inserted"] = r["rows_updated"] = 0
+        r["symbols"]       = sorted(df_valid["symbol"].dropna().unique().tolist())
+        r["first_date"]    = first_trade_date(df_valid)
 
         df_db = self._align("option_data", df_valid)
         if self.dry_run or df_db.empty:
@@ -1281,6 +1309,8 @@ class Migrator:
         r["rows_skipped"]  = skipped + n_dup
         r["rows_valid"]    = len(df_valid)
         r["rows_inserted"] = r["rows_updated"] = 0
+        r["symbols"]       = sorted(df_valid["symbol"].dropna().unique().tolist())
+        r["first_date"]    = first_trade_date(df_valid)
 
         df_db = self._align("spot_data", df_valid)
         if self.dry_run or df_db.empty:
@@ -1330,6 +1360,7 @@ class Migrator:
         r["rows_skipped"]  = skipped + n_dup
         r["rows_valid"]    = len(df_valid)
         r["rows_inserted"] = r["rows_updated"] = 0
+        r["symbols"]       = sorted(df_valid["symbol"].dropna().unique().tolist())
 
         if self.dry_run or df_valid.empty:
             return r
@@ -1434,6 +1465,7 @@ class Migrator:
         r["rows_skipped"]  = skipped + n_dup
         r["rows_valid"]    = len(df_valid)
         r["rows_inserted"] = r["rows_updated"] = 0
+        r["symbols"]       = sorted(df_valid["symbol"].dropna().unique().tolist())
 
         if self.dry_run or df_valid.empty:
             return r
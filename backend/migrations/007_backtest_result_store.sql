@@ -0,0 +1,30 @@
+-- Result store support for backtest_runs / backtest_trade_legs (see services/result_store.py)
+--
+-- The typed columns from migration 003 stay the queryable shape of a run; the
+-- JSONB columns below hold what they cannot (extra engine columns, the exact
+-- summary/pivot/meta payload) so a stored run is served byte-for-byte like a
+-- fresh one.
+
+ALTER TABLE backtest_runs
+    ADD COLUMN IF NOT EXISTS result_header JSONB,   -- {"summary", "pivot", "meta", "columns"}
+    ADD COLUMN IF NOT EXISTS leg_count INTEGER;
+
+ALTER TABLE backtest_trade_legs
+    ADD COLUMN IF NOT EXISTS row_extra JSONB;       -- engine columns without a typed column
+
+-- Engine rows are stored as produced; never reject a run over one odd leg
+ALTER TABLE backtest_trade_legs ALTER COLUMN entry_date DROP NOT NULL;
+ALTER TABLE backtest_trade_legs ALTER COLUMN exit_date DROP NOT NULL;
+ALTER TABLE backtest_trade_legs ALTER COLUMN leg_type DROP NOT NULL;
+ALTER TABLE backtest_trade_legs ALTER COLUMN net_pnl DROP NOT NULL;
+ALTER TABLE backtest_trade_legs ALTER COLUMN exit_reason TYPE TEXT;
+
+-- Repeat-request lookup: latest completed run for a request hash
+CREATE INDEX IF NOT EXISTS idx_backtest_runs_hash_completed
+    ON backtest_runs (request_hash, completed_at DESC)
+    WHERE status = 'completed';
+
+DO $$
+BEGIN
+    RAISE NOTICE 'Migration 007 applied: backtest result store columns';
+END $$;
@@ -11,6 +11,8 @@ from sqlalchemy import text
 from sqlalchemy.exc import OperationalError
 
 from database import reset_engine
+from services.data_version import data_version_key
+from services.job_control import JobCancelled, cancellable_query
 
 logger = logging.getLogger(__name__)
 
@@ -44,6 +46,7 @@ class MarketDataRepository:
     """
 
     _trading_calendar_cache_df: Optional[pd.DataFrame] = None
+    _trading_calendar_cache_version: Optional[str] = None
     _trading_calendar_cache_lock = threading.Lock()
     _columns_cache: dict = {}
     _columns_cache_lock = threading.Lock()
@@ -206,8 +209,15 @@ class MarketDataRepository:
         Uses spot_data table first (smaller), falls back to option_data if needed.
         """
         cls = self.__class__
+        version = data_version_key()
+        if cls._trading_calendar_cache_version != version:
+            # Any import may add trading days
+            cls._trading_calendar_cache_df = None
+            cls._trading_calendar_cache_version = version
         if cls._trading_calendar_cache_df is not None:
             return self._filter_trading_calendar(from_date, to_date)
+        if self._restore_calendar_snapshot(version):
+            return self._filter_trading_calendar(from_date, to_date)
 
         # First try spot_data (much smaller table)
         cols = self._table_columns("spot_data")
@@ -235,6 +245,7 @@ class MarketDataRepository:
                 if not df_full.empty:
                     df_full["date"] = pd.to_datetime(df_full["date"])
                     cls._trading_calendar_cache_df = df_full
+                    self._save_calendar_snapshot(version, df_full)
                     return self._filter_trading_calendar(from_date, to_date)
             except Exception as e:
                 print(f"[WARN] spot_data query failed: {e}")
@@ -245,8 +256,32 @@ class MarketDataRepository:
             return pd.DataFrame(columns=["date"])
         date_col = self._pick(cols, "trade_date", "date")
         self._ensure_trading_calendar_cache(date_col)
+        if cls._trading_calendar_cache_df is not None and not cls._trading_calendar_cache_df.empty:
+            self._save_calendar_snapshot(version, cls._trading_calendar_cache_df)
         return self._filter_trading_calendar(from_date, to_date)
 
+    @classmethod
+    def _restore_calendar_snapshot(cls, version: str) -> bool:
+        """Map the calendar snapshot of this data version (see services.dataset_snapshot)."""
+        try:
+            from services.dataset_snapshot import load_snapshot
+            restored = load_snapshot("calendar", version)
+        except Exception:
+            return False
+        if restored is None:
+            return False
+        cls._trading_calendar_cache_df = restored[0]["calendar"].to_pandas()
+        return True
+
+    @staticmethod
+    def _save_calendar_snapshot(version: str, df: pd.DataFrame) -> None:
+        try:
+            import polars as pl
+            from services.dataset_snapshot import save_snapshot
+            save_snapshot("calendar", version, {"calendar": pl.from_pandas(df[["date"]])})
+        except Exception as exc:
+            logger.debug("Trading calendar snapshot not saved: %s", exc)
+
     def _ensure_trading_calendar_cache(self, date_col: str):
         cls = self.__class__
         if cls._trading_calendar_cache_df is not None:
@@ -255,7 +290,7 @@ class MarketDataRepository:
         redis_url = os.getenv("REDIS_URL", "redis://redis:6379/0")
         try:
             redis_client = redis.Redis.from_url(redis_url)
-            cached = redis_client.get("trading_calendar:full")
+            cached = redis_client.get(f"trading_calendar:{cls._trading_calendar_cache_version}:full")
             if cached:
                 records = msgpack.unpackb(cached, raw=False)
                 df = pd.DataFrame(records)
@@ -284,7 +319,7 @@ class MarketDataRepository:
             if redis_client:
                 try:
                     redis_client.setex(
-                        "trading_calendar:full",
+                        f"trading_calendar:{cls._trading_calendar_cache_version}:full",
                         86400,
                         msgpack.packb(
                             [
@@ -417,9 +452,10 @@ class MarketDataRepository:
             """
         )
 
+        job = None
         try:
             dfs = []
-            with self.engine.begin() as conn:
+            with self.engine.begin() as conn, cancellable_query(conn) as job:
                 for chunk in pd.read_sql(
                     q,
                     conn,
@@ -430,9 +466,14 @@ class MarketDataRepository:
                     },
                     chunksize=150_000,
                 ):
+                    if job is not None and job.cancelled():
+                        raise JobCancelled(job.job_id)
                     if not chunk.empty:
                         dfs.append(chunk)
         except OperationalError as exc:
+            if job is not None and job.cancelled(refresh=True):
+                # pg_cancel_backend from request_cancel — the connection is fine
+                raise JobCancelled(job.job_id) from exc
             logger.warning("Option bulk fetch failed, resetting engine: %s", exc)
             reset_engine()
             raise
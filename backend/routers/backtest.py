@@ -1,20 +1,45 @@
 from fastapi import APIRouter, HTTPException, Response, Header, UploadFile, File
+from fastapi.responses import StreamingResponse
 from typing import Dict, Any, List, Optional, Tuple
-# Import generic multi-leg engine
-# NOTE: keep FastAPI imports at top for readability
-from engines.generic_algotest_engine import run_algotest_backtest, _apply_slippage, _calculate_fo_charges
-from services.algotest_job import execute_algotest_job
-from services.backtest_cache import get_backtest_cache as _get_result_cache
-from worker.tasks import run_algotest_job
+# NOTE: keep FastAPI imports at top for readability. The engine layer (base,
+# engines, algotest_job, recalculate), the pandas / Polars / SQLAlchemy backed
+# services (backtest_cache, result_store, trade_query, equity_series,
+# result_export) and the Celery task module are imported on first use, so API
+# startup does not pay for them. Everything imported here is light.
+from services.job_control import job_event_stream, request_cancel
+from services.job_cost import estimate_job_cost
+from services.dataset_affinity import route_job
+from services.warmup_planner import record_request
+from services.single_flight import (
+    attach_or_lead,
+    complete as complete_flight,
+    complete_job as complete_flight_job,
+    detach as detach_flight,
+    detach_job as detach_flight_job,
+    flight_key,
+    heartbeat as flight_heartbeat,
+    job_owner,
+    new_call_owner,
+    owner_job_id,
+    wait_for as wait_for_flight,
+)
+from services.result_artifacts import (
+    ArtifactNotFound,
+    is_artifact_handle,
+    load_artifact_header,
+    publish_result,
+    scan_result_artifact,
+    stream_result_artifact,
+)
+from services.engine_pool import submit_job
 from worker.celery import celery_app
 import sys
 import os
-import pandas as pd
-import numpy as np
 import traceback
-from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
 import asyncio
 import logging
+import uuid
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
@@ -31,10 +56,9 @@ def _normalize_date(value: Any) -> str:
             continue
     return value
 
-# Thread pool for async tasks (I/O/cache warming) and process pool for CPU-heavy backtests
+# Thread pool for async tasks (I/O/cache warming); CPU-heavy backtests run in
+# the pre-imported engine process pool (services.engine_pool), created on first use
 _backtest_executor = ThreadPoolExecutor(max_workers=3)
-_BACKTEST_PROCESS_WORKERS = min(4, max(1, os.cpu_count() or 1))
-_backtest_process_executor = ProcessPoolExecutor(max_workers=_BACKTEST_PROCESS_WORKERS)
 
 # Add the parent directory to the path to import engines
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -95,137 +119,11 @@ except ImportError as e:
 router = APIRouter()
 
 
-def _normalize_recalc_numeric(value: Any) -> Optional[float]:
-    if value is None:
-        return None
-    if isinstance(value, str):
-        value = value.strip()
-        if value == '':
-            return None
-    try:
-        numeric = float(value)
-    except (TypeError, ValueError):
-        return None
-    if np.isnan(numeric):
-        return None
-    return numeric
-
-
-def _recalculate_trade_prices(
-    trades: List[Dict[str, Any]],
-    slippage_pct: float,
-    charges_enabled: bool = False,
-):
-    """
-    Re-price every leg row using raw prices.
-
-    1. Applies slippage to raw entry/exit prices (existing behaviour).
-    2. Optionally applies Zerodha F&O transaction charges as price adjustments:
-       - SELL leg: effective_entry = entry - entry_charge_per_unit
-                   effective_exit  = exit  + exit_charge_per_unit
-       - BUY  leg: effective_entry = entry + entry_charge_per_unit
-                   effective_exit  = exit  - exit_charge_per_unit
-       Charges per unit = total_charges_₹ / qty.  This keeps Net P&L in
-       the same "per-unit points" unit that the rest of the system uses,
-       while correctly deducting the rupee cost of every brokerage component.
-    """
-    updated_rows: List[Dict[str, Any]] = []
-    trade_totals:  Dict[Any, float] = {}
-    trade_charges: Dict[Any, float] = {}   # total ₹ charges per trade_id
-
-    for raw_row in trades:
-        row = dict(raw_row)
-        position  = str(row.get('B/S',  '') or '').upper().strip()
-        raw_entry = _normalize_recalc_numeric(row.get('Raw Entry Price'))
-        raw_exit  = _normalize_recalc_numeric(row.get('Raw Exit Price'))
-        trade_id  = row.get('Trade')
-        leg_type  = str(row.get('Type', '') or '').upper().strip()
-        is_leg_row = (
-            bool(position)
-            and leg_type in {'CE', 'PE', 'FUT', 'CALL', 'PUT', 'C', 'P'}
-        )
-
-        if is_leg_row and raw_entry is not None and raw_exit is not None:
-            # ── Step 1: apply slippage ────────────────────────────────────
-            new_entry = _apply_slippage(raw_entry, position, 'entry', slippage_pct)
-            new_exit  = _apply_slippage(raw_exit,  position, 'exit',  slippage_pct)
-
-            # ── Step 2: apply transaction charges ────────────────────────
-            charges_inr = 0.0
-            if charges_enabled:
-                qty_raw = _normalize_recalc_numeric(row.get('Qty'))
-                qty     = float(qty_raw) if qty_raw and qty_raw > 0 else 1.0
-                segment = 'FUTURE' if leg_type == 'FUT' else 'OPTION'
-                ch = _calculate_fo_charges(new_entry, new_exit, qty, position, segment)
-
-                epu = ch['entry_charge_per_unit']   # ₹ / qty
-                xpu = ch['exit_charge_per_unit']    # ₹ / qty
-                charges_inr = ch['total_charges_inr']
-
-                # Adjust effective prices so P&L = (eff_entry - eff_exit) for SELL
-                if position == 'SELL':
-                    new_entry = round(new_entry - epu, 2)   # sell gets less
-                    new_exit  = round(new_exit  + xpu, 2)   # buy-back costs more
-                else:
-                    new_entry = round(new_entry + epu, 2)   # buy costs more
-                    new_exit  = round(new_exit  - xpu, 2)   # sell-to-close gets less
-
-            # ── Step 3: P&L (per-unit points) ────────────────────────────
-            if position == 'BUY':
-                leg_pnl = new_exit - new_entry
-            else:
-                leg_pnl = new_entry - new_exit
-
-            row['Entry Price'] = new_entry
-            row['Exit Price']  = new_exit
-            if charges_enabled:
-                row['Charges'] = round(charges_inr, 2)
-
-            if leg_type == 'FUT':
-                row['FUT Entry Price'] = new_entry
-                row['FUT Exit Price']  = new_exit
-                row['FUT P&L'] = leg_pnl
-                row['CE P&L']  = 0
-                row['PE P&L']  = 0
-            elif leg_type in {'CE', 'CALL', 'C'}:
-                row['CE P&L']  = leg_pnl
-                row['PE P&L']  = 0
-                row['FUT P&L'] = row.get('FUT P&L', 0) or 0
-            else:
-                row['PE P&L']  = leg_pnl
-                row['CE P&L']  = 0
-                row['FUT P&L'] = row.get('FUT P&L', 0) or 0
-
-            trade_totals[trade_id]  = trade_totals.get(trade_id, 0.0)  + float(leg_pnl)
-            trade_charges[trade_id] = trade_charges.get(trade_id, 0.0) + charges_inr
-        else:
-            numeric_net = _normalize_recalc_numeric(row.get('Net P&L'))
-            if trade_id is not None and numeric_net is not None:
-                trade_totals.setdefault(trade_id, float(numeric_net))
-
-        updated_rows.append(row)
-
-    for row in updated_rows:
-        trade_id = row.get('Trade')
-        net_pnl  = trade_totals.get(trade_id)
-        if net_pnl is None:
-            continue
-        row['Net P&L'] = round(float(net_pnl), 2)
-        if charges_enabled:
-            row['Total Charges'] = round(trade_charges.get(trade_id, 0.0), 2)
-        entry_spot = _normalize_recalc_numeric(row.get('Entry Spot'))
-        if entry_spot and entry_spot > 1000:
-            row['% P&L'] = round((float(net_pnl) / entry_spot) * 100, 4)
-        else:
-            row['% P&L'] = 0.0
-
-    return updated_rows
-
-
 @router.post("/clear-cache")
 async def clear_cache():
     """Clear the backtest cache"""
-    cache = _get_result_cache()
+    from services.backtest_cache import get_backtest_cache
+    cache = get_backtest_cache()
     cache.clear_all()
     return {"message": "Cache cleared"}
 
@@ -439,99 +337,397 @@ async def get_str_segments():
 
 
 
+def _export_source(strategy_id: Optional[str], run_id: Optional[str], job_id: Optional[str]) -> Tuple[str, Optional[str]]:
+    """(artifact id, stored run id) of the result to export; strategy_id is a run id."""
+    run_id = run_id or strategy_id
+    if job_id:
+        return _job_artifact_id(job_id), None
+    if run_id:
+        from services.trade_query import run_artifact_id
+        try:
+            return run_artifact_id(run_id), run_id
+        except ArtifactNotFound:
+            raise HTTPException(status_code=404, detail="Run not found")
+    raise HTTPException(status_code=400, detail="Provide run_id (strategy_id) or job_id")
+
+
+def _download(chunks, media_type: str, filename: str) -> StreamingResponse:
+    return StreamingResponse(
+        chunks,
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
+
+
 @router.get("/export/trades")
-async def export_trades(strategy_id: str):
+async def export_trades(
+    strategy_id: Optional[str] = None,
+    run_id: Optional[str] = None,
+    job_id: Optional[str] = None,
+    format: str = "csv",
+    columns: Optional[str] = None,
+):
     """
-    Export trade sheet as CSV
+    Export the trade sheet of a stored run / completed job as CSV, Parquet or
+    XLSX, streamed batch by batch.
     """
-    # This is a placeholder - in a real implementation, you would retrieve
-    # the trade data based on strategy_id and return it as CSV
-    content = "Trade Date,Strategy Name,Leg Type,Strike,Entry Premium,Exit Premium,Quantity,P&L,Running Equity\n"
-    content += "2023-01-01,Sample Strategy,CE SELL,18000,200.5,180.2,1,-20.3,10000\n"
-    
-    response = Response(content=content)
-    response.headers["Content-Disposition"] = f"attachment; filename=trade_sheet_{strategy_id}.csv"
-    response.headers["Content-Type"] = "text/csv"
-    return response
+    from services import result_export
+    artifact_id, stored_run = _export_source(strategy_id, run_id, job_id)
+
+    def _open():
+        from services.trade_query import run_trades_frame
+        lf = run_trades_frame(stored_run) if stored_run else scan_result_artifact(artifact_id)
+        return result_export.export_trades(lf, format, columns=_csv_param(columns))
+    try:
+        chunks, media_type = await asyncio.to_thread(_open)
+    except ArtifactNotFound:
+        raise HTTPException(status_code=404, detail="Result not found or expired")
+    except result_export.ExportFormatError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return _download(chunks, media_type, f"trade_sheet_{stored_run or job_id}.{format.lower()}")
 
 
 @router.get("/export/summary")
-async def export_summary(strategy_id: str):
-    """
-    Export summary as CSV
-    """
-    # This is a placeholder - in a real implementation, you would retrieve
-    # the summary data based on strategy_id and return it as CSV
-    content = "Metric,Value\n"
-    content += "Total P&L,5000.00\n"
-    content += "CAGR,15.25\n"
-    content += "Max Drawdown,-12.34\n"
-    content += "CAR/MDD,1.24\n"
-    content += "Win Rate,65.43\n"
-    content += "Total Trades,156\n"
-    
-    response = Response(content=content)
-    response.headers["Content-Disposition"] = f"attachment; filename=summary_{strategy_id}.csv"
-    response.headers["Content-Type"] = "text/csv"
-    return response
+async def export_summary(
+    strategy_id: Optional[str] = None,
+    run_id: Optional[str] = None,
+    job_id: Optional[str] = None,
+    format: str = "csv",
+):
+    """Export the summary metrics and year-wise pivot of a stored run / completed job."""
+    from services import result_export
+    artifact_id, stored_run = _export_source(strategy_id, run_id, job_id)
+
+    def _open():
+        from services.result_store import load_run_header
+        header = load_run_header(stored_run) if stored_run else load_artifact_header(artifact_id)
+        if header is None:
+            raise ArtifactNotFound(stored_run)
+        return result_export.export_summary(header, format)
+    try:
+        chunks, media_type = await asyncio.to_thread(_open)
+    except ArtifactNotFound:
+        raise HTTPException(status_code=404, detail="Result not found or expired")
+    except result_export.ExportFormatError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return _download(chunks, media_type, f"summary_{stored_run or job_id}.{format.lower()}")
 
 
 def _run_algotest_job_process(payload: dict) -> dict:
-    """Helper executed inside the ProcessPoolExecutor."""
-    return execute_algotest_job(payload)
+    """
+    Helper executed inside the ProcessPoolExecutor. The result is written
+    once as an Arrow artifact in the child; only the handle is pickled back.
+    """
+    from services.algotest_job import execute_algotest_job
+    return publish_result(execute_algotest_job(payload, as_table=True))
+
+
+def _flight_owner_live(owner: str) -> bool:
+    """False for a coalescing owner that is a finished / dead Celery job."""
+    job_id = owner_job_id(owner)
+    if job_id is None:
+        return True  # synchronous call: single_flight checks its heartbeat
+    try:
+        return celery_app.AsyncResult(job_id).state not in ("SUCCESS", "FAILURE", "REVOKED")
+    except ValueError:
+        return False
 
 
 @router.post("/algotest")
 async def run_algotest_backtest_endpoint(request: dict):
     """
     Legacy synchronous endpoint kept for backwards compatibility.
+    Identical concurrent requests share one engine run (single-flight).
     """
-    loop = asyncio.get_running_loop()
-    result = await loop.run_in_executor(
-        _backtest_process_executor,
-        _run_algotest_job_process,
-        request,
-    )
+    await asyncio.to_thread(record_request, request)
+    key = await asyncio.to_thread(flight_key, request)
+    owner = new_call_owner()
+    result = None
+    shared = False
+    while result is None:
+        leader = await asyncio.to_thread(attach_or_lead, key, owner, _flight_owner_live)
+        if leader is not None:
+            # Another process runs it — wait for its handle (None: it died, retry).
+            # Awaited on the loop: waiters never hold executor threads.
+            result = await wait_for_flight(key)
+            shared = True
+            continue
+        # Followers treat us as dead once this heartbeat stops
+        beat = asyncio.create_task(flight_heartbeat(owner)) if key else None
+        try:
+            result = await asyncio.wrap_future(submit_job(_run_algotest_job_process, request))
+        finally:
+            try:
+                followers = await asyncio.to_thread(
+                    complete_flight, key, owner,
+                    result or {'status': 'error', 'message': 'Coalesced backtest failed'},
+                )
+            finally:
+                # Only after the result is published, so the run is never taken over
+                if beat is not None:
+                    beat.cancel()
+        shared = followers > 0
+    if is_artifact_handle(result):
+        # Single consumer → removed once streamed; shared ones are left to the sweeper
+        return StreamingResponse(
+            stream_result_artifact(result["artifact_id"], remove=not shared),
+            media_type="application/json",
+        )
     return result
 
 
-@router.post("/algotest/jobs")
-async def queue_algotest_job(request: dict):
+def _run_algotest_extend_process(payload: dict) -> dict:
     """
-    Enqueue an AlgoTest backtest to run asynchronously via Celery.
+    Helper executed inside the ProcessPoolExecutor for incremental runs; like
+    _run_algotest_job_process only the artifact handle is pickled back.
     """
-    payload = dict(request or {})
-    task = run_algotest_job.apply_async(args=[payload])
-    return {"status": "queued", "job_id": task.id}
+    from services.incremental_backtest import extend_algotest_job
+    return publish_result(extend_algotest_job(payload))
 
 
-@router.post("/backtest/recalculate-slippage")
-async def recalculate_slippage(request: dict):
-    trades = request.get('trades') or []
-    if not isinstance(trades, list) or not trades:
-        raise HTTPException(status_code=400, detail="No trades provided")
+@router.post("/algotest/extend")
+async def extend_algotest_backtest_endpoint(request: dict):
+    """
+    Incremental run: re-use the stored checkpoint of the same strategy and
+    only simulate expiries after it. Falls back to a full run (and stores a
+    fresh checkpoint) when no usable checkpoint exists.
+    """
+    result = await asyncio.wrap_future(submit_job(_run_algotest_extend_process, request))
+    if is_artifact_handle(result):
+        return StreamingResponse(
+            stream_result_artifact(result["artifact_id"], remove=True),
+            media_type="application/json",
+        )
+    return result
+
+
+@router.post("/algotest/extend/reset")
+async def reset_algotest_checkpoint(request: dict):
+    """Forget the incremental checkpoint for a strategy."""
+    from services.incremental_backtest import clear_incremental_state
+    return {"status": "success", "cleared": clear_incremental_state(request)}
+
 
+def _run_portfolio_process(payload: dict) -> dict:
+    """Helper executed inside the ProcessPoolExecutor for portfolio runs."""
+    from services.portfolio_backtest import execute_portfolio_job
+    return execute_portfolio_job(payload)
+
+
+@router.post("/algotest/portfolio")
+async def run_portfolio_backtest_endpoint(request: dict):
+    """
+    Run several strategy configs as one book: shared data loads per index,
+    date-aligned combined equity/drawdown, daily exposure and per-strategy
+    attribution.
+    """
+    result = await asyncio.wrap_future(submit_job(_run_portfolio_process, request))
+    if result.get('status') == 'error':
+        status_code = 400 if result.get('invalid_request') else 500
+        raise HTTPException(status_code=status_code, detail=result.get('error'))
+    return result
+
+
+@router.get("/algotest/runs/{run_id}")
+async def get_stored_run(run_id: str):
+    """Summary, pivot and meta of a stored run (no trades)."""
+    from services.result_store import load_run_header
     try:
-        slippage_pct = float(request.get('slippage_pct', 0) or 0)
-    except (TypeError, ValueError):
-        raise HTTPException(status_code=400, detail="Invalid slippage_pct")
+        header = await asyncio.to_thread(load_run_header, run_id)
+    except Exception as exc:
+        logger.warning("Stored run lookup failed for %s: %s", run_id, exc)
+        header = None
+    if header is None:
+        raise HTTPException(status_code=404, detail="Run not found")
+    return {"status": "success", "run_id": run_id, **header}
 
-    charges_enabled = bool(request.get('charges_enabled', False))
 
-    recalculated_rows = _recalculate_trade_prices(
-        trades, slippage_pct, charges_enabled=charges_enabled
+def _csv_param(value: Optional[str], cast=str) -> Optional[list]:
+    """'a,b,c' query parameter → list (None when absent/blank)."""
+    if not value:
+        return None
+    try:
+        items = [cast(v.strip()) for v in value.split(",") if v.strip()]
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail=f"Invalid list parameter: {value}")
+    return items or None
+
+
+async def _query_trades_page(source_factory, columns, sort, order, exit_reason, year, leg, offset, limit) -> dict:
+    from services.trade_query import TradeQueryError, query_trades
+
+    def _run():
+        return query_trades(
+            source_factory(),
+            columns=_csv_param(columns),
+            sort=sort or None,
+            descending=(order or "asc").lower() == "desc",
+            exit_reason=_csv_param(exit_reason),
+            year=_csv_param(year, int),
+            leg=_csv_param(leg, int),
+            offset=offset,
+            limit=limit,
+        )
+    try:
+        return await asyncio.to_thread(_run)
+    except TradeQueryError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    except ArtifactNotFound:
+        raise HTTPException(status_code=404, detail="Result not found or expired")
+
+
+@router.get("/algotest/runs/{run_id}/trades")
+async def get_stored_run_trades(
+    run_id: str,
+    offset: int = 0,
+    limit: int = 500,
+    columns: Optional[str] = None,
+    sort: Optional[str] = None,
+    order: str = "asc",
+    exit_reason: Optional[str] = None,
+    year: Optional[str] = None,
+    leg: Optional[str] = None,
+):
+    """
+    One page of a stored run's leg rows.
+
+    columns / exit_reason / year / leg take comma-separated lists; sort is
+    any column name, order is asc|desc.
+    """
+    from services.trade_query import run_trades_frame
+    page = await _query_trades_page(
+        lambda: run_trades_frame(run_id),
+        columns, sort, order, exit_reason, year, leg, offset, limit,
     )
-    trades_df = pd.DataFrame(recalculated_rows)
+    return {"run_id": run_id, **page}
+
+
+@router.get("/algotest/jobs/{job_id}/trades")
+async def get_algotest_job_trades(
+    job_id: str,
+    offset: int = 0,
+    limit: int = 500,
+    columns: Optional[str] = None,
+    sort: Optional[str] = None,
+    order: str = "asc",
+    exit_reason: Optional[str] = None,
+    year: Optional[str] = None,
+    leg: Optional[str] = None,
+):
+    """Same paging/projection/sort/filters over a completed Celery job's artifact."""
+    artifact_id = _job_artifact_id(job_id)
+    page = await _query_trades_page(
+        lambda: scan_result_artifact(artifact_id),
+        columns, sort, order, exit_reason, year, leg, offset, limit,
+    )
+    return {"job_id": job_id, **page}
+
+
+def _job_artifact_id(job_id: str) -> str:
+    task = celery_app.AsyncResult(job_id)
+    try:
+        handle = task.result if task.state == "SUCCESS" else None
+    except ValueError:
+        handle = None
+    if not is_artifact_handle(handle):
+        raise HTTPException(status_code=404, detail="No completed result for this job")
+    return handle["artifact_id"]
+
+
+async def _equity_response(artifact_factory, points: int, start: Optional[str], end: Optional[str]) -> dict:
+    def _run():
+        from services.equity_series import downsample_equity
+        return downsample_equity(artifact_factory(), points=points, start=start, end=end)
+    try:
+        return await asyncio.to_thread(_run)
+    except ArtifactNotFound:
+        raise HTTPException(status_code=404, detail="Result not found or expired")
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+@router.get("/algotest/runs/{run_id}/equity")
+async def get_stored_run_equity(
+    run_id: str, points: int = 1000, start: Optional[str] = None, end: Optional[str] = None,
+):
+    """
+    Cumulative and %DD series of a stored run, downsampled to ~points
+    (LTTB for equity, min/max buckets for drawdown). start/end (YYYY-MM-DD)
+    zoom into a range of exit dates.
+    """
+    def _artifact():
+        from services.trade_query import run_artifact_id, run_trades_frame
+        run_trades_frame(run_id)          # materialize once
+        return run_artifact_id(run_id)
+    series = await _equity_response(_artifact, points, start, end)
+    return {"run_id": run_id, **series}
+
 
+@router.get("/algotest/jobs/{job_id}/equity")
+async def get_algotest_job_equity(
+    job_id: str, points: int = 1000, start: Optional[str] = None, end: Optional[str] = None,
+):
+    """Downsampled Cumulative / %DD series of a completed Celery job."""
+    artifact_id = _job_artifact_id(job_id)
+    series = await _equity_response(lambda: artifact_id, points, start, end)
+    return {"job_id": job_id, **series}
+
+
+@router.post("/algotest/jobs")
+async def queue_algotest_job(request: dict):
+    """
+    Enqueue an AlgoTest backtest to run asynchronously via Celery.
+    """
+    payload = dict(request or {})
+    await asyncio.to_thread(record_request, payload)
+    key = await asyncio.to_thread(flight_key, payload)
+    job_id = str(uuid.uuid4())
+    owner = await asyncio.to_thread(attach_or_lead, key, job_owner(job_id), _flight_owner_live)
+    if owner is not None:
+        running_job = owner_job_id(owner)
+        if running_job is not None:
+            # Same backtest already queued/running: share its job (status, SSE, result)
+            return {"status": "queued", "job_id": running_job, "coalesced": True}
+        # Held by a synchronous call, which has no job id to share — run separately
+        await asyncio.to_thread(detach_flight, key)
+    # Cost-based routing: short / long / huge queues run under matching memory limits,
+    # preferring a worker that already holds the dataset
+    cost = await asyncio.to_thread(estimate_job_cost, payload)
+    queue = await asyncio.to_thread(route_job, payload, cost)
+    from worker.tasks import run_algotest_job
+    task = run_algotest_job.apply_async(args=[payload], task_id=job_id, queue=queue)
+    return {"status": "queued", "job_id": task.id, "queue": queue, "estimate": cost.as_dict()}
+
+
+def _recalc_source_frame(request: dict) -> "pd.DataFrame":
+    """Trades to re-price: a stored result handle (run_id / job_id) or inline rows."""
+    import pandas as pd
+    from services.trade_query import run_trades_frame
+    from services.trade_table import TradeTable
+
+    if request.get('run_id'):
+        lf = run_trades_frame(str(request['run_id']))
+    elif request.get('job_id'):
+        lf = scan_result_artifact(_job_artifact_id(str(request['job_id'])))
+    else:
+        trades = request.get('trades') or []
+        if not isinstance(trades, list) or not trades:
+            raise HTTPException(status_code=400, detail="No trades provided")
+        return pd.DataFrame(trades)
+    return TradeTable(lf.collect()).to_pandas(parse_dates=False)
+
+
+def _recalculate_process(request: dict, slippage_pct: float, charges_enabled: bool) -> dict:
+    import pandas as pd
+    from services.recalculate import DATE_COLUMNS as RECALC_DATE_COLUMNS, recalculate_trades
+    from services.trade_table import TradeTable
+
+    trades_df = recalculate_trades(_recalc_source_frame(request), slippage_pct, charges_enabled=charges_enabled)
+    meta = {'slippage_pct': slippage_pct, 'charges_enabled': charges_enabled}
     if trades_df.empty:
-        return {
-            'trades': [],
-            'summary': {},
-            'pivot': {"headers": [], "rows": []},
-            'meta': {'slippage_pct': slippage_pct, 'charges_enabled': charges_enabled},
-        }
+        return {'trades': [], 'summary': {}, 'pivot': {"headers": [], "rows": []}, 'meta': meta}
 
-    for col in ['Entry Date', 'Exit Date', 'Leg Exit Date', 'Expiry']:
+    for col in RECALC_DATE_COLUMNS:
         if col in trades_df.columns:
             trades_df[col] = pd.to_datetime(trades_df[col], dayfirst=True, errors='coerce')
 
@@ -539,34 +735,53 @@ async def recalculate_slippage(request: dict):
 
     trades_df, result_summary = compute_analytics(trades_df)
     result_pivot = build_pivot(trades_df, 'Exit Date')
-
-    for col in ['Entry Date', 'Exit Date', 'Leg Exit Date', 'Expiry']:
-        if col in trades_df.columns:
-            trades_df[col] = trades_df[col].apply(
-                lambda v: v.strftime('%d-%m-%Y') if hasattr(v, 'strftime') and not pd.isna(v) else None
-            )
-
-    result_trades = []
-    for row in trades_df.to_dict('records'):
-        for key in ('Cumulative', 'Peak', 'DD', '%DD'):
-            value = row.get(key)
-            if value is not None:
-                try:
-                    numeric = float(value)
-                    if np.isnan(numeric):
-                        row[key] = None
-                except (TypeError, ValueError):
-                    row[key] = None
-        result_trades.append(row)
-
     return {
-        'trades': result_trades,
+        'trades': TradeTable.from_frame(trades_df).to_records(),
         'summary': result_summary,
         'pivot': result_pivot,
-        'meta': {'slippage_pct': slippage_pct, 'charges_enabled': charges_enabled},
+        'meta': meta,
     }
 
 
+@router.post("/backtest/recalculate-slippage")
+async def recalculate_slippage(request: dict):
+    """
+    Re-price finished trades for a new slippage / charges setting.
+
+    Trades come inline ('trades') or from a stored result ('run_id' /
+    'job_id'). With 'slippage_values' (a list) the response is a sensitivity
+    table of summary metrics per slippage value instead of re-priced trades.
+    """
+    charges_enabled = bool(request.get('charges_enabled', False))
+
+    slippage_values = request.get('slippage_values')
+    if slippage_values is not None:
+        try:
+            values = [float(v) for v in slippage_values]
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid slippage_values")
+        if not values or len(values) > 50:
+            raise HTTPException(status_code=400, detail="slippage_values must have 1..50 entries")
+        from services.recalculate import slippage_sensitivity
+        try:
+            rows = await asyncio.to_thread(
+                lambda: slippage_sensitivity(_recalc_source_frame(request), values, charges_enabled=charges_enabled)
+            )
+        except ArtifactNotFound:
+            raise HTTPException(status_code=404, detail="Result not found or expired")
+        return {'sensitivity': rows, 'meta': {'charges_enabled': charges_enabled}}
+
+    try:
+        slippage_pct = float(request.get('slippage_pct', 0) or 0)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid slippage_pct")
+
+    try:
+        return await asyncio.to_thread(_recalculate_process, request, slippage_pct, charges_enabled)
+    except ArtifactNotFound:
+        raise HTTPException(status_code=404, detail="Result not found or expired")
+
+
 @router.get("/algotest/jobs/{job_id}")
 async def get_algotest_job_status(job_id: str):
     """
@@ -583,13 +798,29 @@ async def get_algotest_job_status(job_id: str):
         info = {"error": "Task metadata corrupted"}
     if state == "PENDING":
         return {"status": "queued"}
-    if state in {"STARTED", "PROCESSING", "RETRY"}:
+    if state == "RETRY":
+        # Deferred by memory admission control; info is the Retry exception
+        return {"status": "running", "meta": {"status": "Waiting for memory"}}
+    if state in {"STARTED", "PROCESSING"}:
         return {"status": "running", "meta": info or {"status": "Running..."}} 
     if state == "SUCCESS":
         result_payload = info or {}
         if result_payload.get("status") == "error":
             return {"status": "failed", "error": result_payload.get("message", "Backtest failed")}
+        if is_artifact_handle(result_payload):
+            # Kept until RESULT_ARTIFACT_TTL — the job may be polled again
+            try:
+                stream = stream_result_artifact(
+                    result_payload["artifact_id"],
+                    prefix=b'{"status":"completed","result":',
+                    suffix=b'}',
+                )
+            except ArtifactNotFound:
+                return {"status": "failed", "error": "Result expired, please re-run the backtest"}
+            return StreamingResponse(stream, media_type="application/json")
         return {"status": "completed", "result": result_payload}
+    if state == "REVOKED":
+        return {"status": "cancelled"}
     if state == "FAILURE":
         error = None
         if isinstance(info, dict):
@@ -598,3 +829,64 @@ async def get_algotest_job_status(job_id: str):
             error = str(info)
         return {"status": "failed", "error": error}
     return {"status": state.lower(), "meta": info}
+
+
+def _job_terminal_state(job_id: str):
+    """{'state': 'completed'|'failed'} once Celery has a final result, else None."""
+    task = celery_app.AsyncResult(job_id)
+    try:
+        state = task.state
+        info = task.result if state in ("SUCCESS", "FAILURE") else None
+    except ValueError:
+        return {"state": "failed", "error": "Task metadata corrupted"}
+    if state == "SUCCESS":
+        if isinstance(info, dict) and info.get("status") == "error":
+            return {"state": "failed", "error": info.get("message", "Backtest failed")}
+        return {"state": "completed"}
+    if state == "FAILURE":
+        return {"state": "failed", "error": str(info)}
+    if state == "REVOKED":
+        return {"state": "cancelled", "partial": False}
+    return None
+
+
+@router.post("/algotest/jobs/{job_id}/cancel")
+async def cancel_algotest_job(job_id: str):
+    """
+    Cancel an AlgoTest job. A queued job is revoked outright; a running job
+    stops at its next expiry / date chunk (its in-flight bulk query is
+    cancelled) and completes with the trades finished so far, flagged
+    meta.cancelled / meta.partial.
+    """
+    # Result-backend reads and the revoke broadcast are blocking I/O: off the loop
+    try:
+        state = await asyncio.to_thread(lambda: celery_app.AsyncResult(job_id).state)
+    except ValueError:
+        state = "FAILURE"
+    if state in ("SUCCESS", "FAILURE", "REVOKED"):
+        return {"job_id": job_id, "status": "finished", "state": state.lower()}
+    if await asyncio.to_thread(detach_flight_job, job_id):
+        # Coalesced job: other clients still wait on it — only this one leaves
+        return {"job_id": job_id, "status": "detached"}
+    queued = state == "PENDING"
+    if queued:
+        await asyncio.to_thread(celery_app.control.revoke, job_id)
+        await asyncio.to_thread(complete_flight_job, job_id, {'status': 'error', 'message': 'Backtest cancelled'})
+    outcome = await asyncio.to_thread(request_cancel, job_id, queued)
+    return {"job_id": job_id, "status": "cancelled" if queued else "cancelling", **outcome}
+
+
+@router.get("/algotest/jobs/{job_id}/events")
+async def stream_algotest_job_events(job_id: str):
+    """
+    Server-Sent Events for a running AlgoTest job:
+    'progress' (stage, entries done/total, running stats), 'trades' (partial
+    batches of closed trades) and a final 'status'. Fetch the full result
+    from /algotest/jobs/{job_id} once 'status' arrives.
+    """
+    return StreamingResponse(
+        # Celery result-backend lookups block: each heartbeat check runs in a thread
+        job_event_stream(job_id, job_state=lambda: asyncio.to_thread(_job_terminal_state, job_id)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
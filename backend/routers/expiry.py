@@ -3,13 +3,10 @@ from pydantic import BaseModel
 from typing import List
 import sys
 import os
-import pandas as pd
 
 # Add the parent directory to the path to import base
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from base import load_expiry
-
 router = APIRouter()
 
 class ExpiryResponse(BaseModel):
@@ -26,6 +23,9 @@ async def get_expiry_dates(
     """
     Get list of expiry dates for a given index and type
     """
+    # base pulls in the whole engine layer — import on first use, not at startup
+    from base import load_expiry
+
     try:
         # Validate type parameter
         if type.lower() not in ["weekly", "monthly"]:
@@ -3,12 +3,20 @@ from pydantic import BaseModel
 from typing import List, Dict, Any
 import sys
 import os
-import pandas as pd
-from database import get_data_source, engine as db_engine
-from repositories.market_data_repository import MarketDataRepository
 
 router = APIRouter()
-_repo = MarketDataRepository(db_engine)
+# The database engine (SQLAlchemy, pandas) is created on first use, not when
+# the API imports this router
+_repo = None
+
+
+def _get_repo():
+    global _repo
+    if _repo is None:
+        from database import engine as db_engine
+        from repositories.market_data_repository import MarketDataRepository
+        _repo = MarketDataRepository(db_engine)
+    return _repo
 
 class StrategyOptions(BaseModel):
     instrument_types: List[str]
@@ -60,10 +68,12 @@ async def get_date_range(index: str = "NIFTY"):
     Get min/max available dates for a given index
     """
     from datetime import datetime
+    import pandas as pd
+    from database import get_data_source
     
     if get_data_source() == "postgres":
         try:
-            dr = _repo.get_available_date_range()
+            dr = _get_repo().get_available_date_range()
             if dr["min_date"] and dr["max_date"]:
                 return DateRangeResponse(
                     min_date=pd.to_datetime(dr["min_date"]).strftime('%Y-%m-%d'),
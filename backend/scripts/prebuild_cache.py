@@ -1,95 +1,162 @@
 """
 Startup cache pre-warmer.
 Run automatically at container startup via main.py lifespan.
-Loads the most recent N years of option data + STR segments into memory
-so the first backtest request hits a warm cache.
+Warms the datasets chosen by services/warmup_planner.py (config, then recent
+request history, highest value first within the memory budget) + STR
+segments, so the first backtest requests hit a warm cache. The calendar and
+bulk data are memory-mapped from their snapshots (services/dataset_snapshot.py)
+when one exists for the current data version, so a restart only pays the DB
+cost after an import. Heavy imports and the engine process pool start here
+too, off the import path; the pool forks once the top dataset is resident.
+Progress is reported by /health/ready.
 """
 import os
 import logging
 import threading
-from datetime import datetime, timedelta
+import uuid
+from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
-_WARM_YEARS = int(os.environ.get("PREBUILD_WARM_YEARS", "2"))
-_WARM_SYMBOL = os.environ.get("PREBUILD_SYMBOL", "NIFTY")
+# ANALYZE option_data (migration 006) only when this share of rows changed since the last one
+_ANALYZE_MOD_RATIO = float(os.environ.get("WARMUP_ANALYZE_MOD_RATIO", "0.1"))
+
+
+def _option_data_needs_analyze(conn) -> bool:
+    from sqlalchemy import text
+
+    row = conn.execute(text(
+        "SELECT n_live_tup, n_mod_since_analyze, "
+        "       COALESCE(last_analyze, last_autoanalyze) IS NOT NULL "
+        "FROM pg_stat_user_tables WHERE relname = 'option_data'"
+    )).first()
+    if row is None:
+        return False  # table does not exist yet
+    live, modified, analyzed = row
+    return not analyzed or (modified or 0) > _ANALYZE_MOD_RATIO * max(live or 0, 1)
+
+
+def _apply_migration_006():
+    """Migration 006 is a plain ANALYZE — skip it while the statistics are fresh."""
+    from sqlalchemy import text
+    from database import get_engine
+
+    migration_path = os.path.join(
+        os.path.dirname(os.path.dirname(__file__)),
+        "migrations", "006_add_recent_data_index.sql"
+    )
+    if not os.path.exists(migration_path):
+        return "skipped"
+    engine = get_engine()
+    with engine.begin() as conn:
+        if not _option_data_needs_analyze(conn):
+            return "skipped"
+    with open(migration_path) as f:
+        sql = f.read()
+    with engine.begin() as conn:
+        for stmt in sql.split(';'):
+            stmt = stmt.strip()
+            if stmt and not stmt.startswith('--'):
+                try:
+                    conn.execute(text(stmt + ';'))
+                except Exception:
+                    pass
+    logger.info("[WARMUP] Migration 006 applied (option_data analyzed).")
+    return "done"
+
+
+def _precompute(requests):
+    """Queue top strategies as ordinary AlgoTest jobs (cost-routed, affinity-aware)."""
+    from services.dataset_affinity import route_job
+    from services.job_cost import estimate_job_cost
+    from worker.tasks import run_algotest_job
+
+    for payload in requests:
+        payload = dict(payload)
+        queue = route_job(payload, estimate_job_cost(payload))
+        run_algotest_job.apply_async(args=[payload], task_id=str(uuid.uuid4()), queue=queue)
+    return len(requests)
 
 
 def _do_warmup():
-    """Background thread: warm bulk_load + STR + trading calendar caches."""
-    try:
-        logger.info("[WARMUP] Starting background cache warmup...")
+    """Background thread: run the warmup plan, reporting each step to WarmupState."""
+    from services.warmup_planner import WARMUP_PRECOMPUTE_TOP, plan_warmup, warmup_state
 
-        # Step 0: Apply pending migrations (idempotent — safe to run every startup)
+    state = warmup_state()
+    state.start(["preload", "migrations", "trading_calendar", "str_segments", "plan", "engine_pool"])
+
+    def _run(name, fn, **detail):
+        state.step(name, "running", **detail)
         try:
-            import os
-            from sqlalchemy import text
-            from database import get_engine
-            migration_path = os.path.join(
-                os.path.dirname(os.path.dirname(__file__)),
-                "migrations", "006_add_recent_data_index.sql"
-            )
-            if os.path.exists(migration_path):
-                with open(migration_path) as f:
-                    sql = f.read()
-                engine = get_engine()
-                with engine.begin() as conn:
-                    for stmt in sql.split(';'):
-                        stmt = stmt.strip()
-                        if stmt and not stmt.startswith('--'):
-                            try:
-                                conn.execute(text(stmt + ';'))
-                            except Exception:
-                                pass
-                logger.info("[WARMUP] Migration 006 applied (partial index).")
+            result = fn()
+            state.step(name, "skipped" if result == "skipped" else "done")
+            return result
         except Exception as e:
-            logger.warning(f"[WARMUP] Migration 006 failed (non-fatal): {e}")
+            logger.warning(f"[WARMUP] {name} failed (non-fatal): {e}")
+            state.step(name, "failed", error=str(e))
+            return None
 
-        # Step 1: Warm the trading calendar (avoids 3-8s DISTINCT scan)
-        try:
+    try:
+        logger.info("[WARMUP] Starting background cache warmup...")
+
+        # Step -1: Heavy imports (engine layer), deferred from import time so
+        # the API answers liveness immediately
+        from services import engine_pool
+        _run("preload", engine_pool.preload_engine)
+
+        # Step 0: Apply pending migrations (idempotent — ANALYZE only when stale)
+        _run("migrations", _apply_migration_006)
+
+        # Step 1: Warm the trading calendar (snapshot map, else a 3-8s DISTINCT scan)
+        def _calendar():
             from repositories.market_data_repository import MarketDataRepository
             from database import get_engine
-            repo = MarketDataRepository(get_engine())
-            # Load full calendar into class-level cache
-            repo.get_trading_calendar(
+            MarketDataRepository(get_engine()).get_trading_calendar(
                 from_date="2008-01-01",
                 to_date=datetime.now().strftime("%Y-%m-%d")
             )
-            logger.info("[WARMUP] Trading calendar warmed.")
-        except Exception as e:
-            logger.warning(f"[WARMUP] Trading calendar warmup failed: {e}")
+        _run("trading_calendar", _calendar)
 
         # Step 2: Warm STR segments (fast — just CSV/DB read)
-        try:
+        def _str_segments():
             from base import load_super_trend_dates
             load_super_trend_dates()
-            logger.info("[WARMUP] STR segments warmed.")
-        except Exception as e:
-            logger.warning(f"[WARMUP] STR segment warmup failed: {e}")
+        _run("str_segments", _str_segments)
 
-        # Step 3: Warm bulk option data for recent N years
-        # This is the expensive step — runs in background so it
-        # does NOT block the first user request.
-        try:
-            from base import bulk_load_options
-            to_date = datetime.now().strftime("%Y-%m-%d")
-            from_date = (datetime.now() - timedelta(days=_WARM_YEARS * 365)).strftime("%Y-%m-%d")
-            logger.info(
-                f"[WARMUP] Bulk loading {_WARM_SYMBOL} options "
-                f"{from_date} → {to_date} ({_WARM_YEARS} years)..."
-            )
-            result = bulk_load_options(_WARM_SYMBOL, from_date, to_date)
-            logger.info(
-                f"[WARMUP] Bulk load complete: "
-                f"{result.get('options_rows', '?')} option rows, "
-                f"{result.get('spot_rows', '?')} spot rows."
-            )
-        except Exception as e:
-            logger.warning(f"[WARMUP] Bulk option warmup failed: {e}")
+        # Step 3: Warm bulk option data, highest value first. Each load leaves a
+        # snapshot behind; the first dataset is re-attached (mapped) at the end.
+        # The engine pool starts right after the first one, so its children
+        # fork with that dataset resident and attach it for free.
+        plan = _run("plan", plan_warmup) or []
+        logger.info("[WARMUP] Plan: %s", [d.as_dict() for d in plan])
+        from base import bulk_load_options
+        for i, dataset in enumerate(plan):
+            name = f"dataset:{dataset.symbol}:{dataset.from_date}:{dataset.to_date}"
+            state.add_step(name)
+            _run(name, lambda d=dataset: bulk_load_options(d.symbol, d.from_date, d.to_date), **dataset.as_dict())
+            if i == 0:
+                engine_pool.configure((dataset.symbol, dataset.from_date, dataset.to_date))
+                _run("engine_pool", engine_pool.prestart)
+                state.mark_ready()
+        if not plan:
+            _run("engine_pool", engine_pool.prestart)
+        if len(plan) > 1:
+            top = plan[0]
+            state.add_step(f"attach:{top.symbol}")
+            _run(f"attach:{top.symbol}", lambda: bulk_load_options(top.symbol, top.from_date, top.to_date))
+        state.mark_ready()
+
+        # Step 4: Optionally pre-compute results for the most popular strategies
+        if WARMUP_PRECOMPUTE_TOP > 0:
+            from services.warmup_planner import strategies_to_precompute
+            state.add_step("precompute")
+            _run("precompute", lambda: _precompute(strategies_to_precompute()))
 
+        state.finish()
         logger.info("[WARMUP] Background warmup complete.")
 
     except Exception as e:
+        state.finish("failed")
         logger.error(f"[WARMUP] Warmup thread crashed: {e}")
 
 
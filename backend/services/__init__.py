@@ -1,38 +1,45 @@
 """
 Services module for optimized data loading and caching.
+
+Names are resolved on first access (PEP 562), so importing one light service
+(e.g. services.job_cost from the API) does not pull in Polars, the loaders
+and the executors.
 """
 
-from .data_loader import (
-    HighPerformanceLoader, get_loader, reset_loader, pl,
-    bulk_load, bulk_clear, is_bulk_loaded,
-    get_bulk_option_price, get_bulk_spot_price, get_bulk_strikes_for_date,
-    get_bulk_expiry_dates, get_bulk_spot_df, get_bulk_options_df
-)
-from .data_memory_cache import DataMemoryCache, get_memory_cache, clear_memory_cache, get_cache_stats
-from .backtest_cache import BacktestCache, get_backtest_cache, clear_backtest_cache
-from .parallel_executor import ParallelExecutor, run_parallel_backtest
+import importlib
+
+_EXPORTS = {
+    'HighPerformanceLoader': 'data_loader',
+    'get_loader': 'data_loader',
+    'reset_loader': 'data_loader',
+    'pl': 'data_loader',
+    'bulk_load': 'data_loader',
+    'bulk_clear': 'data_loader',
+    'is_bulk_loaded': 'data_loader',
+    'get_bulk_option_price': 'data_loader',
+    'get_bulk_spot_price': 'data_loader',
+    'get_bulk_strikes_for_date': 'data_loader',
+    'get_bulk_expiry_dates': 'data_loader',
+    'get_bulk_spot_df': 'data_loader',
+    'get_bulk_options_df': 'data_loader',
+    'DataMemoryCache': 'data_memory_cache',
+    'get_memory_cache': 'data_memory_cache',
+    'clear_memory_cache': 'data_memory_cache',
+    'get_cache_stats': 'data_memory_cache',
+    'BacktestCache': 'backtest_cache',
+    'get_backtest_cache': 'backtest_cache',
+    'clear_backtest_cache': 'backtest_cache',
+    'ParallelExecutor': 'parallel_executor',
+    'run_parallel_backtest': 'parallel_executor',
+}
+
+__all__ = list(_EXPORTS)
+
 
-__all__ = [
-    'HighPerformanceLoader',
-    'get_loader',
-    'reset_loader',
-    'pl',
-    'bulk_load',
-    'bulk_clear',
-    'is_bulk_loaded',
-    'get_bulk_option_price',
-    'get_bulk_spot_price',
-    'get_bulk_strikes_for_date',
-    'get_bulk_expiry_dates',
-    'get_bulk_spot_df',
-    'get_bulk_options_df',
-    'DataMemoryCache',
-    'get_memory_cache',
-    'clear_memory_cache',
-    'get_cache_stats',
-    'BacktestCache',
-    'get_backtest_cache',
-    'clear_backtest_cache',
-    'ParallelExecutor',
-    'run_parallel_backtest'
-]
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f"{__name__}.{module}"), name)
+    globals()[name] = value
+    return value
@@ -1,7 +1,7 @@
 """Shared helper for running AlgoTest backtests with caching/logging."""
+import logging
 import traceback
 import os
-from concurrent.futures import ProcessPoolExecutor, as_completed
 from typing import Any, Dict
 
 import numpy as np
@@ -13,7 +13,12 @@ from engines.generic_algotest_engine import run_algotest_backtest, get_expiry_da
 from base import bulk_load_options
 from database import reset_engine
 from services.backtest_cache import get_backtest_cache
+from services.data_version import data_version
+from services.job_control import JobCancelled, current_job
+from services.result_store import lookup_stored_result, store_result
+from services.trade_table import TradeTable
 
+logger = logging.getLogger(__name__)
 
 # Maximum years to load at once; keeps chunked bulk loads under ~1.2GB.
 _BULK_LOAD_CHUNK_YEARS = int(os.environ.get("BULK_LOAD_CHUNK_YEARS", "3"))
@@ -132,8 +137,63 @@ def _reindex_trades(trades: list):
     return trades
 
 
-def _run_backtest_chunk(args: tuple) -> list:
-    """Run backtest for a subset of expiry dates. Must be top-level for pickling."""
+def _compute_trade_analytics(all_trades, as_table: bool = False):
+    """
+    Run compute_analytics/build_pivot over already-reindexed leg rows
+    (a TradeTable, or a list of row dicts).
+
+    Returns (rows, summary, pivot); rows is a TradeTable when as_table=True. The engine's additive-from-100
+    Cumulative/Peak/DD/%DD columns are preserved across compute_analytics,
+    which would otherwise rewrite them with its compound formula.
+    """
+    from base import compute_analytics, build_pivot
+    trades_df = TradeTable.coerce(all_trades).to_pandas()
+
+    # Skip aggregation - trades are already properly indexed
+    # The _reindex_trades call ensures unique Trade IDs
+    trades_aggregated = trades_df
+
+    if 'Net P&L' in trades_aggregated.columns:
+        print(f"[DEBUG] Net P&L sample: "
+              f"{trades_aggregated['Net P&L'].head().tolist()}")
+
+    # Preserve engine-computed cumulative before compute_analytics drops and rewrites them
+    _cum_cols = ['Cumulative', 'Peak', 'DD', '%DD']
+    _saved_final = {col: trades_aggregated[col].copy() for col in _cum_cols if col in trades_aggregated.columns}
+
+    trades_aggregated, result_summary = compute_analytics(trades_aggregated)
+    print(f"[DEBUG] Result summary: {result_summary}")
+    result_pivot = build_pivot(trades_aggregated, "Exit Date")
+
+    # Restore correct additive-from-100 series (compute_analytics overwrites these)
+    for col, saved in _saved_final.items():
+        trades_aggregated[col] = saved
+
+    # Export with correct cumulative values restored
+    table = TradeTable.from_frame(trades_aggregated)
+    return (table if as_table else table.to_records()), result_summary, result_pivot
+
+
+def _clear_nan_equity(trades: list) -> list:
+    """Replace NaN Cumulative/Peak/DD/%DD values on Leg 2+ rows with None."""
+    for row in trades:
+        for k in ('Cumulative', 'Peak', 'DD', '%DD'):
+            v = row.get(k)
+            if v is not None:
+                try:
+                    f = float(v)
+                    if f != f:  # NaN check: NaN is the only float where f != f
+                        row[k] = None
+                except (TypeError, ValueError):
+                    row[k] = None
+    return trades
+
+
+def _run_backtest_chunk(args: tuple):
+    """
+    Run backtest for a subset of expiry dates. Must be top-level for pickling.
+    Returns a Polars frame (pickles as Arrow buffers, not per-row objects).
+    """
     params, chunk_dates = args
     from base import bulk_load_options
     from engines.generic_algotest_engine import run_algotest_backtest
@@ -147,33 +207,47 @@ def _run_backtest_chunk(args: tuple) -> list:
         chunk_params = dict(params)
         chunk_params['_expiry_chunk'] = chunk_dates
         df, _, _ = run_algotest_backtest(chunk_params)
-        return df.to_dict('records') if df is not None and not df.empty else []
+        return TradeTable.from_frame(df).frame
     except Exception:
-        return []
+        return None
 
 
-def execute_algotest_job(request: Dict[str, Any]) -> Dict[str, Any]:
+def execute_algotest_job(request: Dict[str, Any], as_table: bool = False) -> Dict[str, Any]:
+    """
+    Run a full AlgoTest job. With as_table=True 'trades' is returned as a
+    TradeTable (for write-once Arrow artifacts) instead of row dicts.
+    """
     payload = _normalize_request(request)
     index = payload['index']
     from_date = payload.get('from_date')
     to_date = payload.get('to_date')
 
-    redis_cache = None
-    use_cache = False  # DEBUG: Disabled cache to trace issues
-    cache_key = None
+    no_cache = bool(payload.pop('no_cache', False))
+    # Pin the data version for lookup, cache and store of this run
+    payload['_data_version'] = data_version(index)
+    job = current_job()  # set when running as a worker task (progress / cancellation)
 
-    try:
-        redis_cache = get_backtest_cache()
-        # Cache disabled for debugging
-        if False and redis_cache.is_available():
-            use_cache = True
-            cache_key = redis_cache.generate_key(symbol=index, from_date=from_date, to_date=to_date, strategy_config=payload)
-            cached = redis_cache.get(cache_key)
+    # Result cache (memory → Redis → disk), then the durable store: repeat
+    # requests never reach the engine. Both are keyed by the canonical request
+    # (engines.strategy_plan.canonical_request).
+    result_cache = None
+    cache_key = None
+    if not no_cache:
+        try:
+            result_cache = get_backtest_cache()
+            cache_key = result_cache.generate_key(symbol=index, from_date=from_date, to_date=to_date, strategy_config=payload)
+            cached = result_cache.get(cache_key)
             if cached:
-                sanitized = {k: v for k, v in cached.items() if k != 'trades_df'}
-                return {**sanitized, 'cached': True}
-    except Exception:
-        use_cache = False
+                if not as_table:
+                    cached['trades'] = cached['trades'].to_records()
+                return {**cached, 'status': 'success', 'cached': True}
+        except Exception:
+            cache_key = None
+
+        stored = lookup_stored_result(payload, as_table=as_table)
+        if stored is not None:
+            return stored
+    stored_request = dict(payload)  # payload dates may be narrowed below (STR filter)
 
     try:
         # If STR filter is enabled, shrink the load range to only the dates covered
@@ -220,7 +294,7 @@ def execute_algotest_job(request: Dict[str, Any]) -> Dict[str, Any]:
             print(f"[DEBUG] First expiry: {expiry_df.iloc[0]['Current Expiry']}")
             print(f"[DEBUG] Last expiry: {expiry_df.iloc[-1]['Current Expiry']}")
 
-        all_trades = []
+        table = TradeTable()
 
         if n_workers > 1 and expiry_df is not None and not expiry_df.empty and len(expiry_df) >= n_workers * 2:
             bulk_load_options(index, effective_from, effective_to)
@@ -233,11 +307,17 @@ def execute_algotest_job(request: Dict[str, Any]) -> Dict[str, Any]:
                 end = start + chunk_size if i < n_workers - 1 else len(expiry_dates)
                 chunks.append((dict(payload), expiry_dates[start:end]))
 
-            with ProcessPoolExecutor(max_workers=n_workers) as executor:
-                results = list(executor.map(_run_backtest_chunk, chunks))
-                for chunk_trades in results:
-                    if chunk_trades:
-                        all_trades.extend(chunk_trades)
+            # Long-lived pre-warmed pool: children already hold the engine and the dataset
+            from services.engine_pool import map_chunks
+            results = map_chunks(_run_backtest_chunk, chunks)
+            # Each worker numbers its trades from 1 — offset like the date-chunk path
+            chunk_tables = []
+            _trade_id_offset = 0
+            for frame in results:
+                chunk_table = TradeTable.from_frame(frame)
+                chunk_tables.append(chunk_table.offset_trade_ids(_trade_id_offset))
+                _trade_id_offset += chunk_table.max_trade_id()
+            table = TradeTable.concat(chunk_tables)
             engine_summary = None
             engine_pivot = None
             if engine_summary is None:
@@ -252,46 +332,25 @@ def execute_algotest_job(request: Dict[str, Any]) -> Dict[str, Any]:
                 bulk_load_options(index, effective_from, effective_to)
                 print(f"[DEBUG] Calling run_algotest_backtest with from={effective_from}, to={effective_to}")
                 trades_df, engine_summary, engine_pivot = run_algotest_backtest(payload)
-                print(f"[DEBUG] Backtest returned: type={type(trades_df)}, len={len(trades_df) if trades_df is not None else 'None'}, empty={trades_df.empty if trades_df is not None else 'N/A'}")
-                all_trades = trades_df.to_dict('records') if trades_df is not None and not trades_df.empty else []
-                print(f"[DEBUG] Single chunk: trades_df={type(trades_df)}, len={len(trades_df) if trades_df is not None else 'None'}")
-                print(f"[DEBUG] all_trades from single chunk: {len(all_trades)}")
+                table = TradeTable.from_frame(trades_df)
+                logger.debug("[ALGOTEST] Single chunk: %d leg rows", len(table))
                 if engine_summary is None:
                     engine_summary = {}
                 if engine_pivot is None:
                     engine_pivot = {"headers": [], "rows": []}
-                
-                # Compute analytics for single chunk to add Cumulative/Peak/DD/%DD
-                if all_trades and len(all_trades) > 0:
-                    try:
-                        from base import compute_analytics, build_pivot
-                        trades_agg = pd.DataFrame(all_trades)
-                        for col in ['Entry Date', 'Exit Date']:
-                            if col in trades_agg.columns:
-                                trades_agg[col] = pd.to_datetime(trades_agg[col], dayfirst=True, errors='coerce')
-
-                        # Preserve engine-computed cumulative series before compute_analytics overwrites them
-                        _cum_cols = ['Cumulative', 'Peak', 'DD', '%DD']
-                        _saved_agg = {col: trades_agg[col].copy() for col in _cum_cols if col in trades_agg.columns}
-
-                        trades_agg, result_summary = compute_analytics(trades_agg)
-                        result_pivot = build_pivot(trades_agg, "Exit Date")
-
-                        # Restore correct additive-from-100 series
-                        for col, saved in _saved_agg.items():
-                            trades_agg[col] = saved
-
-                        all_trades = _convert_numpy(_format_dates(trades_agg.to_dict('records')))
-                        engine_summary = result_summary
-                        engine_pivot = result_pivot
-                    except Exception as e:
-                        print(f"[WARN] compute_analytics for single chunk failed: {e}")
             else:
-                all_chunk_trades = []
+                chunk_tables = []
                 engine_summary = None
                 engine_pivot = None
                 _trade_id_offset = 0  # cumulative offset so Trade IDs never collide across chunks
-                for chunk_from, chunk_to in _date_chunks(effective_from, effective_to, _BULK_LOAD_CHUNK_YEARS):
+                date_chunks = list(_date_chunks(effective_from, effective_to, _BULK_LOAD_CHUNK_YEARS))
+                for chunk_no, (chunk_from, chunk_to) in enumerate(date_chunks, 1):
+                    if job is not None:
+                        if job.cancelled():
+                            logger.info("[CANCEL] Job %s stopping before chunk %d/%d",
+                                        job.job_id, chunk_no, len(date_chunks))
+                            break
+                        job.set_stage(f"Chunk {chunk_no}/{len(date_chunks)} ({chunk_from} → {chunk_to})")
                     try:
                         bulk_load_options(index, chunk_from, chunk_to)
                         chunk_payload = dict(payload)
@@ -304,16 +363,11 @@ def execute_algotest_job(request: Dict[str, Any]) -> Dict[str, Any]:
                             print(f"[DEBUG] c_df columns: {list(c_df.columns)[:5]}")
                             print(f"[DEBUG] c_df first row: {c_df.iloc[0].to_dict() if len(c_df) > 0 else 'empty'}")
                         if chunk_count > 0:
-                            chunk_records = c_df.to_dict('records')
+                            chunk_table = TradeTable.from_frame(c_df)
                             # Offset Trade IDs so they never collide with previous chunks
-                            chunk_max_id = 0
-                            for row in chunk_records:
-                                orig = int(str(row.get('Trade', 0) or 0))
-                                row['Trade'] = orig + _trade_id_offset
-                                if orig > chunk_max_id:
-                                    chunk_max_id = orig
+                            chunk_max_id = chunk_table.max_trade_id()
+                            chunk_tables.append(chunk_table.offset_trade_ids(_trade_id_offset))
                             _trade_id_offset += chunk_max_id
-                            all_chunk_trades.extend(chunk_records)
                             if c_summary:
                                 engine_summary = c_summary
                             if c_pivot:
@@ -324,15 +378,16 @@ def execute_algotest_job(request: Dict[str, Any]) -> Dict[str, Any]:
                         print(f"[CHUNK ERROR] {chunk_from} → {chunk_to}: {chunk_err}")
                         traceback.print_exc()
                         continue
-                all_trades = all_chunk_trades
-                print(f"[DEBUG] Total all_chunk_trades collected: {len(all_chunk_trades)}")
-                if not all_trades:
+                table = TradeTable.concat(chunk_tables)
+                logger.debug("[ALGOTEST] Total chunk leg rows collected: %d", len(table))
+                if not len(table):
                     engine_summary = None
                     engine_pivot = None
 
         # Reindex trades so multi-chunk runs produce unique trade numbers
-        if all_trades:
-            _reindex_trades(all_trades)
+        table = table.reindex_trades()
+        cancelled = job is not None and job.cancelled(refresh=True)
+        all_trades = []
 
         # Re-compute summary and pivot from the collected trades
         # so the frontend receives full analytics, not just raw trades.
@@ -341,49 +396,16 @@ def execute_algotest_job(request: Dict[str, Any]) -> Dict[str, Any]:
         
         # Always recompute analytics from combined trades when we have multiple chunks
         # (engine_summary only reflects the last chunk's trades)
-        if all_trades and len(all_trades) > 0:
+        if len(table):
             try:
-                from base import compute_analytics, build_pivot
-                trades_df = pd.DataFrame(all_trades)
-
-                # Restore datetime columns before aggregation
-                for col in ['Entry Date', 'Exit Date']:
-                    if col in trades_df.columns:
-                        trades_df[col] = pd.to_datetime(
-                            trades_df[col], dayfirst=True, errors='coerce'
-                        )
-
-                # Skip aggregation - trades are already properly indexed
-                # The _reindex_trades call above ensures unique Trade IDs
-                trades_aggregated = trades_df
-
-                if 'Net P&L' in trades_aggregated.columns:
-                    print(f"[DEBUG] Net P&L sample: "
-                          f"{trades_aggregated['Net P&L'].head().tolist()}")
-
-                # Preserve engine-computed cumulative before compute_analytics drops and rewrites them
-                _cum_cols = ['Cumulative', 'Peak', 'DD', '%DD']
-                _saved_final = {col: trades_aggregated[col].copy() for col in _cum_cols if col in trades_aggregated.columns}
-
-                trades_aggregated, result_summary = compute_analytics(trades_aggregated)
-                print(f"[DEBUG] Result summary: {result_summary}")
-                result_pivot = build_pivot(trades_aggregated, "Exit Date")
-
-                # Restore correct additive-from-100 series (compute_analytics overwrites these)
-                for col, saved in _saved_final.items():
-                    trades_aggregated[col] = saved
-
-                # Export with correct cumulative values restored
-                all_trades = _convert_numpy(
-                    _format_dates(trades_aggregated.to_dict('records'))
-                )
-
+                all_trades, result_summary, result_pivot = _compute_trade_analytics(table, as_table=as_table)
             except Exception as e:
                 print(f"[ERROR] compute_analytics failed: {e}")
                 traceback.print_exc()
                 result_summary = {}
+                all_trades = table if as_table else table.to_records()
                 try:
-                    trades_df = pd.DataFrame(all_trades)
+                    trades_df = table.to_pandas()
                     if ('Trade' in trades_df.columns and
                             trades_df['Trade'].nunique() < len(trades_df)):
                         fallback_df = trades_df.groupby(
@@ -458,22 +480,13 @@ def execute_algotest_job(request: Dict[str, Any]) -> Dict[str, Any]:
                         print(f"[DEBUG] Fallback summary: {result_summary}")
                 except Exception as fallback_error:
                     print(f"[ERROR] Fallback summary failed: {fallback_error}")
-        else:
-            all_trades = _convert_numpy(_format_dates(all_trades))
 
         # Ensure missing Cumulative/Peak/DD/%DD on Leg 2+ rows are explicit None (→ JSON null).
         # float NaN from pandas survives _convert_numpy and causes parseFloat(NaN) in JS,
         # which the ?? 100.0 fallback cannot catch (NaN is not null/undefined).
-        for row in all_trades:
-            for k in ('Cumulative', 'Peak', 'DD', '%DD'):
-                v = row.get(k)
-                if v is not None:
-                    try:
-                        f = float(v)
-                        if f != f:  # NaN check: NaN is the only float where f != f
-                            row[k] = None
-                    except (TypeError, ValueError):
-                        row[k] = None
+        # TradeTable exports already map NaN → null.
+        if not isinstance(all_trades, TradeTable):
+            _clear_nan_equity(all_trades)
 
         import json
 
@@ -510,7 +523,7 @@ def execute_algotest_job(request: Dict[str, Any]) -> Dict[str, Any]:
         
         result_payload = {
             'status': 'success',
-            'trades': _make_json_safe(all_trades),
+            'trades': all_trades,  # TradeTable, or its records (already JSON-native)
             'summary': _make_json_safe(result_summary),
             'pivot': _make_json_safe(result_pivot),
             'meta': _make_json_safe({
@@ -528,19 +541,41 @@ def execute_algotest_job(request: Dict[str, Any]) -> Dict[str, Any]:
             }),
             'cached': False,
         }
+        if cancelled:
+            # Partial result: shown to the user, never stored or cached
+            result_payload['meta'].update({'cancelled': True, 'partial': True})
+            return result_payload
         
-        import logging
-        logger = logging.getLogger(__name__)
         logger.warning(f"[SUMMARY_DEBUG] result_summary has {len(result_summary)} keys: {list(result_summary.keys())}")
         logger.warning(f"[SUMMARY_DEBUG] total_pnl value: {result_summary.get('total_pnl')}")
         logger.warning(f"[SUMMARY_DEBUG] cagr_options value: {result_summary.get('cagr_options')}")
         
         print(f"[DEBUG] After JSON safe: payload.summary={result_payload.get('summary')}")
 
-        if use_cache and redis_cache and cache_key:
-            redis_cache.set(cache_key, result_payload)
+        if not no_cache:
+            store_result(stored_request, result_payload)
+
+        if cache_key:
+            # Tier admission (entry size limits) is the cache's call
+            result_cache.set(cache_key, result_payload)
 
         return result_payload
+    except JobCancelled:
+        # Cancelled before any trade was produced (e.g. during the bulk load)
+        return {
+            'status': 'success',
+            'trades': TradeTable() if as_table else [],
+            'summary': {},
+            'pivot': {"headers": [], "rows": []},
+            'meta': {
+                'index': index,
+                'from_date': from_date,
+                'to_date': to_date,
+                'cancelled': True,
+                'partial': True,
+            },
+            'cached': False,
+        }
     except OperationalError:
         traceback.print_exc()
         reset_engine()
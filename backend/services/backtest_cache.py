@@ -1,19 +1,28 @@
 """
-Redis Result Cache for Backtests
+Tiered Result Cache for Backtests
 
 PHASE 7: Redis Result Cache
 
 Features:
-- Cache backtest results in Redis
-- Key format: backtest:{symbol}:{start_date}:{end_date}:{strategy_hash}
-- 24 hour expiration
-- JSON serialization
+- Three tiers behind one get/set:
+    L1  in-process LRU, bounded in bytes, holding decoded results (µs hits)
+    L2  Redis, compressed columnar payloads (Arrow IPC + zstd, JSON header)
+    L3  local disk (shared results volume) for results too big for Redis
+- Read-through: Redis / disk hits are promoted into process memory
+- Write-back: L1 is filled at once; encoding and the Redis / disk writes run
+  on a background thread, off the request path
+- Admission control: per-tier entry size limits, so one 18-year result
+  cannot flush Redis or the process cache
+- Per-tier hit / miss / latency / size metrics (get_stats)
+- Key format: backtest:{version}:{symbol}:d{data_version}:{start_date}:{end_date}:{strategy_fingerprint}
+- Engine changes (version) and imports for the symbol (data_version) change
+  the key, so entries never go stale; the 7 day expiry only reclaims memory
 
 Usage:
     from services.backtest_cache import BacktestCache, get_backtest_cache
-    
+
     cache = get_backtest_cache()
-    
+
     # Generate cache key
     key = cache.generate_key(
         symbol="NIFTY",
@@ -21,27 +30,35 @@ Usage:
         to_date="2025-12-31",
         strategy_config={"legs": [...]}
     )
-    
-    # Check cache
+
+    # Check cache ('trades' comes back as a TradeTable)
     result = cache.get(key)
-    
+
     if result is None:
         # Run backtest
         result = run_backtest(...)
-        
+
         # Cache result
         cache.set(key, result)
 """
 
 import os
-import json
+import io
+import time
+import struct
 import hashlib
 import logging
-from typing import Optional, Dict, Any
-from datetime import datetime, timedelta
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional, Dict, Any, Tuple
 
+import orjson
+import polars as pl
 import redis
-import pandas as pd
+
+from services.trade_table import TradeTable
 
 logger = logging.getLogger(__name__)
 
@@ -71,20 +88,241 @@ REDIS_HOST = os.getenv("REDIS_HOST", "redis")
 REDIS_PORT = int(os.getenv("REDIS_PORT", "6379"))
 REDIS_DB = int(os.getenv("REDIS_DB", "0"))
 REDIS_PASSWORD = os.getenv("REDIS_PASSWORD", None)
-CACHE_TTL_SECONDS = int(os.getenv("BACKTEST_CACHE_TTL", "86400"))  # 24 hours
+CACHE_TTL_SECONDS = int(os.getenv("BACKTEST_CACHE_TTL", str(7 * 86400)))  # 7 days
+
+_MB = 1024 * 1024
+RESULT_CACHE_MEMORY_MB = int(os.getenv("RESULT_CACHE_MEMORY_MB", "128"))
+RESULT_CACHE_MEMORY_MAX_ENTRY_MB = int(os.getenv("RESULT_CACHE_MEMORY_MAX_ENTRY_MB", "16"))
+# Compressed size; larger entries skip Redis (maxmemory is 500mb) and go to disk
+RESULT_CACHE_REDIS_MAX_ENTRY_MB = int(os.getenv("RESULT_CACHE_REDIS_MAX_ENTRY_MB", "4"))
+RESULT_CACHE_DIR = Path(os.getenv("RESULT_CACHE_DIR", "/tmp/algotest_results/cache"))
+RESULT_CACHE_DISK_MB = int(os.getenv("RESULT_CACHE_DISK_MB", "4096"))
+RESULT_CACHE_DISK_MAX_ENTRY_MB = int(os.getenv("RESULT_CACHE_DISK_MAX_ENTRY_MB", "512"))
+RESULT_CACHE_WRITE_BACK = os.getenv("RESULT_CACHE_WRITE_BACK", "1") == "1"
+
+TIERS = ('memory', 'redis', 'disk')
+
+# Payload: magic, header length, JSON header, Arrow IPC (zstd) trades
+_MAGIC = b'BTC1'
+_HEADER_LEN = struct.Struct('>I')
+_JSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+# ── Payload encoding ──────────────────────────────────────────────────────────
+
+def _split_result(result: Dict[str, Any]) -> Tuple[Dict[str, Any], TradeTable]:
+    trades = result.get('trades_df') if result.get('trades') is None else result.get('trades')
+    header = {k: v for k, v in result.items() if k not in ('trades', 'trades_df', 'cached')}
+    return header, TradeTable.coerce(trades)
+
+
+def encode_result(result: Dict[str, Any]) -> bytes:
+    """Compressed columnar payload for the Redis / disk tiers."""
+    header, table = _split_result(result)
+    head = orjson.dumps(header, option=_JSON_OPTIONS, default=str)
+    body = b''
+    if len(table):
+        buf = io.BytesIO()
+        table.export_frame().write_ipc(buf, compression='zstd')
+        body = buf.getvalue()
+    return _MAGIC + _HEADER_LEN.pack(len(head)) + head + body
+
+
+def decode_result(data: bytes) -> Dict[str, Any]:
+    """Inverse of encode_result; 'trades' is a TradeTable."""
+    if data[:4] != _MAGIC:
+        raise ValueError("not a result cache payload")
+    (head_len,) = _HEADER_LEN.unpack_from(data, 4)
+    start = 4 + _HEADER_LEN.size
+    result = orjson.loads(data[start:start + head_len])
+    body = data[start + head_len:]
+    result['trades'] = TradeTable(pl.read_ipc(io.BytesIO(body))) if body else TradeTable()
+    return result
+
+
+def _detached(entry: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy handed to callers: they may annotate meta / summary; the trades table is immutable."""
+    return {k: (dict(v) if isinstance(v, dict) else v) for k, v in entry.items()}
+
+
+def _resident_size(entry: Dict[str, Any]) -> int:
+    header, table = _split_result(entry)
+    size = len(orjson.dumps(header, option=_JSON_OPTIONS, default=str))
+    if len(table):
+        size += int(table.frame.estimated_size())
+    return size
+
+
+# ── Tiers ─────────────────────────────────────────────────────────────────────
+
+class _TierStats:
+    __slots__ = ('hits', 'misses', 'sets', 'rejected', 'hit_seconds', 'errors')
+
+    def __init__(self):
+        self.hits = self.misses = self.sets = self.rejected = self.errors = 0
+        self.hit_seconds = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': f"{(self.hits / lookups * 100) if lookups else 0:.1f}%",
+            'avg_hit_ms': round(self.hit_seconds / self.hits * 1000, 3) if self.hits else None,
+            'sets': self.sets,
+            'rejected': self.rejected,
+            'errors': self.errors,
+        }
+
+
+class _MemoryTier:
+    """Byte-bounded LRU of decoded results, private to this process."""
+
+    def __init__(self, max_bytes: int, max_entry_bytes: int):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self._entries: 'OrderedDict[str, Tuple[Dict[str, Any], int]]' = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            self._entries.move_to_end(key)
+            return _detached(item[0])
+
+    def put(self, key: str, entry: Dict[str, Any], size: int) -> bool:
+        if size > self.max_entry_bytes or size > self.max_bytes:
+            return False
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (entry, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+        return True
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def usage(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._bytes, 'max_bytes': self.max_bytes}
+
+
+class _DiskTier:
+    """Payload files on the shared results volume, oldest-first eviction."""
+
+    def __init__(self, directory: Path, max_bytes: int, max_entry_bytes: int, ttl: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.ttl = ttl
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{hashlib.sha256(key.encode()).hexdigest()[:32]}.btc"
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            if time.time() - path.stat().st_mtime > self.ttl:
+                path.unlink()
+                return None
+            data = path.read_bytes()
+            os.utime(path)  # LRU order for eviction
+            return data
+        except FileNotFoundError:
+            return None
+
+    def put(self, key: str, data: bytes) -> bool:
+        if len(data) > self.max_entry_bytes:
+            return False
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._path(key)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+        self._evict()
+        return True
+
+    def _evict(self) -> None:
+        files = []
+        total = 0
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.btc'):
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                files.append((st.st_mtime, st.st_size, entry.path))
+                total += st.st_size
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+                total -= size
+            except OSError:
+                pass
+
+    def delete(self, key: str) -> None:
+        try:
+            self._path(key).unlink()
+        except FileNotFoundError:
+            pass
+
+    def clear(self) -> int:
+        removed = 0
+        try:
+            entries = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            return 0
+        for entry in entries:
+            if entry.name.endswith('.btc'):
+                try:
+                    os.unlink(entry.path)
+                    removed += 1
+                except OSError:
+                    pass
+        return removed
+
+    def usage(self) -> Dict[str, Any]:
+        entries = 0
+        total = 0
+        try:
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith('.btc'):
+                    entries += 1
+                    total += entry.stat().st_size
+        except (FileNotFoundError, OSError):
+            pass
+        return {'entries': entries, 'bytes': total, 'max_bytes': self.max_bytes}
 
 
 class BacktestCache:
     """
-    Redis-based cache for backtest results.
-    
+    Tiered cache for backtest results (process memory → Redis → disk).
+
     Features:
     - Automatic key generation from parameters
-    - JSON serialization of results
-    - 24 hour expiration
-    - Hit/miss tracking
+    - Compressed columnar payloads below L1
+    - Admission control and write-back per tier
+    - Hit/miss/latency tracking per tier
     """
-    
+
     def __init__(
         self,
         host: str = REDIS_HOST,
@@ -94,16 +332,19 @@ class BacktestCache:
         ttl: int = CACHE_TTL_SECONDS
     ):
         self._ttl = ttl
-        self._hits = 0
-        self._misses = 0
-        
+        self._stats = {tier: _TierStats() for tier in TIERS}
+        self._memory = _MemoryTier(RESULT_CACHE_MEMORY_MB * _MB, RESULT_CACHE_MEMORY_MAX_ENTRY_MB * _MB)
+        self._disk = _DiskTier(RESULT_CACHE_DIR, RESULT_CACHE_DISK_MB * _MB,
+                               RESULT_CACHE_DISK_MAX_ENTRY_MB * _MB, ttl)
+        self._redis_max_entry = RESULT_CACHE_REDIS_MAX_ENTRY_MB * _MB
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="result-cache")
+
         try:
             self._redis = redis.Redis(
                 host=host,
                 port=port,
                 db=db,
                 password=password,
-                decode_responses=True,
                 socket_connect_timeout=5,
                 socket_timeout=5
             )
@@ -114,51 +355,8 @@ class BacktestCache:
         except Exception as e:
             self._redis = None
             self._available = False
-            logger.warning(f"[REDIS] Not available: {e}")
-    
-    def _serialize_result(self, result: Dict[str, Any]) -> str:
-        """Serialize backtest result to JSON."""
-        serialized = {}
-
-        trades_data = None
-        if "trades_df" in result and result["trades_df"] is not None:
-            trades_data = result["trades_df"].to_dict(orient="records")
-        elif "trades" in result and result["trades"] is not None:
-            trades_data = result["trades"]
-
-        if trades_data is not None:
-            serialized["trades"] = trades_data
-
-        if "summary" in result:
-            serialized["summary"] = result["summary"]
-
-        if "pivot" in result:
-            serialized["pivot"] = result["pivot"]
-
-        return json.dumps(serialized, default=str)
-    
-    def _deserialize_result(self, data: str) -> Optional[Dict[str, Any]]:
-        """Deserialize backtest result from JSON."""
-        try:
-            parsed = json.loads(data)
-            result = {}
-            
-            if "trades" in parsed:
-                trades = parsed["trades"]
-                result["trades"] = trades
-                result["trades_df"] = pd.DataFrame(trades)
-            
-            if "summary" in parsed:
-                result["summary"] = parsed["summary"]
-            
-            if "pivot" in parsed:
-                result["pivot"] = parsed["pivot"]
-            
-            return result
-        except Exception as e:
-            logger.error(f"[REDIS] Deserialization error: {e}")
-            return None
-    
+            logger.warning(f"[REDIS] Not available, result cache uses memory/disk only: {e}")
+
     def generate_key(
         self,
         symbol: str,
@@ -168,67 +366,126 @@ class BacktestCache:
     ) -> str:
         """
         Generate collision-resistant cache key.
-        Uses full SHA256 of ALL params combined.
-        Any change to any parameter = different key = fresh calculation.
+        Hashes the canonical request (engines.strategy_plan.canonical_request):
+        alias spellings, default-valued keys and settings of disabled features
+        do not change the key; any semantic change does. The symbol's data
+        version is part of the key (pinned by a '_data_version' hint if given).
         """
-        def normalize_date(d: Any) -> str:
-            if not d:
-                return ''
-            d = str(d).strip()
-            for fmt in ['%d/%m/%Y', '%Y-%m-%d', '%d-%m-%Y', '%Y/%m/%d']:
-                try:
-                    from datetime import datetime
-                    return datetime.strptime(d, fmt).strftime('%Y-%m-%d')
-                except ValueError:
-                    continue
-            return d
+        from engines.strategy_plan import canonical_request, strategy_fingerprint
+        from services.data_version import data_version
 
-        from_date_norm = normalize_date(from_date)
-        to_date_norm = normalize_date(to_date)
+        config = dict(strategy_config or {})
+        config['index'] = symbol or config.get('index')
+        config['from_date'] = from_date or config.get('from_date') or config.get('date_from')
+        config['to_date'] = to_date or config.get('to_date') or config.get('date_to')
+        canonical = canonical_request(config)
+        full_hash = strategy_fingerprint(canonical)
+        version = config.get('_data_version')
+        if version is None:
+            version = data_version(canonical['index'])
 
-        key_payload = {
-            'symbol': symbol.upper() if symbol else '',
-            'from_date': from_date_norm,
-            'to_date': to_date_norm,
-            'config': strategy_config or {}
-        }
+        return f"backtest:{CACHE_VERSION}:{canonical['index']}:d{version}:{canonical['from_date'] or ''}:{canonical['to_date'] or ''}:{full_hash}"
+
+    # ── Read-through ──────────────────────────────────────────────────────────
+
+    def _hit(self, tier: str, started: float) -> None:
+        stats = self._stats[tier]
+        stats.hits += 1
+        stats.hit_seconds += time.perf_counter() - started
+
+    def _redis_get(self, key: str) -> Optional[bytes]:
+        if not self._available:
+            return None
+        try:
+            return self._redis.get(key)
+        except Exception as e:
+            self._stats['redis'].errors += 1
+            logger.error(f"[REDIS] Get error: {e}")
+            return None
 
-        if isinstance(key_payload['config'], dict):
-            config_copy = dict(key_payload['config'])
-            for field in ['no_cache', 'request_id', 'timestamp', 'user_id']:
-                config_copy.pop(field, None)
-            key_payload['config'] = config_copy
+    def _redis_put(self, key: str, data: bytes, ttl: int) -> bool:
+        if not self._available:
+            return False
+        if len(data) > self._redis_max_entry:
+            self._stats['redis'].rejected += 1
+            return False
+        try:
+            self._redis.setex(key, ttl, data)
+            self._stats['redis'].sets += 1
+            return True
+        except Exception as e:
+            self._stats['redis'].errors += 1
+            logger.error(f"[REDIS] Set error: {e}")
+            return False
 
-        key_str = json.dumps(key_payload, sort_keys=True, default=str)
-        full_hash = hashlib.sha256(key_str.encode()).hexdigest()
+    def _memory_put(self, key: str, entry: Dict[str, Any]) -> None:
+        if self._memory.put(key, entry, _resident_size(entry)):
+            self._stats['memory'].sets += 1
+        else:
+            self._stats['memory'].rejected += 1
 
-        return f"backtest:{CACHE_VERSION}:{symbol.upper() if symbol else ''}:{from_date_norm}:{to_date_norm}:{full_hash}"
-    
     def get(self, key: str) -> Optional[Dict[str, Any]]:
         """
-        Get cached result.
-        
+        Get cached result ('trades' as a TradeTable), checking memory, Redis,
+        then disk. Lower-tier hits are promoted upwards.
+
         Returns None if not in cache.
         """
-        if not self._available:
-            return None
-        
+        started = time.perf_counter()
+        entry = self._memory.get(key)
+        if entry is not None:
+            self._hit('memory', started)
+            return entry
+        self._stats['memory'].misses += 1
+
+        for tier, fetch in (('redis', self._redis_get), ('disk', self._disk_get)):
+            data = fetch(key)
+            if data is None:
+                self._stats[tier].misses += 1
+                continue
+            try:
+                entry = decode_result(data)
+            except Exception as e:
+                self._stats[tier].errors += 1
+                logger.error(f"[CACHE] Corrupt {tier} entry {key}: {e}")
+                self._stats[tier].misses += 1
+                continue
+            self._hit(tier, started)
+            logger.info(f"[CACHE] {tier.upper()} HIT: {key}")
+            self._memory_put(key, entry)
+            return _detached(entry)
+        logger.debug(f"[CACHE] MISS: {key}")
+        return None
+
+    def _disk_get(self, key: str) -> Optional[bytes]:
         try:
-            data = self._redis.get(key)
-            
-            if data is not None:
-                self._hits += 1
-                logger.info(f"[REDIS] CACHE HIT: {key}")
-                return self._deserialize_result(data)
-            
-            self._misses += 1
-            logger.debug(f"[REDIS] CACHE MISS: {key}")
+            return self._disk.get(key)
+        except OSError as e:
+            self._stats['disk'].errors += 1
+            logger.warning(f"[CACHE] Disk read failed: {e}")
             return None
-            
+
+    # ── Write-back ────────────────────────────────────────────────────────────
+
+    def _write_lower(self, key: str, entry: Dict[str, Any], ttl: int) -> None:
+        try:
+            data = encode_result(entry)
         except Exception as e:
-            logger.error(f"[REDIS] Get error: {e}")
-            return None
-    
+            logger.error(f"[CACHE] Encode error for {key}: {e}")
+            return
+        if self._redis_put(key, data, ttl):
+            logger.info(f"[CACHE] CACHED in Redis: {key} ({len(data)} bytes, TTL: {ttl}s)")
+            return
+        try:
+            if self._disk.put(key, data):
+                self._stats['disk'].sets += 1
+                logger.info(f"[CACHE] CACHED on disk: {key} ({len(data)} bytes)")
+            else:
+                self._stats['disk'].rejected += 1
+        except OSError as e:
+            self._stats['disk'].errors += 1
+            logger.warning(f"[CACHE] Disk write failed: {e}")
+
     def set(
         self,
         key: str,
@@ -236,46 +493,86 @@ class BacktestCache:
         ttl: int = None
     ) -> bool:
         """
-        Cache result.
-        
-        Returns True if cached successfully.
+        Cache result: memory now, Redis (or disk, when too big for Redis) on
+        the write-back thread.
+
+        Returns True if the result was accepted by any tier.
+        """
+        header, table = _split_result(result)
+        entry = {**header, 'trades': table}
+        self._memory_put(key, entry)
+        expire = ttl or self._ttl
+        if RESULT_CACHE_WRITE_BACK:
+            self._writer.submit(self._write_lower, key, entry, expire)
+        else:
+            self._write_lower(key, entry, expire)
+        return True
+
+    def flush(self, timeout: float = 30.0) -> None:
+        """Wait for pending write-backs (tests / shutdown)."""
+        self._writer.submit(lambda: None).result(timeout=timeout)
+
+    def delete(self, key: str) -> bool:
+        """Delete cached result from every tier."""
+        self._memory.delete(key)
+        try:
+            self._disk.delete(key)
+        except OSError:
+            pass
+        if not self._available:
+            return True
+
+        try:
+            self._redis.delete(key)
+            logger.info(f"[REDIS] DELETED: {key}")
+            return True
+        except Exception as e:
+            logger.error(f"[REDIS] Delete error: {e}")
+            return False
+
+    # ── Auxiliary records ─────────────────────────────────────────────────────
+
+    def get_record(self, key: str) -> Optional[bytes]:
+        """Raw bytes stored with put_record (Redis tier only); None if absent."""
+        return self._redis_get(key)
+
+    def put_record(self, key: str, data: bytes, ttl: int) -> bool:
+        """
+        Store raw state that lives next to the results (e.g. incremental
+        checkpoints) in the Redis tier, bypassing the result codec and the
+        per-entry admission limit.
         """
         if not self._available:
             return False
-        
         try:
-            data = self._serialize_result(result)
-            expire = ttl or self._ttl
-            
-            self._redis.setex(key, expire, data)
-            logger.info(f"[REDIS] CACHED: {key} (TTL: {expire}s)")
+            self._redis.setex(key, ttl, data)
             return True
-            
         except Exception as e:
-            logger.error(f"[REDIS] Set error: {e}")
+            logger.error(f"[REDIS] Record set error: {e}")
             return False
-    
-    def delete(self, key: str) -> bool:
-        """Delete cached result."""
+
+    def delete_record(self, key: str) -> bool:
         if not self._available:
             return False
-        
         try:
             self._redis.delete(key)
-            logger.info(f"[REDIS] DELETED: {key}")
             return True
         except Exception as e:
-            logger.error(f"[REDIS] Delete error: {e}")
+            logger.error(f"[REDIS] Record delete error: {e}")
             return False
-    
+
     def clear_all(self) -> bool:
-        """Clear all backtest cache entries."""
+        """Clear all backtest cache entries (all tiers)."""
+        self._memory.clear()
+        removed = self._disk.clear()
+        if removed:
+            logger.info(f"[CACHE] Cleared {removed} disk entries")
         if not self._available:
-            return False
-        
+            return True
+
         try:
             # Find all backtest:* keys
-            keys = self._redis.keys("backtest:*")
+            keys = list(self._redis.scan_iter("backtest:*", count=1000))
             if keys:
                 self._redis.delete(*keys)
                 logger.info(f"[REDIS] Cleared {len(keys)} entries")
@@ -283,28 +580,36 @@ class BacktestCache:
         except Exception as e:
             logger.error(f"[REDIS] Clear error: {e}")
             return False
-    
+
     def get_stats(self) -> Dict[str, Any]:
-        """Get cache statistics."""
-        total = self._hits + self._misses
-        hit_rate = (self._hits / total * 100) if total > 0 else 0
-        
+        """Get cache statistics, per tier."""
+        hits = sum(s.hits for s in self._stats.values())
+        misses = self._stats['disk'].misses
+        total = hits + misses
+        hit_rate = (hits / total * 100) if total > 0 else 0
+
         return {
             "available": self._available,
-            "hits": self._hits,
-            "misses": self._misses,
+            "hits": hits,
+            "misses": misses,
             "hit_rate": f"{hit_rate:.1f}%",
-            "ttl_seconds": self._ttl
+            "ttl_seconds": self._ttl,
+            "tiers": {
+                "memory": {**self._stats['memory'].as_dict(), **self._memory.usage()},
+                "redis": {**self._stats['redis'].as_dict(), 'available': self._available,
+                          'max_entry_bytes': self._redis_max_entry},
+                "disk": {**self._stats['disk'].as_dict(), **self._disk.usage()},
+            },
         }
-    
+
     def is_available(self) -> bool:
-        """Check if Redis is available."""
+        """Check if the Redis tier is available."""
         return self._available
 
 
 # Singleton instance
 _cache_instance: Optional[BacktestCache] = None
-_cache_lock = __import__('threading').Lock()
+_cache_lock = threading.Lock()
 
 
 def get_backtest_cache() -> BacktestCache:
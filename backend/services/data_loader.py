@@ -51,6 +51,8 @@ from sqlalchemy import text
 
 # Import engine from database.py (uses connection pooling)
 from database import get_engine
+from services.data_version import data_version_key
+from services.dataset_snapshot import load_snapshot, save_snapshot
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -63,7 +65,8 @@ try:
 except Exception:
     pass
 
-_LOOKUP_CACHE_TTL = int(os.getenv("LOOKUP_CACHE_TTL", "86400"))
+# Keys carry the data version, so this only ages out superseded versions
+_LOOKUP_CACHE_TTL = int(os.getenv("LOOKUP_CACHE_TTL", str(7 * 86400)))
 _LOOKUP_KEY_PREFIX = "bulk"
 _FULL_RANGE_FROM = "2000-01-01"
 _FULL_RANGE_TO = "2026-12-31"
@@ -92,7 +95,7 @@ def _get_redis_client() -> Optional[redis.Redis]:
 
 def _lookup_cache_key(symbol: str, from_date: str, to_date: str) -> str:
     normalized_symbol = symbol.upper()
-    return f"{_LOOKUP_KEY_PREFIX}:{normalized_symbol}:{from_date}:{to_date}"
+    return f"{_LOOKUP_KEY_PREFIX}:{normalized_symbol}:{data_version_key(normalized_symbol)}:{from_date}:{to_date}"
 
 
 def load_lookup_cache_from_redis(
@@ -153,16 +156,16 @@ def store_lookup_cache_in_redis(
 
 def _full_range_cache_key(symbol: str) -> str:
     normalized_symbol = symbol.upper()
-    return f"{_LOOKUP_KEY_PREFIX}:{normalized_symbol}:full"
+    return f"{_LOOKUP_KEY_PREFIX}:{normalized_symbol}:{data_version_key(normalized_symbol)}:full"
 
 
-def _load_full_range_from_redis(symbol: str) -> Optional[pl.DataFrame]:
+def _load_full_range_from_redis(symbol: str, cache_key: Optional[str] = None) -> Optional[pl.DataFrame]:
     client = _get_redis_client()
     if client is None:
         return None
 
     try:
-        raw = client.get(_full_range_cache_key(symbol))
+        raw = client.get(cache_key or _full_range_cache_key(symbol))
         if not raw:
             return None
 
@@ -178,7 +181,7 @@ def _load_full_range_from_redis(symbol: str) -> Optional[pl.DataFrame]:
     return None
 
 
-def _store_full_range_in_redis(symbol: str, df: pl.DataFrame) -> None:
+def _store_full_range_in_redis(symbol: str, df: pl.DataFrame, cache_key: Optional[str] = None) -> None:
     client = _get_redis_client()
     if client is None or df is None or df.is_empty():
         return
@@ -197,7 +200,7 @@ def _store_full_range_in_redis(symbol: str, df: pl.DataFrame) -> None:
         ]
         packed = msgpack.packb(payload, use_bin_type=True)
         client.set(
-            _full_range_cache_key(symbol),
+            cache_key or _full_range_cache_key(symbol),
             packed,
             ex=_LOOKUP_CACHE_TTL
         )
@@ -212,10 +215,12 @@ def _serialize_cache_value(value: Any) -> Any:
     return value
 
 
-def _is_full_range_loaded(symbol: str) -> bool:
+def _is_full_range_loaded(symbol: str, cache_key: Optional[str] = None) -> bool:
+    """Full range in memory for ``symbol`` — and, given its cache key, for the current data version."""
     return (
         _full_range_loaded
         and _full_range_symbol == symbol.upper()
+        and (cache_key is None or _bulk_loaded_key == cache_key)
         and _bulk_options_df is not None
         and not _bulk_options_df.is_empty()
     )
@@ -1023,6 +1028,8 @@ _bulk_options_df: Optional[pl.DataFrame] = None
 _bulk_spot_df: Optional[pl.DataFrame] = None
 _bulk_expiry_df: Optional[pl.DataFrame] = None
 _bulk_loaded_key: Optional[str] = None
+# Trading day → (offset, length) in _bulk_options_df; None when the frame is not Date-sorted
+_bulk_date_index: Optional[Dict[str, Tuple[int, int]]] = None
 
 
 def bulk_load(symbol: str, from_date: str, to_date: str) -> dict:
@@ -1039,15 +1046,24 @@ def bulk_load(symbol: str, from_date: str, to_date: str) -> dict:
     Returns dict with stats about loaded data.
     """
     global _bulk_options_df, _bulk_spot_df, _bulk_expiry_df, _bulk_loaded_key, _full_range_loaded, _full_range_symbol
+    global _bulk_date_index
 
     symbol_upper = symbol.upper()
+    # Versioned key: a new import for this symbol means a new key everywhere
+    # (memory, Parquet, Redis); other symbols' caches stay valid indefinitely.
     cache_key = _full_range_cache_key(symbol_upper)
     key = hashlib.md5(cache_key.encode()).hexdigest()
-    parquet_path = Path(PARQUET_CACHE_DIR) / f"{key}.parquet"
+    parquet_path = Path(PARQUET_CACHE_DIR) / f"{symbol_upper}_{key}.parquet"
+
+    if _full_range_symbol == symbol_upper and _bulk_loaded_key not in (None, cache_key):
+        logger.info("[BULK] New data version for %s - dropping in-process caches", symbol_upper)
+        for shared in (_shared_date_cache, _shared_premium_cache, _shared_trading_days_cache,
+                       _shared_expiry_cache, _shared_spot_cache):
+            shared.clear()
 
     cached_data_valid = False
     
-    if _is_full_range_loaded(symbol_upper) and _bulk_options_df is not None:
+    if _is_full_range_loaded(symbol_upper, cache_key) and _bulk_options_df is not None:
         # Validate cached data covers the requested date range
         min_date = str(_bulk_options_df["Date"].min())
         max_date = str(_bulk_options_df["Date"].max())
@@ -1058,34 +1074,38 @@ def bulk_load(symbol: str, from_date: str, to_date: str) -> dict:
             logger.info(f"[BULK] Cached data ({min_date} to {max_date}) doesn't cover requested range ({from_date} to {to_date}) - reloading")
             _full_range_loaded = False
             _bulk_options_df = None
+            _bulk_date_index = None
     else:
+        if _restore_bulk_snapshot(symbol_upper, cache_key, from_date, to_date):
+            _clear_engine_bhav_cache()
+            return _get_bulk_stats()
+        _bulk_date_index = None  # Parquet / Redis frames carry no row index
+
         if parquet_path.exists():
-            age = time.time() - os.path.getmtime(parquet_path)
-            if age < 86400:
-                try:
-                    start_cache = time.perf_counter()
-                    _bulk_options_df = pl.read_parquet(parquet_path)
-                    _full_range_loaded = True
-                    _full_range_symbol = symbol_upper
-                    _bulk_loaded_key = cache_key
-                    elapsed_cache = time.perf_counter() - start_cache
-                    logger.info(f"[BULK] Loaded from Parquet cache in {elapsed_cache:.2f}s")
-                    
-                    # Verify Parquet data covers requested range
-                    if _bulk_options_df is not None and not _bulk_options_df.is_empty():
-                        min_date = str(_bulk_options_df["Date"].min())
-                        max_date = str(_bulk_options_df["Date"].max())
-                        if min_date > from_date or max_date < to_date:
-                            logger.info(f"[BULK] Parquet data ({min_date} to {max_date}) doesn't cover requested range ({from_date} to {to_date}) - will reload from DB")
-                            _full_range_loaded = False
-                            _bulk_options_df = None
-                        else:
-                            cached_data_valid = True
-                except Exception as exc:
-                    logger.warning(f"[BULK] Parquet cache load failed: {exc}")
-
-        if not _is_full_range_loaded(symbol_upper):
-            cached_df = _load_full_range_from_redis(symbol_upper)
+            try:
+                start_cache = time.perf_counter()
+                _bulk_options_df = pl.read_parquet(parquet_path)
+                _full_range_loaded = True
+                _full_range_symbol = symbol_upper
+                _bulk_loaded_key = cache_key
+                elapsed_cache = time.perf_counter() - start_cache
+                logger.info(f"[BULK] Loaded from Parquet cache in {elapsed_cache:.2f}s")
+                
+                # Verify Parquet data covers requested range
+                if _bulk_options_df is not None and not _bulk_options_df.is_empty():
+                    min_date = str(_bulk_options_df["Date"].min())
+                    max_date = str(_bulk_options_df["Date"].max())
+                    if min_date > from_date or max_date < to_date:
+                        logger.info(f"[BULK] Parquet data ({min_date} to {max_date}) doesn't cover requested range ({from_date} to {to_date}) - will reload from DB")
+                        _full_range_loaded = False
+                        _bulk_options_df = None
+                    else:
+                        cached_data_valid = True
+            except Exception as exc:
+                logger.warning(f"[BULK] Parquet cache load failed: {exc}")
+
+        if not _is_full_range_loaded(symbol_upper, cache_key):
+            cached_df = _load_full_range_from_redis(symbol_upper, cache_key)
             if cached_df is not None and not cached_df.is_empty():
                 # Verify Redis data covers requested range
                 min_date = str(cached_df["Date"].min())
@@ -1110,12 +1130,7 @@ def bulk_load(symbol: str, from_date: str, to_date: str) -> dict:
     )
     start_time = time.perf_counter()
 
-    try:
-        from engines.generic_multi_leg import _bhav_pandas_cache
-        _bhav_pandas_cache.clear()
-        logger.debug("[BULK] Cleared bhav pandas cache")
-    except Exception:
-        pass  # engine not imported yet — that's fine
+    _clear_engine_bhav_cache()
 
     from repositories.market_data_repository import MarketDataRepository
     from database import get_engine
@@ -1135,19 +1150,18 @@ def bulk_load(symbol: str, from_date: str, to_date: str) -> dict:
         spot_df = spot_future.result()
         expiry_df = expiry_future.result()
 
+    snapshot_options = None
     if options_df is not None and not options_df.empty:
-        pl_options = pl.from_pandas(options_df)
+        # Date-ordered, so each trading day is one contiguous row range
+        pl_options = pl.from_pandas(options_df).sort("Date", maintain_order=True)
         _bulk_options_df = pl_options
+        _bulk_date_index = _build_date_index(pl_options)
         _full_range_loaded = True
         _full_range_symbol = symbol_upper
         _bulk_loaded_key = cache_key
+        snapshot_options = pl_options
         logger.info(f"[BULK] Loaded {len(_bulk_options_df)} option rows")
-        try:
-            pl_options.write_parquet(parquet_path)
-            logger.info("[BULK] Saved to Parquet cache")
-        except Exception as exc:
-            logger.warning(f"[BULK] Failed to save Parquet cache: {exc}")
-        _store_full_range_in_redis(symbol_upper, pl_options)
+        _store_full_range_in_redis(symbol_upper, pl_options, cache_key)
     elif options_df is None and _bulk_options_df is None:
         _bulk_options_df = pl.DataFrame()
         logger.warning("[BULK] No option data available (cache and DB)")
@@ -1172,12 +1186,89 @@ def bulk_load(symbol: str, from_date: str, to_date: str) -> dict:
         _bulk_expiry_df = pl.DataFrame()
         logger.warning("[BULK] No expiry data returned!")
 
+    if snapshot_options is not None:
+        meta = {"from_date": from_date, "to_date": to_date, "date_index": _bulk_date_index}
+        frames = {"options": snapshot_options, "spot": _bulk_spot_df, "expiry": pl.from_pandas(expiry_df)}
+        if not save_snapshot(f"bulk_{symbol_upper}", data_version_key(symbol_upper), frames, meta):
+            try:
+                snapshot_options.write_parquet(parquet_path)
+                logger.info("[BULK] Saved to Parquet cache")
+                _drop_superseded_parquet(symbol_upper, parquet_path)
+            except Exception as exc:
+                logger.warning(f"[BULK] Failed to save Parquet cache: {exc}")
+
     elapsed = time.perf_counter() - start_time
     logger.info(f"[BULK] Load complete in {elapsed:.2f}s")
 
     return _get_bulk_stats()
 
 
+def _clear_engine_bhav_cache() -> None:
+    try:
+        from engines.generic_multi_leg import _bhav_pandas_cache
+        _bhav_pandas_cache.clear()
+        logger.debug("[BULK] Cleared bhav pandas cache")
+    except Exception:
+        pass  # engine not imported yet — that's fine
+
+
+def _build_date_index(options_df: pl.DataFrame) -> Dict[str, Tuple[int, int]]:
+    """Trading day → (offset, length) of its rows in a Date-sorted frame."""
+    counts = options_df.group_by("Date", maintain_order=True).agg(pl.len().alias("rows"))
+    index: Dict[str, Tuple[int, int]] = {}
+    offset = 0
+    for day, rows in zip(counts["Date"].to_list(), counts["rows"].to_list()):
+        index[str(day)[:10]] = (offset, rows)
+        offset += rows
+    return index
+
+
+def _restore_bulk_snapshot(symbol: str, cache_key: str, from_date: str, to_date: str) -> bool:
+    """
+    Map the symbol's snapshot at the current data version (options, spot,
+    expiry and the date index) — no database round trip at all.
+    """
+    global _bulk_options_df, _bulk_spot_df, _bulk_expiry_df, _bulk_date_index
+    global _bulk_loaded_key, _full_range_loaded, _full_range_symbol
+
+    restored = load_snapshot(f"bulk_{symbol}", data_version_key(symbol))
+    if restored is None:
+        return False
+    frames, meta = restored
+    if meta.get("from_date", "9999") > from_date or meta.get("to_date", "") < to_date:
+        logger.info(
+            "[BULK] Snapshot (%s to %s) doesn't cover requested range (%s to %s)",
+            meta.get("from_date"), meta.get("to_date"), from_date, to_date,
+        )
+        return False
+
+    expiry = frames["expiry"]
+    if not expiry.is_empty():
+        expiry = expiry.filter(
+            (pl.col("Current Expiry") >= datetime.strptime(from_date, "%Y-%m-%d"))
+            & (pl.col("Current Expiry") <= datetime.strptime(to_date, "%Y-%m-%d"))
+        )
+    _bulk_options_df = frames["options"]
+    _bulk_spot_df = frames["spot"]
+    _bulk_expiry_df = expiry
+    _bulk_date_index = {day: tuple(span) for day, span in (meta.get("date_index") or {}).items()}
+    _full_range_loaded = True
+    _full_range_symbol = symbol
+    _bulk_loaded_key = cache_key
+    logger.info("[BULK] Restored %s from snapshot (%d option rows)", symbol, len(_bulk_options_df))
+    return True
+
+
+def _drop_superseded_parquet(symbol: str, current: Path) -> None:
+    """Remove this symbol's Parquet files from older data versions."""
+    for path in Path(PARQUET_CACHE_DIR).glob(f"{symbol}_*.parquet"):
+        if path != current:
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+
 def _get_bulk_stats() -> dict:
     """Return stats about currently loaded bulk data."""
     return {
@@ -1188,17 +1279,33 @@ def _get_bulk_stats() -> dict:
     }
 
 
+def resident_dataset() -> Optional[dict]:
+    """Symbol, date range and data version of the bulk data held in this process."""
+    if _bulk_options_df is None or _bulk_options_df.is_empty() or _full_range_symbol is None:
+        return None
+    if _bulk_loaded_key != _full_range_cache_key(_full_range_symbol):
+        return None  # superseded by an import; the next load replaces it
+    return {
+        "symbol": _full_range_symbol,
+        "from_date": str(_bulk_options_df["Date"].min())[:10],
+        "to_date": str(_bulk_options_df["Date"].max())[:10],
+        "version": data_version_key(_full_range_symbol),
+    }
+
+
 def bulk_clear():
     """
     Clear bulk-loaded data from memory.
     MUST be called in try/finally to prevent memory leaks and stale data.
     """
     global _bulk_options_df, _bulk_spot_df, _bulk_expiry_df, _bulk_loaded_key, _full_range_loaded, _full_range_symbol
+    global _bulk_date_index
     
     _bulk_options_df = None
     _bulk_spot_df = None
     _bulk_expiry_df = None
     _bulk_loaded_key = None
+    _bulk_date_index = None
     _full_range_loaded = False
     _full_range_symbol = None
     
@@ -1316,6 +1423,11 @@ def get_bulk_options_df() -> Optional[pl.DataFrame]:
     return _bulk_options_df
 
 
+def get_bulk_date_index() -> Optional[Dict[str, Tuple[int, int]]]:
+    """Per-day row ranges of get_bulk_options_df() (None if unavailable)."""
+    return _bulk_date_index
+
+
 # Singleton instance
 _loader_instance: Optional[HighPerformanceLoader] = None
 
@@ -0,0 +1,195 @@
+"""
+Per-symbol data version watermark
+
+PHASE 7: Redis Result Cache
+
+Every import that changes market data bumps a monotonic version for the
+symbols it touched (migrate_data.Migrator, after each file commits). Cache
+layers put the version into their keys instead of relying on TTLs:
+
+- Parquet bulk cache and Redis full-range / lookup caches (data_loader)
+- In-process bulk state (data_loader, base.bulk_load_options)
+- Backtest results (BacktestCache keys, result_store request_hash)
+
+An import of NIFTY therefore invalidates exactly the NIFTY entries, at once,
+and untouched symbols keep their caches indefinitely. Symbol-less data
+(trading holidays) bumps the global row '*', which is part of every
+symbol's version.
+
+Each bump also logs the earliest trade date the import touched
+(_data_change), so state derived from a date range (incremental checkpoints)
+can tell "new days appended" from "covered days corrected".
+
+Usage:
+    from services.data_version import data_version
+
+    version = data_version('NIFTY')    # 0 until the first tracked import
+    since = data_versions('NIFTY')     # {'NIFTY': 12, '*': 3}
+    changed_since('NIFTY', since)      # None, or the earliest date touched since
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+
+# How long a process trusts its last read (imports show up within this delay)
+DATA_VERSION_POLL_S = float(os.getenv("DATA_VERSION_POLL_S", "5"))
+GLOBAL_SYMBOL = '*'
+
+DATA_VERSION_DDL = """
+CREATE TABLE IF NOT EXISTS _data_version (
+    symbol      TEXT        PRIMARY KEY,
+    version     BIGINT      NOT NULL DEFAULT 0,
+    updated_at  TIMESTAMPTZ NOT NULL DEFAULT now()
+)
+"""
+
+# One row per bump: the earliest trade date it touched (NULL = unknown / all)
+DATA_CHANGE_DDL = """
+CREATE TABLE IF NOT EXISTS _data_change (
+    symbol      TEXT        NOT NULL,
+    version     BIGINT      NOT NULL,
+    first_date  DATE,
+    changed_at  TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (symbol, version)
+)
+"""
+
+# Earlier than any trading date: "changed from the beginning"
+UNKNOWN_CHANGE_DATE = '0001-01-01'
+
+_BUMP_SQL = text(
+    "INSERT INTO _data_version (symbol, version, updated_at) "
+    "VALUES (:symbol, 1, now()) "
+    "ON CONFLICT (symbol) DO UPDATE SET "
+    "  version = _data_version.version + 1, updated_at = now() "
+    "RETURNING version"
+)
+
+_LOG_CHANGE_SQL = text(
+    "INSERT INTO _data_change (symbol, version, first_date) "
+    "VALUES (:symbol, :version, :first_date) ON CONFLICT DO NOTHING"
+)
+
+_CHANGES_SQL = text(
+    "SELECT COUNT(*), MIN(first_date), BOOL_OR(first_date IS NULL) FROM _data_change "
+    "WHERE (symbol = :symbol AND version > :version) "
+    "   OR (symbol = :global_symbol AND version > :global_version)"
+)
+
+_versions: Dict[str, int] = {}
+_loaded_at = 0.0
+_lock = threading.Lock()
+_has_loaded = False
+
+
+def bump_data_version(conn, symbols: Iterable[Optional[str]], first_date: Optional[str] = None) -> None:
+    """
+    Bump the version of every symbol in ``symbols`` (None / '' → the global
+    row) and log ``first_date``, the earliest trade date the import touched
+    (None: unknown, treated as touching every date). ``conn`` is an open
+    SQLAlchemy connection, so the bump commits with the caller's transaction.
+    """
+    for symbol in sorted({(s or GLOBAL_SYMBOL).strip().upper() for s in symbols}):
+        version = conn.execute(_BUMP_SQL, {"symbol": symbol}).scalar()
+        conn.execute(_LOG_CHANGE_SQL, {"symbol": symbol, "version": version, "first_date": first_date})
+
+
+def _load_versions() -> Optional[Dict[str, int]]:
+    """Current versions, or None when the table cannot be read."""
+    from database import get_engine
+
+    try:
+        with get_engine().begin() as conn:
+            rows = conn.execute(text("SELECT symbol, version FROM _data_version")).fetchall()
+    except Exception as exc:
+        if _has_loaded:
+            logger.error("[DATA_VERSION] read failed, keeping the last versions: %s", exc)
+        else:
+            logger.error("[DATA_VERSION] unavailable, using version 0: %s", exc)
+        return None
+    return {str(symbol): int(version) for symbol, version in rows}
+
+
+def _snapshot() -> Dict[str, int]:
+    global _versions, _loaded_at, _has_loaded
+    now = time.monotonic()
+    if now - _loaded_at >= DATA_VERSION_POLL_S:
+        with _lock:
+            if now - _loaded_at >= DATA_VERSION_POLL_S:
+                versions = _load_versions()
+                # A transient DB error must not flip every key back to d0:
+                # the last good read stays until the next successful one
+                if versions is not None:
+                    _versions = versions
+                    _has_loaded = True
+                _loaded_at = time.monotonic()
+    return _versions
+
+
+def data_version(symbol: Optional[str] = None) -> int:
+    """
+    Version of ``symbol``'s data (plus the global row). Without a symbol: the
+    catalog version, which changes on any import.
+    """
+    versions = _snapshot()
+    if symbol is None:
+        return sum(versions.values())
+    return versions.get(symbol.strip().upper(), 0) + versions.get(GLOBAL_SYMBOL, 0)
+
+
+def data_versions(symbol: str) -> Dict[str, int]:
+    """The two components of ``symbol``'s version, for changed_since()."""
+    versions = _snapshot()
+    symbol = symbol.strip().upper()
+    return {symbol: versions.get(symbol, 0), GLOBAL_SYMBOL: versions.get(GLOBAL_SYMBOL, 0)}
+
+
+def changed_since(symbol: str, since: Dict[str, int]) -> Optional[str]:
+    """
+    Earliest trade date ('YYYY-MM-DD') touched by imports of ``symbol`` or
+    of symbol-less data after the ``since`` versions (data_versions()).
+    None when nothing changed; UNKNOWN_CHANGE_DATE when a bump did not log
+    its dates (or predates the log, or the log cannot be read).
+    """
+    symbol = symbol.strip().upper()
+    current = data_versions(symbol)
+    since_symbol = int(since.get(symbol, 0))
+    since_global = int(since.get(GLOBAL_SYMBOL, 0))
+    expected = (current[symbol] - since_symbol) + (current[GLOBAL_SYMBOL] - since_global)
+    if expected <= 0:
+        return None if expected == 0 else UNKNOWN_CHANGE_DATE
+    from database import get_engine
+
+    try:
+        with get_engine().begin() as conn:
+            count, first_date, unknown = conn.execute(_CHANGES_SQL, {
+                "symbol": symbol, "version": since_symbol,
+                "global_symbol": GLOBAL_SYMBOL, "global_version": since_global,
+            }).first()
+    except Exception as exc:
+        logger.error("[DATA_VERSION] change log unavailable: %s", exc)
+        return UNKNOWN_CHANGE_DATE
+    if count < expected or unknown or first_date is None:
+        return UNKNOWN_CHANGE_DATE
+    return first_date.strftime('%Y-%m-%d')
+
+
+def data_version_key(symbol: Optional[str] = None) -> str:
+    """The version as a cache-key segment ('d17')."""
+    return f"d{data_version(symbol)}"
+
+
+def refresh_data_versions() -> Tuple[Tuple[str, int], ...]:
+    """Drop the local memo (e.g. right after an import in this process)."""
+    global _loaded_at
+    with _lock:
+        _loaded_at = 0.0
+    return tuple(sorted(_snapshot().items()))
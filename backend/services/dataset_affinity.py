@@ -0,0 +1,270 @@
+"""
+Dataset-affinity routing of AlgoTest jobs
+
+PHASE 12: Job Scheduling
+
+Loading a symbol's bulk data costs minutes; a worker that already holds it
+runs the same backtest in seconds. Workers therefore advertise what they hold
+and the dispatcher routes to them:
+
+- Every backtest worker also consumes its own direct queue
+  ('affinity.<hostname>'), added at startup (worker.tasks signal handler)
+- Each pool process advertises its resident dataset (symbol, date range,
+  data version), whether it is busy, and the queues it serves, in Redis
+  under a short TTL refreshed by a heartbeat thread
+- route_job() prefers a worker whose resident data covers the request at the
+  current data version and whose backlog is short; otherwise the least-loaded
+  idle worker; otherwise the shared cost queue (first free worker wins)
+
+Workers are only eligible for jobs at or below their own queue's size class
+(services.job_cost), so affinity never bypasses memory routing. Dispatches
+to a direct queue are counted until the worker picks them up, which is the
+backlog used for load balancing.
+
+Usage:
+    cost = estimate_job_cost(payload)
+    queue = route_job(payload, cost)          # may tag payload['_affinity_host']
+    run_algotest_job.apply_async(args=[payload], queue=queue)
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+import orjson
+import redis
+
+from services.job_cost import BACKTEST_QUEUES, JobCost
+
+logger = logging.getLogger(__name__)
+
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379/0")
+AFFINITY_ENABLED = os.getenv("AFFINITY_ENABLED", "1") == "1"
+# An advertisement not refreshed within this many seconds is ignored
+AFFINITY_TTL = int(os.getenv("AFFINITY_TTL", "60"))
+# A warm worker is preferred while it has at most this many jobs ahead
+AFFINITY_MAX_BACKLOG = int(os.getenv("AFFINITY_MAX_BACKLOG", "1"))
+
+AFFINITY_HOST_KEY = '_affinity_host'
+
+_redis_client: Optional[redis.Redis] = None
+_hostname: Optional[str] = None
+_served_queues: List[str] = []
+_busy = False
+_heartbeat: Optional[threading.Thread] = None
+
+
+def direct_queue(hostname: str) -> str:
+    return f"affinity.{hostname}"
+
+
+def _worker_key(hostname: str, pid: int) -> str:
+    return f"affinity:worker:{hostname}:{pid}"
+
+
+def _pending_key(hostname: str) -> str:
+    return f"affinity:pending:{hostname}"
+
+
+def _get_redis_client() -> Optional[redis.Redis]:
+    global _redis_client
+    if _redis_client is None:
+        try:
+            client = redis.Redis.from_url(REDIS_URL)
+            client.ping()
+            _redis_client = client
+        except redis.RedisError as exc:
+            logger.warning("[AFFINITY] Unable to connect to Redis, affinity disabled: %s", exc)
+            return None
+    return _redis_client
+
+
+def _rank(queue: str) -> int:
+    return BACKTEST_QUEUES.index(queue) if queue in BACKTEST_QUEUES else -1
+
+
+# ── Worker side ───────────────────────────────────────────────────────────────
+
+def register_worker(hostname: str, queues: Iterable[str]) -> Optional[str]:
+    """
+    Called once per worker at startup: remember which backtest queues it
+    serves and return its direct queue (None for non-backtest workers).
+    """
+    global _hostname, _served_queues
+    _served_queues = [q for q in queues if q in BACKTEST_QUEUES]
+    if not _served_queues or not AFFINITY_ENABLED:
+        return None
+    _hostname = hostname
+    return direct_queue(hostname)
+
+
+def is_backtest_worker() -> bool:
+    return bool(_served_queues)
+
+
+def advertise(busy: Optional[bool] = None) -> None:
+    """Publish this process's resident dataset and busy flag."""
+    global _busy
+    if busy is not None:
+        _busy = busy
+    if _hostname is None:
+        return
+    client = _get_redis_client()
+    if client is None:
+        return
+    try:
+        from services.data_loader import resident_dataset
+        dataset = resident_dataset()
+    except Exception:
+        dataset = None
+    record = {
+        "hostname": _hostname,
+        "queues": _served_queues,
+        "busy": _busy,
+        "dataset": dataset,
+        "updated": time.time(),
+    }
+    try:
+        client.set(_worker_key(_hostname, os.getpid()), orjson.dumps(record), ex=AFFINITY_TTL)
+    except redis.RedisError as exc:
+        logger.debug("[AFFINITY] advertise failed: %s", exc)
+
+
+def claim(params: Dict[str, Any]) -> None:
+    """A task started: take it off the backlog of the worker it was routed to."""
+    host = params.pop(AFFINITY_HOST_KEY, None)
+    client = _get_redis_client() if host else None
+    if client is None:
+        return
+    try:
+        if client.decr(_pending_key(host)) < 0:
+            client.set(_pending_key(host), 0, ex=AFFINITY_TTL * 10)
+    except redis.RedisError:
+        pass
+
+
+def withdraw() -> None:
+    """Drop this process's advertisement (worker shutdown)."""
+    client = _get_redis_client() if _hostname else None
+    if client is None:
+        return
+    try:
+        client.delete(_worker_key(_hostname, os.getpid()))
+    except redis.RedisError:
+        pass
+
+
+def start_heartbeat() -> None:
+    """Refresh the advertisement in the background (pool process init)."""
+    global _heartbeat
+    if _hostname is None or (_heartbeat is not None and _heartbeat.is_alive()):
+        return
+
+    def _beat():
+        while True:
+            advertise()
+            time.sleep(max(1.0, AFFINITY_TTL / 3))
+
+    _heartbeat = threading.Thread(target=_beat, name="affinity-heartbeat", daemon=True)
+    _heartbeat.start()
+
+
+# ── Dispatcher side ───────────────────────────────────────────────────────────
+
+def _workers(client: redis.Redis) -> Dict[str, Dict[str, Any]]:
+    """Live workers by hostname: served queues, resident datasets and load."""
+    keys = list(client.scan_iter(match="affinity:worker:*", count=200))
+    if not keys:
+        return {}
+    workers: Dict[str, Dict[str, Any]] = {}
+    for raw in client.mget(keys):
+        if raw is None:
+            continue
+        record = orjson.loads(raw)
+        worker = workers.setdefault(record["hostname"], {
+            "queues": record.get("queues") or [], "datasets": [], "busy": 0, "pending": 0,
+        })
+        worker["busy"] += int(bool(record.get("busy")))
+        if record.get("dataset"):
+            worker["datasets"].append(record["dataset"])
+    hosts = list(workers)
+    for host, pending in zip(hosts, client.mget([_pending_key(h) for h in hosts])):
+        workers[host]["pending"] = max(0, int(pending or 0))
+    return workers
+
+
+def live_slots() -> int:
+    """
+    Backtest pool processes currently advertising (one heartbeat each, i.e.
+    one concurrent job slot); 0 when affinity is off or Redis is unreachable.
+    """
+    client = _get_redis_client() if AFFINITY_ENABLED else None
+    if client is None:
+        return 0
+    try:
+        return sum(1 for _ in client.scan_iter(match="affinity:worker:*", count=200))
+    except redis.RedisError as exc:
+        logger.debug("[AFFINITY] slot count failed: %s", exc)
+        return 0
+
+
+def _covers(dataset: Dict[str, Any], symbol: str, version: str, from_date: str, to_date: str) -> bool:
+    return (
+        dataset.get("symbol") == symbol
+        and dataset.get("version") == version
+        and dataset.get("from_date", "9999") <= from_date
+        and dataset.get("to_date", "") >= to_date
+    )
+
+
+def route_job(payload: Dict[str, Any], cost: JobCost) -> str:
+    """
+    Queue for one job (or shard): a warm worker's direct queue when possible,
+    else the least-loaded idle worker's, else the shared cost queue. Tags the
+    payload with the chosen host so the worker can clear its backlog entry.
+    """
+    client = _get_redis_client() if AFFINITY_ENABLED else None
+    if client is None:
+        return cost.queue
+    from engines.strategy_plan import canonical_request
+    from services.data_version import data_version_key
+
+    request = canonical_request(payload)
+    symbol = request['index']
+    from_date, to_date = request.get('from_date') or '', request.get('to_date') or ''
+    version = data_version_key(symbol)
+    try:
+        workers = _workers(client)
+    except redis.RedisError as exc:
+        logger.warning("[AFFINITY] worker lookup failed: %s", exc)
+        return cost.queue
+
+    eligible = {
+        host: w for host, w in workers.items()
+        if any(_rank(q) >= _rank(cost.queue) for q in w["queues"])
+    }
+    load = lambda host: eligible[host]["busy"] + eligible[host]["pending"]
+    warm = [
+        host for host, w in eligible.items()
+        if load(host) <= AFFINITY_MAX_BACKLOG
+        and any(_covers(d, symbol, version, from_date, to_date) for d in w["datasets"])
+    ]
+    if warm:
+        host, reason = min(warm, key=load), "warm"
+    else:
+        idle = [host for host in eligible if load(host) == 0]
+        if not idle:
+            return cost.queue
+        host, reason = min(idle), "idle"
+
+    try:
+        client.incr(_pending_key(host))
+        client.expire(_pending_key(host), AFFINITY_TTL * 10)
+    except redis.RedisError:
+        return cost.queue
+    payload[AFFINITY_HOST_KEY] = host
+    logger.info("[AFFINITY] %s %s..%s → %s (%s)", symbol, from_date, to_date, host, reason)
+    return direct_queue(host)
@@ -0,0 +1,136 @@
+"""
+Memory-mappable snapshots of resident datasets
+
+PHASE 5: High-Performance Data Loading
+
+A restarted API process or a recycled Celery child used to rebuild its
+resident data from PostgreSQL (or decode Parquet). Snapshots make that a
+memory map instead:
+
+- Each snapshot is a directory of uncompressed Arrow IPC files plus a JSON
+  manifest, named '<name>_<data version>' under SNAPSHOT_DIR (the shared
+  Parquet cache volume)
+- Reads use Polars memory mapping without rechunking: nothing is decoded or
+  copied, pages fault in on first touch and are shared through the page
+  cache by every process on the host
+- Writes go to a temporary directory renamed into place, so readers never
+  see a partial snapshot; superseded versions are deleted on save (open
+  maps stay valid after unlink)
+
+Snapshotted today: the bulk option / spot / expiry frames with their per-date
+row index (data_loader.bulk_load) and the trading calendar
+(MarketDataRepository).
+
+Usage:
+    from services.dataset_snapshot import load_snapshot, save_snapshot
+
+    save_snapshot('bulk_NIFTY', 'd17', {'options': df}, meta={'from_date': ...})
+    frames, meta = load_snapshot('bulk_NIFTY', 'd17') or ({}, {})
+"""
+
+import logging
+import os
+import shutil
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import orjson
+import polars as pl
+
+logger = logging.getLogger(__name__)
+
+
+SNAPSHOT_ENABLED = os.getenv("DATASET_SNAPSHOT_ENABLED", "1") == "1"
+SNAPSHOT_DIR = Path(os.getenv(
+    "DATASET_SNAPSHOT_DIR",
+    os.path.join(os.getenv("PARQUET_CACHE_DIR", "/tmp/parquet_cache"), "snapshots"),
+))
+
+_MANIFEST = "manifest.json"
+
+
+def _snapshot_path(name: str, version: str) -> Path:
+    return SNAPSHOT_DIR / f"{name}_{version}"
+
+
+def save_snapshot(
+    name: str,
+    version: str,
+    frames: Dict[str, pl.DataFrame],
+    meta: Optional[Dict[str, Any]] = None,
+) -> bool:
+    """
+    Persist ``frames`` as the snapshot of ``name`` at ``version``, replacing
+    an existing one (e.g. a wider date range of the same version).
+    """
+    if not SNAPSHOT_ENABLED:
+        return False
+    target = _snapshot_path(name, version)
+    tmp = SNAPSHOT_DIR / f".{name}_{version}.{os.getpid()}.{uuid.uuid4().hex[:8]}"
+    start = time.perf_counter()
+    try:
+        tmp.mkdir(parents=True)
+        for key, df in frames.items():
+            df.write_ipc(tmp / f"{key}.arrow", compression="uncompressed")
+        manifest = {
+            "name": name,
+            "version": version,
+            "frames": sorted(frames),
+            "rows": {key: df.height for key, df in frames.items()},
+            "meta": meta or {},
+            "created": time.time(),
+        }
+        (tmp / _MANIFEST).write_bytes(orjson.dumps(manifest))
+        if target.exists():
+            stale = tmp.with_name(tmp.name + ".old")
+            os.rename(target, stale)
+            shutil.rmtree(stale, ignore_errors=True)
+        os.rename(tmp, target)
+    except OSError as exc:
+        shutil.rmtree(tmp, ignore_errors=True)
+        if (target / _MANIFEST).exists():
+            return True  # another process published it first
+        logger.warning("[SNAPSHOT] Failed to save %s %s: %s", name, version, exc)
+        return False
+    except Exception as exc:
+        shutil.rmtree(tmp, ignore_errors=True)
+        logger.warning("[SNAPSHOT] Failed to save %s %s: %s", name, version, exc)
+        return False
+    logger.info("[SNAPSHOT] Saved %s %s in %.2fs", name, version, time.perf_counter() - start)
+    drop_superseded(name, version)
+    return True
+
+
+def load_snapshot(name: str, version: str) -> Optional[Tuple[Dict[str, pl.DataFrame], Dict[str, Any]]]:
+    """Memory-map the snapshot of ``name`` at ``version`` → (frames, meta), or None."""
+    if not SNAPSHOT_ENABLED:
+        return None
+    path = _snapshot_path(name, version)
+    try:
+        manifest = orjson.loads((path / _MANIFEST).read_bytes())
+    except (OSError, ValueError):
+        return None
+    start = time.perf_counter()
+    try:
+        frames = {
+            key: pl.read_ipc(path / f"{key}.arrow", memory_map=True, rechunk=False)
+            for key in manifest["frames"]
+        }
+    except Exception as exc:
+        logger.warning("[SNAPSHOT] Unreadable snapshot %s, removing: %s", path.name, exc)
+        shutil.rmtree(path, ignore_errors=True)
+        return None
+    logger.info("[SNAPSHOT] Mapped %s %s in %.3fs", name, version, time.perf_counter() - start)
+    return frames, manifest.get("meta") or {}
+
+
+def drop_superseded(name: str, keep_version: str) -> None:
+    """Delete snapshots of ``name`` from other data versions."""
+    keep = _snapshot_path(name, keep_version)
+    prefix = f"{name}_"
+    for path in SNAPSHOT_DIR.glob(f"{name}_*"):
+        # Versions look like 'd17'
+        if path != keep and path.is_dir() and path.name[len(prefix):].startswith('d'):
+            shutil.rmtree(path, ignore_errors=True)
@@ -0,0 +1,224 @@
+"""
+Persistent pre-warmed engine process pool
+
+PHASE 13: Fast Startup
+
+CPU-heavy backtests run in one long-lived process pool per process (API
+requests, execute_algotest_job expiry chunks, ParallelExecutor months) instead
+of a cold pool per call. Every child is ready before it accepts work:
+
+- Initializer: imports the engine layer (pandas shims, base, engines,
+  loaders) and attaches a resident dataset — ENGINE_POOL_DATASET, or the one
+  warmup planned (configure()); children forked after warmup inherit the
+  parent's bulk data copy-on-write, and snapshot pages are shared anyway
+- Jobs are plain function calls (submit_job / map_chunks); bulk_load_options
+  inside a job returns at once when the attached dataset covers it
+- Health: after each job the children's unique memory (USS — pages shared
+  copy-on-write with the parent do not count) is checked; past
+  ENGINE_POOL_MAX_RSS_MB, or after ENGINE_POOL_MAX_JOBS, the pool is replaced
+  by a fresh prestarted one while in-flight jobs finish on the old one
+  (rolling recycle, no BrokenProcessPool)
+
+A forked child never reuses its parent's pool object: pools are per pid.
+
+Usage:
+    result = await asyncio.wrap_future(submit_job(fn, payload))
+    frames = map_chunks(fn, chunks)
+"""
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, wait
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+ENGINE_POOL_WORKERS = int(os.getenv("ENGINE_POOL_WORKERS", str(min(4, max(1, os.cpu_count() or 1)))))
+# Recycle once any child's unique memory (USS) passes this (0 = never)
+ENGINE_POOL_MAX_RSS_MB = int(os.getenv("ENGINE_POOL_MAX_RSS_MB", "1500"))
+# Recycle after this many jobs (0 = never)
+ENGINE_POOL_MAX_JOBS = int(os.getenv("ENGINE_POOL_MAX_JOBS", "0"))
+# 'SYMBOL:FROM:TO' attached by every child at start (overrides the warmup plan)
+ENGINE_POOL_DATASET = os.getenv("ENGINE_POOL_DATASET", "")
+
+_MB = 1024 * 1024
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_pid: Optional[int] = None
+_pool_jobs = 0
+_pool_started: Optional[float] = None
+_recycles = 0
+_attach: Optional[Tuple[str, str, str]] = None
+_pool_lock = threading.Lock()
+
+
+def preload_engine() -> float:
+    """Import everything a backtest needs; returns the seconds it took."""
+    start = time.perf_counter()
+    import pandas_compat
+    pandas_compat.install()
+    import base  # noqa: F401
+    import services.algotest_job  # noqa: F401
+    import engines.generic_algotest_engine  # noqa: F401
+    return time.perf_counter() - start
+
+
+def _configured_dataset() -> Optional[Tuple[str, str, str]]:
+    if ENGINE_POOL_DATASET:
+        parts = ENGINE_POOL_DATASET.split(':')
+        if len(parts) == 3:
+            return parts[0].upper(), parts[1], parts[2]
+        logger.warning("[ENGINE_POOL] Ignoring ENGINE_POOL_DATASET=%r (want SYMBOL:FROM:TO)", ENGINE_POOL_DATASET)
+    return _attach
+
+
+def _init_engine_process(dataset: Optional[Tuple[str, str, str]]) -> None:
+    start = time.perf_counter()
+    preload_engine()
+    if dataset is not None:
+        # No-op when the dataset was inherited from the parent at fork
+        from base import bulk_load_options
+        try:
+            bulk_load_options(*dataset)
+        except Exception as exc:
+            logger.warning("[ENGINE_POOL] pid %d could not attach %s: %s", os.getpid(), dataset, exc)
+    logger.info("[ENGINE_POOL] pid %d ready in %.2fs (dataset %s)",
+                os.getpid(), time.perf_counter() - start, dataset)
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+def _new_pool() -> ProcessPoolExecutor:
+    global _pool_pid, _pool_jobs, _pool_started
+    _pool_pid = os.getpid()
+    _pool_jobs = 0
+    _pool_started = time.time()
+    return ProcessPoolExecutor(
+        max_workers=ENGINE_POOL_WORKERS,
+        initializer=_init_engine_process,
+        initargs=(_configured_dataset(),),
+    )
+
+
+def get_engine_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None or _pool_pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool_pid != os.getpid():
+                _pool = _new_pool()
+    return _pool
+
+
+def configure(dataset: Optional[Tuple[str, str, str]]) -> None:
+    """
+    Dataset for children to attach (warmup's top dataset). An existing pool
+    is recycled so its children pick it up.
+    """
+    global _attach
+    _attach = dataset
+    if _pool is not None and _pool_pid == os.getpid():
+        recycle("dataset changed")
+
+
+def prestart(timeout: float = 300.0) -> int:
+    """Spawn (and initialize) every child now; returns how many answered."""
+    pool = get_engine_pool()
+    futures = [pool.submit(_ping) for _ in range(ENGINE_POOL_WORKERS)]
+    done, _ = wait(futures, timeout=timeout)
+    return len({f.result() for f in done if f.exception() is None})
+
+
+# ── Health / recycling ────────────────────────────────────────────────────────
+
+def _children(pool: ProcessPoolExecutor) -> Dict[int, Any]:
+    # CPython keeps the live workers in _processes (pid → Process)
+    return dict(getattr(pool, '_processes', None) or {})
+
+
+def _unique_memory(pid: int) -> Optional[int]:
+    """
+    Unique set size: pages only this child holds. Pages inherited
+    copy-on-write from the pre-warmed parent (the attached dataset) are
+    shared and do not count; RSS only when smaps is not readable.
+    """
+    import psutil
+    try:
+        process = psutil.Process(pid)
+        try:
+            return process.memory_full_info().uss
+        except psutil.AccessDenied:
+            return process.memory_info().rss
+    except psutil.Error:
+        return None
+
+
+def pool_stats() -> Dict[str, Any]:
+    """Children and their memory, without creating a pool."""
+    pool = _pool if _pool_pid == os.getpid() else None
+    if pool is None:
+        return {"running": False}
+    children = []
+    for pid in _children(pool):
+        private = _unique_memory(pid)
+        children.append({"pid": pid, "uss_mb": round(private / _MB, 1) if private is not None else None})
+    return {
+        "running": True,
+        "workers": ENGINE_POOL_WORKERS,
+        "children": children,
+        "jobs": _pool_jobs,
+        "recycles": _recycles,
+        "uptime_s": round(time.time() - (_pool_started or time.time()), 1),
+        "dataset": _configured_dataset(),
+    }
+
+
+def recycle(reason: str, current: Optional[ProcessPoolExecutor] = None) -> None:
+    """
+    Swap in a fresh pool; the old one finishes its jobs and exits. With
+    ``current``, only if that pool is still the live one (concurrent checks).
+    """
+    global _pool, _recycles
+    with _pool_lock:
+        if current is not None and current is not _pool:
+            return
+        old = _pool if _pool_pid == os.getpid() else None
+        _pool = _new_pool()
+        _recycles += 1
+    logger.info("[ENGINE_POOL] Recycling pool (%s)", reason)
+    if old is not None:
+        old.shutdown(wait=False)
+    threading.Thread(target=prestart, name="engine-pool-prestart", daemon=True).start()
+
+
+def _after_job(pool: ProcessPoolExecutor) -> None:
+    global _pool_jobs
+    if pool is not _pool:
+        return  # finished on a pool that was already replaced
+    _pool_jobs += 1
+    if ENGINE_POOL_MAX_JOBS and _pool_jobs >= ENGINE_POOL_MAX_JOBS:
+        recycle(f"{_pool_jobs} jobs", pool)
+        return
+    if ENGINE_POOL_MAX_RSS_MB:
+        for pid in _children(pool):
+            private = _unique_memory(pid)
+            if private is not None and private > ENGINE_POOL_MAX_RSS_MB * _MB:
+                recycle(f"pid {pid} USS {private // _MB}MB", pool)
+                return
+
+
+def submit_job(fn: Callable, *args: Any, **kwargs: Any) -> Future:
+    """Run ``fn`` on a ready child; memory is checked when it completes."""
+    pool = get_engine_pool()
+    future = pool.submit(fn, *args, **kwargs)
+    future.add_done_callback(lambda _f: _after_job(pool))
+    return future
+
+
+def map_chunks(fn: Callable, items) -> list:
+    """Ordered results of ``fn`` over ``items`` on the pool (expiry / month chunks)."""
+    return [future.result() for future in [submit_job(fn, item) for item in items]]
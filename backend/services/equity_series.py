@@ -0,0 +1,144 @@
+"""
+Downsampled equity / drawdown series
+
+PHASE 10: Columnar Results
+
+The results chart needs the shape of the curve, not every trade. For a
+stored result this module returns the Cumulative and %DD series reduced to a
+point budget:
+
+- Cumulative: Largest-Triangle-Three-Buckets (shape-preserving)
+- %DD: min/max per bucket, so every drawdown trough is kept exactly
+- Full-resolution arrays are cached per artifact (results are immutable),
+  so pan/zoom requests only re-bucket a slice
+
+Usage:
+    from services.equity_series import downsample_equity
+
+    series = downsample_equity(artifact_id, points=800, start='2020-01-01', end='2021-12-31')
+"""
+
+import os
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import polars as pl
+
+from services.result_artifacts import scan_result_artifact
+from services.trade_table import DATE_FORMAT
+
+EQUITY_CACHE_SIZE = int(os.getenv("EQUITY_CACHE_SIZE", "32"))
+MAX_EQUITY_POINTS = 10000
+
+
+@lru_cache(maxsize=EQUITY_CACHE_SIZE)
+def _equity_arrays(artifact_id: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """(exit dates, trade numbers, Cumulative, %DD) — one point per trade."""
+    lf = scan_result_artifact(artifact_id)
+    schema = lf.schema
+    if 'Cumulative' not in schema:
+        empty = np.array([], dtype=float)
+        return np.array([], dtype='datetime64[D]'), np.array([], dtype=np.int64), empty, empty
+    frame = (
+        lf.filter(pl.col('Cumulative').is_not_null())   # only a trade's first leg carries it
+          .select(
+              pl.col('Exit Date').cast(pl.Utf8).str.strptime(pl.Date, DATE_FORMAT, strict=False).alias('date'),
+              pl.col('Trade').cast(pl.Int64, strict=False).alias('trade'),
+              pl.col('Cumulative').cast(pl.Float64, strict=False).alias('cum'),
+              (pl.col('%DD').cast(pl.Float64, strict=False) if '%DD' in schema
+               else pl.lit(0.0)).fill_null(0.0).alias('dd'),
+          )
+          .collect()
+    )
+    return (
+        frame['date'].to_numpy().astype('datetime64[D]'),
+        frame['trade'].to_numpy(),
+        frame['cum'].to_numpy(),
+        frame['dd'].to_numpy(),
+    )
+
+
+def lttb_indices(y: np.ndarray, threshold: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets over positions 0..n-1; keeps both ends."""
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.arange(n, dtype=float)
+    every = (n - 2) / (threshold - 2)
+    out = np.empty(threshold, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_start, next_end = end, min(int((i + 2) * every) + 1, n)
+        if next_start >= next_end:
+            avg_x, avg_y = x[n - 1], y[n - 1]
+        else:
+            avg_x, avg_y = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(area.argmax())
+        out[i + 1] = a
+    return out
+
+
+def minmax_indices(y: np.ndarray, buckets: int) -> np.ndarray:
+    """Positions of each bucket's min and max (troughs are never dropped)."""
+    n = len(y)
+    if buckets * 2 >= n or buckets < 1:
+        return np.arange(n)
+    edges = np.linspace(0, n, buckets + 1).astype(np.int64)
+    keep = [0, n - 1]
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        if hi > lo:
+            window = y[lo:hi]
+            keep.append(lo + int(window.argmin()))
+            keep.append(lo + int(window.argmax()))
+    return np.unique(np.asarray(keep, dtype=np.int64))
+
+
+def _series(dates: np.ndarray, trades: np.ndarray, values: np.ndarray, idx: np.ndarray) -> Dict[str, list]:
+    return {
+        'date': [str(d) for d in dates[idx]],
+        'trade': trades[idx].tolist(),
+        'value': np.round(values[idx], 4).tolist(),
+    }
+
+
+def downsample_equity(
+    artifact_id: str,
+    points: int = 1000,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Cumulative (LTTB) and %DD (min/max buckets) within [start, end], ≈points each."""
+    points = max(3, min(int(points), MAX_EQUITY_POINTS))
+    dates, trades, cum, dd = _equity_arrays(artifact_id)
+
+    mask = np.ones(len(dates), dtype=bool)
+    if start:
+        mask &= dates >= np.datetime64(start, 'D')
+    if end:
+        mask &= dates <= np.datetime64(end, 'D')
+    dates, trades, cum, dd = dates[mask], trades[mask], cum[mask], dd[mask]
+
+    trough = int(dd.argmin()) if len(dd) else None
+    return {
+        'total_points': int(len(cum)),
+        'points': points,
+        'range': {
+            'start': str(dates[0]) if len(dates) else None,
+            'end': str(dates[-1]) if len(dates) else None,
+        },
+        'equity': _series(dates, trades, cum, lttb_indices(cum, points)),
+        'drawdown': _series(dates, trades, dd, minmax_indices(dd, points // 2)),
+        'max_drawdown': None if trough is None else {
+            'date': str(dates[trough]),
+            'trade': int(trades[trough]),
+            'value': round(float(dd[trough]), 4),
+        },
+    }
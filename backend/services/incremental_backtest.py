@@ -0,0 +1,446 @@
+"""
+Incremental "extend to latest data" backtests
+
+PHASE 8: Incremental Extension
+
+When new bhavcopy days are imported, a saved strategy is usually re-run with
+nothing but a later ``to_date``.  Instead of recomputing the whole history
+this module keeps a checkpoint of the last run in Redis and only simulates
+the expiries that were still open (or did not exist yet) at that point.
+
+Checkpoint contents (resume metadata only, a few hundred bytes):
+- run_id of the run in the durable result store (services.result_store);
+  its trades that entered before ``resume_entry`` (the first trade still
+  open at the end of the previous data range) are the completed ones
+- Cumulative equity / peak at the checkpoint (additive, base 100)
+- Trade counter, so appended trades keep sequential numbers
+- The symbol's data versions and the last trading date actually loaded
+
+Trade rows never go to Redis: without a stored run (store disabled or the
+run purged) there is no checkpoint and the next request runs in full.
+
+The checkpoint is judged by the data, not by the requested ``to_date``:
+imports since the checkpoint that only appended days after the last loaded
+date extend it (even for the same ``to_date``); an import or correction that
+touched covered days (services.data_version.changed_since) forces a full run.
+
+Re-entry chains never outlive their parent expiry's exit date, so they carry
+no state across the checkpoint: an open parent is simply recomputed together
+with its whole chain.
+
+Usage:
+    from services.incremental_backtest import extend_algotest_job
+
+    result = extend_algotest_job({**saved_strategy, "to_date": "2025-03-31"})
+    result["meta"]["incremental"]   # {"mode": "extend", "new_trades": 4, ...}
+"""
+
+import hashlib
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import orjson
+import pandas as pd
+import polars as pl
+
+from services.algotest_job import (
+    _clear_nan_equity,
+    _compute_trade_analytics,
+    _normalize_request,
+    execute_algotest_job,
+)
+from services.backtest_cache import CACHE_VERSION, get_backtest_cache
+from services.data_version import changed_since, data_versions
+from services.result_store import load_stored_result, store_result
+from services.trade_table import DATE_FORMAT, TradeTable
+
+logger = logging.getLogger(__name__)
+
+# Calendar days re-loaded before the checkpoint so DTE anchors of the first
+# open expiry resolve against a complete trading calendar.
+INCREMENTAL_LOOKBACK_DAYS = int(os.getenv("INCREMENTAL_LOOKBACK_DAYS", "62"))
+INCREMENTAL_STATE_TTL = int(os.getenv("INCREMENTAL_STATE_TTL", str(30 * 86400)))  # 30 days
+
+_STATE_KEY_PREFIX = "bt_state"
+
+
+def _state_key(payload: Dict[str, Any]) -> str:
+    """
+    Checkpoint key: the canonical request (engines.strategy_plan) without the
+    end of the date range, so alias spellings and disabled-feature settings
+    share one checkpoint exactly as they share a cache entry.
+    """
+    from engines.strategy_plan import canonical_request
+
+    canonical = canonical_request(payload)
+    canonical.pop('to_date', None)
+    digest = hashlib.sha256(
+        orjson.dumps(canonical, option=orjson.OPT_SORT_KEYS, default=str)
+    ).hexdigest()
+    return f"{_STATE_KEY_PREFIX}:{CACHE_VERSION}:{canonical['index']}:{canonical.get('from_date')}:{digest}"
+
+
+def _load_state(key: str) -> Optional[Dict[str, Any]]:
+    raw = get_backtest_cache().get_record(key)
+    if not raw:
+        return None
+    try:
+        state = orjson.loads(raw)
+    except orjson.JSONDecodeError as e:
+        logger.warning(f"[INCREMENTAL] Corrupt checkpoint {key}: {e}")
+        return None
+    # Checkpoints without versions / loaded_to cannot be validated, and ones
+    # without a stored run have no trades to resume from
+    if not (state.get('versions') and state.get('loaded_to') and state.get('run_id')):
+        return None
+    return state
+
+
+def _store_state(key: str, state: Dict[str, Any]) -> bool:
+    stored = get_backtest_cache().put_record(
+        key,
+        orjson.dumps(state, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY),
+        INCREMENTAL_STATE_TTL,
+    )
+    if stored:
+        logger.info(
+            f"[INCREMENTAL] Checkpoint saved: {key} → run {state['run_id']} "
+            f"({state['trade_count']} completed trades)"
+        )
+    return stored
+
+
+def _last_loaded_date(from_date: Any, to_date: Any) -> Optional[str]:
+    """Last trading date with data in [from_date, to_date] (what a run actually covers)."""
+    from base import get_trading_calendar
+
+    try:
+        calendar = get_trading_calendar(str(from_date), str(to_date))
+    except Exception as e:
+        logger.warning(f"[INCREMENTAL] Trading calendar unavailable: {e}")
+        return None
+    if calendar is None or calendar.empty:
+        return None
+    return pd.to_datetime(calendar['date']).max().strftime('%Y-%m-%d')
+
+
+def _trade_id(row: Dict[str, Any]) -> int:
+    try:
+        return int(str(row.get('Trade', 0) or 0))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _group_trades(rows: List[Dict[str, Any]]) -> List[Tuple[int, List[Dict[str, Any]]]]:
+    """Group leg rows by Trade, preserving trade order."""
+    groups: Dict[int, List[Dict[str, Any]]] = {}
+    for row in rows:
+        groups.setdefault(_trade_id(row), []).append(row)
+    return sorted(groups.items(), key=lambda item: item[0])
+
+
+def _trade_date(legs: List[Dict[str, Any]], col: str) -> Optional[pd.Timestamp]:
+    value = legs[0].get(col)
+    if value is None:
+        return None
+    ts = pd.to_datetime(value, dayfirst=True, errors='coerce')
+    return None if pd.isna(ts) else ts
+
+
+def _trade_cumulative(legs: List[Dict[str, Any]]) -> Optional[float]:
+    """Engine cumulative value of a trade (only the first leg row carries it)."""
+    for row in legs:
+        value = row.get('Cumulative')
+        if value is None:
+            continue
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            continue
+        if value == value:
+            return value
+    return None
+
+
+def _trade_pct_steps(groups) -> List[float]:
+    """Per-trade % P&L recovered from consecutive engine Cumulative values."""
+    steps = []
+    prev = 100.0
+    for _, legs in groups:
+        cum = _trade_cumulative(legs)
+        if cum is None:
+            steps.append(0.0)
+            continue
+        steps.append(cum - prev)
+        prev = cum
+    return steps
+
+
+def _build_checkpoint(
+    result: Dict[str, Any],
+    payload: Dict[str, Any],
+    versions: Dict[str, int],
+    loaded_to: Optional[str],
+) -> Optional[Dict[str, Any]]:
+    """
+    Split a finished result into completed trades and the open tail.
+    ``versions`` / ``loaded_to`` describe the data the run saw (taken before
+    it started, so an import during the run only makes the checkpoint stale).
+    The trades themselves stay in the result store under ``run_id``.
+
+    Any trade exiting on the last exit date of the run is treated as open
+    (it may have been clamped to the end of the data), as is everything that
+    entered on or after the earliest open trade.
+    """
+    run_id = (result.get('meta') or {}).get('run_id')
+    groups = _group_trades(result.get('trades') or [])
+    if not groups or loaded_to is None or not run_id:
+        return None
+
+    exit_dates = [_trade_date(legs, 'Exit Date') for _, legs in groups]
+    valid_exits = [d for d in exit_dates if d is not None]
+    if not valid_exits:
+        return None
+    last_exit = max(valid_exits)
+
+    entry_dates = [_trade_date(legs, 'Entry Date') for _, legs in groups]
+    open_entries = [
+        entry for entry, exit_ in zip(entry_dates, exit_dates)
+        if entry is not None and (exit_ is None or exit_ >= last_exit)
+    ]
+    resume_entry = min(open_entries) if open_entries else None
+
+    steps = _trade_pct_steps(groups)
+    completed = 0
+    cumulative = 100.0
+    peak = 100.0
+    for entry, step in zip(entry_dates, steps):
+        if entry is None or (resume_entry is not None and entry >= resume_entry):
+            continue
+        cumulative += step
+        peak = max(peak, cumulative)
+        completed += 1
+
+    if resume_entry is None:
+        resume_entry = last_exit + pd.Timedelta(days=1)
+
+    return {
+        'index': payload.get('index'),
+        'from_date': payload.get('from_date'),
+        'to_date': payload.get('to_date'),
+        'run_id': run_id,
+        'loaded_to': loaded_to,
+        'versions': versions,
+        'resume_entry': resume_entry.strftime('%Y-%m-%d'),
+        'cumulative': round(cumulative, 6),
+        'peak': round(peak, 6),
+        'trade_count': completed,
+    }
+
+
+def _completed_trades(state: Dict[str, Any], table: TradeTable) -> TradeTable:
+    """Legs of the stored run's trades that entered before the checkpoint."""
+    frame = table.frame
+    if not len(table) or 'Entry Date' not in frame.columns:
+        return TradeTable()
+    entry = pl.col('Entry Date')
+    if frame.schema['Entry Date'] == pl.Utf8:
+        entry = entry.str.strptime(pl.Date, DATE_FORMAT, strict=False)
+    resume_entry = pd.Timestamp(state['resume_entry']).date()
+    return TradeTable(frame.filter(entry.cast(pl.Date) < resume_entry))
+
+
+def _stitch_new_trades(
+    state: Dict[str, Any],
+    new_rows: List[Dict[str, Any]],
+) -> List[Dict[str, Any]]:
+    """
+    Keep trades of the tail run that enter on/after the checkpoint, renumber
+    them after the stored trades and continue the stored equity curve.
+    """
+    resume_entry = pd.Timestamp(state['resume_entry'])
+    groups = _group_trades(new_rows)
+    steps = _trade_pct_steps(groups)
+
+    cumulative = float(state['cumulative'])
+    peak = float(state['peak'])
+    trade_no = int(state['trade_count'])
+    appended: List[Dict[str, Any]] = []
+
+    for (_, legs), step in zip(groups, steps):
+        entry = _trade_date(legs, 'Entry Date')
+        if entry is None or entry < resume_entry:
+            continue
+        trade_no += 1
+        cumulative += step
+        peak = max(peak, cumulative)
+        dd = cumulative - peak
+        pct_dd = (dd / peak) if peak != 0 else 0.0
+        first = True
+        for row in legs:
+            row = dict(row)
+            row['Trade'] = trade_no
+            row['Index'] = trade_no
+            if first:
+                row['Cumulative'] = round(cumulative, 2)
+                row['Peak'] = round(peak, 2)
+                row['DD'] = round(dd, 2)
+                row['%DD'] = round(pct_dd * 100, 4)
+                first = False
+            else:
+                row['Cumulative'] = None
+                row['Peak'] = None
+                row['DD'] = None
+                row['%DD'] = None
+            appended.append(row)
+
+    return appended
+
+
+def _supports_incremental(payload: Dict[str, Any]) -> bool:
+    """Fixed entry mode forces the first entry to the segment start, so a
+    resumed range would place entries differently from a full run."""
+    return str(payload.get('filter_entry_mode', 'dte') or 'dte').lower().strip() != 'fixed'
+
+
+def _full_run(payload: Dict[str, Any], key: str, reason: str, versions: Dict[str, int]) -> Dict[str, Any]:
+    logger.info(f"[INCREMENTAL] Full run ({reason})")
+    loaded_to = _last_loaded_date(payload.get('from_date'), payload.get('to_date'))
+    result = execute_algotest_job(payload)
+    if result.get('status') == 'success':
+        checkpoint = _build_checkpoint(result, payload, versions, loaded_to)
+        if checkpoint is not None:
+            _store_state(key, checkpoint)
+    result.setdefault('meta', {})['incremental'] = {'mode': 'full', 'reason': reason}
+    return result
+
+
+def extend_algotest_job(request: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Run an AlgoTest backtest, re-using the stored checkpoint of the same
+    strategy when the data it covered is unchanged and only new trading days
+    (up to ``to_date``) are missing.
+    """
+    payload = _normalize_request(request)
+    key = _state_key(payload)
+
+    if not _supports_incremental(payload):
+        return execute_algotest_job(payload)
+
+    index = str(payload.get('index', 'NIFTY')).upper()
+    versions = data_versions(index)  # before any run: a concurrent import only makes us stale
+    state = _load_state(key)
+    if state is None:
+        return _full_run(payload, key, 'no checkpoint', versions)
+
+    new_to = pd.to_datetime(payload.get('to_date'))
+    old_to = pd.to_datetime(state.get('to_date'))
+    if pd.isna(new_to) or pd.isna(old_to) or new_to < old_to:
+        return _full_run(payload, key, 'to_date moved backwards', versions)
+
+    changed_from = changed_since(index, state['versions'])
+    if changed_from is not None and changed_from <= state['loaded_to']:
+        return _full_run(payload, key, f"data changed from {changed_from}", versions)
+
+    loaded_to = _last_loaded_date(payload.get('from_date'), payload.get('to_date'))
+    if loaded_to is None:
+        return _full_run(payload, key, 'trading calendar unavailable', versions)
+
+    try:
+        stored = load_stored_result(state['run_id'], as_table=True)
+    except Exception as e:
+        logger.warning(f"[INCREMENTAL] Stored run {state['run_id']} unreadable: {e}")
+        stored = None
+    if stored is None:
+        return _full_run(payload, key, 'checkpoint run no longer stored', versions)
+
+    if loaded_to <= state['loaded_to']:
+        # No trading day with data beyond the checkpoint: it is the answer
+        return {
+            'status': 'success',
+            'trades': stored['trades'].to_records(),
+            'summary': stored['summary'],
+            'pivot': stored['pivot'],
+            'meta': {
+                'index': payload.get('index'),
+                'from_date': payload.get('from_date'),
+                'to_date': payload.get('to_date'),
+                'run_id': state['run_id'],
+                'incremental': {'mode': 'checkpoint', 'new_trades': 0, 'loaded_to': state['loaded_to']},
+            },
+            'cached': True,
+        }
+
+    t0 = time.perf_counter()
+    resume_entry = pd.Timestamp(state['resume_entry'])
+    lookback_from = max(
+        pd.to_datetime(payload.get('from_date')),
+        resume_entry - pd.Timedelta(days=INCREMENTAL_LOOKBACK_DAYS),
+    )
+
+    tail_payload = dict(payload)
+    tail_payload['from_date'] = lookback_from.strftime('%Y-%m-%d')
+    tail_payload['to_date'] = new_to.strftime('%Y-%m-%d')
+    tail_payload.pop('date_from', None)
+    tail_payload.pop('date_to', None)
+
+    tail = execute_algotest_job(tail_payload)
+    if tail.get('status') != 'success':
+        return tail
+
+    appended = _stitch_new_trades(state, tail.get('trades') or [])
+    all_trades = _completed_trades(state, stored['trades']).to_records() + appended
+
+    result_summary: Dict[str, Any] = {}
+    result_pivot: Dict[str, Any] = {"headers": [], "rows": []}
+    if all_trades:
+        try:
+            all_trades, result_summary, result_pivot = _compute_trade_analytics(all_trades)
+        except Exception as e:
+            logger.warning(f"[INCREMENTAL] Analytics on stitched trades failed, falling back to full run: {e}")
+            return _full_run(payload, key, 'analytics failed', versions)
+    _clear_nan_equity(all_trades)
+
+    result = orjson.loads(orjson.dumps({
+        'status': 'success',
+        'trades': all_trades,
+        'summary': result_summary,
+        'pivot': result_pivot,
+        'meta': {
+            **(tail.get('meta') or {}),
+            'from_date': payload.get('from_date'),
+            'to_date': payload.get('to_date'),
+            'date_range': f"{payload.get('from_date')} to {payload.get('to_date')}",
+            'incremental': {
+                'mode': 'extend',
+                'resumed_from': state['resume_entry'],
+                'loaded_to': loaded_to,
+                'reused_trades': int(state['trade_count']),
+                'new_trades': len({r['Trade'] for r in appended}),
+                'elapsed_s': round(time.perf_counter() - t0, 3),
+            },
+        },
+        'cached': False,
+    }, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY))
+
+    # The stitched run becomes the next checkpoint's trades (and answers
+    # repeat requests from the store like any other run)
+    store_result(payload, result)
+    checkpoint = _build_checkpoint(result, payload, versions, loaded_to)
+    if checkpoint is not None:
+        _store_state(key, checkpoint)
+
+    logger.info(
+        f"[INCREMENTAL] {payload.get('index')} extended {state['loaded_to']} → {loaded_to}: "
+        f"{result['meta']['incremental']['new_trades']} new trades in "
+        f"{result['meta']['incremental']['elapsed_s']}s"
+    )
+    return result
+
+
+def clear_incremental_state(request: Dict[str, Any]) -> bool:
+    """Drop the stored checkpoint for a strategy (forces the next run to be full)."""
+    payload = _normalize_request(request)
+    return get_backtest_cache().delete_record(_state_key(payload))
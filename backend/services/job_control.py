@@ -0,0 +1,407 @@
+"""
+Live job progress over Redis pub/sub
+
+PHASE 11: Live Job Control
+
+A Celery backtest publishes what it is doing while it runs, so clients can
+subscribe (SSE) instead of polling the job status:
+
+- progress: stage, trades done / total, running stats (P&L, win %, equity, max DD)
+- trades:   partial batches of closed trades (numbered by ``seq``)
+- status:   terminal state (completed / failed / cancelled)
+
+The latest progress snapshot and the trade batches are also kept in Redis
+for JOB_EVENTS_TTL so a late subscriber can catch up before live events.
+
+Each worker process runs one task at a time, so the running job is a
+process-wide handle the engine reaches through current_job() — no callback
+has to travel inside the (JSON) task payload.
+
+Cancellation is cooperative: request_cancel() raises a Redis flag that the
+engine checks between expiries and date chunks (the trades finished so far
+are returned as a partial result), and cancels any bulk query the job has
+registered with cancellable_query() via pg_cancel_backend.
+
+Usage:
+    with job_context(task_id, on_progress=meta_callback) as job:
+        ...                               # engine calls current_job().step(...)
+        job.finish('completed')
+
+    StreamingResponse(job_event_stream(job_id), media_type='text/event-stream')
+
+    request_cancel(job_id)                # API: flag + pg_cancel_backend
+"""
+
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+import orjson
+import redis
+
+logger = logging.getLogger(__name__)
+
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379/0")
+JOB_EVENTS_TTL = int(os.getenv("JOB_EVENTS_TTL", "3600"))
+JOB_PROGRESS_INTERVAL_S = float(os.getenv("JOB_PROGRESS_INTERVAL_S", "0.5"))
+JOB_TRADE_BATCH = int(os.getenv("JOB_TRADE_BATCH", "50"))
+SSE_HEARTBEAT_S = float(os.getenv("SSE_HEARTBEAT_S", "15"))
+JOB_CANCEL_POLL_S = float(os.getenv("JOB_CANCEL_POLL_S", "1.0"))
+
+TERMINAL_STATES = ('completed', 'failed', 'cancelled')
+
+_redis_client: Optional[redis.Redis] = None
+_current: Optional['JobControl'] = None
+
+
+def events_channel(job_id: str) -> str:
+    return f"algotest:job:{job_id}:events"
+
+
+def _progress_key(job_id: str) -> str:
+    return f"algotest:job:{job_id}:progress"
+
+
+def _trades_key(job_id: str) -> str:
+    return f"algotest:job:{job_id}:trades"
+
+
+def _status_key(job_id: str) -> str:
+    return f"algotest:job:{job_id}:status"
+
+
+def _cancel_key(job_id: str) -> str:
+    return f"algotest:job:{job_id}:cancel"
+
+
+def _backends_key(job_id: str) -> str:
+    return f"algotest:job:{job_id}:pg_pids"
+
+
+class JobCancelled(Exception):
+    """Raised where a cancelled job cannot simply stop early (e.g. a cancelled bulk query)."""
+
+
+def _get_redis_client() -> Optional[redis.Redis]:
+    global _redis_client
+    if _redis_client is None:
+        try:
+            client = redis.Redis.from_url(REDIS_URL)
+            client.ping()
+            _redis_client = client
+        except redis.RedisError as exc:
+            logger.warning("[JOB] Unable to connect to Redis for progress events: %s", exc)
+            return None
+    return _redis_client
+
+
+def _fmt_date(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    if hasattr(value, 'strftime'):
+        return value.strftime('%d-%m-%Y')
+    return str(value)[:10]
+
+
+class JobControl:
+    """Progress publisher for one running job (or one shard of it)."""
+
+    def __init__(
+        self,
+        job_id: str,
+        on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+        shard: Optional[int] = None,
+    ):
+        self.job_id = job_id
+        self.shard = shard
+        self._on_progress = on_progress
+        self._started = time.monotonic()
+        self._last_emit = 0.0
+        self.stage = 'Running backtest'
+        self.done = 0
+        self.total = 0
+        # Running stats over closed trades (additive % equity from 100, like the engine)
+        self._trades = 0
+        self._wins = 0
+        self._pnl = 0.0
+        self._equity = 100.0
+        self._peak = 100.0
+        self._max_dd = 0.0
+        self._batch: List[Dict[str, Any]] = []
+        self._seq = 0
+        self._cancelled = False
+        self._cancel_checked = 0.0
+
+    # ── Engine hooks ─────────────────────────────────────────────────────────
+    def set_stage(self, stage: str) -> None:
+        self.stage = stage
+        self.done = 0
+        self.total = 0
+        self._emit_progress(force=True)
+
+    def step(self, done: int, total: int) -> None:
+        """Called before each scheduled entry."""
+        self.done = done
+        self.total = total
+        self._emit_progress()
+
+    def trade_closed(self, trade: Dict[str, Any]) -> None:
+        """Called for every recorded trade (re-entries included)."""
+        net = float(trade.get('net_pnl') or 0.0)
+        pct = float(trade.get('net_pnl_pct') or 0.0) * 100
+        self._trades += 1
+        self._wins += 1 if net > 0 else 0
+        self._pnl += net
+        self._equity += pct
+        self._peak = max(self._peak, self._equity)
+        self._max_dd = min(self._max_dd, self._equity - self._peak)
+        self._batch.append({
+            'entry_date': _fmt_date(trade.get('entry_date')),
+            'exit_date': _fmt_date(trade.get('exit_date')),
+            'net_pnl': round(net, 2),
+            'pct_pnl': round(pct, 2),
+            'exit_reason': trade.get('exit_reason'),
+            'legs': len(trade.get('legs') or []),
+        })
+        if len(self._batch) >= JOB_TRADE_BATCH:
+            self._flush_trades()
+
+    # ── Cancellation ─────────────────────────────────────────────────────────
+    def cancelled(self, refresh: bool = False) -> bool:
+        """True once cancel was requested (Redis is read at most every JOB_CANCEL_POLL_S)."""
+        if self._cancelled:
+            return True
+        now = time.monotonic()
+        if not refresh and now - self._cancel_checked < JOB_CANCEL_POLL_S:
+            return False
+        self._cancel_checked = now
+        client = _get_redis_client()
+        if client is None:
+            return False
+        try:
+            self._cancelled = bool(client.exists(_cancel_key(self.job_id)))
+        except redis.RedisError:
+            return False
+        return self._cancelled
+
+    def track_backend(self, pid: int) -> None:
+        client = _get_redis_client()
+        if client is None:
+            return
+        try:
+            pipe = client.pipeline(transaction=False)
+            pipe.sadd(_backends_key(self.job_id), pid)
+            pipe.expire(_backends_key(self.job_id), JOB_EVENTS_TTL)
+            pipe.execute()
+        except redis.RedisError as exc:
+            logger.debug("[JOB] could not register backend %s for %s: %s", pid, self.job_id, exc)
+
+    def untrack_backend(self, pid: int) -> None:
+        client = _get_redis_client()
+        if client is None:
+            return
+        try:
+            client.srem(_backends_key(self.job_id), pid)
+        except redis.RedisError:
+            pass
+
+    # ── Snapshot / publishing ────────────────────────────────────────────────
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'stage': self.stage,
+            'shard': self.shard,
+            'done': self.done,
+            'total': self.total,
+            'pct_complete': round(100.0 * self.done / self.total, 1) if self.total else None,
+            'elapsed_s': round(time.monotonic() - self._started, 1),
+            'stats': {
+                'trades': self._trades,
+                'win_pct': round(100.0 * self._wins / self._trades, 2) if self._trades else 0.0,
+                'total_pnl': round(self._pnl, 2),
+                'equity': round(self._equity, 2),
+                'max_dd': round(self._max_dd, 2),
+            },
+        }
+
+    def _publish(self, event: str, data: Dict[str, Any], keep: Optional[str] = None) -> None:
+        client = _get_redis_client()
+        if client is None:
+            return
+        body = orjson.dumps(data)
+        try:
+            pipe = client.pipeline(transaction=False)
+            if keep == 'set':
+                pipe.set(_progress_key(self.job_id), body, ex=JOB_EVENTS_TTL)
+            elif keep == 'list':
+                pipe.rpush(_trades_key(self.job_id), body)
+                pipe.expire(_trades_key(self.job_id), JOB_EVENTS_TTL)
+            elif keep == 'status':
+                pipe.set(_status_key(self.job_id), body, ex=JOB_EVENTS_TTL)
+            pipe.publish(events_channel(self.job_id), orjson.dumps({'event': event, 'data': data}))
+            pipe.execute()
+        except redis.RedisError as exc:
+            logger.debug("[JOB] progress publish failed for %s: %s", self.job_id, exc)
+
+    def _flush_trades(self) -> None:
+        if not self._batch:
+            return
+        self._seq += 1
+        self._publish('trades', {'seq': self._seq, 'shard': self.shard, 'rows': self._batch}, keep='list')
+        self._batch = []
+
+    def _emit_progress(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self._last_emit < JOB_PROGRESS_INTERVAL_S:
+            return
+        self._last_emit = now
+        self._flush_trades()
+        snap = self.snapshot()
+        self._publish('progress', snap, keep='set')
+        if self._on_progress is not None:
+            label = f"{self.stage}: {self.done}/{self.total} entries" if self.total else self.stage
+            try:
+                self._on_progress({'status': label, 'progress': snap})
+            except Exception as exc:
+                logger.debug("[JOB] progress callback failed: %s", exc)
+
+    def finish(self, state: str, **extra: Any) -> None:
+        """Publish the terminal status (job-level only — never from a shard)."""
+        if state == 'completed' and self.total:
+            self.done = self.total
+        self._flush_trades()
+        self._publish('progress', self.snapshot(), keep='set')
+        self._publish('status', {'state': state, **extra}, keep='status')
+
+
+@contextmanager
+def job_context(job_id: Optional[str], **kwargs: Any):
+    """Make a JobControl the current job for the duration of a task."""
+    global _current
+    if not job_id:
+        yield None
+        return
+    previous = _current
+    _current = JobControl(job_id, **kwargs)
+    try:
+        yield _current
+    finally:
+        _current = previous
+
+
+def current_job() -> Optional[JobControl]:
+    return _current
+
+
+@contextmanager
+def cancellable_query(conn):
+    """
+    Register the connection's backend pid with the current job while a long
+    query runs, so request_cancel() can pg_cancel_backend it.
+    """
+    job = _current
+    if job is None:
+        yield None
+        return
+    from sqlalchemy import text
+
+    pid = conn.execute(text("SELECT pg_backend_pid()")).scalar()
+    job.track_backend(pid)
+    try:
+        if job.cancelled():
+            raise JobCancelled(job.job_id)
+        yield job
+    finally:
+        job.untrack_backend(pid)
+
+
+def request_cancel(job_id: str, queued: bool = False) -> Dict[str, Any]:
+    """
+    Flag a job as cancelled and cancel its in-flight bulk queries. For a job
+    that never started (``queued``) the terminal status is published here,
+    since no worker will.
+    """
+    client = _get_redis_client()
+    if client is None:
+        return {'flagged': False, 'queries_cancelled': 0}
+    try:
+        client.set(_cancel_key(job_id), 1, ex=JOB_EVENTS_TTL)
+        pids = [int(p) for p in client.smembers(_backends_key(job_id))]
+    except redis.RedisError as exc:
+        logger.warning("[JOB] cancel flag failed for %s: %s", job_id, exc)
+        return {'flagged': False, 'queries_cancelled': 0}
+
+    cancelled = 0
+    if pids:
+        from sqlalchemy import text
+        from database import get_engine
+
+        try:
+            with get_engine().connect() as conn:
+                for pid in pids:
+                    if conn.execute(text("SELECT pg_cancel_backend(:pid)"), {'pid': pid}).scalar():
+                        cancelled += 1
+        except Exception as exc:
+            logger.warning("[JOB] pg_cancel_backend failed for %s: %s", job_id, exc)
+    if queued:
+        JobControl(job_id).finish('cancelled', partial=False)
+    logger.info("[JOB] cancel requested for %s (%d queries cancelled)", job_id, cancelled)
+    return {'flagged': True, 'queries_cancelled': cancelled}
+
+
+# ── Subscriber side (API) ─────────────────────────────────────────────────────
+
+def _sse(event: str, data: Any) -> bytes:
+    body = data if isinstance(data, (bytes, bytearray)) else orjson.dumps(data)
+    return b'event: ' + event.encode() + b'\ndata: ' + bytes(body) + b'\n\n'
+
+
+async def job_event_stream(
+    job_id: str,
+    job_state: Optional[Callable[[], Awaitable[Optional[Dict[str, Any]]]]] = None,
+) -> AsyncIterator[bytes]:
+    """
+    SSE byte stream for one job: catch-up snapshot, then live events until a
+    terminal status. ``job_state`` (async — it runs on the event loop) is
+    awaited on heartbeats so a job that died without publishing (worker
+    crash) still ends the stream.
+    """
+    import redis.asyncio as aioredis
+
+    client = aioredis.from_url(REDIS_URL)
+    pubsub = client.pubsub()
+    try:
+        await pubsub.subscribe(events_channel(job_id))
+
+        snapshot = await client.get(_progress_key(job_id))
+        if snapshot:
+            yield _sse('progress', snapshot)
+        for batch in await client.lrange(_trades_key(job_id), 0, -1):
+            yield _sse('trades', batch)
+        status = await client.get(_status_key(job_id))
+        if status:
+            yield _sse('status', status)
+            return
+
+        while True:
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=SSE_HEARTBEAT_S)
+            if message is None:
+                state = await job_state() if job_state else None
+                if state and state.get('state') in TERMINAL_STATES:
+                    yield _sse('status', state)
+                    return
+                yield b': keep-alive\n\n'
+                continue
+            payload = orjson.loads(message['data'])
+            yield _sse(payload['event'], payload['data'])
+            if payload['event'] == 'status':
+                return
+    finally:
+        try:
+            await pubsub.unsubscribe()
+            await pubsub.close()
+            await client.close()
+        except Exception:
+            pass
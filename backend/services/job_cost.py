@@ -0,0 +1,261 @@
+"""
+AlgoTest job cost estimation and queue routing
+
+PHASE 12: Job Scheduling
+
+Before a job is queued its cost is predicted from the request alone:
+
+- Rows to load: option rows per trading day for the symbol (PostgreSQL
+  planner statistics — pg_class.reltuples and the pg_stats symbol / date
+  frequencies — no table scan) × trading days in the range
+- Resident bytes: rows × bytes per loaded row × in-memory overhead
+  (Polars frame plus the per-date partitions built by bulk_load_options)
+- Runtime: load time + per-leg, per-day engine time, scaled up for
+  SL/target path checks and re-entries
+
+The estimate picks one of three queues, each served by workers with a
+matching memory limit (docker-compose), so short jobs no longer wait behind
+18-year runs. At start, a worker defers a job whose predicted footprint does
+not fit in its free memory (container cgroup limit, else host) instead of
+being OOM-killed mid-load.
+
+Usage:
+    from services.job_cost import estimate_job_cost, fits_in_memory
+
+    cost = estimate_job_cost(payload)
+    run_algotest_job.apply_async(args=[payload], queue=cost.queue)
+"""
+
+import logging
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+QUEUE_SHORT = os.getenv("BACKTEST_QUEUE_SHORT", "backtests_short")
+QUEUE_LONG = os.getenv("BACKTEST_QUEUE_LONG", "backtests")
+QUEUE_HUGE = os.getenv("BACKTEST_QUEUE_HUGE", "backtests_huge")
+BACKTEST_QUEUES = (QUEUE_SHORT, QUEUE_LONG, QUEUE_HUGE)
+
+# Routing thresholds
+COST_SHORT_MAX_S = float(os.getenv("COST_SHORT_MAX_S", "30"))
+COST_SHORT_MAX_MB = int(os.getenv("COST_SHORT_MAX_MB", "300"))
+COST_HUGE_MIN_S = float(os.getenv("COST_HUGE_MIN_S", "600"))
+COST_HUGE_MIN_MB = int(os.getenv("COST_HUGE_MIN_MB", "1000"))
+
+# Model constants (calibrate against [JOB] timings in the worker logs)
+COST_DEFAULT_ROWS_PER_DAY = float(os.getenv("COST_DEFAULT_ROWS_PER_DAY", "3000"))
+COST_BYTES_PER_ROW = float(os.getenv("COST_BYTES_PER_ROW", "96"))
+COST_MEMORY_OVERHEAD = float(os.getenv("COST_MEMORY_OVERHEAD", "2.5"))
+COST_LOAD_ROWS_PER_S = float(os.getenv("COST_LOAD_ROWS_PER_S", "150000"))
+COST_LEG_DAY_S = float(os.getenv("COST_LEG_DAY_S", "0.004"))
+COST_SL_FACTOR = float(os.getenv("COST_SL_FACTOR", "1.6"))
+COST_REENTRY_FACTOR = float(os.getenv("COST_REENTRY_FACTOR", "1.4"))
+# Bulk loads run in chunks of this many years (algotest_job), which caps residency
+BULK_LOAD_CHUNK_YEARS = int(os.getenv("BULK_LOAD_CHUNK_YEARS", "3"))
+
+# Deferral when a job does not fit the worker's free memory
+COST_DEFER_S = int(os.getenv("COST_DEFER_S", "20"))
+COST_DEFER_MAX = int(os.getenv("COST_DEFER_MAX", "15"))
+COST_MEMORY_HEADROOM_MB = int(os.getenv("COST_MEMORY_HEADROOM_MB", "200"))
+
+_TRADING_DAYS_PER_YEAR = 248
+_STATS_TTL_S = 3600
+_MB = 1024 * 1024
+
+_stats: Optional[Tuple[str, Dict[str, float], float]] = None  # (data version, rows/day by symbol, loaded at)
+_stats_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class JobCost:
+    """Predicted footprint of one AlgoTest job."""
+    symbol: str
+    trading_days: int
+    legs: int
+    rows: int
+    resident_bytes: int
+    runtime_s: float
+    queue: str
+
+    def as_dict(self) -> Dict[str, Any]:
+        out = asdict(self)
+        out['resident_mb'] = round(self.resident_bytes / _MB, 1)
+        out['runtime_s'] = round(self.runtime_s, 1)
+        return out
+
+
+# ── Row-count metadata ────────────────────────────────────────────────────────
+
+def _load_rows_per_day() -> Dict[str, float]:
+    """
+    Option rows per trading day by symbol, from the planner statistics
+    ANALYZE keeps for option_data (pg_class / pg_stats) — no table scan.
+    """
+    from sqlalchemy import text
+    from database import get_engine
+
+    with get_engine().begin() as conn:
+        total = conn.execute(text(
+            "SELECT reltuples FROM pg_class WHERE relname = 'option_data'"
+        )).scalar() or 0
+        rows = conn.execute(text(
+            "SELECT attname, n_distinct, most_common_vals::text AS vals, most_common_freqs AS freqs "
+            "FROM pg_stats WHERE schemaname = 'public' AND tablename = 'option_data' "
+            "AND attname IN ('symbol', 'trade_date', 'date')"
+        )).fetchall()
+    total = float(total)
+    if total <= 0:
+        return {}
+
+    days = 0.0
+    freqs: Dict[str, float] = {}
+    for attname, n_distinct, vals, col_freqs in rows:
+        if attname == 'symbol' and vals and col_freqs:
+            names = [v.strip().strip('"').upper() for v in vals.strip('{}').split(',')]
+            freqs = dict(zip(names, (float(f) for f in col_freqs)))
+        elif attname in ('trade_date', 'date') and n_distinct:
+            # Negative n_distinct is a fraction of the row count
+            days = max(days, -n_distinct * total if n_distinct < 0 else float(n_distinct))
+    if days <= 0:
+        return {}
+    return {symbol: total * freq / days for symbol, freq in freqs.items()}
+
+
+def rows_per_day(symbol: str) -> float:
+    """Option rows per trading day for ``symbol`` (default when unknown)."""
+    global _stats
+    from services.data_version import data_version_key
+
+    version = data_version_key()
+    now = time.monotonic()
+    stats = _stats
+    if stats is None or stats[0] != version or now - stats[2] > _STATS_TTL_S:
+        with _stats_lock:
+            stats = _stats
+            if stats is None or stats[0] != version or now - stats[2] > _STATS_TTL_S:
+                try:
+                    per_symbol = _load_rows_per_day()
+                except Exception as exc:
+                    logger.warning("[COST] Row statistics unavailable: %s", exc)
+                    per_symbol = {}
+                stats = _stats = (version, per_symbol, now)
+    return stats[1].get(symbol.upper()) or COST_DEFAULT_ROWS_PER_DAY
+
+
+# ── Estimate ──────────────────────────────────────────────────────────────────
+
+def _trading_days(from_date: Optional[str], to_date: Optional[str]) -> int:
+    try:
+        start = datetime.strptime(str(from_date)[:10], '%Y-%m-%d')
+        end = datetime.strptime(str(to_date)[:10], '%Y-%m-%d')
+    except (TypeError, ValueError):
+        return _TRADING_DAYS_PER_YEAR
+    return max(1, int(abs((end - start).days) * _TRADING_DAYS_PER_YEAR / 365.25))
+
+
+def _has_sl_or_target(request: Dict[str, Any]) -> bool:
+    if request.get('overall_sl_value') is not None or request.get('overall_target_value') is not None:
+        return True
+    for leg in request.get('legs') or []:
+        if leg.get('stop_loss') is not None or leg.get('target') is not None:
+            return True
+        for block in (leg.get('stopLoss'), leg.get('targetProfit')):
+            if isinstance(block, dict) and block.get('value') not in (None, '', 0):
+                return True
+    return False
+
+
+def route_queue(resident_bytes: int, runtime_s: float) -> str:
+    if resident_bytes >= COST_HUGE_MIN_MB * _MB or runtime_s >= COST_HUGE_MIN_S:
+        return QUEUE_HUGE
+    if resident_bytes <= COST_SHORT_MAX_MB * _MB and runtime_s <= COST_SHORT_MAX_S:
+        return QUEUE_SHORT
+    return QUEUE_LONG
+
+
+def estimate_dataset(symbol: str, from_date: Optional[str], to_date: Optional[str]) -> Tuple[int, int, float]:
+    """Rows, resident bytes and cold load seconds of one symbol / date range."""
+    days = _trading_days(from_date, to_date)
+    per_day = rows_per_day(symbol)
+    rows = int(per_day * days)
+    # Only one chunk of years is resident at a time
+    resident_days = min(days, BULK_LOAD_CHUNK_YEARS * _TRADING_DAYS_PER_YEAR)
+    resident = int(per_day * resident_days * COST_BYTES_PER_ROW * COST_MEMORY_OVERHEAD)
+    return rows, resident, rows / COST_LOAD_ROWS_PER_S
+
+
+def estimate_job_cost(request: Dict[str, Any]) -> JobCost:
+    """Predict rows, resident bytes, runtime and queue for an AlgoTest request."""
+    from engines.strategy_plan import canonical_request
+
+    canonical = canonical_request(request)
+    symbol = canonical['index']
+    days = _trading_days(canonical.get('from_date'), canonical.get('to_date'))
+    legs = max(1, len(canonical.get('legs') or []))
+
+    rows, resident, load_s = estimate_dataset(symbol, canonical.get('from_date'), canonical.get('to_date'))
+
+    engine_s = days * legs * COST_LEG_DAY_S
+    if _has_sl_or_target(canonical):
+        engine_s *= COST_SL_FACTOR
+    if canonical.get('re_entry_enabled'):
+        engine_s *= COST_REENTRY_FACTOR
+    runtime = load_s + engine_s
+
+    return JobCost(
+        symbol=symbol,
+        trading_days=days,
+        legs=legs,
+        rows=rows,
+        resident_bytes=resident,
+        runtime_s=runtime,
+        queue=route_queue(resident, runtime),
+    )
+
+
+# ── Admission ─────────────────────────────────────────────────────────────────
+
+def _read_int(path: Path) -> Optional[int]:
+    try:
+        value = path.read_text().strip()
+    except OSError:
+        return None
+    return int(value) if value.isdigit() else None
+
+
+def available_memory_bytes() -> int:
+    """Free memory for this worker: the container cgroup headroom, capped by the host."""
+    import psutil
+
+    available = int(psutil.virtual_memory().available)
+    for limit_file, usage_file in (
+        (Path('/sys/fs/cgroup/memory.max'), Path('/sys/fs/cgroup/memory.current')),                       # v2
+        (Path('/sys/fs/cgroup/memory/memory.limit_in_bytes'), Path('/sys/fs/cgroup/memory/memory.usage_in_bytes')),  # v1
+    ):
+        limit, usage = _read_int(limit_file), _read_int(usage_file)
+        if limit is not None and usage is not None and limit < (1 << 60):
+            available = min(available, max(0, limit - usage))
+            break
+    return available
+
+
+def _reclaimable_bytes() -> int:
+    """Bulk data already resident in this process, replaced by the next load."""
+    try:
+        from services import data_loader
+        df = data_loader._bulk_options_df
+        return int(df.estimated_size()) if df is not None else 0
+    except Exception:
+        return 0
+
+
+def fits_in_memory(cost: JobCost) -> bool:
+    need = cost.resident_bytes + COST_MEMORY_HEADROOM_MB * _MB
+    return need <= available_memory_bytes() + _reclaimable_bytes()
@@ -29,13 +29,15 @@ import importlib
 import os
 import logging
 import multiprocessing as mp
-from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures import FIRST_COMPLETED, as_completed, wait
 from typing import List, Dict, Any, Optional, Callable
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 import pandas as pd
 import numpy as np
 
+from services.engine_pool import submit_job
+
 logger = logging.getLogger(__name__)
 
 
@@ -181,24 +183,24 @@ class ParallelExecutor:
         logger.info(f"[PARALLEL] Starting {len(chunks)} parallel backtests...")
         
         backtest_func_path = f"{backtest_func.__module__}.{backtest_func.__name__}"
-        with ProcessPoolExecutor(max_workers=self._max_workers) as executor:
-            futures = {
-                executor.submit(
-                    _run_single_backtest_worker,
-                    {
-                        "chunk_id": chunk.chunk_id,
-                        "params": chunk.params,
-                        "from_date": chunk.from_date,
-                        "to_date": chunk.to_date,
-                    },
-                    backtest_func_path
-                ): chunk
-                for chunk in chunks
-            }
-            
-            for future in as_completed(futures):
-                result = future.result()
-                results.append(result)
+        # Chunks run on the persistent engine pool (children pre-imported,
+        # dataset attached); at most max_workers of them in flight
+        pending = set()
+        for chunk in chunks:
+            if len(pending) >= self._max_workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                results.extend(future.result() for future in done)
+            pending.add(submit_job(
+                _run_single_backtest_worker,
+                {
+                    "chunk_id": chunk.chunk_id,
+                    "params": chunk.params,
+                    "from_date": chunk.from_date,
+                    "to_date": chunk.to_date,
+                },
+                backtest_func_path
+            ))
+        results.extend(future.result() for future in as_completed(pending))
         
         results.sort(key=lambda x: x.chunk_id)
         success_count = sum(1 for r in results if r.success)
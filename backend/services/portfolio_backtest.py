@@ -0,0 +1,358 @@
+"""
+Multi-Strategy Portfolio Backtest
+
+PHASE 11: Portfolio Runs
+
+Features:
+- Runs several AlgoTest strategy configs (NIFTY and/or BANKNIFTY) as one book
+- Each index's dataset is bulk-loaded ONCE per date chunk and shared by every
+  strategy on that index (optionally across forked workers, copy-on-write)
+- Date-aligned combined equity curve and drawdown on one business-day calendar
+- Margin-free exposure by day (open trades, open legs, gross notional)
+- Per-strategy attribution from a single vectorized groupby
+- All or nothing: if any strategy fails on any chunk the run is an error,
+  never a book curve / drawdown computed over the strategies that survived
+
+Units follow the engine: each trade contributes its '% P&L' (points as a %
+of entry spot), summed additively from a base of 100. That keeps strategies
+on different indices comparable and makes the combined drawdown the
+drawdown of the book, not a sum of per-strategy drawdowns.
+
+Usage:
+    from services.portfolio_backtest import execute_portfolio_job
+
+    result = execute_portfolio_job({
+        "from_date": "2022-01-01",
+        "to_date": "2024-12-31",
+        "strategies": [
+            {"name": "Nifty short straddle", "index": "NIFTY", "legs": [...], ...},
+            {"name": "BN iron fly", "index": "BANKNIFTY", "weight": 0.5, "legs": [...], ...},
+        ],
+    })
+"""
+
+import logging
+import multiprocessing as mp
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from base import bulk_load_options
+from engines.generic_algotest_engine import run_algotest_backtest
+from services.algotest_job import (
+    _BULK_LOAD_CHUNK_YEARS,
+    _clear_nan_equity,
+    _convert_numpy,
+    _date_chunks,
+    _normalize_request,
+    _reindex_trades,
+)
+
+logger = logging.getLogger(__name__)
+
+
+# Strategies of one index run in forked workers when > 1 (they inherit the
+# already-loaded dataset instead of loading their own copy).
+PORTFOLIO_WORKERS = int(os.getenv("PORTFOLIO_WORKERS", "1"))
+PORTFOLIO_MAX_STRATEGIES = int(os.getenv("PORTFOLIO_MAX_STRATEGIES", "20"))
+
+_BASE_EQUITY = 100.0
+
+
+def _normalize_strategies(request: Dict[str, Any]) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """Resolve the shared date range and give every strategy a unique name, index and weight."""
+    book = _normalize_request(request)
+    strategies = book.pop('strategies', None) or []
+    if not isinstance(strategies, list) or not strategies:
+        raise ValueError("'strategies' must be a non-empty list of strategy configs")
+    if len(strategies) > PORTFOLIO_MAX_STRATEGIES:
+        raise ValueError(f"At most {PORTFOLIO_MAX_STRATEGIES} strategies per portfolio")
+    if not book.get('from_date') or not book.get('to_date'):
+        raise ValueError("'from_date' and 'to_date' are required")
+
+    normalized = []
+    seen = set()
+    for pos, cfg in enumerate(strategies, start=1):
+        params = dict(cfg or {})
+        name = str(params.pop('name', None) or params.get('strategy_name') or f"Strategy {pos}")
+        if name in seen:
+            name = f"{name} #{pos}"
+        seen.add(name)
+        try:
+            weight = float(params.pop('weight', 1.0))
+        except (TypeError, ValueError):
+            weight = 1.0
+        params['index'] = str(params.get('index') or book['index']).upper()
+        params['from_date'] = book['from_date']
+        params['to_date'] = book['to_date']
+        params.pop('date_from', None)
+        params.pop('date_to', None)
+        normalized.append({'name': name, 'index': params['index'], 'weight': weight, 'params': params})
+    return book, normalized
+
+
+def _run_portfolio_strategy(args: tuple) -> Tuple[str, list, str]:
+    """Run one strategy over one date chunk. Top-level so it can be pickled."""
+    name, params = args
+    try:
+        # Already resident in a forked worker — this returns immediately.
+        bulk_load_options(params['index'], params['from_date'], params['to_date'])
+        df, _, _ = run_algotest_backtest(params)
+        rows = df.to_dict('records') if df is not None and not df.empty else []
+        return name, rows, None
+    except Exception as e:
+        logger.exception(f"[PORTFOLIO] Strategy {name!r} failed "
+                         f"({params.get('from_date')} → {params.get('to_date')})")
+        return name, [], str(e)
+
+
+def _run_index_group(index: str, strategies: list, chunk_from: str, chunk_to: str) -> list:
+    """Load index data for the chunk once, then run every strategy of that index against it."""
+    bulk_load_options(index, chunk_from, chunk_to)
+    jobs = []
+    for strat in strategies:
+        params = dict(strat['params'])
+        params['from_date'] = chunk_from
+        params['to_date'] = chunk_to
+        jobs.append((strat['name'], params))
+
+    if PORTFOLIO_WORKERS > 1 and len(jobs) > 1:
+        # fork: children share the parent's resident dataset pages copy-on-write
+        ctx = mp.get_context('fork')
+        with ProcessPoolExecutor(max_workers=min(PORTFOLIO_WORKERS, len(jobs)), mp_context=ctx) as pool:
+            return list(pool.map(_run_portfolio_strategy, jobs))
+    return [_run_portfolio_strategy(job) for job in jobs]
+
+
+def _collect_rows(book: Dict[str, Any], strategies: list) -> Tuple[Dict[str, list], Dict[str, str]]:
+    """
+    Run all strategies, chunk by chunk, with one data load per (index, chunk).
+    Stops after the first chunk in which any strategy failed.
+    """
+    by_index: Dict[str, list] = {}
+    for strat in strategies:
+        by_index.setdefault(strat['index'], []).append(strat)
+
+    rows: Dict[str, list] = {s['name']: [] for s in strategies}
+    id_offsets: Dict[str, int] = {s['name']: 0 for s in strategies}
+    errors: Dict[str, str] = {}
+
+    for chunk_from, chunk_to in _date_chunks(book['from_date'], book['to_date'], _BULK_LOAD_CHUNK_YEARS):
+        for index, group in by_index.items():
+            for name, chunk_rows, error in _run_index_group(index, group, chunk_from, chunk_to):
+                if error:
+                    errors[name] = error
+                    continue
+                # Offset Trade IDs so they never collide with previous chunks
+                chunk_max_id = 0
+                for row in chunk_rows:
+                    orig = int(str(row.get('Trade', 0) or 0))
+                    row['Trade'] = orig + id_offsets[name]
+                    chunk_max_id = max(chunk_max_id, orig)
+                id_offsets[name] += chunk_max_id
+                rows[name].extend(chunk_rows)
+            logger.info(f"[PORTFOLIO] {index} {chunk_from} → {chunk_to}: {len(group)} strategies")
+        if errors:
+            return rows, errors
+
+    for name in rows:
+        _reindex_trades(rows[name])
+    return rows, errors
+
+
+def _trade_frame(rows: Dict[str, list], strategies: list) -> pd.DataFrame:
+    """One row per (strategy, trade): entry/exit dates, weighted % P&L, open legs and notional."""
+    frames = []
+    for strat in strategies:
+        strat_rows = rows.get(strat['name'])
+        if not strat_rows:
+            continue
+        df = pd.DataFrame(strat_rows)
+        df['Strategy'] = strat['name']
+        df['Weight'] = strat['weight']
+        frames.append(df)
+    if not frames:
+        return pd.DataFrame()
+
+    legs = pd.concat(frames, ignore_index=True, sort=False)
+    for col in ('Entry Date', 'Exit Date'):
+        legs[col] = pd.to_datetime(legs[col], format='%d-%m-%Y', errors='coerce')
+    for col in ('Entry Spot', 'Qty', '% P&L'):
+        if col not in legs.columns:
+            legs[col] = 0.0
+    legs['Notional'] = (
+        pd.to_numeric(legs['Entry Spot'], errors='coerce').fillna(0.0)
+        * pd.to_numeric(legs['Qty'], errors='coerce').fillna(0.0)
+    )
+
+    # First leg row of a trade carries the trade-level '% P&L' (engine convention)
+    trades = legs.groupby(['Strategy', 'Trade'], sort=False).agg(
+        entry=('Entry Date', 'first'),
+        exit=('Exit Date', 'first'),
+        pct_pnl=('% P&L', 'first'),
+        weight=('Weight', 'first'),
+        legs=('Leg', 'size'),
+        notional=('Notional', 'sum'),
+    ).reset_index()
+    trades['pct_pnl'] = pd.to_numeric(trades['pct_pnl'], errors='coerce').fillna(0.0) * trades['weight']
+    return trades.dropna(subset=['entry', 'exit'])
+
+
+def _drawdown(equity: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    peak = np.maximum.accumulate(np.maximum(equity, _BASE_EQUITY))
+    dd = equity - peak
+    pct_dd = np.divide(dd, peak, out=np.zeros_like(dd), where=peak != 0) * 100
+    return peak, dd, pct_dd
+
+
+def _aggregate(trades: pd.DataFrame, names: List[str]) -> Tuple[Dict[str, Any], List[Dict[str, Any]], Dict[str, Any]]:
+    """Build the aligned equity/drawdown/exposure series and per-strategy attribution."""
+    # Business days plus any trade date that falls outside them (holiday sessions)
+    calendar = pd.bdate_range(trades['entry'].min(), trades['exit'].max())
+    calendar = calendar.union(pd.DatetimeIndex(trades['entry'])).union(pd.DatetimeIndex(trades['exit']))
+    n_days = len(calendar)
+
+    # Realized % P&L lands on the exit day: strategies × days matrix in one pivot
+    daily = trades.pivot_table(index='exit', columns='Strategy', values='pct_pnl', aggfunc='sum')
+    daily = daily.reindex(index=calendar, columns=names, fill_value=0.0).fillna(0.0)
+    strategy_equity = _BASE_EQUITY + daily.cumsum()
+    equity = _BASE_EQUITY + daily.sum(axis=1).cumsum().to_numpy()
+    peak, dd, pct_dd = _drawdown(equity)
+
+    # Exposure: +x on the entry day, -x the day after exit, then cumsum
+    entry_idx = calendar.searchsorted(trades['entry'].to_numpy(), side='left')
+    exit_idx = calendar.searchsorted(trades['exit'].to_numpy(), side='right')
+    exposure = {}
+    for key, weights in (('open_trades', np.ones(len(trades))),
+                         ('open_legs', trades['legs'].to_numpy(dtype=float)),
+                         ('notional', trades['notional'].to_numpy(dtype=float))):
+        delta = np.zeros(n_days + 1)
+        np.add.at(delta, entry_idx, weights)
+        np.add.at(delta, exit_idx, -weights)
+        exposure[key] = np.cumsum(delta[:-1])
+
+    # Attribution: one groupby over all trades
+    grouped = trades.assign(win=trades['pct_pnl'] > 0).groupby('Strategy')
+    stats = grouped.agg(
+        trades=('pct_pnl', 'size'),
+        wins=('win', 'sum'),
+        total_pct=('pct_pnl', 'sum'),
+        avg_pct=('pct_pnl', 'mean'),
+        best_pct=('pct_pnl', 'max'),
+        worst_pct=('pct_pnl', 'min'),
+    ).reindex(names)
+    book_total = float(daily.to_numpy().sum())
+    strat_dd = (strategy_equity - np.maximum(strategy_equity.cummax(), _BASE_EQUITY)).min()
+
+    attribution = []
+    for name in names:
+        row = stats.loc[name]
+        n_trades = int(row['trades']) if pd.notna(row['trades']) else 0
+        total = float(row['total_pct']) if pd.notna(row['total_pct']) else 0.0
+        attribution.append({
+            'strategy': name,
+            'trades': n_trades,
+            'win_rate': round(float(row['wins']) / n_trades * 100, 2) if n_trades else 0.0,
+            'total_pnl_pct': round(total, 2),
+            'avg_pnl_pct': round(float(row['avg_pct']), 4) if n_trades else 0.0,
+            'best_pnl_pct': round(float(row['best_pct']), 2) if n_trades else 0.0,
+            'worst_pnl_pct': round(float(row['worst_pct']), 2) if n_trades else 0.0,
+            'contribution_pct': round(total / book_total * 100, 2) if book_total else 0.0,
+            'max_dd': round(float(strat_dd[name]), 2),
+        })
+
+    curve = {
+        'dates': [d.strftime('%Y-%m-%d') for d in calendar],
+        'equity': np.round(equity, 2).tolist(),
+        'peak': np.round(peak, 2).tolist(),
+        'dd': np.round(dd, 2).tolist(),
+        'pct_dd': np.round(pct_dd, 4).tolist(),
+        'strategy_equity': {
+            name: np.round(strategy_equity[name].to_numpy(), 2).tolist() for name in names
+        },
+        'exposure': {
+            'open_trades': exposure['open_trades'].astype(int).tolist(),
+            'open_legs': exposure['open_legs'].astype(int).tolist(),
+            'notional': np.round(exposure['notional'], 2).tolist(),
+        },
+    }
+
+    worst = int(np.argmin(dd)) if n_days else 0
+    summary = {
+        'strategies': len(names),
+        'trades': int(len(trades)),
+        'total_pnl_pct': round(book_total, 2),
+        'final_equity': round(float(equity[-1]), 2) if n_days else _BASE_EQUITY,
+        'max_dd': round(float(dd.min()), 2) if n_days else 0.0,
+        'max_dd_pct': round(float(pct_dd.min()), 4) if n_days else 0.0,
+        'max_dd_date': calendar[worst].strftime('%Y-%m-%d') if n_days else None,
+        'max_open_trades': int(exposure['open_trades'].max()) if n_days else 0,
+        'max_notional': round(float(exposure['notional'].max()), 2) if n_days else 0.0,
+        # Sum of standalone drawdowns overstates the book's — report both
+        'sum_strategy_max_dd': round(float(strat_dd.sum()), 2),
+    }
+    return curve, attribution, summary
+
+
+def execute_portfolio_job(request: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Run a book of strategies in one pass and return combined + per-strategy
+    results. Errors come back as status 'error'; 'invalid_request' marks the
+    ones caused by the request (bad strategies / dates), found by validation
+    before anything runs. A strategy failing at run time fails the book
+    ('strategy_errors' names which), since the combined curve, drawdown and
+    exposure would otherwise silently miss it.
+    """
+    started = time.perf_counter()
+    try:
+        book, strategies = _normalize_strategies(request)
+    except ValueError as e:
+        return {'status': 'error', 'error': str(e), 'invalid_request': True}
+
+    try:
+        rows, errors = _collect_rows(book, strategies)
+        if errors:
+            failed = ', '.join(f"{name}: {error}" for name, error in errors.items())
+            return {
+                'status': 'error',
+                'error': f"{len(errors)} of {len(strategies)} strategies failed — {failed}",
+                'strategy_errors': errors,
+            }
+
+        names = [s['name'] for s in strategies]
+        trades = _trade_frame(rows, strategies)
+
+        if trades.empty:
+            curve, attribution, summary = {}, [], {'strategies': len(names), 'trades': 0}
+        else:
+            curve, attribution, summary = _aggregate(trades, names)
+
+        per_strategy = [
+            {
+                'name': s['name'],
+                'index': s['index'],
+                'weight': s['weight'],
+                'trades': _clear_nan_equity(rows.get(s['name'], [])),
+            }
+            for s in strategies
+        ]
+        return _convert_numpy({
+            'status': 'success',
+            'portfolio': curve,
+            'attribution': attribution,
+            'summary': summary,
+            'strategies': per_strategy,
+            'meta': {
+                'from_date': book['from_date'],
+                'to_date': book['to_date'],
+                'indices': sorted({s['index'] for s in strategies}),
+                'elapsed_s': round(time.perf_counter() - started, 2),
+            },
+        })
+    except Exception as e:
+        logger.exception("[PORTFOLIO] Portfolio run failed")
+        return {'status': 'error', 'error': str(e)}
@@ -0,0 +1,206 @@
+"""
+Slippage / charges recalculation and sensitivity
+
+PHASE 10: Columnar Results
+
+Column-wise re-pricing of finished trades from their raw prices — the
+vectorized equivalent of the old per-row loop in routers/backtest.py — and a
+slippage sensitivity table (one analytics pass per slippage value, one
+pricing pass for all of them).
+
+Usage:
+    from services.recalculate import recalculate_trades, slippage_sensitivity
+
+    trades_df = recalculate_trades(trades, slippage_pct=0.5, charges_enabled=True)
+    table = slippage_sensitivity(trades, [0, 0.25, 0.5, 1.0], charges_enabled=True)
+"""
+
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+from engines.cost_model import apply_slippage, fo_charges, normalize_slippage_array, py_round
+
+_LEG_TYPES = ('CE', 'PE', 'FUT', 'CALL', 'PUT', 'C', 'P')
+_CALL_TYPES = ('CE', 'CALL', 'C')
+DATE_COLUMNS = ('Entry Date', 'Exit Date', 'Leg Exit Date', 'Expiry')
+
+
+def _text(df: pd.DataFrame, col: str) -> np.ndarray:
+    if col not in df.columns:
+        return np.full(len(df), '', dtype=object)
+    return df[col].fillna('').astype(str).str.upper().str.strip().to_numpy()
+
+
+def _numeric(df: pd.DataFrame, col: str) -> np.ndarray:
+    if col not in df.columns:
+        return np.full(len(df), np.nan)
+    values = df[col]
+    if values.dtype == object:
+        values = values.replace('', np.nan)
+    return pd.to_numeric(values, errors='coerce').to_numpy(dtype=float)
+
+
+def _as_frame(trades: Any) -> pd.DataFrame:
+    if isinstance(trades, pd.DataFrame):
+        return trades.reset_index(drop=True)
+    return pd.DataFrame(list(trades or []))
+
+
+def _reprice(df: pd.DataFrame, slippage: np.ndarray, charges_enabled: bool) -> Dict[str, np.ndarray]:
+    """
+    Leg prices / P&L for every slippage value at once.
+    ``slippage`` has shape (S, 1); returned arrays are (S, n).
+    """
+    position = _text(df, 'B/S')
+    leg_type = _text(df, 'Type')
+    raw_entry = _numeric(df, 'Raw Entry Price')
+    raw_exit = _numeric(df, 'Raw Exit Price')
+    is_sell = position == 'SELL'
+
+    is_leg = (position != '') & np.isin(leg_type, _LEG_TYPES) & np.isfinite(raw_entry) & np.isfinite(raw_exit)
+
+    entry = apply_slippage(raw_entry, is_sell, 'entry', slippage)
+    exit_ = apply_slippage(raw_exit, is_sell, 'exit', slippage)
+    charges = np.zeros_like(entry)
+    if charges_enabled:
+        qty = _numeric(df, 'Qty')
+        qty = np.where(np.isfinite(qty) & (qty > 0), qty, 1.0)
+        ch = fo_charges(entry, exit_, qty, is_sell, leg_type != 'FUT')
+        charges = ch['total_charges_inr']
+        # Sellers receive less / pay more; buyers pay more / receive less
+        entry = py_round(np.where(is_sell, entry - ch['entry_charge_per_unit'], entry + ch['entry_charge_per_unit']), 2)
+        exit_ = py_round(np.where(is_sell, exit_ + ch['exit_charge_per_unit'], exit_ - ch['exit_charge_per_unit']), 2)
+
+    pnl = np.where(position == 'BUY', exit_ - entry, entry - exit_)
+    return {
+        'is_leg': is_leg,
+        'leg_type': leg_type,
+        'entry': entry,
+        'exit': exit_,
+        'pnl': np.where(is_leg, pnl, 0.0),
+        'charges': np.where(is_leg, charges, 0.0),
+    }
+
+
+def _trade_totals(df: pd.DataFrame, is_leg: np.ndarray, pnl: np.ndarray, charges: np.ndarray):
+    """
+    Per-row trade Net P&L / charges (NaN where the trade has none): the sum of
+    its repriced legs, or the first non-leg row's Net P&L for leg-less trades.
+    """
+    if 'Trade' not in df.columns:
+        nan = np.full(len(df), np.nan)
+        return nan, nan
+    codes, _ = pd.factorize(df['Trade'])
+    n_trades = int(codes.max()) + 1 if len(codes) else 0
+    has_code = codes >= 0
+    leg_rows = is_leg & has_code
+
+    pnl_sum = np.bincount(codes[leg_rows], weights=pnl[leg_rows], minlength=n_trades)
+    charge_sum = np.bincount(codes[leg_rows], weights=charges[leg_rows], minlength=n_trades)
+    has_leg = np.bincount(codes[leg_rows], minlength=n_trades) > 0
+
+    fallback = np.full(n_trades, np.nan)
+    net = _numeric(df, 'Net P&L')
+    other = ~is_leg & has_code & np.isfinite(net)
+    if other.any():
+        first = pd.Series(net[other]).groupby(codes[other]).first()
+        fallback[first.index.to_numpy()] = first.to_numpy()
+
+    totals = np.where(has_leg, pnl_sum, fallback)
+    row_total = np.where(has_code, totals[np.where(has_code, codes, 0)], np.nan)
+    row_charges = np.where(has_code, charge_sum[np.where(has_code, codes, 0)], np.nan)
+    return row_total, row_charges
+
+
+def _pct_pnl(df: pd.DataFrame, total: np.ndarray) -> np.ndarray:
+    entry_spot = _numeric(df, 'Entry Spot')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pct = py_round(total / entry_spot * 100, 4)
+    return np.where(np.isfinite(entry_spot) & (entry_spot > 1000), pct, 0.0)
+
+
+def recalculate_trades(trades: Any, slippage_pct: float, charges_enabled: bool = False) -> pd.DataFrame:
+    """
+    Re-price every leg row from its raw prices.
+
+    1. Slippage on raw entry/exit prices.
+    2. Optionally Zerodha F&O charges as per-unit price adjustments, so Net
+       P&L stays in per-unit points (SELL: entry - epu / exit + xpu; BUY the
+       reverse); 'Charges' / 'Total Charges' carry the ₹ amounts.
+    3. Trade Net P&L = sum of its legs; % P&L on Entry Spot.
+    """
+    df = _as_frame(trades).copy()
+    if df.empty:
+        return df
+    priced = _reprice(df, np.asarray([[slippage_pct]], dtype=object), charges_enabled)
+    is_leg = priced['is_leg']
+    leg_type = priced['leg_type']
+    entry, exit_, pnl, charges = (priced[k][0] for k in ('entry', 'exit', 'pnl', 'charges'))
+
+    def _put(col, values, mask):
+        current = df[col].to_numpy(dtype=object) if col in df.columns else np.full(len(df), None, dtype=object)
+        df[col] = pd.Series(np.where(mask, values, current), index=df.index).infer_objects()
+
+    _put('Entry Price', entry, is_leg)
+    _put('Exit Price', exit_, is_leg)
+    if charges_enabled:
+        _put('Charges', py_round(charges, 2), is_leg)
+
+    is_fut = is_leg & (leg_type == 'FUT')
+    is_call = is_leg & np.isin(leg_type, _CALL_TYPES)
+    is_put = is_leg & ~is_fut & ~is_call
+    old_fut = _numeric(df, 'FUT P&L')
+    old_fut = np.where(np.isnan(old_fut), 0.0, old_fut)
+    _put('FUT Entry Price', entry, is_fut)
+    _put('FUT Exit Price', exit_, is_fut)
+    _put('FUT P&L', np.where(is_fut, pnl, old_fut), is_leg)
+    _put('CE P&L', np.where(is_call, pnl, 0), is_leg)
+    _put('PE P&L', np.where(is_put, pnl, 0), is_leg)
+
+    total, total_charges = _trade_totals(df, is_leg, pnl, charges)
+    has_total = np.isfinite(total)
+    _put('Net P&L', py_round(total, 2), has_total)
+    if charges_enabled:
+        _put('Total Charges', py_round(np.nan_to_num(total_charges), 2), has_total)
+    _put('% P&L', _pct_pnl(df, total), has_total)
+    return df
+
+
+def slippage_sensitivity(
+    trades: Any,
+    slippage_values: Sequence[float],
+    charges_enabled: bool = False,
+) -> List[Dict[str, Any]]:
+    """
+    Summary metrics for each slippage value. Pricing runs once for all
+    values (broadcast kernels); compute_analytics runs once per value.
+    """
+    from base import compute_analytics
+
+    df = _as_frame(trades)
+    values = [float(v) for v in normalize_slippage_array(list(slippage_values))]
+    if df.empty or not values:
+        return [{'slippage_pct': v, 'total_charges_inr': 0.0, **compute_analytics(pd.DataFrame())[1]} for v in values]
+
+    base_df = df.copy()
+    for col in DATE_COLUMNS:
+        if col in base_df.columns:
+            base_df[col] = pd.to_datetime(base_df[col], dayfirst=True, errors='coerce')
+
+    priced = _reprice(df, np.asarray(values, dtype=object).reshape(-1, 1), charges_enabled)
+    rows = []
+    for i, slippage in enumerate(values):
+        total, total_charges = _trade_totals(df, priced['is_leg'], priced['pnl'][i], priced['charges'][i])
+        has_total = np.isfinite(total)
+        scenario = base_df.copy()
+        scenario['Net P&L'] = np.where(has_total, py_round(total, 2), _numeric(df, 'Net P&L'))
+        scenario['% P&L'] = np.where(has_total, _pct_pnl(df, total), _numeric(df, '% P&L'))
+        _, summary = compute_analytics(scenario)
+        rows.append({
+            'slippage_pct': slippage,
+            'total_charges_inr': round(float(priced['charges'][i].sum()), 2),
+            **summary,
+        })
+    return rows
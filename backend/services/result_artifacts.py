@@ -0,0 +1,205 @@
+"""
+Result artifacts: write once, hand back a handle, stream out
+
+PHASE 10: Columnar Results
+
+A finished backtest is written ONCE as an Arrow IPC file (trades) plus a
+small JSON header (status/summary/pivot/meta) in RESULT_ARTIFACT_DIR — a
+directory shared by the API and the Celery workers. Only the handle travels
+back through the process pool or the Celery result backend; the API
+memory-maps the artifact and streams it as JSON in row batches.
+
+Usage:
+    from services.result_artifacts import publish_result, stream_result_artifact
+
+    handle = publish_result(execute_algotest_job(payload, as_table=True))
+    # {'artifact_id': '9f1c…', 'status': 'success', 'rows': 10412}
+    StreamingResponse(stream_result_artifact(handle['artifact_id']), media_type='application/json')
+"""
+
+import logging
+import os
+import re
+import time
+import uuid
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterator, Optional
+
+import orjson
+
+# Polars / TradeTable are imported where artifacts are read or written, so
+# the API can import the handle helpers (and ArtifactNotFound) for free
+if TYPE_CHECKING:
+    import polars as pl
+
+logger = logging.getLogger(__name__)
+
+
+RESULT_ARTIFACT_DIR = Path(os.getenv("RESULT_ARTIFACT_DIR", "/tmp/algotest_results"))
+RESULT_ARTIFACT_TTL = int(os.getenv("RESULT_ARTIFACT_TTL", "86400"))  # match Celery result_expires
+RESULT_STREAM_BATCH_ROWS = int(os.getenv("RESULT_STREAM_BATCH_ROWS", "2000"))
+_SWEEP_INTERVAL_S = 600
+
+_ARTIFACT_ID_RE = re.compile(r'^[0-9a-f]{32}$')
+_JSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+_last_sweep = 0.0
+
+
+class ArtifactNotFound(LookupError):
+    """Artifact id unknown, malformed or already swept."""
+
+
+def _paths(artifact_id: str):
+    if not _ARTIFACT_ID_RE.match(str(artifact_id or '')):
+        raise ArtifactNotFound(artifact_id)
+    return (RESULT_ARTIFACT_DIR / f"{artifact_id}.arrow",
+            RESULT_ARTIFACT_DIR / f"{artifact_id}.json")
+
+
+def sweep_result_artifacts(max_age: int = RESULT_ARTIFACT_TTL) -> int:
+    """Delete artifacts older than max_age seconds. Returns files removed."""
+    global _last_sweep
+    _last_sweep = time.time()
+    cutoff = _last_sweep - max_age
+    removed = 0
+    try:
+        entries = list(os.scandir(RESULT_ARTIFACT_DIR))
+    except FileNotFoundError:
+        return 0
+    for entry in entries:
+        try:
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.unlink(entry.path)
+                removed += 1
+        except OSError:
+            continue
+    if removed:
+        logger.info(f"[ARTIFACT] Swept {removed} expired files")
+    return removed
+
+
+def write_result_artifact(result: Dict[str, Any], artifact_id: Optional[str] = None) -> Dict[str, Any]:
+    """Write trades as Arrow IPC and the rest as a JSON header; return the handle."""
+    RESULT_ARTIFACT_DIR.mkdir(parents=True, exist_ok=True)
+    if time.time() - _last_sweep > _SWEEP_INTERVAL_S:
+        sweep_result_artifacts()
+
+    from services.trade_table import TradeTable
+
+    artifact_id = artifact_id or uuid.uuid4().hex
+    arrow_path, header_path = _paths(artifact_id)
+    table = TradeTable.coerce(result.get('trades'))
+    header = {k: v for k, v in result.items() if k != 'trades'}
+
+    # Write to temp names and rename so readers never see partial files
+    tmp_arrow = arrow_path.with_suffix('.arrow.tmp')
+    tmp_header = header_path.with_suffix('.json.tmp')
+    table.write_ipc(tmp_arrow)
+    tmp_header.write_bytes(orjson.dumps(header, option=_JSON_OPTIONS))
+    os.replace(tmp_arrow, arrow_path)
+    os.replace(tmp_header, header_path)
+
+    return {
+        'artifact_id': artifact_id,
+        'status': result.get('status', 'success'),
+        'rows': len(table),
+    }
+
+
+def publish_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Successful results become an artifact handle; errors are small and pass through."""
+    if not isinstance(result, dict) or result.get('status') != 'success':
+        return result
+    return write_result_artifact(result)
+
+
+def is_artifact_handle(value: Any) -> bool:
+    return isinstance(value, dict) and 'artifact_id' in value and 'trades' not in value
+
+
+def load_result_artifact(artifact_id: str, as_table: bool = False) -> Dict[str, Any]:
+    """Full result dict (trades as records, or as a TradeTable)."""
+    from services.trade_table import TradeTable
+
+    arrow_path, header_path = _paths(artifact_id)
+    try:
+        header = orjson.loads(header_path.read_bytes())
+        table = TradeTable.read_ipc(arrow_path)
+    except FileNotFoundError:
+        raise ArtifactNotFound(artifact_id)
+    header['trades'] = table if as_table else table.to_records()
+    return header
+
+
+def load_artifact_header(artifact_id: str) -> Dict[str, Any]:
+    """status / summary / pivot / meta of an artifact, without its trades."""
+    _, header_path = _paths(artifact_id)
+    try:
+        return orjson.loads(header_path.read_bytes())
+    except FileNotFoundError:
+        raise ArtifactNotFound(artifact_id)
+
+
+def artifact_exists(artifact_id: str) -> bool:
+    try:
+        arrow_path, header_path = _paths(artifact_id)
+    except ArtifactNotFound:
+        return False
+    return arrow_path.exists() and header_path.exists()
+
+
+def scan_result_artifact(artifact_id: str) -> "pl.LazyFrame":
+    """Lazy, memory-mapped view of an artifact's trades (for paged queries)."""
+    import polars as pl
+
+    arrow_path, _ = _paths(artifact_id)
+    if not arrow_path.exists():
+        raise ArtifactNotFound(artifact_id)
+    return pl.scan_ipc(arrow_path, memory_map=True)
+
+
+def remove_result_artifact(artifact_id: str) -> None:
+    for path in _paths(artifact_id):
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def stream_result_artifact(
+    artifact_id: str,
+    prefix: bytes = b'',
+    suffix: bytes = b'',
+    remove: bool = False,
+    batch_rows: Optional[int] = None,
+) -> Iterator[bytes]:
+    """
+    Yield the result as one JSON object, trades serialized batch by batch
+    from the memory-mapped Arrow file. ``prefix``/``suffix`` wrap it in an
+    envelope (e.g. the job-status response).
+    """
+    from services.trade_table import TradeTable
+
+    arrow_path, header_path = _paths(artifact_id)
+    try:
+        header = orjson.loads(header_path.read_bytes())
+        table = TradeTable.read_ipc(arrow_path)
+    except FileNotFoundError:
+        raise ArtifactNotFound(artifact_id)
+
+    def _generate() -> Iterator[bytes]:
+        try:
+            head = orjson.dumps(header, option=_JSON_OPTIONS)
+            # '{...header...}' → '{...header..., "trades":['
+            yield prefix + head[:-1] + (b',' if len(head) > 2 else b'') + b'"trades":['
+            frame = table.frame
+            step = batch_rows or RESULT_STREAM_BATCH_ROWS
+            for offset in range(0, frame.height, step):
+                body = frame.slice(offset, step).write_json(row_oriented=True).encode()
+                yield (b',' if offset else b'') + body[1:-1]
+            yield b']}' + suffix
+        finally:
+            if remove:
+                remove_result_artifact(artifact_id)
+
+    return _generate()
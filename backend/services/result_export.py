@@ -0,0 +1,222 @@
+"""
+Streaming result exports (CSV / Parquet / XLSX)
+
+PHASE 10: Columnar Results
+
+Trade sheets and summaries of a stored result are produced server-side,
+batch by batch from the memory-mapped Arrow artifact, so memory stays flat
+however long the run is:
+
+- CSV: one encoded slice per chunk
+- Parquet: one row group per chunk through an append-only sink
+- XLSX: xlsxwriter constant_memory mode into a temp file, then streamed
+
+Usage:
+    from services.result_export import export_trades, export_summary
+
+    chunks, media_type = export_trades(lazy_frame, 'parquet')
+    StreamingResponse(chunks, media_type=media_type)
+"""
+
+import io
+import os
+import tempfile
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import orjson
+import polars as pl
+
+EXPORT_BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", "20000"))
+EXPORT_FORMATS = ('csv', 'parquet', 'xlsx')
+
+MEDIA_TYPES = {
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+_FILE_CHUNK = 1 << 20
+
+
+class ExportFormatError(ValueError):
+    """Unsupported format or missing optional writer."""
+
+
+def _check_format(fmt: str) -> str:
+    fmt = (fmt or 'csv').lower()
+    if fmt not in EXPORT_FORMATS:
+        raise ExportFormatError(f"Unsupported export format '{fmt}' (use {', '.join(EXPORT_FORMATS)})")
+    if fmt == 'xlsx':
+        try:
+            import xlsxwriter  # noqa: F401
+        except ImportError:
+            raise ExportFormatError("XLSX export requires the xlsxwriter package")
+    return fmt
+
+
+def _batches(lf: pl.LazyFrame, batch_rows: int) -> Iterator[pl.DataFrame]:
+    total = lf.select(pl.len()).collect().item()
+    if not total:
+        yield lf.slice(0, 0).collect()
+        return
+    for offset in range(0, total, batch_rows):
+        yield lf.slice(offset, batch_rows).collect()
+
+
+# ── Writers ───────────────────────────────────────────────────────────────────
+
+def _iter_csv(frames: Iterator[pl.DataFrame]) -> Iterator[bytes]:
+    first = True
+    for frame in frames:
+        if frame.height or first:
+            yield frame.write_csv(None, include_header=first).encode()
+        first = False
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file whose tell() keeps counting after chunks are drained."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._pos = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._pos
+
+    def drain(self) -> bytes:
+        out = b''.join(self._chunks)
+        self._chunks.clear()
+        return out
+
+
+def _iter_parquet(frames: Iterator[pl.DataFrame]) -> Iterator[bytes]:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    sink = _ChunkSink()
+    writer = None
+    try:
+        for frame in frames:
+            table = frame.to_arrow()
+            if writer is None:
+                writer = pq.ParquetWriter(pa.PythonFile(sink, mode='w'), table.schema, compression='zstd')
+            else:
+                table = table.cast(writer.schema)
+            writer.write_table(table)
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    finally:
+        if writer is not None:
+            writer.close()
+    yield sink.drain()
+
+
+def _xlsx_value(value: Any) -> Any:
+    if value is None or isinstance(value, (int, float, str, bool)):
+        return value
+    return str(value)
+
+
+def _iter_xlsx(sheets: List[Tuple[str, Iterator[pl.DataFrame]]]) -> Iterator[bytes]:
+    import xlsxwriter
+
+    fd, path = tempfile.mkstemp(suffix='.xlsx')
+    os.close(fd)
+    try:
+        workbook = xlsxwriter.Workbook(path, {
+            'constant_memory': True,
+            'nan_inf_to_errors': True,
+            'strings_to_numbers': False,
+        })
+        bold = workbook.add_format({'bold': True})
+        for name, frames in sheets:
+            sheet = workbook.add_worksheet(name[:31])
+            row_no = 0
+            for frame in frames:
+                if row_no == 0:
+                    sheet.write_row(0, 0, frame.columns, bold)
+                    row_no = 1
+                for row in frame.iter_rows():
+                    sheet.write_row(row_no, 0, [_xlsx_value(v) for v in row])
+                    row_no += 1
+        workbook.close()
+        with open(path, 'rb') as fh:
+            while True:
+                chunk = fh.read(_FILE_CHUNK)
+                if not chunk:
+                    break
+                yield chunk
+    finally:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+# ── Public API ────────────────────────────────────────────────────────────────
+
+def export_trades(
+    lf: pl.LazyFrame,
+    fmt: str = 'csv',
+    columns: Optional[List[str]] = None,
+    batch_rows: int = EXPORT_BATCH_ROWS,
+) -> Tuple[Iterator[bytes], str]:
+    """(byte chunks, media type) for a trade sheet."""
+    fmt = _check_format(fmt)
+    if columns:
+        missing = [c for c in columns if c not in lf.schema]
+        if missing:
+            raise ExportFormatError(f"Unknown column(s): {', '.join(missing)}")
+        lf = lf.select(columns)
+    frames = _batches(lf, batch_rows)
+    if fmt == 'csv':
+        return _iter_csv(frames), MEDIA_TYPES[fmt]
+    if fmt == 'parquet':
+        return _iter_parquet(frames), MEDIA_TYPES[fmt]
+    return _iter_xlsx([('Trades', frames)]), MEDIA_TYPES[fmt]
+
+
+def _summary_frames(header: Dict[str, Any]) -> Tuple[pl.DataFrame, pl.DataFrame]:
+    summary = header.get('summary') or {}
+    metrics = pl.DataFrame({
+        'Metric': [str(k) for k in summary],
+        # Mixed numbers / dates / text → one text column
+        'Value': ['' if v is None else (v if isinstance(v, str) else orjson.dumps(v).decode())
+                  for v in summary.values()],
+    })
+    pivot = header.get('pivot') or {}
+    headers = [str(h) for h in pivot.get('headers') or []]
+    rows = pivot.get('rows') or []
+    yearly = pl.DataFrame(
+        {h: ['' if r[i] is None else str(r[i]) for r in rows] for i, h in enumerate(headers)}
+    ) if headers else pl.DataFrame()
+    return metrics, yearly
+
+
+def export_summary(header: Dict[str, Any], fmt: str = 'csv') -> Tuple[Iterator[bytes], str]:
+    """
+    (byte chunks, media type) for a run summary: Metric/Value rows, plus the
+    year-wise pivot (second sheet in XLSX, a second section in CSV).
+    """
+    fmt = _check_format(fmt)
+    metrics, yearly = _summary_frames(header)
+    if fmt == 'xlsx':
+        return _iter_xlsx([('Summary', iter([metrics])), ('Year-wise', iter([yearly]))]), MEDIA_TYPES[fmt]
+    if fmt == 'parquet':
+        return _iter_parquet(iter([metrics])), MEDIA_TYPES[fmt]
+
+    def _csv() -> Iterator[bytes]:
+        yield metrics.write_csv(None).encode()
+        if yearly.width:
+            yield b'\n'
+            yield yearly.write_csv(None).encode()
+    return _csv(), MEDIA_TYPES[fmt]
@@ -0,0 +1,471 @@
+"""
+Durable backtest result store (PostgreSQL)
+
+PHASE 10: Columnar Results
+
+Finished AlgoTest runs are persisted into the migration-003 tables
+(backtest_runs / backtest_trade_legs / backtest_run_summary /
+backtest_run_pivot_yearly, plus the JSONB columns from migration 007):
+
+- Leg rows are bulk-loaded with one COPY per run
+- Runs are keyed by request_hash (MD5 of the canonical request and the
+  symbol's data version), so a repeat request is answered from the store
+  before the engine runs, until the next import for that symbol
+- Trades are retrievable page by page by run_id
+
+Storing is best-effort: any database error is logged and the backtest
+result is returned unchanged.
+
+Usage:
+    from services.result_store import lookup_stored_result, store_result
+
+    result = lookup_stored_result(payload)          # None → run the engine
+    run_id = store_result(payload, result)          # also sets result['meta']['run_id']
+"""
+
+import hashlib
+import io
+import logging
+import os
+import time
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import orjson
+import polars as pl
+from sqlalchemy import text
+
+from database import get_engine
+from services.trade_table import DATE_FORMAT, TradeTable
+
+logger = logging.getLogger(__name__)
+
+
+RESULT_STORE_ENABLED = os.getenv("RESULT_STORE_ENABLED", "true").lower() == "true"
+RESULT_STORE_MAX_AGE_DAYS = int(os.getenv("RESULT_STORE_MAX_AGE_DAYS", "30"))
+_PURGE_INTERVAL_S = 3600
+
+ENGINE_NAME = 'generic_algotest_engine'
+_NULL_SENTINEL = '\\N'
+_JSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+# (db column, engine row key, kind) — everything else goes to row_extra
+_LEG_COLUMNS: List[Tuple[str, str, str]] = [
+    ('trade_no',          'Trade',        'int'),
+    ('leg_no',            'Leg',          'int'),
+    ('trade_index_label', 'Index',        'text'),
+    ('entry_date',        'Entry Date',   'date'),
+    ('exit_date',         'Exit Date',    'date'),
+    ('leg_type',          'Type',         'text'),
+    ('strike_price',      'Strike',       'num'),
+    ('side',              'B/S',          'text'),
+    ('quantity',          'Qty',          'int'),
+    ('entry_price',       'Entry Price',  'num'),
+    ('exit_price',        'Exit Price',   'num'),
+    ('entry_spot',        'Entry Spot',   'num'),
+    ('exit_spot',         'Exit Spot',    'num'),
+    ('spot_pnl',          'Spot P&L',     'num'),
+    ('net_pnl',           'Net P&L',      'num'),
+    ('pct_pnl',           '% P&L',        'num'),
+    ('exit_reason',       'Exit Reason',  'text'),
+    ('str_segment',       'STR Segment',  'text'),
+    ('cumulative',        'Cumulative',   'num'),
+    ('peak',              'Peak',         'num'),
+    ('drawdown',          'DD',           'num'),
+    ('drawdown_pct',      '%DD',          'num'),
+]
+LEG_KEY_TO_COLUMN = {key: col for col, key, _ in _LEG_COLUMNS}
+# Polars dtype a leg column is read back as (dates parsed from ISO text)
+_COLUMN_DTYPES = {'int': pl.Int64, 'num': pl.Float64, 'date': pl.Utf8, 'text': pl.Utf8}
+
+# compute_analytics key → backtest_run_summary column
+_SUMMARY_COLUMNS = {
+    'total_pnl': 'total_pnl', 'count': 'trade_count', 'win_pct': 'win_pct',
+    'loss_pct': 'loss_pct', 'avg_win': 'avg_win', 'avg_loss': 'avg_loss',
+    'max_win': 'max_win', 'max_loss': 'max_loss',
+    'avg_profit_per_trade': 'avg_profit_per_trade', 'expectancy': 'expectancy',
+    'reward_to_risk': 'reward_to_risk', 'profit_factor': 'profit_factor',
+    'cagr_options': 'cagr_options', 'cagr_spot': 'cagr_spot',
+    'max_dd_pct': 'max_dd_pct', 'max_dd_pts': 'max_dd_pts',
+    'mdd_duration_days': 'mdd_duration_days', 'mdd_start_date': 'mdd_start_date',
+    'mdd_end_date': 'mdd_end_date', 'mdd_trade_number': 'mdd_trade_number',
+    'car_mdd': 'car_mdd', 'recovery_factor': 'recovery_factor',
+    'max_win_streak': 'max_win_streak', 'max_loss_streak': 'max_loss_streak',
+    'spot_change': 'spot_change',
+}
+_PIVOT_MONTHS = ('jan', 'feb', 'mar', 'apr', 'may', 'jun',
+                 'jul', 'aug', 'sep', 'oct', 'nov', 'dec')
+
+_store_unavailable = False
+_last_purge = 0.0
+
+
+# ── Keys and conversions ──────────────────────────────────────────────────────
+
+def request_hash(payload: Dict[str, Any]) -> str:
+    """
+    MD5 of the canonical request (alias spellings / disabled features ignored)
+    and the data version it ran on, so an import retires older runs.
+    """
+    from engines.strategy_plan import canonical_request
+    from services.data_version import data_version
+
+    canonical = canonical_request(payload)
+    version = payload.get('_data_version')
+    if version is None:
+        version = data_version(canonical.get('index'))
+    return hashlib.md5(
+        orjson.dumps({**canonical, '_data_version': version},
+                     option=orjson.OPT_SORT_KEYS | _JSON_OPTIONS, default=str)
+    ).hexdigest()
+
+
+def _as_date(value: Any) -> Optional[date]:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if not value:
+        return None
+    for fmt in (DATE_FORMAT, '%Y-%m-%d'):
+        try:
+            return datetime.strptime(str(value)[:10], fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def _as_number(value: Any) -> Optional[float]:
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if number != number else number
+
+
+def _available() -> bool:
+    return RESULT_STORE_ENABLED and not _store_unavailable
+
+
+def _mark_unavailable(err: Exception) -> None:
+    """Missing tables/columns (migrations 003/007 not applied) disable the store."""
+    global _store_unavailable
+    if getattr(err, 'pgcode', None) in ('42P01', '42703'):
+        _store_unavailable = True
+        logger.warning(f"[RESULT STORE] Disabled — schema not migrated: {err}")
+    else:
+        logger.warning(f"[RESULT STORE] {err}")
+
+
+# ── Write path ────────────────────────────────────────────────────────────────
+
+def _legs_csv(table: TradeTable, run_id: str) -> Tuple[List[str], io.StringIO]:
+    """Project engine rows onto the typed columns (+ row_extra JSON) as COPY CSV."""
+    frame = table.export_frame()
+    exprs = [pl.lit(run_id).alias('run_id')]
+    for col, key, kind in _LEG_COLUMNS:
+        if key not in frame.columns:
+            continue
+        expr = pl.col(key)
+        if kind == 'int':
+            expr = expr.cast(pl.Int64, strict=False)
+        elif kind == 'num':
+            expr = expr.cast(pl.Float64, strict=False)
+        elif kind == 'date':
+            expr = expr.cast(pl.Utf8).str.strptime(pl.Date, DATE_FORMAT, strict=False)
+        else:
+            expr = expr.cast(pl.Utf8)
+        exprs.append(expr.alias(col))
+    extra = [c for c in frame.columns if c not in LEG_KEY_TO_COLUMN]
+    if extra:
+        exprs.append(pl.struct(extra).struct.json_encode().alias('row_extra'))
+    out = frame.select(exprs)
+    data = out.write_csv(None, include_header=False, null_value=_NULL_SENTINEL)
+    return out.columns, io.StringIO(data)
+
+
+def _summary_params(run_id: str, summary: Dict[str, Any]) -> Dict[str, Any]:
+    params = {'run_id': run_id}
+    for key, col in _SUMMARY_COLUMNS.items():
+        value = summary.get(key)
+        if col.endswith('_date'):
+            params[col] = _as_date(value)
+        elif col in ('trade_count', 'mdd_duration_days', 'mdd_trade_number',
+                     'max_win_streak', 'max_loss_streak'):
+            number = _as_number(value)
+            params[col] = int(number) if number is not None else None
+        else:
+            params[col] = _as_number(value)
+    return params
+
+
+def _pivot_params(run_id: str, pivot: Dict[str, Any]) -> List[Dict[str, Any]]:
+    rows = []
+    for row in (pivot or {}).get('rows') or []:
+        if len(row) < 17:
+            continue
+        try:
+            year = int(row[0])
+        except (TypeError, ValueError):
+            continue
+        params = {'run_id': run_id, 'year': year}
+        params.update({m: _as_number(v) for m, v in zip(_PIVOT_MONTHS, row[1:13])})
+        days = _as_number(row[15])
+        params.update({
+            'total': _as_number(row[13]),
+            'max_drawdown_text': str(row[14]) if row[14] is not None else None,
+            'days_for_mdd': int(days) if days is not None else None,
+            'r_mdd': _as_number(row[16]),
+        })
+        rows.append(params)
+    return rows
+
+
+def store_result(payload: Dict[str, Any], result: Dict[str, Any]) -> Optional[str]:
+    """
+    Persist a successful result (one transaction, legs via COPY).
+    Returns the run_id and records it in result['meta']['run_id'].
+    """
+    if not _available() or result.get('status') != 'success':
+        return None
+    t0 = time.perf_counter()
+    table = TradeTable.coerce(result.get('trades'))
+    meta = dict(result.get('meta') or {})
+    header = {
+        'summary': result.get('summary') or {},
+        'pivot': result.get('pivot') or {"headers": [], "rows": []},
+        'meta': meta,
+        'columns': table.columns if len(table) else [],
+    }
+
+    raw = None
+    try:
+        raw = get_engine().raw_connection()
+        with raw.cursor() as cur:
+            cur.execute(
+                """
+                INSERT INTO backtest_runs (
+                    strategy_name, engine_name, index_symbol, date_from, date_to,
+                    request_payload, request_hash, status, completed_at,
+                    result_header, leg_count
+                ) VALUES (
+                    %(strategy_name)s, %(engine_name)s, %(index_symbol)s, %(date_from)s, %(date_to)s,
+                    %(request_payload)s::jsonb, %(request_hash)s, 'completed', NOW(),
+                    %(result_header)s::jsonb, %(leg_count)s
+                ) RETURNING id
+                """,
+                {
+                    'strategy_name': str(payload.get('strategy_name') or 'AlgoTest')[:120],
+                    'engine_name': ENGINE_NAME,
+                    'index_symbol': str(payload.get('index') or '')[:30],
+                    'date_from': _as_date(payload.get('from_date')),
+                    'date_to': _as_date(payload.get('to_date')),
+                    'request_payload': orjson.dumps(payload, option=_JSON_OPTIONS, default=str).decode(),
+                    'request_hash': request_hash(payload),
+                    'result_header': orjson.dumps(header, option=_JSON_OPTIONS, default=str).decode(),
+                    'leg_count': len(table),
+                },
+            )
+            run_id = str(cur.fetchone()[0])
+
+            if len(table):
+                columns, buf = _legs_csv(table, run_id)
+                col_list = ", ".join(columns)
+                cur.copy_expert(
+                    f"COPY backtest_trade_legs ({col_list}) FROM STDIN "
+                    f"WITH (FORMAT CSV, NULL '{_NULL_SENTINEL}')",
+                    buf,
+                )
+
+            summary_params = _summary_params(run_id, header['summary'])
+            cols = list(summary_params)
+            cur.execute(
+                f"INSERT INTO backtest_run_summary ({', '.join(cols)}) "
+                f"VALUES ({', '.join(f'%({c})s' for c in cols)})",
+                summary_params,
+            )
+            pivot_rows = _pivot_params(run_id, header['pivot'])
+            if pivot_rows:
+                cols = list(pivot_rows[0])
+                cur.executemany(
+                    f"INSERT INTO backtest_run_pivot_yearly ({', '.join(cols)}) "
+                    f"VALUES ({', '.join(f'%({c})s' for c in cols)})",
+                    pivot_rows,
+                )
+        raw.commit()
+    except Exception as err:
+        if raw is not None:
+            try:
+                raw.rollback()
+            except Exception:
+                pass
+        _mark_unavailable(err)
+        return None
+    finally:
+        if raw is not None:
+            raw.close()
+
+    meta['run_id'] = run_id
+    result['meta'] = meta
+    logger.info(
+        f"[RESULT STORE] Stored run {run_id}: {len(table)} legs "
+        f"in {time.perf_counter() - t0:.2f}s"
+    )
+    if time.time() - _last_purge > _PURGE_INTERVAL_S:
+        purge_stored_results()
+    return run_id
+
+
+def purge_stored_results(max_age_days: int = RESULT_STORE_MAX_AGE_DAYS) -> int:
+    """Delete runs older than max_age_days (legs/summary/pivot cascade)."""
+    global _last_purge
+    _last_purge = time.time()
+    if not _available():
+        return 0
+    try:
+        with get_engine().begin() as conn:
+            removed = conn.execute(
+                text("DELETE FROM backtest_runs WHERE engine_name = :engine "
+                     "AND started_at < NOW() - make_interval(days => :days)"),
+                {'engine': ENGINE_NAME, 'days': max_age_days},
+            ).rowcount or 0
+    except Exception as err:
+        _mark_unavailable(err)
+        return 0
+    if removed:
+        logger.info(f"[RESULT STORE] Purged {removed} runs older than {max_age_days}d")
+    return removed
+
+
+# ── Read path ─────────────────────────────────────────────────────────────────
+
+def find_run(payload: Dict[str, Any]) -> Optional[str]:
+    """Latest completed run for this request within RESULT_STORE_MAX_AGE_DAYS."""
+    if not _available():
+        return None
+    try:
+        with get_engine().connect() as conn:
+            run_id = conn.execute(
+                text("""
+                    SELECT id FROM backtest_runs
+                    WHERE request_hash = :hash AND status = 'completed'
+                      AND result_header IS NOT NULL
+                      AND completed_at > NOW() - make_interval(days => :days)
+                    ORDER BY completed_at DESC
+                    LIMIT 1
+                """),
+                {'hash': request_hash(payload), 'days': RESULT_STORE_MAX_AGE_DAYS},
+            ).scalar()
+    except Exception as err:
+        _mark_unavailable(err)
+        return None
+    return str(run_id) if run_id else None
+
+
+def load_run_header(run_id: str) -> Optional[Dict[str, Any]]:
+    """summary / pivot / meta / columns / leg_count of a stored run."""
+    with get_engine().connect() as conn:
+        row = conn.execute(
+            text("SELECT result_header::text, leg_count FROM backtest_runs "
+                 "WHERE id = CAST(:run_id AS uuid) AND status = 'completed'"),
+            {'run_id': run_id},
+        ).fetchone()
+    if row is None or row[0] is None:
+        return None
+    header = orjson.loads(row[0])
+    header['leg_count'] = row[1] or 0
+    header.setdefault('meta', {})['run_id'] = str(run_id)
+    return header
+
+
+def load_trades(
+    run_id: str,
+    offset: int = 0,
+    limit: Optional[int] = None,
+    columns: Optional[List[str]] = None,
+) -> TradeTable:
+    """
+    Leg rows of a stored run (ordered by trade, leg), optionally one page.
+    Read columnar, mirroring the write path: one COPY ... TO STDOUT parsed by
+    Polars, row_extra decoded as a whole column.
+    """
+    select = [f"{col}::float8" if kind == 'num' else col for col, _, kind in _LEG_COLUMNS]
+    sql = (f"SELECT {', '.join(select)}, row_extra::text AS row_extra FROM backtest_trade_legs "
+           f"WHERE run_id = CAST(%(run_id)s AS uuid) ORDER BY trade_no, leg_no, id")
+    params: Dict[str, Any] = {'run_id': run_id}
+    if limit is not None:
+        sql += " LIMIT %(limit)s OFFSET %(offset)s"
+        params.update({'limit': int(limit), 'offset': int(offset)})
+
+    buf = io.BytesIO()
+    raw = get_engine().raw_connection()
+    try:
+        with raw.cursor() as cur:
+            query = cur.mogrify(sql, params).decode()
+            cur.copy_expert(
+                f"COPY ({query}) TO STDOUT WITH (FORMAT CSV, HEADER, NULL '{_NULL_SENTINEL}')",
+                buf,
+            )
+    finally:
+        raw.close()
+
+    dtypes = {col: _COLUMN_DTYPES[kind] for col, _, kind in _LEG_COLUMNS}
+    dtypes['row_extra'] = pl.Utf8
+    frame = pl.read_csv(buf.getvalue(), dtypes=dtypes, null_values=_NULL_SENTINEL)
+    if not frame.height:
+        return TradeTable()
+
+    frame = frame.with_columns([
+        pl.col(col).str.strptime(pl.Date, '%Y-%m-%d', strict=False)
+        for col, _, kind in _LEG_COLUMNS if kind == 'date'
+    ])
+    # Trade labels are stored as text; numeric ones go back out as numbers
+    labels = frame['trade_index_label'].drop_nulls()
+    if labels.str.contains(r'^\d+$').all():
+        frame = frame.with_columns(pl.col('trade_index_label').cast(pl.Int64))
+
+    extra = frame['row_extra']
+    frame = frame.drop('row_extra').rename(
+        {col: key for col, key, _ in _LEG_COLUMNS}
+    )
+    if extra.null_count() < len(extra):
+        decoded = extra.str.json_decode(infer_schema_length=None).struct.unnest()
+        frame = pl.concat(
+            [frame, decoded.select([c for c in decoded.columns if c not in frame.columns])],
+            how='horizontal',
+        )
+
+    if columns:
+        frame = frame.select([c for c in columns if c in frame.columns])
+    return TradeTable(frame)
+
+
+def load_stored_result(run_id: str, as_table: bool = False) -> Optional[Dict[str, Any]]:
+    """Full result of a stored run, shaped like execute_algotest_job's."""
+    header = load_run_header(run_id)
+    if header is None:
+        return None
+    table = load_trades(run_id, columns=header.get('columns') or None)
+    return {
+        'status': 'success',
+        'trades': table if as_table else table.to_records(),
+        'summary': header.get('summary') or {},
+        'pivot': header.get('pivot') or {"headers": [], "rows": []},
+        'meta': header.get('meta') or {},
+        'cached': True,
+    }
+
+
+def lookup_stored_result(payload: Dict[str, Any], as_table: bool = False) -> Optional[Dict[str, Any]]:
+    """Stored result for a repeat request, or None."""
+    run_id = find_run(payload)
+    if not run_id:
+        return None
+    try:
+        result = load_stored_result(run_id, as_table=as_table)
+    except Exception as err:
+        _mark_unavailable(err)
+        return None
+    if result is not None:
+        logger.info(f"[RESULT STORE] Hit run {run_id} for {payload.get('index')}")
+    return result
@@ -0,0 +1,298 @@
+"""
+Expiry-sharded distributed AlgoTest backtests
+
+PHASE 9: Distributed Execution
+
+Long ranges are split into contiguous groups of expiries ("shards") that run
+as a Celery chord on the ``backtests`` queue; one merge task stacks the shard
+frames, renumbers the trades and continues the equity curve across shards as
+column expressions, and computes analytics once.
+
+Why expiry-aligned shards are exact:
+- Every trade (and its whole re-entry chain) belongs to exactly one expiry,
+  and re-entries never outlive that expiry's exit date.
+- Each shard only TRADES its own expiries (``_expiry_chunk``) but loads a
+  data window padded by SHARD_LOOKBACK_DAYS / SHARD_LOOKAHEAD_DAYS, so DTE
+  entry anchors and next-expiry exits that cross a shard boundary resolve
+  against the same trading calendar as a single-process run.
+
+Usage:
+    from services.sharded_backtest import plan_expiry_shards, merge_shard_results
+
+    expiries = shardable_expiries(payload)             # [] → run unsharded
+    shards = plan_expiry_shards(payload, n_shards=8, expiries=expiries)
+    ...                                                # chord of shard tasks
+    result = merge_shard_results(payload, shard_results)
+"""
+
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+import polars as pl
+
+from services.algotest_job import (
+    _compute_trade_analytics,
+    _convert_numpy,
+    _normalize_request,
+)
+from services.incremental_backtest import _supports_incremental
+from services.job_control import JobCancelled, current_job
+from services.result_artifacts import (
+    load_result_artifact,
+    remove_result_artifact,
+    write_result_artifact,
+)
+from services.result_store import store_result
+from services.trade_table import TradeTable
+
+logger = logging.getLogger(__name__)
+
+
+# Sharding is only worth the chord overhead for long ranges
+SHARD_MIN_EXPIRIES = int(os.getenv("SHARD_MIN_EXPIRIES", "60"))
+SHARD_MIN_EXPIRIES_PER_SHARD = int(os.getenv("SHARD_MIN_EXPIRIES_PER_SHARD", "20"))
+# Shards per backtests worker — >1 evens out uneven shard runtimes
+SHARDS_PER_WORKER = int(os.getenv("SHARDS_PER_WORKER", "2"))
+# Padding around a shard's expiries (calendar days)
+SHARD_LOOKBACK_DAYS = int(os.getenv("SHARD_LOOKBACK_DAYS", "62"))
+SHARD_LOOKAHEAD_DAYS = int(os.getenv("SHARD_LOOKAHEAD_DAYS", "45"))
+
+_EQUITY_COLUMNS = ('Cumulative', 'Peak', 'DD', '%DD')
+
+
+def _expiry_type(payload: Dict[str, Any]) -> str:
+    etype = str(payload.get('expiry_type', 'WEEKLY') or 'WEEKLY').upper()
+    return 'weekly' if etype in ('WEEKLY', 'NEXT_WEEKLY', 'WEEKLY_T1') else 'monthly'
+
+
+def _supports_sharding(payload: Dict[str, Any]) -> bool:
+    """Same constraint as incremental runs: fixed entry mode pins the first
+    entry to the segment start, so a shard would place entries differently.
+    Custom expiry weekdays are generated by the engine itself, not listed."""
+    return _supports_incremental(payload) and payload.get('expiry_day_of_week') is None
+
+
+def shardable_expiries(request: Dict[str, Any]) -> List[pd.Timestamp]:
+    """
+    Expiries of the job when it is large enough (and its options allow) to
+    be worth at least two shards, else []. Cheap — run it before asking how
+    many workers there are.
+    """
+    from engines.generic_algotest_engine import get_expiry_dates
+
+    payload = _normalize_request(request)
+    if not _supports_sharding(payload):
+        return []
+    expiry_df = get_expiry_dates(payload['index'], _expiry_type(payload),
+                                 payload.get('from_date'), payload.get('to_date'))
+    if expiry_df is None or expiry_df.empty or len(expiry_df) < SHARD_MIN_EXPIRIES:
+        return []
+    expiries = sorted(pd.to_datetime(expiry_df['Current Expiry']).dt.normalize().unique())
+    return expiries if len(expiries) // SHARD_MIN_EXPIRIES_PER_SHARD >= 2 else []
+
+
+def plan_expiry_shards(
+    request: Dict[str, Any],
+    n_shards: int,
+    expiries: Optional[List[pd.Timestamp]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Split the job into expiry-aligned shard payloads (``expiries`` from
+    shardable_expiries, looked up when not given).
+
+    Returns an empty list when the job is too small or its options do not
+    allow sharding — the caller then runs it as a single job.
+    """
+    payload = _normalize_request(request)
+    if n_shards < 2:
+        return []
+    if expiries is None:
+        expiries = shardable_expiries(payload)
+    if not expiries:
+        return []
+
+    from_date, to_date = payload.get('from_date'), payload.get('to_date')
+    n_shards = min(n_shards, max(1, len(expiries) // SHARD_MIN_EXPIRIES_PER_SHARD))
+    if n_shards < 2:
+        return []
+
+    user_from = pd.to_datetime(from_date)
+    user_to = pd.to_datetime(to_date)
+    size, extra = divmod(len(expiries), n_shards)
+    shards = []
+    start = 0
+    for shard_no in range(n_shards):
+        end = start + size + (1 if shard_no < extra else 0)
+        group = expiries[start:end]
+        start = end
+        first, last = pd.Timestamp(group[0]), pd.Timestamp(group[-1])
+
+        shard = dict(payload)
+        shard.pop('date_from', None)
+        shard.pop('date_to', None)
+        shard['from_date'] = max(user_from, first - pd.Timedelta(days=SHARD_LOOKBACK_DAYS)).strftime('%Y-%m-%d')
+        shard['to_date'] = min(user_to, last + pd.Timedelta(days=SHARD_LOOKAHEAD_DAYS)).strftime('%Y-%m-%d')
+        shard['_expiry_chunk'] = [pd.Timestamp(e).strftime('%Y-%m-%d') for e in group]
+        shard['_shard'] = shard_no
+        shards.append(shard)
+
+    logger.info(
+        f"[SHARD] {payload['index']} {from_date} → {to_date}: "
+        f"{len(expiries)} expiries in {len(shards)} shards"
+    )
+    return shards
+
+
+def run_shard(shard: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Run one shard: load its padded window once and trade its expiries.
+    Rows are written to an Arrow artifact; only its handle goes through Redis.
+    """
+    from base import bulk_load_options
+    from engines.generic_algotest_engine import run_algotest_backtest
+
+    t0 = time.perf_counter()
+    job = current_job()
+    df = pd.DataFrame()
+    # A shard still queued when the job was cancelled contributes nothing
+    if job is None or not job.cancelled(refresh=True):
+        try:
+            bulk_load_options(shard['index'], shard['from_date'], shard['to_date'])
+            df, _, _ = run_algotest_backtest(shard)
+        except JobCancelled:
+            df = pd.DataFrame()
+    handle = write_result_artifact({'status': 'success', 'trades': TradeTable.from_frame(df)})
+    return {
+        'shard': shard.get('_shard', 0),
+        'artifact_id': handle['artifact_id'],
+        'expiries': len(shard.get('_expiry_chunk') or []),
+        'elapsed_s': round(time.perf_counter() - t0, 2),
+        'cancelled': job is not None and job.cancelled(),
+    }
+
+
+def _shard_table(result: Dict[str, Any]) -> TradeTable:
+    """Trades of one shard, read from (and then removing) its artifact."""
+    artifact_id = result.get('artifact_id')
+    if not artifact_id:
+        return TradeTable.coerce(result.get('rows'))
+    try:
+        return load_result_artifact(artifact_id, as_table=True)['trades']
+    finally:
+        remove_result_artifact(artifact_id)
+
+
+def _chain_shards(shard_results: List[Dict[str, Any]]) -> TradeTable:
+    """
+    Stack shard frames in expiry order with sequential trade numbers and one
+    additive equity curve (each shard's engine curve restarts at 100).
+
+    A trade's % step is the change of its engine Cumulative from the previous
+    trade's within the shard; Trade / Cumulative / Peak / DD / %DD are then
+    column expressions over the stacked per-trade steps, written to the first
+    leg row of each trade as the engine does.
+    """
+    frames = []
+    for result in sorted(shard_results, key=lambda r: r.get('shard', 0)):
+        table = _shard_table(result)
+        if len(table) and 'Trade' in table.columns:
+            frames.append(table.frame.with_columns(
+                pl.lit(result.get('shard', 0), dtype=pl.Int64).alias('_shard'),
+                pl.col('Trade').cast(pl.Int64, strict=False).fill_null(0).alias('_tid'),
+            ))
+    if not frames:
+        return TradeTable()
+
+    legs = pl.concat(frames, how='diagonal_relaxed').sort(['_shard', '_tid'], maintain_order=True)
+    if 'Cumulative' not in legs.columns:
+        legs = legs.with_columns(pl.lit(None, dtype=pl.Float64).alias('Cumulative'))
+    columns = [c for c in legs.columns if not c.startswith('_')]
+    columns += [c for c in ('Trade', 'Index', *_EQUITY_COLUMNS) if c not in columns]
+
+    cum = pl.col('_cum')
+    equity, peak = pl.col('_equity'), pl.col('_peak')
+    trades = (
+        legs.group_by(['_shard', '_tid'], maintain_order=True)
+            .agg(pl.col('Cumulative').cast(pl.Float64, strict=False).fill_nan(None)
+                   .drop_nulls().first().alias('_cum'))
+            .with_columns(
+                pl.when(cum.is_null()).then(0.0)
+                  .otherwise(cum - cum.forward_fill().shift(1).over('_shard').fill_null(100.0))
+                  .alias('_step')
+            )
+            .with_columns((100.0 + pl.col('_step').cum_sum()).alias('_equity'))
+            .with_columns(pl.max_horizontal(equity.cum_max(), pl.lit(100.0)).alias('_peak'))
+            .select(
+                '_shard', '_tid',
+                pl.int_range(1, pl.len() + 1, dtype=pl.Int64).alias('Trade'),
+                equity.round(2).alias('Cumulative'),
+                peak.round(2).alias('Peak'),
+                (equity - peak).round(2).alias('DD'),
+                ((equity - peak) / peak * 100).round(4).alias('%DD'),
+            )
+    )
+
+    first_leg = pl.int_range(pl.len()).over(['_shard', '_tid']) == 0
+    merged = (
+        legs.drop([c for c in ('Trade', 'Index', *_EQUITY_COLUMNS) if c in legs.columns])
+            .join(trades, on=['_shard', '_tid'], how='left')
+            .with_columns(
+                pl.col('Trade').alias('Index'),
+                *[pl.when(first_leg).then(pl.col(c)).otherwise(None).alias(c) for c in _EQUITY_COLUMNS],
+            )
+            .select(columns)
+    )
+    return TradeTable(merged)
+
+
+def merge_shard_results(request: Dict[str, Any], shard_results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Chord callback body: one renumbering pass and one analytics pass."""
+    payload = _normalize_request(request)
+    no_cache = bool(payload.pop('no_cache', False))
+    failed = [r for r in shard_results if r.get('error')]
+    if failed:
+        for r in shard_results:
+            if r.get('artifact_id'):
+                remove_result_artifact(r['artifact_id'])
+        return {
+            'status': 'error',
+            'message': f"{len(failed)} of {len(shard_results)} shards failed: {failed[0]['error']}",
+        }
+
+    all_trades = _chain_shards(shard_results)
+    result_summary: Dict[str, Any] = {}
+    result_pivot: Dict[str, Any] = {"headers": [], "rows": []}
+    if len(all_trades):
+        all_trades, result_summary, result_pivot = _compute_trade_analytics(all_trades, as_table=True)
+
+    # Trades stay a TradeTable (NaN equity → null on export); publish_result
+    # writes them to the job's Arrow artifact as they are
+    result = {
+        'status': 'success',
+        'trades': all_trades,
+        'summary': _convert_numpy(result_summary),
+        'pivot': _convert_numpy(result_pivot),
+        'meta': {
+            'index': payload.get('index'),
+            'from_date': payload.get('from_date'),
+            'to_date': payload.get('to_date'),
+            'date_range': f"{payload.get('from_date')} to {payload.get('to_date')}",
+            'sharding': {
+                'shards': len(shard_results),
+                'expiries': sum(r.get('expiries', 0) for r in shard_results),
+                'shard_elapsed_s': [r.get('elapsed_s') for r in sorted(shard_results, key=lambda r: r.get('shard', 0))],
+            },
+        },
+        'cached': False,
+    }
+    job = current_job()
+    if any(r.get('cancelled') for r in shard_results) or (job is not None and job.cancelled(refresh=True)):
+        # Partial result (finished shards only): returned, never stored
+        result['meta'].update({'cancelled': True, 'partial': True})
+        return result
+    if not no_cache:
+        store_result(payload, result)
+    return result
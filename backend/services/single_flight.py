@@ -0,0 +1,363 @@
+"""
+Single-flight coalescing of identical AlgoTest runs
+
+PHASE 11: Live Job Control
+
+Identical requests that arrive while the same backtest is already running
+attach to that run instead of starting another engine pass:
+
+- Key: BacktestCache.generate_key of the normalized request, so the
+  coalescing key and the result-cache key always agree
+- Lock: SET NX in Redis holding the owner (a Celery job id, or a call id
+  for the synchronous endpoint), shared by all API processes and workers
+- Fan-out: the owner publishes its result handle (the Arrow artifact is on
+  the shared volume) to every follower when it finishes
+- Async followers simply get the owner's job id — polling and SSE already
+  serve any number of clients per job
+
+Followers are reference-counted, so a cancel from one client only detaches
+it while others are still waiting. Synchronous followers wait on Redis
+pub/sub from the event loop (no thread per waiter), and a synchronous owner
+keeps a short-lived heartbeat key alive while it runs: when it stops (the
+API process died), followers give up and the next one takes the run over
+instead of waiting out the lock TTL.
+
+Usage:
+    key = flight_key(payload)
+    owner = attach_or_lead(key, job_id, is_live=...)   # None → we lead
+    ...
+    complete(key, job_id, result_handle)               # fan out + unlock
+
+    result = await wait_for(key)                        # synchronous follower
+"""
+
+import asyncio
+import logging
+import os
+import time
+import uuid
+from typing import Any, Callable, Dict, Optional
+
+import orjson
+import redis
+
+logger = logging.getLogger(__name__)
+
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379/0")
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "1") == "1"
+# Longest a run may hold the lock (a crashed owner frees it after this)
+SINGLE_FLIGHT_TTL = int(os.getenv("SINGLE_FLIGHT_TTL", "1800"))
+# How long a finished result stays readable for followers that raced the publish
+SINGLE_FLIGHT_RESULT_TTL = int(os.getenv("SINGLE_FLIGHT_RESULT_TTL", "120"))
+SINGLE_FLIGHT_POLL_S = float(os.getenv("SINGLE_FLIGHT_POLL_S", "5"))
+# Synchronous owners refresh their heartbeat this often; three missed beats = dead
+SINGLE_FLIGHT_HEARTBEAT_S = float(os.getenv("SINGLE_FLIGHT_HEARTBEAT_S", "5"))
+_HEARTBEAT_TTL = max(1, int(SINGLE_FLIGHT_HEARTBEAT_S * 3))
+
+JOB_OWNER_PREFIX = 'job:'
+CALL_OWNER_PREFIX = 'call:'
+
+_redis_client: Optional[redis.Redis] = None
+_scripts: Dict[str, Any] = {}
+
+# Returns the current owner (and counts us as a follower) if the lock is held
+_ATTACH_LUA = """
+local owner = redis.call('GET', KEYS[1])
+if owner then
+    redis.call('INCR', KEYS[2])
+    redis.call('EXPIRE', KEYS[2], ARGV[1])
+end
+return owner
+"""
+
+# Owner only: drop the lock and, if anyone is waiting, publish the result
+_COMPLETE_LUA = """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then
+    return -1
+end
+local followers = tonumber(redis.call('GET', KEYS[2]) or '0')
+redis.call('DEL', KEYS[1], KEYS[2])
+if followers > 0 then
+    redis.call('SET', KEYS[3], ARGV[2], 'EX', ARGV[3])
+    redis.call('PUBLISH', KEYS[4], ARGV[2])
+end
+return followers
+"""
+
+# Take over a stale run: unlock only if the dead owner still holds the lock
+_TAKEOVER_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    redis.call('DEL', KEYS[1], KEYS[2])
+end
+return 0
+"""
+
+# Follower leaving (cancel): 1 if it detached, 0 if nobody else is attached
+_DETACH_LUA = """
+local followers = tonumber(redis.call('GET', KEYS[1]) or '0')
+if followers > 0 then
+    redis.call('DECR', KEYS[1])
+    return 1
+end
+return 0
+"""
+
+
+def _lock_key(key: str) -> str:
+    return f"flight:{key}"
+
+
+def _followers_key(key: str) -> str:
+    return f"flight:{key}:followers"
+
+
+def _result_key(key: str) -> str:
+    return f"flight:{key}:result"
+
+
+def _channel(key: str) -> str:
+    return f"flight:{key}:done"
+
+
+def _job_key(job_id: str) -> str:
+    return f"flight:job:{job_id}"
+
+
+def _heartbeat_key(owner: str) -> str:
+    return f"flight:beat:{owner}"
+
+
+def _get_redis_client() -> Optional[redis.Redis]:
+    global _redis_client
+    if _redis_client is None:
+        try:
+            client = redis.Redis.from_url(REDIS_URL)
+            client.ping()
+            _redis_client = client
+        except redis.RedisError as exc:
+            logger.warning("[FLIGHT] Unable to connect to Redis, coalescing disabled: %s", exc)
+            return None
+    return _redis_client
+
+
+def _script(client: redis.Redis, name: str, source: str):
+    if name not in _scripts:
+        _scripts[name] = client.register_script(source)
+    return _scripts[name]
+
+
+def new_call_owner() -> str:
+    return CALL_OWNER_PREFIX + uuid.uuid4().hex
+
+
+def job_owner(job_id: str) -> str:
+    return JOB_OWNER_PREFIX + job_id
+
+
+def owner_job_id(owner: Optional[str]) -> Optional[str]:
+    if owner and owner.startswith(JOB_OWNER_PREFIX):
+        return owner[len(JOB_OWNER_PREFIX):]
+    return None
+
+
+def call_owner_live(owner: str) -> bool:
+    """A synchronous owner is alive while its heartbeat key exists."""
+    client = _get_redis_client()
+    if client is None:
+        return True
+    try:
+        return bool(client.exists(_heartbeat_key(owner)))
+    except redis.RedisError:
+        return True
+
+
+async def heartbeat(owner: str) -> None:
+    """
+    Synchronous owner: keep the heartbeat fresh until cancelled. Run it as
+    a task next to the engine call; attach_or_lead set the first beat.
+    """
+    import redis.asyncio as aioredis
+
+    client = aioredis.from_url(REDIS_URL)
+    try:
+        while True:
+            await asyncio.sleep(SINGLE_FLIGHT_HEARTBEAT_S)
+            try:
+                await client.set(_heartbeat_key(owner), 1, ex=_HEARTBEAT_TTL)
+            except redis.RedisError as exc:
+                logger.warning("[FLIGHT] heartbeat failed for %s: %s", owner, exc)
+    finally:
+        try:
+            await client.delete(_heartbeat_key(owner))
+            await client.close()
+        except Exception:
+            pass
+
+
+def flight_key(request: Dict[str, Any]) -> Optional[str]:
+    """Coalescing key: the result-cache key of the normalized request."""
+    if not SINGLE_FLIGHT_ENABLED:
+        return None
+    from services.algotest_job import _normalize_request
+    from services.backtest_cache import get_backtest_cache
+
+    payload = _normalize_request(request)
+    return get_backtest_cache().generate_key(
+        symbol=payload.get('index'),
+        from_date=payload.get('from_date'),
+        to_date=payload.get('to_date'),
+        strategy_config=payload,
+    )
+
+
+def attach_or_lead(
+    key: Optional[str],
+    owner: str,
+    is_live: Optional[Callable[[str], bool]] = None,
+) -> Optional[str]:
+    """
+    Take the lock for ``owner`` (→ None: run it yourself) or attach to the
+    run already holding it (→ that owner). ``is_live`` lets the caller
+    reject a stale job owner (e.g. a revoked / crashed Celery job);
+    synchronous owners are judged by their heartbeat. A stale lock is then
+    taken over.
+    """
+    client = _get_redis_client() if key else None
+    if client is None:
+        return None
+    try:
+        job_id = owner_job_id(owner)
+        for _ in range(3):
+            if job_id is None:
+                # Beat first, so a follower never sees a synchronous owner without one
+                client.set(_heartbeat_key(owner), 1, ex=_HEARTBEAT_TTL)
+            if client.set(_lock_key(key), owner, nx=True, ex=SINGLE_FLIGHT_TTL):
+                if job_id:
+                    client.set(_job_key(job_id), key, ex=SINGLE_FLIGHT_TTL)
+                return None
+            if job_id is None:
+                client.delete(_heartbeat_key(owner))
+            current = _script(client, 'attach', _ATTACH_LUA)(
+                keys=[_lock_key(key), _followers_key(key)], args=[SINGLE_FLIGHT_TTL],
+            )
+            if current is None:
+                continue  # released between SET and attach — try to lead again
+            current = current.decode() if isinstance(current, bytes) else current
+            stale = (
+                not call_owner_live(current) if owner_job_id(current) is None
+                else is_live is not None and not is_live(current)
+            )
+            if stale:
+                logger.info("[FLIGHT] taking over stale run %s", current)
+                _script(client, 'takeover', _TAKEOVER_LUA)(
+                    keys=[_lock_key(key), _followers_key(key)], args=[current],
+                )
+                continue
+            logger.info("[FLIGHT] coalesced onto %s", current)
+            return current
+    except redis.RedisError as exc:
+        logger.warning("[FLIGHT] lock failed, running uncoalesced: %s", exc)
+    return None
+
+
+def complete(key: Optional[str], owner: str, result: Dict[str, Any]) -> int:
+    """Owner finished: unlock and fan the (small) result out. Returns the follower count."""
+    client = _get_redis_client() if key else None
+    if client is None:
+        return 0
+    try:
+        followers = _script(client, 'complete', _COMPLETE_LUA)(
+            keys=[_lock_key(key), _followers_key(key), _result_key(key), _channel(key)],
+            args=[owner, orjson.dumps(result), SINGLE_FLIGHT_RESULT_TTL],
+        )
+    except redis.RedisError as exc:
+        logger.warning("[FLIGHT] release failed for %s: %s", key, exc)
+        return 0
+    followers = int(followers)
+    if followers > 0:
+        logger.info("[FLIGHT] %s served %d coalesced request(s)", owner, followers)
+    return max(followers, 0)
+
+
+def complete_job(job_id: str, result: Dict[str, Any]) -> int:
+    """complete() for a Celery job, found by its id."""
+    client = _get_redis_client()
+    if client is None:
+        return 0
+    try:
+        key = client.get(_job_key(job_id))
+        client.delete(_job_key(job_id))
+    except redis.RedisError:
+        return 0
+    if key is None:
+        return 0
+    return complete(key.decode(), job_owner(job_id), result)
+
+
+def detach(key: Optional[str]) -> bool:
+    """Drop one follower of ``key``; False when no follower was attached."""
+    client = _get_redis_client() if key else None
+    if client is None:
+        return False
+    try:
+        return bool(_script(client, 'detach', _DETACH_LUA)(keys=[_followers_key(key)]))
+    except redis.RedisError:
+        return False
+
+
+def detach_job(job_id: str) -> bool:
+    """
+    A client of a coalesced job cancels: True if other clients are still
+    attached (the run continues, only this follower is dropped).
+    """
+    client = _get_redis_client()
+    if client is None:
+        return False
+    try:
+        key = client.get(_job_key(job_id))
+    except redis.RedisError:
+        return False
+    return key is not None and detach(key.decode())
+
+
+async def wait_for(key: str, timeout: float = SINGLE_FLIGHT_TTL) -> Optional[Dict[str, Any]]:
+    """
+    Follower side: wait (on the event loop, no thread held) until the owner
+    publishes its result. None when the owner vanished without publishing —
+    unlocked, or a synchronous owner whose heartbeat stopped — so the caller
+    attaches again and takes the run over.
+    """
+    import redis.asyncio as aioredis
+
+    client = aioredis.from_url(REDIS_URL)
+    pubsub = client.pubsub()
+    deadline = time.monotonic() + timeout
+    try:
+        await pubsub.subscribe(_channel(key))
+        while time.monotonic() < deadline:
+            # Result key covers a publish that happened before we subscribed
+            stored = await client.get(_result_key(key))
+            if stored is not None:
+                return orjson.loads(stored)
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=SINGLE_FLIGHT_POLL_S)
+            if message is not None:
+                return orjson.loads(message['data'])
+            owner = await client.get(_lock_key(key))
+            if owner is None:
+                stored = await client.get(_result_key(key))
+                return orjson.loads(stored) if stored is not None else None
+            owner = owner.decode()
+            if owner_job_id(owner) is None and not await client.exists(_heartbeat_key(owner)):
+                logger.info("[FLIGHT] owner %s stopped heartbeating, giving up on %s", owner, key)
+                return None
+    except redis.RedisError as exc:
+        logger.warning("[FLIGHT] wait failed for %s: %s", key, exc)
+    finally:
+        try:
+            await pubsub.unsubscribe()
+            await pubsub.close()
+            await client.close()
+        except Exception:
+            pass
+    return None
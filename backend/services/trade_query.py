@@ -0,0 +1,131 @@
+"""
+Paged trade queries over stored results
+
+PHASE 10: Columnar Results
+
+Serves the results table one page at a time instead of shipping every leg
+row up front. Queries run lazily over the memory-mapped Arrow artifact of a
+job, or of a stored run (materialized once from the result store):
+
+- offset/limit paging with next_offset
+- column projection
+- sort by any column (date columns sort chronologically)
+- filters: exit reason, exit year, leg number
+
+Usage:
+    from services.trade_query import query_trades, run_trades_frame
+
+    page = query_trades(run_trades_frame(run_id), columns=['Trade', 'Net P&L'],
+                        sort='Net P&L', descending=True, year=[2023], limit=100)
+"""
+
+import logging
+import uuid
+from typing import Any, Dict, List, Optional, Sequence
+
+import polars as pl
+
+from services.result_artifacts import (
+    ArtifactNotFound,
+    artifact_exists,
+    scan_result_artifact,
+    write_result_artifact,
+)
+from services.result_store import load_stored_result
+from services.trade_table import DATE_FORMAT, TradeTable
+
+logger = logging.getLogger(__name__)
+
+
+MAX_PAGE_SIZE = 5000
+_DATE_SORT_COLUMNS = ('Entry Date', 'Exit Date', 'Leg Exit Date')
+
+
+class TradeQueryError(ValueError):
+    """Invalid projection, sort or filter for the result's columns."""
+
+
+def run_artifact_id(run_id: str) -> str:
+    """Stored runs are materialized under their UUID hex."""
+    try:
+        return uuid.UUID(str(run_id)).hex
+    except ValueError:
+        raise ArtifactNotFound(run_id)
+
+
+def run_trades_frame(run_id: str) -> pl.LazyFrame:
+    """Lazy trades of a stored run; the first request writes its artifact."""
+    artifact_id = run_artifact_id(run_id)
+    if not artifact_exists(artifact_id):
+        result = load_stored_result(run_id, as_table=True)
+        if result is None:
+            raise ArtifactNotFound(run_id)
+        write_result_artifact(result, artifact_id=artifact_id)
+        logger.info(f"[TRADES] Materialized run {run_id} ({len(result['trades'])} legs)")
+    return scan_result_artifact(artifact_id)
+
+
+def _check_columns(schema: Dict[str, Any], names: Sequence[str], what: str) -> None:
+    missing = [n for n in names if n not in schema]
+    if missing:
+        raise TradeQueryError(f"Unknown {what} column(s): {', '.join(missing)}")
+
+
+def _exit_year() -> pl.Expr:
+    return pl.col('Exit Date').cast(pl.Utf8).str.strptime(pl.Date, DATE_FORMAT, strict=False).dt.year()
+
+
+def query_trades(
+    source: pl.LazyFrame,
+    columns: Optional[List[str]] = None,
+    sort: Optional[str] = None,
+    descending: bool = False,
+    exit_reason: Optional[List[str]] = None,
+    year: Optional[List[int]] = None,
+    leg: Optional[List[int]] = None,
+    offset: int = 0,
+    limit: int = 500,
+) -> Dict[str, Any]:
+    """One page of leg rows after filters and sort; only the page is collected."""
+    if offset < 0 or not 1 <= limit <= MAX_PAGE_SIZE:
+        raise TradeQueryError(f"offset must be >= 0 and limit in 1..{MAX_PAGE_SIZE}")
+    schema = source.schema
+    if columns:
+        _check_columns(schema, columns, 'projection')
+    if sort:
+        _check_columns(schema, [sort], 'sort')
+
+    lf = source
+    if exit_reason:
+        _check_columns(schema, ['Exit Reason'], 'filter')
+        wanted = [r.strip().upper() for r in exit_reason if r.strip()]
+        lf = lf.filter(pl.col('Exit Reason').cast(pl.Utf8).str.to_uppercase().is_in(wanted))
+    if year:
+        _check_columns(schema, ['Exit Date'], 'filter')
+        lf = lf.filter(_exit_year().is_in(list(year)))
+    if leg:
+        _check_columns(schema, ['Leg'], 'filter')
+        lf = lf.filter(pl.col('Leg').cast(pl.Int64, strict=False).is_in(list(leg)))
+
+    total = lf.select(pl.len()).collect().item()
+
+    if sort:
+        key = pl.col(sort)
+        if sort in _DATE_SORT_COLUMNS:
+            key = key.cast(pl.Utf8).str.strptime(pl.Date, DATE_FORMAT, strict=False)
+        lf = lf.sort(key, descending=descending, nulls_last=True, maintain_order=True)
+
+    page = lf.slice(offset, limit)
+    if columns:
+        page = page.select(columns)
+    frame = page.collect()
+
+    next_offset = offset + frame.height
+    return {
+        'total': total,
+        'offset': offset,
+        'limit': limit,
+        'next_offset': next_offset if next_offset < total else None,
+        'columns': frame.columns,
+        'trades': TradeTable(frame).to_records(),
+    }
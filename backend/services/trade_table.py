@@ -0,0 +1,218 @@
+"""
+Columnar trade table
+
+PHASE 10: Columnar Results
+
+Features:
+- Column buffers the engine appends leg rows to (no list of dicts)
+- Polars-backed frame for Trade-ID offsets / re-indexing / concatenation
+- One columnar hop to pandas for compute_analytics
+- Vectorized date formatting and NaN → null on the way out
+
+Usage:
+    from services.trade_table import TradeTable
+
+    table = TradeTable()
+    table.append({'Trade': 1, 'Leg': 1, 'Net P&L': 12.5, ...})
+    table = table.reindex_trades()
+    df = table.to_pandas()            # Entry/Exit Date parsed for analytics
+    rows = table.to_records()         # JSON-ready dicts ('%d-%m-%Y' dates, null for NaN)
+    table.write_ipc(path)             # Arrow IPC artifact (memory-mapped on read)
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+import pandas as pd
+import polars as pl
+
+
+DATE_COLUMNS = ('Entry Date', 'Exit Date')
+DATE_FORMAT = '%d-%m-%Y'
+
+
+def _to_series(name: str, values: list) -> pl.Series:
+    """
+    Build a typed column from appended Python values.
+
+    Engine columns are mostly homogeneous; the exceptions are numeric columns
+    that use '' as a blank (e.g. 'FUT Entry Price' on option legs) and the odd
+    int/float mix, which become Float64 with nulls.
+    """
+    try:
+        return pl.Series(name, values)
+    except Exception:
+        pass
+    try:
+        return pl.Series(
+            name,
+            [None if (v is None or v == '') else float(v) for v in values],
+            dtype=pl.Float64,
+        )
+    except (TypeError, ValueError):
+        return pl.Series(name, [None if v is None else str(v) for v in values], dtype=pl.Utf8)
+
+
+class TradeTable:
+    """Column-oriented per-leg trade rows."""
+
+    __slots__ = ('_frame', '_columns', '_buffered')
+
+    def __init__(self, frame: Optional[pl.DataFrame] = None):
+        self._frame = frame
+        self._columns: Dict[str, list] = {}
+        self._buffered = 0
+
+    # ── Construction ─────────────────────────────────────────────────────────
+    @classmethod
+    def from_rows(cls, rows: Iterable[Dict[str, Any]]) -> 'TradeTable':
+        table = cls()
+        for row in rows:
+            table.append(row)
+        return table
+
+    @classmethod
+    def from_frame(cls, df: Union[pd.DataFrame, pl.DataFrame, None]) -> 'TradeTable':
+        if df is None:
+            return cls()
+        if isinstance(df, pl.DataFrame):
+            return cls(df)
+        if df.empty:
+            return cls()
+        columns = []
+        for name in df.columns:
+            series = df[name]
+            if series.dtype == object:
+                columns.append(_to_series(str(name), series.tolist()))
+            else:
+                columns.append(pl.from_pandas(series).alias(str(name)))
+        return cls(pl.DataFrame(columns))
+
+    @classmethod
+    def coerce(cls, value: Any) -> 'TradeTable':
+        if isinstance(value, TradeTable):
+            return value
+        if isinstance(value, (pd.DataFrame, pl.DataFrame)):
+            return cls.from_frame(value)
+        return cls.from_rows(value or [])
+
+    @classmethod
+    def concat(cls, tables: Iterable['TradeTable']) -> 'TradeTable':
+        frames = [t.frame for t in tables if len(t)]
+        if not frames:
+            return cls()
+        if len(frames) == 1:
+            return cls(frames[0])
+        return cls(pl.concat(frames, how='diagonal_relaxed'))
+
+    def append(self, row: Dict[str, Any]) -> None:
+        """Append one leg row to the column buffers."""
+        n = self._buffered
+        columns = self._columns
+        for key, value in row.items():
+            col = columns.get(key)
+            if col is None:
+                col = columns[key] = [None] * n
+            col.append(value)
+        n += 1
+        if len(row) != len(columns):
+            for col in columns.values():
+                if len(col) < n:
+                    col.append(None)
+        self._buffered = n
+
+    # ── Frame access ─────────────────────────────────────────────────────────
+    @property
+    def frame(self) -> pl.DataFrame:
+        """Materialize buffered rows (once) and return the Polars frame."""
+        if self._buffered:
+            buffered = pl.DataFrame([_to_series(k, v) for k, v in self._columns.items()])
+            self._frame = buffered if self._frame is None else pl.concat(
+                [self._frame, buffered], how='diagonal_relaxed'
+            )
+            self._columns = {}
+            self._buffered = 0
+        return self._frame if self._frame is not None else pl.DataFrame()
+
+    def __len__(self) -> int:
+        return self._buffered + (self._frame.height if self._frame is not None else 0)
+
+    @property
+    def columns(self) -> List[str]:
+        return self.frame.columns
+
+    # ── Trade numbering ──────────────────────────────────────────────────────
+    def _trade_ids(self) -> pl.Expr:
+        return pl.col('Trade').cast(pl.Int64, strict=False).fill_null(0)
+
+    def max_trade_id(self) -> int:
+        if not len(self) or 'Trade' not in self.columns:
+            return 0
+        value = self.frame.select(self._trade_ids().max()).item()
+        return int(value or 0)
+
+    def offset_trade_ids(self, offset: int) -> 'TradeTable':
+        """Shift Trade IDs so chunks never collide."""
+        if not offset or not len(self) or 'Trade' not in self.columns:
+            return self
+        return TradeTable(self.frame.with_columns((self._trade_ids() + offset).alias('Trade')))
+
+    def reindex_trades(self) -> 'TradeTable':
+        """
+        Columnar equivalent of algotest_job._reindex_trades: order by engine
+        Trade ID then Leg, and renumber trades 1..N by change of Trade ID.
+        """
+        if not len(self) or 'Trade' not in self.columns:
+            return self
+        frame = self.frame.with_columns(self._trade_ids().alias('_tid'))
+        sort_cols = ['_tid']
+        if 'Leg' in frame.columns:
+            frame = frame.with_columns(pl.col('Leg').cast(pl.Int64, strict=False).fill_null(0).alias('_leg'))
+            sort_cols.append('_leg')
+        frame = (
+            frame.sort(sort_cols, maintain_order=True)
+                 .with_columns(pl.col('_tid').rank('dense').cast(pl.Int64).alias('Trade'))
+                 .with_columns(pl.col('Trade').alias('Index'))
+                 .drop(sort_cols)
+        )
+        return TradeTable(frame)
+
+    # ── Output ───────────────────────────────────────────────────────────────
+    def to_pandas(self, parse_dates: bool = True) -> pd.DataFrame:
+        """One columnar conversion to pandas; Entry/Exit Date parsed for analytics."""
+        if not len(self):
+            return pd.DataFrame()
+        df = self.frame.to_pandas()
+        if parse_dates:
+            for col in DATE_COLUMNS:
+                if col in df.columns and not pd.api.types.is_datetime64_any_dtype(df[col]):
+                    df[col] = pd.to_datetime(df[col], format=DATE_FORMAT, errors='coerce')
+        return df
+
+    def export_frame(self) -> pl.DataFrame:
+        """Frame in output form: datetimes as dd-mm-YYYY strings, NaN as null."""
+        frame = self.frame
+        exprs = []
+        for name, dtype in frame.schema.items():
+            if dtype in (pl.Date, pl.Datetime) or isinstance(dtype, pl.Datetime):
+                exprs.append(pl.col(name).dt.strftime(DATE_FORMAT))
+            elif dtype in (pl.Float32, pl.Float64):
+                exprs.append(pl.col(name).fill_nan(None))
+        return frame.with_columns(exprs) if exprs else frame
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        """
+        JSON-ready rows: datetimes as dd-mm-YYYY strings, NaN as None, native
+        Python scalars only (replaces _format_dates / _convert_numpy /
+        _clear_nan_equity row walks).
+        """
+        if not len(self):
+            return []
+        return self.export_frame().to_dicts()
+
+    # ── Arrow IPC ────────────────────────────────────────────────────────────
+    def write_ipc(self, path) -> None:
+        self.export_frame().write_ipc(path)
+
+    @classmethod
+    def read_ipc(cls, path, memory_map: bool = True) -> 'TradeTable':
+        return cls(pl.read_ipc(path, memory_map=memory_map))
@@ -0,0 +1,333 @@
+"""
+Usage-driven warmup planning and readiness
+
+PHASE 12: Job Scheduling
+
+Startup warmup used to load one fixed symbol / year span. The planner
+decides what to warm from what users actually run:
+
+- History: every AlgoTest request bumps its dataset (symbol and year-aligned
+  range) and its strategy fingerprint in Redis sorted sets (record_request)
+- Config: WARMUP_PLAN_FILE (JSON) or WARMUP_DATASETS ('NIFTY:2,BANKNIFTY:1'
+  → symbol:years) always come first; PREBUILD_SYMBOL / PREBUILD_WARM_YEARS
+  remain the fallback when there is neither config nor history
+- Value: requests × predicted cold-load seconds (services.job_cost); datasets
+  are taken greedily by value while each fits the per-process budget and
+  together fit the page-cache budget (their snapshots stay mapped)
+- Precompute (optional): the top strategies whose result predates the
+  current data version are queued as ordinary AlgoTest jobs
+
+Progress is kept in WarmupState, served by /health/ready; the process
+reports ready once the critical steps (schema, calendar, first dataset) are
+done, while the rest continues in the background.
+
+Usage:
+    record_request(payload)                  # on every AlgoTest request
+    plan = plan_warmup()                     # → [WarmupDataset, ...]
+    warmup_state().snapshot()                # → readiness / progress dict
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+import orjson
+import redis
+
+logger = logging.getLogger(__name__)
+
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379/0")
+WARMUP_PLAN_FILE = os.getenv("WARMUP_PLAN_FILE", "")
+WARMUP_DATASETS = os.getenv("WARMUP_DATASETS", "")
+WARMUP_MAX_DATASETS = int(os.getenv("WARMUP_MAX_DATASETS", "4"))
+# A single dataset must fit the process (same cap as bulk_load)
+WARMUP_PROCESS_BUDGET_MB = int(os.getenv("WARMUP_PROCESS_BUDGET_MB", os.getenv("BULK_LOAD_MAX_MEMORY_MB", "1500")))
+# All warmed datasets together (their snapshots sit in the page cache)
+WARMUP_TOTAL_BUDGET_MB = int(os.getenv("WARMUP_TOTAL_BUDGET_MB", "3000"))
+WARMUP_PRECOMPUTE_TOP = int(os.getenv("WARMUP_PRECOMPUTE_TOP", "0"))
+# Entries kept in each history set
+WARMUP_HISTORY_SIZE = int(os.getenv("WARMUP_HISTORY_SIZE", "200"))
+
+_FALLBACK_SYMBOL = os.getenv("PREBUILD_SYMBOL", "NIFTY")
+_FALLBACK_YEARS = int(os.getenv("PREBUILD_WARM_YEARS", "2"))
+# Configured datasets outrank any amount of history
+_CONFIG_WEIGHT = 1e9
+
+_DATASETS_KEY = "warmup:datasets"
+_STRATEGIES_KEY = "warmup:strategies"
+_STRATEGY_PAYLOADS_KEY = "warmup:strategy_payloads"
+_PRECOMPUTED_KEY = "warmup:precomputed"
+_MB = 1024 * 1024
+
+_redis_client: Optional[redis.Redis] = None
+
+
+@dataclass(frozen=True)
+class WarmupDataset:
+    symbol: str
+    from_date: str
+    to_date: str
+    weight: float
+    resident_bytes: int = 0
+    load_s: float = 0.0
+    source: str = "history"
+
+    @property
+    def value(self) -> float:
+        return self.weight * max(self.load_s, 1.0)
+
+    def as_dict(self) -> Dict[str, Any]:
+        out = asdict(self)
+        out['resident_mb'] = round(self.resident_bytes / _MB, 1)
+        out['load_s'] = round(self.load_s, 1)
+        return out
+
+
+def _get_redis_client() -> Optional[redis.Redis]:
+    global _redis_client
+    if _redis_client is None:
+        try:
+            client = redis.Redis.from_url(REDIS_URL)
+            client.ping()
+            _redis_client = client
+        except redis.RedisError as exc:
+            logger.warning("[WARMUP] Unable to connect to Redis, no request history: %s", exc)
+            return None
+    return _redis_client
+
+
+# ── Request history ───────────────────────────────────────────────────────────
+
+def _year_range(from_date: str, to_date: str) -> tuple:
+    """Year-aligned range, so near-identical requests count as one dataset."""
+    today = date.today().isoformat()
+    return f"{from_date[:4]}-01-01", min(f"{to_date[:4]}-12-31", today)
+
+
+def record_request(request: Dict[str, Any]) -> None:
+    """Count one AlgoTest request towards its dataset and strategy."""
+    client = _get_redis_client()
+    if client is None:
+        return
+    try:
+        from engines.strategy_plan import canonical_request, strategy_fingerprint
+
+        canonical = canonical_request(request)
+        if not canonical.get('from_date') or not canonical.get('to_date'):
+            return
+        start, end = _year_range(canonical['from_date'], canonical['to_date'])
+        fingerprint = strategy_fingerprint(canonical)
+        pipe = client.pipeline(transaction=False)
+        pipe.zincrby(_DATASETS_KEY, 1, f"{canonical['index']}|{start}|{end}")
+        pipe.zincrby(_STRATEGIES_KEY, 1, fingerprint)
+        pipe.hsetnx(_STRATEGY_PAYLOADS_KEY, fingerprint, orjson.dumps(canonical))
+        pipe.zcard(_STRATEGIES_KEY)
+        strategies = pipe.execute()[-1]
+        if strategies > 2 * WARMUP_HISTORY_SIZE:
+            _trim_history(client)
+    except Exception as exc:
+        logger.debug("[WARMUP] request not recorded: %s", exc)
+
+
+def _trim_history(client: redis.Redis) -> None:
+    dropped = client.zrange(_STRATEGIES_KEY, 0, -WARMUP_HISTORY_SIZE - 1)
+    pipe = client.pipeline(transaction=False)
+    pipe.zremrangebyrank(_DATASETS_KEY, 0, -WARMUP_HISTORY_SIZE - 1)
+    pipe.zremrangebyrank(_STRATEGIES_KEY, 0, -WARMUP_HISTORY_SIZE - 1)
+    if dropped:
+        pipe.hdel(_STRATEGY_PAYLOADS_KEY, *dropped)
+        pipe.hdel(_PRECOMPUTED_KEY, *dropped)
+    pipe.execute()
+
+
+# ── Planning ──────────────────────────────────────────────────────────────────
+
+def _configured() -> List[Dict[str, Any]]:
+    entries: List[Dict[str, Any]] = []
+    if WARMUP_PLAN_FILE:
+        try:
+            with open(WARMUP_PLAN_FILE) as handle:
+                entries.extend(json.load(handle).get('datasets') or [])
+        except (OSError, ValueError) as exc:
+            logger.warning("[WARMUP] Ignoring plan file %s: %s", WARMUP_PLAN_FILE, exc)
+    for item in filter(None, (part.strip() for part in WARMUP_DATASETS.split(','))):
+        symbol, _, years = item.partition(':')
+        entries.append({'symbol': symbol, 'years': float(years or _FALLBACK_YEARS)})
+    return entries
+
+
+def _config_range(entry: Dict[str, Any]) -> tuple:
+    if entry.get('from_date') and entry.get('to_date'):
+        return str(entry['from_date'])[:10], str(entry['to_date'])[:10]
+    today = date.today()
+    years = float(entry.get('years') or _FALLBACK_YEARS)
+    start = date.fromordinal(today.toordinal() - int(years * 365.25))
+    return start.isoformat(), today.isoformat()
+
+
+def _candidates() -> Dict[str, List[tuple]]:
+    """symbol → [(from, to, weight, source), ...]"""
+    candidates: Dict[str, List[tuple]] = {}
+    for entry in _configured():
+        start, end = _config_range(entry)
+        weight = _CONFIG_WEIGHT * float(entry.get('weight', 1))
+        candidates.setdefault(str(entry['symbol']).upper(), []).append((start, end, weight, "config"))
+
+    client = _get_redis_client()
+    if client is not None:
+        try:
+            history = client.zrevrange(_DATASETS_KEY, 0, WARMUP_HISTORY_SIZE - 1, withscores=True)
+        except redis.RedisError:
+            history = []
+        for member, hits in history:
+            symbol, start, end = member.decode().split('|')
+            candidates.setdefault(symbol, []).append((start, end, float(hits), "history"))
+
+    if not candidates:
+        start, end = _config_range({'years': _FALLBACK_YEARS})
+        candidates[_FALLBACK_SYMBOL.upper()] = [(start, end, 1.0, "default")]
+    return candidates
+
+
+def _dataset(symbol: str, start: str, end: str, weight: float, source: str) -> WarmupDataset:
+    from services.job_cost import COST_BYTES_PER_ROW, COST_MEMORY_OVERHEAD, estimate_dataset
+
+    rows, _, load_s = estimate_dataset(symbol, start, end)
+    # Warmup loads the whole range at once (no chunking)
+    resident = int(rows * COST_BYTES_PER_ROW * COST_MEMORY_OVERHEAD)
+    return WarmupDataset(symbol, start, end, weight, resident, load_s, source)
+
+
+def plan_warmup() -> List[WarmupDataset]:
+    """
+    Datasets to warm, highest value first. One per symbol (a process holds one
+    symbol's bulk data): the union of its requested ranges when that fits the
+    process budget, else its most requested range.
+    """
+    per_symbol: List[WarmupDataset] = []
+    for symbol, ranges in _candidates().items():
+        weight = sum(r[2] for r in ranges)
+        source = "config" if any(r[3] == "config" for r in ranges) else ranges[0][3]
+        union = _dataset(symbol, min(r[0] for r in ranges), max(r[1] for r in ranges), weight, source)
+        if union.resident_bytes <= WARMUP_PROCESS_BUDGET_MB * _MB:
+            per_symbol.append(union)
+            continue
+        start, end, _, _ = max(ranges, key=lambda r: r[2])
+        per_symbol.append(_dataset(symbol, start, end, weight, source))
+
+    plan: List[WarmupDataset] = []
+    total = 0
+    for dataset in sorted(per_symbol, key=lambda d: d.value, reverse=True):
+        if len(plan) >= WARMUP_MAX_DATASETS:
+            break
+        if dataset.resident_bytes > WARMUP_PROCESS_BUDGET_MB * _MB:
+            logger.info("[WARMUP] %s %s..%s exceeds the process budget, skipped",
+                        dataset.symbol, dataset.from_date, dataset.to_date)
+            continue
+        if total + dataset.resident_bytes > WARMUP_TOTAL_BUDGET_MB * _MB:
+            continue
+        plan.append(dataset)
+        total += dataset.resident_bytes
+    return plan
+
+
+def strategies_to_precompute(limit: int = WARMUP_PRECOMPUTE_TOP) -> List[Dict[str, Any]]:
+    """Top strategies whose last precompute predates their symbol's data version."""
+    client = _get_redis_client() if limit > 0 else None
+    if client is None:
+        return []
+    from services.data_version import data_version_key
+
+    try:
+        top = client.zrevrange(_STRATEGIES_KEY, 0, limit - 1)
+        if not top:
+            return []
+        payloads = client.hmget(_STRATEGY_PAYLOADS_KEY, top)
+        done = client.hmget(_PRECOMPUTED_KEY, top)
+    except redis.RedisError:
+        return []
+    pending = []
+    for fingerprint, payload, version in zip(top, payloads, done):
+        if payload is None:
+            continue
+        request = orjson.loads(payload)
+        current = data_version_key(request['index'])
+        if version is None or version.decode() != current:
+            pending.append(request)
+            try:
+                client.hset(_PRECOMPUTED_KEY, fingerprint, current)
+            except redis.RedisError:
+                pass
+    return pending
+
+
+# ── Readiness ─────────────────────────────────────────────────────────────────
+
+class WarmupState:
+    """Thread-safe warmup progress for readiness checks."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.status = "pending"
+        self.ready = False
+        self.steps: List[Dict[str, Any]] = []
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def start(self, steps: List[str]) -> None:
+        with self._lock:
+            self.status = "running"
+            self.started_at = time.time()
+            self.steps = [{"name": name, "status": "pending"} for name in steps]
+
+    def add_step(self, name: str) -> None:
+        with self._lock:
+            self.steps.append({"name": name, "status": "pending"})
+
+    def step(self, name: str, status: str, **detail: Any) -> None:
+        with self._lock:
+            for step in self.steps:
+                if step["name"] == name:
+                    step.update(status=status, **detail)
+                    if status == "running":
+                        step["started_at"] = time.time()
+                    elif "started_at" in step:
+                        step["elapsed_s"] = round(time.time() - step.pop("started_at"), 2)
+                    return
+
+    def mark_ready(self) -> None:
+        with self._lock:
+            if not self.ready:
+                self.ready = True
+                logger.info("[WARMUP] Ready after %.1fs", time.time() - (self.started_at or time.time()))
+
+    def finish(self, status: str = "complete") -> None:
+        with self._lock:
+            self.status = status
+            self.ready = True
+            self.finished_at = time.time()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            done = sum(1 for s in self.steps if s["status"] in ("done", "failed", "skipped"))
+            return {
+                "ready": self.ready,
+                "status": self.status,
+                "progress": {"done": done, "total": len(self.steps)},
+                "steps": [dict(s) for s in self.steps],
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+            }
+
+
+_state = WarmupState()
+
+
+def warmup_state() -> WarmupState:
+    return _state
@@ -33,9 +33,14 @@ celery_app.conf.update(
     broker_connection_retry_on_startup=True,
     broker_connection_retry=True,
     broker_connection_max_retries=3,
+    # AlgoTest jobs and shards are routed per job by services.job_cost to
+    # backtests_short / backtests / backtests_huge, or to a worker's direct
+    # queue 'affinity.<hostname>' (services.dataset_affinity); these are the defaults.
     task_routes={
         'worker.tasks.run_backtest_task': {'queue': 'backtests'},
         'worker.tasks.run_algotest_job': {'queue': 'backtests'},
+        'worker.tasks.run_algotest_shard': {'queue': 'backtests'},
+        'worker.tasks.merge_algotest_shards': {'queue': 'backtests'},
         'worker.tasks.load_data_task': {'queue': 'uploads'},
         'worker.tasks.migrate_csv_task': {'queue': 'uploads'},
     },
@@ -3,18 +3,21 @@ Celery tasks for background processing.
 """
 import sys
 import os
+import time
 from datetime import datetime
 from pathlib import Path
 
 # Add backend to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from celery import chord
+from celery.exceptions import Ignore, Retry
+from celery.signals import celeryd_after_setup, worker_process_init, worker_process_shutdown
 from worker.celery import celery_app
 from services.upload_config import DATA_TYPE_METHODS
-from database import DATABASE_URL
-from migrate_data import Migrator
-from sqlalchemy import create_engine, text
-import pandas as pd
+
+# migrate_data, pandas and SQLAlchemy are imported inside the tasks that use
+# them: this module is also imported by the API just to enqueue tasks.
 
 
 @celery_app.task(bind=True)
@@ -50,19 +53,225 @@ def run_backtest_task(self, params: dict):
         }
 
 
+# 0 = size shards from the live backtest-queue worker slots
+ALGOTEST_SHARDS = int(os.getenv("ALGOTEST_SHARDS", "0"))
+# Seconds a worker slot count is reused before it is looked up again
+WORKER_SLOTS_TTL = int(os.getenv("WORKER_SLOTS_TTL", "60"))
+
+_worker_slots = (0.0, 1)  # (looked up at, slots)
+
+
+def _inspect_worker_slots() -> int:
+    """Pool slots from a Celery inspect broadcast (two round trips, ~1s)."""
+    from services.job_cost import BACKTEST_QUEUES
+
+    try:
+        inspector = celery_app.control.inspect(timeout=1.0)
+        queues = inspector.active_queues() or {}
+        stats = inspector.stats() or {}
+    except Exception:
+        return 1
+    slots = 0
+    for worker, worker_queues in queues.items():
+        if any(q.get('name') in BACKTEST_QUEUES for q in worker_queues or []):
+            pool = (stats.get(worker) or {}).get('pool') or {}
+            slots += int(pool.get('max-concurrency') or 1)
+    return max(1, slots)
+
+
+def _backtest_worker_slots() -> int:
+    """
+    Pool slots of all workers consuming a backtest queue (1 if unknown),
+    cached for WORKER_SLOTS_TTL. Counted from the dataset-affinity
+    heartbeats (one per pool process); the inspect broadcast is only the
+    fallback when affinity is off.
+    """
+    global _worker_slots
+    looked_up, slots = _worker_slots
+    if time.monotonic() - looked_up < WORKER_SLOTS_TTL:
+        return slots
+    from services.dataset_affinity import live_slots
+
+    slots = live_slots() or _inspect_worker_slots()
+    _worker_slots = (time.monotonic(), slots)
+    return slots
+
+
+@celeryd_after_setup.connect
+def _add_affinity_queue(sender, instance, **kwargs):
+    """Backtest workers also consume their own direct queue (dataset affinity)."""
+    from services.dataset_affinity import register_worker
+
+    queues = instance.app.amqp.queues
+    direct = register_worker(sender, list(queues.consume_from))
+    if direct is not None:
+        queues.select_add(direct)
+
+
+@worker_process_init.connect
+def _init_backtest_process(**kwargs):
+    """Pool process of a backtest worker: import the engine now, then advertise."""
+    from services.dataset_affinity import is_backtest_worker, start_heartbeat
+    from services.engine_pool import preload_engine
+
+    if is_backtest_worker():
+        preload_engine()
+        start_heartbeat()
+
+
+@worker_process_shutdown.connect
+def _withdraw_affinity(**kwargs):
+    from services.dataset_affinity import withdraw
+    withdraw()
+
+
+def _progress_meta(task):
+    """Mirror live job progress into the Celery task state (for status polling)."""
+    def _update(meta: dict):
+        task.update_state(state='PROCESSING', meta=meta)
+    return _update
+
+
+def _finish_job(job, result: dict) -> None:
+    if job is None:
+        return
+    from services.single_flight import complete_job
+
+    # Hand the result to identical requests that coalesced onto this job
+    complete_job(job.job_id, result)
+    if result.get('status') == 'success':
+        if job.cancelled(refresh=True):
+            job.finish('cancelled', partial=True, artifact_id=result.get('artifact_id'))
+        else:
+            job.finish('completed', artifact_id=result.get('artifact_id'))
+    else:
+        job.finish('failed', error=result.get('message') or result.get('error'))
+
+
 @celery_app.task(bind=True)
 def run_algotest_job(self, params: dict):
-    """Execute AlgoTest backtest via shared service."""
-    try:
-        self.update_state(state='PROCESSING', meta={'status': 'Running AlgoTest backtest'})
-        from services.algotest_job import execute_algotest_job
-        result = execute_algotest_job(params)
-        return _sanitize_result(result)
-    except Exception as e:
-        return _sanitize_result({
-            'status': 'error',
-            'message': str(e)
-        })
+    """
+    Execute AlgoTest backtest via shared service.
+
+    Long ranges are replaced by an expiry-sharded chord (run_algotest_shard
+    → merge_algotest_shards); the job id stays the same for status polling.
+    Progress and partial trades are published on the job's event channel.
+    A job whose predicted footprint does not fit in the worker's free memory
+    is deferred (retried) rather than started.
+    """
+    from services.dataset_affinity import advertise, claim
+    from services.job_control import job_context
+
+    claim(params)
+    advertise(busy=True)
+    with job_context(self.request.id, on_progress=_progress_meta(self)) as job:
+        try:
+            self.update_state(state='PROCESSING', meta={'status': 'Running AlgoTest backtest'})
+            from services.algotest_job import _normalize_request
+            from services.dataset_affinity import route_job
+            from services.job_cost import COST_DEFER_MAX, COST_DEFER_S, estimate_job_cost, fits_in_memory
+            from services.result_artifacts import publish_result
+            from services.result_store import lookup_stored_result
+            from services.sharded_backtest import SHARDS_PER_WORKER, plan_expiry_shards, shardable_expiries
+
+            # A stored run answers repeat requests without planning any shards
+            # (no_cache: recompute, and merge_shard_results does not store either)
+            stored = None
+            if not params.get('no_cache'):
+                stored = lookup_stored_result(_normalize_request(params), as_table=True)
+            if stored is not None:
+                result = _sanitize_result(publish_result(stored))
+                _finish_job(job, result)
+                return result
+
+            cost = estimate_job_cost(params)
+            if not fits_in_memory(cost) and self.request.retries < COST_DEFER_MAX:
+                if job is not None:
+                    job.set_stage('Waiting for memory')
+                raise self.retry(countdown=COST_DEFER_S, max_retries=COST_DEFER_MAX)
+
+            # Size check first: short jobs never ask how many workers there are
+            shards = []
+            expiries = shardable_expiries(params)
+            if expiries:
+                n_shards = ALGOTEST_SHARDS
+                if not n_shards:
+                    slots = _backtest_worker_slots()
+                    n_shards = slots * SHARDS_PER_WORKER if slots > 1 else 0  # one slot: nothing to spread over
+                shards = plan_expiry_shards(params, n_shards, expiries) if n_shards > 1 else []
+            if shards:
+                self.update_state(state='PROCESSING', meta={
+                    'status': f'Running {len(shards)} expiry shards', 'shards': len(shards),
+                })
+                if job is not None:
+                    job.set_stage(f'Running {len(shards)} expiry shards')
+                for shard in shards:
+                    shard['_job_id'] = self.request.id
+                # Each shard goes to a worker already holding its range, if any
+                queues = [route_job(shard, estimate_job_cost(shard)) for shard in shards]
+                # merge_algotest_shards publishes the terminal status
+                return self.replace(chord(
+                    (run_algotest_shard.s(shard).set(queue=queue) for shard, queue in zip(shards, queues)),
+                    merge_algotest_shards.s(params),
+                ))
+
+            from services.algotest_job import execute_algotest_job
+            # Trades go to an Arrow artifact; only the handle is stored in Redis
+            result = _sanitize_result(publish_result(execute_algotest_job(params, as_table=True)))
+            _finish_job(job, result)
+            return result
+        except (Ignore, Retry):
+            raise
+        except Exception as e:
+            result = _sanitize_result({
+                'status': 'error',
+                'message': str(e)
+            })
+            _finish_job(job, result)
+            return result
+        finally:
+            advertise(busy=False)
+
+
+@celery_app.task(bind=True)
+def run_algotest_shard(self, shard: dict):
+    """Run one expiry shard of a distributed AlgoTest job."""
+    from services.dataset_affinity import advertise, claim
+    from services.job_control import job_context
+
+    claim(shard)
+    advertise(busy=True)
+    with job_context(shard.get('_job_id'), shard=shard.get('_shard', 0)):
+        try:
+            from services.sharded_backtest import run_shard
+            return _sanitize_result(run_shard(shard))
+        except Exception as e:
+            return {'shard': shard.get('_shard', 0), 'error': str(e)}
+        finally:
+            advertise(busy=False)
+
+
+@celery_app.task(bind=True)
+def merge_algotest_shards(self, shard_results: list, params: dict):
+    """Chord callback: renumber trades across shards and compute analytics once."""
+    from services.job_control import job_context
+
+    # The chord replaced run_algotest_job, so this task carries the job id
+    with job_context(self.request.id, on_progress=_progress_meta(self)) as job:
+        try:
+            self.update_state(state='PROCESSING', meta={'status': 'Merging shard results'})
+            if job is not None:
+                job.set_stage('Merging shard results')
+            from services.result_artifacts import publish_result
+            from services.sharded_backtest import merge_shard_results
+            result = _sanitize_result(publish_result(merge_shard_results(params, shard_results)))
+        except Exception as e:
+            result = _sanitize_result({
+                'status': 'error',
+                'message': str(e)
+            })
+        _finish_job(job, result)
+        return result
 
 
 def _sanitize_result(value):
@@ -122,6 +331,8 @@ def load_data_task(self, data_type: str, source: str):
 @celery_app.task(bind=True)
 def migrate_csv_task(self, temp_path: str, data_type: str, force: bool = False):
     """Migrate an uploaded CSV via Migrator and delete the temp file."""
+    from migrate_data import Migrator
+
     normalized = data_type.strip().lower()
     method_name = DATA_TYPE_METHODS.get(normalized)
     if method_name is None:
@@ -148,6 +359,9 @@ def migrate_csv_task(self, temp_path: str, data_type: str, force: bool = False):
 @celery_app.task
 def health_check():
     """Simple health check task."""
+    from database import DATABASE_URL
+    from sqlalchemy import create_engine, text
+
     try:
         engine = create_engine(DATABASE_URL)
         with engine.connect() as conn:
@@ -1,5 +1,5 @@
 import React, { useState, useEffect, useMemo, useRef, useCallback } from 'react';
-import { Play, Plus, Trash2, Info, Save, AlertTriangle, Loader2, RefreshCw } from 'lucide-react';
+import { Play, Plus, Trash2, Info, Save, AlertTriangle, Loader2, RefreshCw, Square } from 'lucide-react';
 import { format, parse, isValid } from 'date-fns';
 import ResultsPanel from './ResultsPanel';
 import SuperTrendFilter from './SuperTrendFilter';
@@ -423,6 +423,7 @@ const [slippagePct, setSlippagePct] = useState(0);
   const [validationError, setValidationError] = useState(null);
   const [trailSLWarning, setTrailSLWarning] = useState(null);
   const jobPollRef = useRef(null);
+  const jobEventsRef = useRef(null);
   const [jobId, setJobId] = useState(null);
   const [jobStatusLabel, setJobStatusLabel] = useState('');
   const [jobState, setJobState] = useState('idle'); // 'idle' | 'queued' | 'running' | 'completed'
@@ -502,6 +503,10 @@ const [slippagePct, setSlippagePct] = useState(0);
       clearTimeout(jobPollRef.current);
       jobPollRef.current = null;
     }
+    if (jobEventsRef.current) {
+      jobEventsRef.current.close();
+      jobEventsRef.current = null;
+    }
   }, []);
 
   useEffect(() => {
@@ -511,7 +516,9 @@ const [slippagePct, setSlippagePct] = useState(0);
   const pollJobStatus = useCallback((jobId) => {
     stopJobPolling();
     setJobState('queued');
-    const intervalMs = 1500;
+    // Live progress arrives over SSE; polling only backs it up (and fetches the result)
+    let intervalMs = 1500;
+    const sseFallbackMs = 10000;
 
     const fetchStatus = async () => {
       try {
@@ -536,7 +543,10 @@ const [slippagePct, setSlippagePct] = useState(0);
           setSlippagePct(payload?.meta?.slippage_pct ?? 0);
           setChargesEnabled(payload?.meta?.charges_enabled ?? false);
           setResults(payload);
-          if (strFilter.enabled && Array.isArray(payload?.trades) && payload.trades.length === 0) {
+          if (payload?.meta?.cancelled) {
+            const tradeCount = Array.isArray(payload?.trades) ? payload.trades.length : 0;
+            setError(`Backtest cancelled — showing the ${tradeCount} trade rows completed before cancelling.`);
+          } else if (strFilter.enabled && Array.isArray(payload?.trades) && payload.trades.length === 0) {
             setError(`No trades matched the ${strFilter.configLabel} filter for this date range. Try a different filter or widen the date range.`);
           } else {
             setError(null);
@@ -544,6 +554,16 @@ const [slippagePct, setSlippagePct] = useState(0);
           return;
         }
 
+        if (data.status === 'cancelled') {
+          setJobState('idle');
+          stopJobPolling();
+          setJobStatusLabel('');
+          setJobId(null);
+          setLoading(false);
+          setError('Backtest cancelled.');
+          return;
+        }
+
         if (data.status === 'failed') {
           setJobState('idle');
           stopJobPolling();
@@ -562,6 +582,7 @@ const [slippagePct, setSlippagePct] = useState(0);
           setJobStatusLabel('Queued…');
         }
 
+        if (jobEventsRef.current) return; // SSE pushes progress; the fallback timer keeps running
         jobPollRef.current = setTimeout(fetchStatus, intervalMs);
       } catch (err) {
         setJobState('idle');
@@ -573,9 +594,87 @@ const [slippagePct, setSlippagePct] = useState(0);
       }
     };
 
+    const fetchNow = () => {
+      if (jobPollRef.current) clearTimeout(jobPollRef.current);
+      jobPollRef.current = setTimeout(fetchStatus, 0);
+    };
+
+    if (typeof EventSource !== 'undefined') {
+      const events = new EventSource(`/api/algotest/jobs/${jobId}/events`);
+      jobEventsRef.current = events;
+      intervalMs = sseFallbackMs;
+
+      const fallbackTick = () => {
+        if (jobEventsRef.current !== events) return;
+        fetchStatus();
+        jobPollRef.current = setTimeout(fallbackTick, intervalMs);
+      };
+
+      events.addEventListener('progress', (evt) => {
+        try {
+          const progress = JSON.parse(evt.data);
+          const stats = progress.stats || {};
+          const counts = progress.total ? ` ${progress.done}/${progress.total}` : '';
+          const pnl = stats.trades ? ` · ${stats.trades} trades · P&L ${stats.total_pnl}` : '';
+          setJobState('running');
+          setJobStatusLabel(`${progress.stage || 'Running backtest'}${counts}${pnl}`);
+        } catch (err) {
+          // Malformed event — polling still reports status
+        }
+      });
+      events.addEventListener('status', () => {
+        events.close();
+        jobEventsRef.current = null;
+        intervalMs = 1500;
+        fetchNow();
+      });
+      events.onerror = () => {
+        // Stream unavailable (proxy, Redis down): fall back to regular polling
+        if (jobEventsRef.current !== events) return;
+        events.close();
+        jobEventsRef.current = null;
+        intervalMs = 1500;
+        fetchNow();
+      };
+      jobPollRef.current = setTimeout(fallbackTick, 0);
+      return;
+    }
+
     jobPollRef.current = setTimeout(fetchStatus, 0);
   }, [stopJobPolling, strFilter.configLabel, strFilter.enabled]);
 
+  const cancelJob = useCallback(async () => {
+    if (!jobId) return;
+    setJobStatusLabel('Cancelling…');
+    try {
+      const res = await fetch(`/api/algotest/jobs/${jobId}/cancel`, { method: 'POST' });
+      const data = await res.json().catch(() => null);
+      if (data?.status === 'detached') {
+        // Shared (coalesced) run keeps going for the other clients — just stop following it
+        stopJobPolling();
+        setJobState('idle');
+        setJobStatusLabel('');
+        setJobId(null);
+        setLoading(false);
+        setError('Backtest cancelled.');
+        return;
+      }
+    } catch (err) {
+      console.warn('[cancelJob] cancel request failed:', err);
+    }
+    // Polling / SSE deliver the partial result or the cancelled status
+  }, [jobId, stopJobPolling]);
+
+  // Leaving the page abandons the job — cancel it instead of letting it hold a worker
+  useEffect(() => {
+    if (!jobId) return undefined;
+    const onUnload = () => {
+      if (navigator.sendBeacon) navigator.sendBeacon(`/api/algotest/jobs/${jobId}/cancel`);
+    };
+    window.addEventListener('pagehide', onUnload);
+    return () => window.removeEventListener('pagehide', onUnload);
+  }, [jobId]);
+
   const formatSummaryDateInput = (value) => {
     if (!value) return null;
     const parsed = value instanceof Date ? value : new Date(value);
@@ -744,7 +843,8 @@ const [slippagePct, setSlippagePct] = useState(0);
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify(sanitizePayload({
-          trades: rawResults.trades,
+          // Stored runs are re-priced server-side; no need to post every trade back
+          ...(rawResults.meta?.run_id ? { run_id: rawResults.meta.run_id } : { trades: rawResults.trades }),
           slippage_pct: Number(slippagePct) || 0,
           charges_enabled: chargesEnabled,
           initial_capital: 100000,
@@ -2294,6 +2394,15 @@ const [slippagePct, setSlippagePct] = useState(0);
               </>
             )}
           </button>
+          {loading && jobId && (
+            <button
+              onClick={cancelJob}
+              className="flex items-center gap-2 px-4 py-1.5 rounded-full text-xs font-semibold text-red-600 bg-white border border-red-300 shadow hover:bg-red-50"
+            >
+              <Square size={12} />
+              Cancel
+            </button>
+          )}
           {jobStatusLabel && (
             <div className="mt-2 text-xs text-center text-secondary">{jobStatusLabel}</div>
           )}